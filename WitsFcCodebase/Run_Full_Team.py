@@ -1,13 +1,32 @@
+import argparse, sys
+
+# Launcher options (removed from sys.argv before the common arguments are parsed by Script)
+launcher = argparse.ArgumentParser(add_help=False)
+launcher.add_argument("--procs", type=int, default=0, help="number of worker processes (0: all agents in this process)")
+launcher.add_argument("--no-pin", action="store_true", help="do not pin worker processes to CPU cores")
+launch_args, sys.argv[1:] = launcher.parse_known_args()
+
+if launch_args.procs > 0:
+    import os
+    os.environ.setdefault("OMP_NUM_THREADS", "1") # before numpy is imported: one core per worker process
+
 from scripts.commons.Script import Script
 script = Script() # Initialize: load config file, parse arguments, build cpp modules
 a = script.args
 
+if launch_args.procs > 0: # e.g. --procs 5: 1 agent per process, --procs 2: 3+2 agents
+    from scripts.commons.Team_Launcher import Team_Launcher
+    # per-agent cycle times are printed every minute in debug mode, every 5 minutes otherwise
+    Team_Launcher(a.i, a.p, a.m, a.t, launch_args.procs, pin=not launch_args.no_pin, report_interval=3000 if a.D else 15000).run()
+    exit()
+
 from agent.Agent import Agent
+from communication.Team_Runtime import Team_Runtime
 
 # Args: Server IP, Agent Port, Monitor Port, Uniform No., Team name, Enable Log, Enable Draw
 team_args = ((a.i, a.p, a.m, u, a.t, True, True) for u in range(1,6))
 script.batch_create(Agent,team_args)
 
-while True:
-    script.batch_execute_agent()
-    script.batch_receive()
+# Single event loop over all agent sockets: each agent thinks as soon as its own perception arrives
+runtime = Team_Runtime(script.players)
+runtime.run(report_interval = 3000 if a.D else 0) # in debug mode, print think latency every 3000 cycles (1 minute)
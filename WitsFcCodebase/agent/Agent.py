@@ -3,14 +3,13 @@ from math_ops.Math_Ops import Math_Ops as M
 import math
 import numpy as np
 
-from strategy.Assignment import role_assignment 
+from strategy.Assignment import RoleAssigner
 from strategy.Strategy import Strategy 
 from strategy.GameModeHandler import GameModeHandler
 from strategy.DecisionMaker import DecisionMaker
 from strategy.TacticalStrategies import TacticalStrategies
 
 from formation.Formation import GenerateBasicFormation
-from formation.DynamicFormation import DynamicFormation
 
 
 class Agent(Base_Agent):
@@ -31,6 +30,12 @@ class Agent(Base_Agent):
         self.fat_proxy_cmd = "" if is_fat_proxy else None
         self.fat_proxy_walk = np.zeros(3) # filtered walk parameters for fat proxy
 
+        # Strategy components are created once and receive the strategy data of each cycle (see select_skill)
+        self.game_mode_handler = GameModeHandler(self.world)
+        self.decision_maker = DecisionMaker(None)
+        self.tactical_strategies = TacticalStrategies(None, self.decision_maker)
+        self.role_assigner = RoleAssigner() # warm start: this agent's previous assignment
+
         self.init_pos = ([-14,0],[-9,-5],[-9,0],[-9,5],[-5,-5],[-5,0],[-5,5],[-1,-6],[-1,-2.5],[-1,2.5],[-1,6])[unum-1] # initial formation
 
 
@@ -190,7 +195,10 @@ class Agent(Base_Agent):
     def think_and_send(self):
         
         behavior = self.behavior
+        prof = self.world.profiler
+        t = prof.now()
         strategyData = Strategy(self.world)
+        t = prof.add(prof.STRATEGY, t)
         d = self.world.draw
 
         if strategyData.play_mode == self.world.M_GAME_OVER:
@@ -203,7 +211,9 @@ class Agent(Base_Agent):
             self.state = 0 if behavior.execute("Get_Up") else 1
         else:
             if strategyData.play_mode != self.world.M_BEFORE_KICKOFF:
+                t = prof.now()
                 self.select_skill(strategyData)
+                prof.add(prof.SELECT_SKILL, t)
             else:
                 pass
 
@@ -212,11 +222,13 @@ class Agent(Base_Agent):
         self.radio.broadcast()
 
         #--------------------------------------- 4. Send to server
+        t = prof.now()
         if self.fat_proxy_cmd is None: # normal behavior
             self.scom.commit_and_send( strategyData.robot_model.get_command() )
         else: # fat proxy behavior
             self.scom.commit_and_send( self.fat_proxy_cmd.encode() ) 
             self.fat_proxy_cmd = ""
+        prof.add(prof.COMMAND_SEND, t)
 
 
 
@@ -232,10 +244,11 @@ class Agent(Base_Agent):
         #--------------------------------------- Initialize
         drawer = self.world.draw
         
-        # Create helper objects
-        game_mode_handler = GameModeHandler(self.world)
-        decision_maker = DecisionMaker(strategyData)
-        tactical_strategies = TacticalStrategies(strategyData, decision_maker)
+        # Helper objects (reused every cycle)
+        game_mode_handler = self.game_mode_handler
+        decision_maker = self.decision_maker
+        tactical_strategies = self.tactical_strategies
+        tactical_strategies.update(strategyData)
         
         # Get game mode information
         game_mode_group = game_mode_handler.get_game_mode_group(strategyData.play_mode)
@@ -244,16 +257,12 @@ class Agent(Base_Agent):
         
         #--------------------------------------- Generate Dynamic Formation
         # Use dynamic formation that adapts to ball position and game state
-        formation_positions = DynamicFormation.generate_formation(
-            ball_pos=strategyData.ball_2d,
-            play_mode_group=game_mode_group,
-            is_left_team=self.world.team_side_is_left,
-            is_our_set_piece=is_our_set_piece
-        )
+        # (the formation and the role assignment are computed once per snapshot, see World_Snapshot)
+        formation_positions = strategyData.snapshot.formation(game_mode_group, is_our_set_piece)
         
         #--------------------------------------- Role Assignment
         # Assign each player to optimal formation position using stable matching
-        point_preferences = role_assignment(strategyData.teammate_positions, formation_positions)
+        point_preferences = strategyData.snapshot.role_assignment(game_mode_group, is_our_set_piece, self.role_assigner)
         strategyData.my_desired_position = point_preferences[strategyData.player_unum]
         strategyData.my_desried_orientation = strategyData.GetDirectionRelativeToMyPositionAndTarget(
             strategyData.my_desired_position)
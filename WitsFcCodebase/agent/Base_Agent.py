@@ -10,6 +10,7 @@ from world.World import World
 
 class Base_Agent():
     all_agents = []
+    comm_class = Server_Comm # e.g. Replay_Comm, to replay a recording instead of connecting to the server
 
     def __init__(self, host:str, agent_port:int, monitor_port:int, unum:int, robot_type:int, team_name:str, enable_log:bool=True,
                   enable_draw:bool=True, apply_play_mode_correction:bool=True, wait_for_server:bool=True, hear_callback=None) -> None:
@@ -18,7 +19,7 @@ class Base_Agent():
         self.logger = Logger(enable_log, f"{team_name}_{unum}")
         self.world = World(robot_type, team_name, unum, apply_play_mode_correction, enable_draw, self.logger, host)
         self.world_parser = World_Parser(self.world, self.hear_message if hear_callback is None else hear_callback)
-        self.scom = Server_Comm(host,agent_port,monitor_port,unum,robot_type,team_name,self.world_parser,self.world,Base_Agent.all_agents,wait_for_server)
+        self.scom = Base_Agent.comm_class(host,agent_port,monitor_port,unum,robot_type,team_name,self.world_parser,self.world,Base_Agent.all_agents,wait_for_server)
         self.inv_kinematics = Inverse_Kinematics(self.world.robot)
         self.behavior = Behavior(self)
         self.path_manager = Path_Manager(self.world)
@@ -1,6 +1,3 @@
-import numpy as np
-
-
 class Behavior():
 
     def __init__(self, base_agent) -> None:
@@ -115,7 +112,11 @@ class Behavior():
             self.head.execute()
 
         # Execute behavior
-        if not self.behaviors[name][2](reset,*args):
+        prof = self.world.profiler
+        t = prof.now()
+        finished = self.behaviors[name][2](reset,*args)
+        prof.add(prof.BEHAVIOR, t)
+        if not finished:
             return False
 
         # The behavior has finished
@@ -173,7 +174,7 @@ class Behavior():
             if done: break # Exit here if last command is part of the behavior
 
         # reset to avoid polluting the next command
-        r.joints_target_speed = np.zeros_like(r.joints_target_speed)
+        r.joints_target_speed.fill(0)
 
 
     def is_ready(self, name, *args) -> bool:
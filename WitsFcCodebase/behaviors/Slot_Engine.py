@@ -1,59 +1,194 @@
 from math_ops.Math_Ops import Math_Ops as M
-from os import listdir
+from os import getpid, listdir, makedirs, remove, replace, stat
 from os.path import isfile, join
 from world.World import World
 import numpy as np
+import pickle
 import xml.etree.ElementTree as xmlp
 
+
+class Slot_Motion():
+    '''
+    Compiled slot behavior: keyframe durations, joint mask and angle matrix (one row per slot)
+
+    The arrays are shared by all agents that load the same XML file and must not be modified (see Slot_Engine.set_slot).
+    The joints moved by each slot are also stored contiguously (slot k is [offsets[k]:offsets[k+1]]), with the angle each
+    joint has at the start of the slot (the target of the last slot that moved it, or NaN if it starts at the reset position).
+    '''
+    MAX_JOINTS = 24
+
+    def __init__(self, deltas_ms, mask, angles, description:str, auto_head:bool) -> None:
+        self.deltas_ms = deltas_ms      # (n,) duration of each slot
+        self.mask = mask                # (n,MAX_JOINTS) True if the joint is moved by the slot
+        self.angles = angles            # (n,MAX_JOINTS) target angle of each joint (0 if the joint is not moved)
+        self.description = description
+        self.auto_head = auto_head
+
+        self.deltas = deltas_ms.tolist()                      # (python floats are faster to handle one by one)
+        self.indices = [np.flatnonzero(m) for m in mask]      # joints moved by each slot
+        self.offsets = np.cumsum([0] + [len(i) for i in self.indices]).tolist()
+        self.flat_indices = np.concatenate(self.indices)
+        self.flat_angles = angles[mask]
+
+        last, start = np.full(Slot_Motion.MAX_JOINTS, np.nan), []
+        for m, a in zip(mask, angles):
+            start.append(last[m])
+            last = np.where(m, a, last)
+        self.flat_start = np.concatenate(start)
+        self.from_reset = np.isnan(self.flat_start)
+        self.reset_indices = self.flat_indices[self.from_reset]
+
+    @staticmethod
+    def from_slots(slots, description:str, auto_head:bool):
+        ''' Create from a list of slots: (delta_ms, joint indices, angles) '''
+        n = len(slots)
+        deltas_ms = np.array([s[0] for s in slots], float)
+        mask = np.zeros((n, Slot_Motion.MAX_JOINTS), bool)
+        angles = np.zeros((n, Slot_Motion.MAX_JOINTS))
+        for k, (_, indices, a) in enumerate(slots):
+            mask[k, indices] = True
+            angles[k, indices] = a
+        return Slot_Motion(deltas_ms, mask, angles, description, auto_head)
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def __getitem__(self, k):
+        ''' Slot `k`: (delta_ms, joint indices, angles) '''
+        return self.deltas[k], self.indices[k], self.angles[k, self.mask[k]]
+
+    def __iter__(self):
+        return (self[k] for k in range(len(self)))
+
+
 class Slot_Engine():
+    CACHE_VERSION = 1
+    _motions = dict() # compiled motions of this process, key: (XML path, modification time, size)
 
     def __init__(self, world : World) -> None:
         self.world = world
         self.state_slot_number = 0
-        self.state_slot_start_time = 0
+        self.state_slot_start_time_ms = 0
         self.state_slot_start_angles = None
+        self.state_slot_diff = None
+        self.state_slot_min = None
+        self.state_slot_max = None
         self.state_init_zero = True
 
-        # ------------- Parse slot behaviors
+        r = world.robot
+        self.joints_min = np.array([r.joints_info[i].min for i in range(r.no_of_joints)])
+        self.joints_max = np.array([r.joints_info[i].max for i in range(r.no_of_joints)])
+
+        # ------------- Load compiled slot behaviors
 
         dir = M.get_active_directory("/behaviors/slot/")
 
-        common_dir = f"{dir}common/"
-        files =  [(f,join(common_dir, f)) for f in listdir(common_dir) if isfile(join(common_dir, f)) and f.endswith(".xml")]
-        robot_dir = f"{dir}r{world.robot.type}"
-        files += [(f,join(robot_dir, f)) for f in listdir(robot_dir) if isfile(join(robot_dir, f)) and f.endswith(".xml")]
+        self.behaviors = Slot_Engine.load_dir(dir, "common")
+        for bname, motion in Slot_Engine.load_dir(dir, f"r{world.robot.type}").items():
+            assert bname not in self.behaviors, f"Found at least 2 slot behaviors with same name: {bname}.xml"
+            self.behaviors[bname] = motion
 
-        self.behaviors = dict()
-        self.descriptions = dict()
-        self.auto_head_flags = dict()
+        self.descriptions = {bname: m.description for bname, m in self.behaviors.items()}
+        self.auto_head_flags = {bname: m.auto_head for bname, m in self.behaviors.items()}
 
-        for fname, file in files:
-            robot_xml_root = xmlp.parse(file).getroot()
-            slots = []
-            bname = fname[:-4] # remove extension ".xml"
 
-            for xml_slot in robot_xml_root:
-                assert xml_slot.tag == 'slot', f"Unexpected XML element in slot behavior {fname}: '{xml_slot.tag}'"
-                indices, angles = [],[]
-                
-                for action in xml_slot:
-                    indices.append(  int(action.attrib['id'])    )
-                    angles.append( float(action.attrib['angle']) )
+    @staticmethod
+    def compile(file:str) -> Slot_Motion:
+        ''' Parse slot behavior XML file '''
+        fname = file.split("/")[-1]
+        robot_xml_root = xmlp.parse(file).getroot()
+        slots = []
 
-                delta_ms = float(xml_slot.attrib['delta']) * 1000
-                assert delta_ms > 0, f"Invalid delta <=0 found in Slot Behavior {fname}"
-                slots.append((delta_ms, indices, angles))
+        for xml_slot in robot_xml_root:
+            assert xml_slot.tag == 'slot', f"Unexpected XML element in slot behavior {fname}: '{xml_slot.tag}'"
+            indices, angles = [],[]
 
-            assert bname not in self.behaviors, f"Found at least 2 slot behaviors with same name: {fname}"
+            for action in xml_slot:
+                indices.append(  int(action.attrib['id'])    )
+                angles.append( float(action.attrib['angle']) )
 
-            self.descriptions[bname] = robot_xml_root.attrib["description"] if "description" in robot_xml_root.attrib else bname
-            self.auto_head_flags[bname] = (robot_xml_root.attrib["auto_head"] == "1")
-            self.behaviors[bname] = slots
+            delta_ms = float(xml_slot.attrib['delta']) * 1000
+            assert delta_ms > 0, f"Invalid delta <=0 found in Slot Behavior {fname}"
+            slots.append((delta_ms, indices, angles))
+
+        description = robot_xml_root.attrib["description"] if "description" in robot_xml_root.attrib else fname[:-4]
+        auto_head = (robot_xml_root.attrib["auto_head"] == "1")
+        return Slot_Motion.from_slots(slots, description, auto_head)
+
+
+    @staticmethod
+    def load_dir(dir:str, sub_dir:str) -> dict:
+        '''
+        Load the compiled slot behaviors of `dir/sub_dir`, compiling the XML files that changed since they were cached
+
+        Compiled behaviors are cached in memory (shared by the agents of this process) and on disk, in `dir/.compiled/sub_dir.pkl`
+        (the cache is only written if a behavior was compiled, and errors are ignored, e.g. if the directory is read-only)
+
+        Returns
+        -------
+        behaviors : dict
+            key: behavior name, value: Slot_Motion
+        '''
+        xml_dir = join(dir, sub_dir)
+        cache_file = join(dir, ".compiled", f"{sub_dir}.pkl")
+        cached = None # disk cache, key: file name, value: (modification time, size, deltas_ms, mask, angles, description, auto_head)
+        changed = False
+        behaviors = dict()
+
+        for fname in sorted(listdir(xml_dir)):
+            file = join(xml_dir, fname)
+            if not fname.endswith(".xml") or not isfile(file): continue
+            s = stat(file)
+            key = (file, s.st_mtime_ns, s.st_size)
+            motion = Slot_Engine._motions.get(key)
+
+            if motion is None:
+                if cached is None:
+                    try:
+                        with open(cache_file, 'rb') as f:
+                            version, cached = pickle.load(f)
+                        if version != Slot_Engine.CACHE_VERSION: cached = dict()
+                    except Exception:
+                        cached = dict()
+                entry = cached.get(fname)
+                if entry is not None and entry[:2] == key[1:]:
+                    motion = Slot_Motion(*entry[2:])
+                else:
+                    motion = Slot_Engine.compile(file)
+                    cached[fname] = (*key[1:], motion.deltas_ms, motion.mask, motion.angles, motion.description, motion.auto_head)
+                    changed = True
+                Slot_Engine._motions[key] = motion
+
+            behaviors[fname[:-4]] = motion # remove extension ".xml"
+
+        if changed:
+            tmp_file = f"{cache_file}.{getpid()}.tmp" # (written atomically, other processes may be reading or writing it)
+            try:
+                makedirs(join(dir, ".compiled"), exist_ok=True)
+                cached = {f:e for f,e in cached.items() if f[:-4] in behaviors} # remove deleted files
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump((Slot_Engine.CACHE_VERSION, cached), f, protocol=4)
+                replace(tmp_file, cache_file)
+            except OSError: # the cache is optional, the behaviors were already compiled
+                try:
+                    remove(tmp_file)
+                except OSError:
+                    pass
+
+        return behaviors
+
+
+    def set_slot(self, name, slot_number, delta_ms, indices, angles):
+        ''' Replace one slot of a behavior, for this agent only (e.g. to optimize a behavior) '''
+        m = self.behaviors[name]
+        slots = list(m)
+        slots[slot_number] = (delta_ms, indices, angles)
+        self.behaviors[name] = Slot_Motion.from_slots(slots, m.description, m.auto_head)
 
 
     def get_behaviors_callbacks(self):
-        ''' 
-        Returns callbacks for each slot behavior (used internally) 
+        '''
+        Returns callbacks for each slot behavior (used internally)
 
         Implementation note:
         --------------------
@@ -71,11 +206,19 @@ class Slot_Engine():
 
     def reset(self, name):
         ''' Initialize/Reset slot behavior '''
+        assert name in self.behaviors, f"Requested slot behavior does not exist: {name}"
+        m = self.behaviors[name]
 
         self.state_slot_number = 0
         self.state_slot_start_time_ms = self.world.time_local_ms
-        self.state_slot_start_angles = np.copy(self.world.robot.joints_position)
-        assert name in self.behaviors, f"Requested slot behavior does not exist: {name}"
+
+        # Start angles and (target - start) of every slot, for all slots at once (slot k is [offsets[k]:offsets[k+1]])
+        start = m.flat_start.copy()
+        start[m.from_reset] = self.world.robot.joints_position[m.reset_indices]
+        self.state_slot_start_angles = start
+        self.state_slot_diff = m.flat_angles - start
+        self.state_slot_min = self.joints_min[m.flat_indices]
+        self.state_slot_max = self.joints_max[m.flat_indices]
 
 
     def execute(self,name,reset) -> bool:
@@ -83,28 +226,30 @@ class Slot_Engine():
 
         if reset: self.reset(name)
 
+        m = self.behaviors[name]
+        k = self.state_slot_number
         elapsed_ms = self.world.time_local_ms - self.state_slot_start_time_ms
-        delta_ms, indices, angles = self.behaviors[name][self.state_slot_number]
+        delta_ms = m.deltas[k]
 
         # Check slot progression
         if elapsed_ms >= delta_ms:
-            self.state_slot_start_angles[indices] = angles #update start angles based on last target
-             
             # Prevent 2 rare scenarios:
             # 1 - this function is called after the behavior is finished & reset==False
             # 2 - we are in the last slot, syncmode is not active, and we lost the last step
-            if self.state_slot_number+1 == len(self.behaviors[name]):
+            if k+1 == len(m.deltas):
                 return True # So, the return indicates a finished behavior until a reset is sent via the arguments
 
-            self.state_slot_number += 1
+            k = self.state_slot_number = k + 1
             elapsed_ms = 0
             self.state_slot_start_time_ms = self.world.time_local_ms
-            delta_ms, indices, angles = self.behaviors[name][self.state_slot_number]
+            delta_ms = m.deltas[k]
 
-        # Execute 
+        # Execute (the targets are limited to the joints' range of motion here, with precomputed limits)
+        a, b = m.offsets[k], m.offsets[k+1]
         progress = (elapsed_ms+20) / delta_ms
-        target = (angles - self.state_slot_start_angles[indices]) * progress + self.state_slot_start_angles[indices]
-        self.world.robot.set_joints_target_position_direct(indices,target,False)
+        target = self.state_slot_diff[a:b] * progress + self.state_slot_start_angles[a:b]
+        np.clip(target, self.state_slot_min[a:b], self.state_slot_max[a:b], out=target)
+        self.world.robot.set_joints_target_position_direct(m.flat_indices[a:b],target,False,limit_joints=False)
 
         # Return True if finished (this is the last step)
-        return bool(elapsed_ms+20 >= delta_ms and self.state_slot_number + 1 == len(self.behaviors[name])) # true if next step (now+20ms) is out of bounds
+        return bool(elapsed_ms+20 >= delta_ms and k + 1 == len(m.deltas)) # true if next step (now+20ms) is out of bounds
@@ -1,7 +1,7 @@
 from agent.Base_Agent import Base_Agent
 from behaviors.custom.Dribble.Env import Env
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
+from math_ops.Neural_Network import Policy
 import numpy as np
 import pickle
 
@@ -24,6 +24,7 @@ class Dribble():
             "/behaviors/custom/Dribble/dribble_R4.pkl"
             ][self.world.robot.type]), 'rb') as f:
             self.model = pickle.load(f)
+        self.policy = Policy(self.model) # preallocated float32 inference engine
 
     def define_approach_orientation(self):
 
@@ -178,7 +179,7 @@ class Dribble():
 
             #------------------------ 2. Execute behavior
             obs = self.env.observe(reset_dribble)
-            action = run_mlp(obs, self.model)   
+            action = self.policy(obs)   
             self.env.execute(action)
         
         # wind down dribbling, and then reset phase
@@ -190,7 +191,7 @@ class Dribble():
 
             #------------------------ 2. Execute behavior
             obs = self.env.observe(reset_dribble, virtual_ball=True)
-            action = run_mlp(obs, self.model)   
+            action = self.policy(obs)   
             self.env.execute(action)
 
             #------------------------ 3. Reset behavior
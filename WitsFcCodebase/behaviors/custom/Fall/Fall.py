@@ -1,6 +1,6 @@
 from agent.Base_Agent import Base_Agent
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
+from math_ops.Neural_Network import Policy
 import pickle, numpy as np
 
 class Fall():
@@ -12,6 +12,7 @@ class Fall():
 
         with open(M.get_active_directory("/behaviors/custom/Fall/fall.pkl"), 'rb') as f:
             self.model = pickle.load(f)
+        self.policy = Policy(self.model) # preallocated float32 inference engine
 
         self.action_size = len(self.model[-1][0]) # extracted from size of Neural Network's last layer bias
         self.obs = np.zeros(self.action_size+1, np.float32)
@@ -28,7 +29,7 @@ class Fall():
       
     def execute(self,reset) -> bool:
         self.observe()
-        action = run_mlp(self.obs, self.model) 
+        action = self.policy(self.obs) 
         
         self.world.robot.set_joints_target_position_direct( # commit actions:
             slice(self.controllable_joints), # act on trained joints
@@ -1,10 +1,18 @@
+from functools import lru_cache
 import math
+import numpy as np
 
 
 class Step_Generator():
+    '''
+    Target positions of both feet (y and z, relative to the hip center) during a walking gait
+
+    The targets only depend on the gait parameters, which are constant during a step, so the targets of every time step
+    of a step are computed once per parameter tuple (see `get_table`) and each time step reads its targets from the table.
+    '''
     GRAVITY = 9.81
     Z0 = 0.2
-    
+
     def __init__(self, feet_y_dev, sample_time, max_ankle_z) -> None:
         self.feet_y_dev = feet_y_dev
         self.sample_time = sample_time
@@ -13,6 +21,51 @@ class Step_Generator():
         self.switch = False # switch legs
         self.external_progress = 0 # non-overlaped progress
         self.max_ankle_z = max_ankle_z
+        self.table = None   # targets of the current step parameters (see get_table)
+        self.requested = None # parameters of the last call to get_target_positions (accepted at the end of the step)
+
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def get_table(feet_y_dev, sample_time, max_ankle_z, ts_per_step, swing_height, max_leg_extension):
+        '''
+        Target positions of each time step of a step, for each active leg (memoized for the last 64 parameter tuples)
+
+        Returns
+        -------
+        table : `tuple`
+            table[is_left_active][ts] = (Left leg y, Left leg z, Right leg y, Right leg z), with python floats
+        '''
+        #-------------------------- Compute COM.y
+        W = math.sqrt(Step_Generator.Z0/Step_Generator.GRAVITY)
+
+        step_time = ts_per_step * sample_time
+        y0 = feet_y_dev # absolute initial y value
+
+        #-------------------------- Cap maximum extension and swing height
+        z0 = min(-max_leg_extension, max_ankle_z) #  capped initial z value
+        zh = min(swing_height, max_ankle_z - z0) # capped swing height
+
+        right_active, left_active = [], []
+        for ts in range(ts_per_step):
+            time_delta = ts * sample_time
+            y_swing = y0 + y0 * (  math.sinh((step_time - time_delta)/W) + math.sinh(time_delta/W)  ) / math.sinh(-step_time/W)
+
+            #-------------------------- Compute Z Swing
+            progress = ts / ts_per_step
+            active_z_swing = zh * math.sin(math.pi * progress)
+
+            right_active.append((y0-y_swing, z0, -y0-y_swing, active_z_swing+z0))
+            left_active.append((y0+y_swing, active_z_swing+z0, -y0+y_swing, z0))
+
+        return tuple(right_active), tuple(left_active)
+
+
+    def _set_parameters(self, ts_per_step, z_span, z_extension):
+        self.ts_per_step = ts_per_step        # step duration in time steps
+        self.swing_height = z_span
+        self.max_leg_extension = z_extension  # maximum distance between ankle to center of both hip joints
+        self.table = Step_Generator.get_table(self.feet_y_dev, self.sample_time, self.max_ankle_z, ts_per_step, z_span, z_extension)
 
 
     def get_target_positions(self, reset, ts_per_step, z_span, z_extension):
@@ -26,14 +79,13 @@ class Step_Generator():
         '''
 
         assert type(ts_per_step)==int and ts_per_step > 0, "ts_per_step must be a positive integer!"
+        self.requested = (ts_per_step, z_span, z_extension)
 
         #-------------------------- Advance 1ts
         if reset:
-            self.ts_per_step = ts_per_step        # step duration in time steps
-            self.swing_height = z_span
-            self.max_leg_extension = z_extension  # maximum distance between ankle to center of both hip joints
+            self._set_parameters(ts_per_step, z_span, z_extension)
             self.state_current_ts = 0
-            self.state_is_left_active = False 
+            self.state_is_left_active = False
             self.switch = False
         elif self.switch:
             self.state_current_ts = 0
@@ -42,34 +94,39 @@ class Step_Generator():
         else:
             self.state_current_ts += 1
 
-        #-------------------------- Compute COM.y
-        W = math.sqrt(self.Z0/self.GRAVITY)
-
-        step_time = self.ts_per_step * self.sample_time
-        time_delta = self.state_current_ts * self.sample_time
- 
-        y0 = self.feet_y_dev # absolute initial y value
-        y_swing = y0 + y0 * (  math.sinh((step_time - time_delta)/W) + math.sinh(time_delta/W)  ) / math.sinh(-step_time/W)
-
-        #-------------------------- Cap maximum extension and swing height
-        z0 = min(-self.max_leg_extension, self.max_ankle_z) #  capped initial z value
-        zh = min(self.swing_height, self.max_ankle_z - z0) # capped swing height
-
-        #-------------------------- Compute Z Swing
-        progress = self.state_current_ts / self.ts_per_step
+        target = self.table[self.state_is_left_active][self.state_current_ts]
         self.external_progress = self.state_current_ts / (self.ts_per_step-1)
-        active_z_swing = zh * math.sin(math.pi * progress)
 
         #-------------------------- Accept new parameters after final step
         if self.state_current_ts + 1 >= self.ts_per_step:
-            self.ts_per_step = ts_per_step        # step duration in time steps
-            self.swing_height = z_span
-            self.max_leg_extension = z_extension  # maximum distance between ankle to center of both hip joints
+            self._set_parameters(ts_per_step, z_span, z_extension)
             self.switch = True
 
-        #-------------------------- Distinguish active leg
-        if self.state_is_left_active:
-            return y0+y_swing, active_z_swing+z0, -y0+y_swing, z0
-        else:
-            return y0-y_swing, z0, -y0-y_swing, active_z_swing+z0
+        return target
+
+
+    def get_future_positions(self, n):
+        '''
+        Get the target positions of the next `n` time steps, assuming the next calls to `get_target_positions` have the same
+        parameters as the last call (the state of the generator is not changed, and that method must have been called at least once)
+
+        Returns
+        -------
+        targets : ndarray
+            (n,4) array, where each row is (Left leg y, Left leg z, Right leg y, Right leg z)
+        '''
+        targets = np.empty((n,4))
+        ts, is_left_active, switch = self.state_current_ts, self.state_is_left_active, self.switch
+        table, steps = self.table, self.ts_per_step
+
+        for i in range(n):
+            if switch: # the parameters of the last call are accepted at the end of the step
+                ts, is_left_active, switch = 0, not is_left_active, False
+                table, steps = Step_Generator.get_table(self.feet_y_dev, self.sample_time, self.max_ankle_z, *self.requested), self.requested[0]
+            else:
+                ts += 1
+            if ts + 1 >= steps:
+                switch = True
+            targets[i] = table[is_left_active][ts]
 
+        return targets
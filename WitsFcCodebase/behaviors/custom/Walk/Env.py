@@ -144,15 +144,12 @@ class Env():
         r = self.world.robot
         # Apply IK to each leg + Set joint targets
           
-        # Left leg 
-        indices, self.values_l, error_codes = self.ik.leg(l_pos, l_rot, True, dynamic_pose=False)
+        # Both legs at once (the values are already limited to the joints' range of motion)
+        values, _, _ = self.ik.legs((l_pos, r_pos), (l_rot, r_rot), (True, False), dynamic_pose=False)
+        self.values_l, self.values_r = values
 
-        r.set_joints_target_position_direct(indices, self.values_l, harmonize=False)
-
-        # Right leg
-        indices, self.values_r, error_codes = self.ik.leg(r_pos, r_rot, False, dynamic_pose=False)
-
-        r.set_joints_target_position_direct(indices, self.values_r, harmonize=False)
+        r.set_joints_target_position_direct(self.ik.LEFT_LEG_INDICES, self.values_l, harmonize=False, limit_joints=False)
+        r.set_joints_target_position_direct(self.ik.RIGHT_LEG_INDICES, self.values_r, harmonize=False, limit_joints=False)
 
 
     def execute(self, action):
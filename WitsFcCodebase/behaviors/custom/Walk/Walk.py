@@ -1,7 +1,7 @@
 from agent.Base_Agent import Base_Agent
 from behaviors.custom.Walk.Env import Env
 from math_ops.Math_Ops import Math_Ops as M
-from math_ops.Neural_Network import run_mlp
+from math_ops.Neural_Network import Policy
 import numpy as np
 import pickle
 
@@ -22,6 +22,7 @@ class Walk():
             "/behaviors/custom/Walk/walk_R4.pkl"
             ][self.world.robot.type]), 'rb') as f:
             self.model = pickle.load(f)
+        self.policy = Policy(self.model) # preallocated float32 inference engine
 
 
     def execute(self, reset, target_2d, is_target_absolute, orientation, is_orientation_absolute, distance):
@@ -72,7 +73,7 @@ class Walk():
         #------------------------ 2. Execute behavior
 
         obs = self.env.observe(reset)
-        action = run_mlp(obs, self.model)   
+        action = self.policy(obs)   
         self.env.execute(action)
         
         return False
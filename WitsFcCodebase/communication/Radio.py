@@ -1,6 +1,7 @@
-from typing import List
-from world.commons.Other_Robot import Other_Robot
+from communication.Radio_Codec import Radio_Codec
+from world.commons.Other_Robots import Other_Robots
 from world.World import World
+import math
 import numpy as np
 
 class Radio():
@@ -18,9 +19,7 @@ class Radio():
     # map limits are hardcoded:
 
     # lines, columns, half lines index, half cols index, (lines-1)/x_span, (cols-1)/y_span, combinations, combinations*2states, 
-    TP = 321,221,160,110,10,  10,70941,141882 # teammate position
-    OP = 201,111,100,55, 6.25,5, 22311,44622  # opponent position
-    BP = 301,201,150,100,10,  10,60501        # ball position
+    TP, OP, BP = Radio_Codec.TP, Radio_Codec.OP, Radio_Codec.BP # teammate, opponent and ball position (see Radio_Codec)
     SYMB = "!#$%&*+,-./0123456789:<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[]^_`abcdefghijklmnopqrstuvwxyz{|}~;"
     SLEN = len(SYMB)
     SYMB_TO_IDX = {ord(s):i for i,s in enumerate(SYMB)}
@@ -40,6 +39,11 @@ class Radio():
         for g in self.groups: # add 'self in group?'
             g.append(any(i.is_self for i in g[0]))
 
+        # rows of each group's players in world.other_robots, and which of them is oneself
+        self.group_rows = [np.array([ot.row for ot in g[0]], int) for g in self.groups]
+        self.group_self_idx = [next((i for i,ot in enumerate(g[0]) if ot.is_self), None) for g in self.groups]
+        self.codec = Radio_Codec([(has_ball, [Radio.TP if ot.is_teammate else Radio.OP for ot in group]) for group, has_ball, _ in self.groups])
+
     def get_player_combination(self, pos, is_unknown, is_down, info):
         ''' Returns combination (0-based) and number of possible combinations '''
 
@@ -91,7 +95,7 @@ class Radio():
 
     def check_broadcast_requirements(self):
         '''
-        Check if broadcast group is valid
+        Check if broadcast group is valid (all players of the group are checked at once)
 
         Returns
         -------
@@ -118,12 +122,11 @@ class Radio():
         r = w.robot
         ago40ms = w.time_local_ms - 40
         ago370ms = w.time_local_ms - 370 # maximum delay (up to 2 MIAs) is 360ms because radio has a delay of 20ms (otherwise max delay would be 340ms)
-        group : List[Other_Robot]
 
         idx9 = int((w.time_server * 25)+0.1) % 9 # sequence of 9 phases
         max_MIA = idx9 // 3                      # maximum number of MIA players (based on server time)
         group_idx = idx9 % 3                     # group number                  (based on server time)
-        group, has_ball, is_self_included = self.groups[group_idx]
+        _, has_ball, is_self_included = self.groups[group_idx]
 
         #============================================ 0. check if group is valid
 
@@ -133,9 +136,14 @@ class Radio():
         if is_self_included and r.loc_last_update < ago40ms: # Oneself is included and unable to self-locate
             return False
 
+        o = w.other_robots
+        rows, self_idx = self.group_rows[group_idx], self.group_self_idx[group_idx]
+        last_update = o.state_last_update[rows].tolist() # (python ints are faster than numpy for a few players)
+
         # Get players that have been previously seen or heard but not recently
-        MIAs = [not ot.is_self and ot.state_last_update < ago370ms and ot.state_last_update > 0 for ot in group]
-        self.MIAs = [ot.state_last_update == 0 or MIAs[i] for i,ot in enumerate(group)] # add players that have never been seen
+        MIAs = [0 < t < ago370ms for t in last_update]
+        if self_idx is not None: MIAs[self_idx] = False
+        self.MIAs = [t == 0 or m for t,m in zip(last_update, MIAs)] # add players that have never been seen
 
         if sum(MIAs) > max_MIA: # checking if number of recently missing members is not above threshold
             return False
@@ -150,13 +158,10 @@ class Radio():
         # - Player is other and not MIA and:  
         #      - last update was >40ms ago OR
         #      - last update did not include the head (head is important to provide state and accurate position)
-
-        if any(
-            (not ot.is_self and not self.MIAs[i] and                   
-                (ot.state_last_update < ago40ms or ot.state_last_update==0 or len(ot.state_abs_pos)<3)#  (last update: has no head or is old)                          
-            ) for i,ot in enumerate(group)
-        ):
-            return False
+        dims = o.state_abs_pos_dim[rows].tolist()
+        for i in range(len(rows)):
+            if i != self_idx and not self.MIAs[i] and (last_update[i] < ago40ms or dims[i] < 3):
+                return False
 
         return True
 
@@ -164,143 +169,101 @@ class Radio():
     def broadcast(self):
         '''
         Commit messages to teammates if certain conditions are met
-        Messages contain: positions/states of every moving entity
+        Messages contain: positions/states of every moving entity (see Radio_Codec)
         '''
 
         if not self.check_broadcast_requirements():
             return
-            
-        w = self.world
-        ot : Other_Robot
 
+        w = self.world
+        o = w.other_robots
         group_idx = int((w.time_server * 25)+0.1) % 3 # group number based on server time
-        group, has_ball, _ = self.groups[group_idx]
-
-        #============================================ 1. create combination
-
-        # add message number
-        combination = group_idx
-        no_of_combinations = 3
-
-        # add ball combination
-        if has_ball: 
-            c, n = self.get_ball_combination(w.ball_abs_pos[0], w.ball_abs_pos[1])   
-            combination += c * no_of_combinations
-            no_of_combinations *= n
-
-
-        # add group combinations
-        for i,ot in enumerate(group):
-            c, n = self.get_player_combination(ot.state_abs_pos,                           # player position
-                                               self.MIAs[i], ot.state_fallen,              # is unknown, is down
-                                               Radio.TP if ot.is_teammate else Radio.OP)   # is teammate
-            combination += c * no_of_combinations
-            no_of_combinations *= n
-
-
-        assert(no_of_combinations < 9.61e38) # 88*89^19 (first character cannot be ';')
-
-        #============================================ 2. create message
-
-        # 1st msg symbol: ignore ';' due to server bug
-        msg = Radio.SYMB[combination % (Radio.SLEN-1)]
-        combination //= (Radio.SLEN-1)
+        rows = self.group_rows[group_idx]
 
-        # following msg symbols
-        while combination:
-            msg += Radio.SYMB[combination % Radio.SLEN]
-            combination //= Radio.SLEN
-
-        #============================================ 3. commit message
-
-        self.commit_announcement(msg.encode()) # commit message
+        msg = self.codec.encode(group_idx, float(w.ball_abs_pos[0]), float(w.ball_abs_pos[1]),
+                                o.state_abs_pos[rows,:2].tolist(), self.MIAs, o.state_fallen[rows].tolist())
+        self.commit_announcement(msg) # commit message
 
 
     def receive(self, msg:bytearray):
+        ''' Update the world with a message from a teammate (all players of the message are decoded at once, see Radio_Codec) '''
         w = self.world
         r = w.robot
         ago40ms = w.time_local_ms - 40
         ago110ms = w.time_local_ms - 110
         msg_time = w.time_local_ms - 20 # message was sent in the last step
 
-        #============================================ 1. get combination
-
-        # read first symbol, which cannot be ';' due to server bug
-        combination = Radio.SYMB_TO_IDX[msg[0]]
-        total_combinations = Radio.SLEN-1
-
-        if len(msg)>1:
-            for m in msg[1:]:
-                combination += total_combinations * Radio.SYMB_TO_IDX[m]
-                total_combinations *= Radio.SLEN
-
-        #============================================ 2. get msg ID
-
-        message_no = combination % 3
-        combination //= 3
-        group, has_ball, _ = self.groups[message_no]
-
-        #============================================ 3. get data
-
-        if has_ball:
-            ball_comb = combination % Radio.BP[6]
-            combination //= Radio.BP[6]
+        #============================================ 1. decode message
 
-        players_combs = []
-        ot : Other_Robot
-        for ot in group:
-            info = Radio.TP if ot.is_teammate else Radio.OP
-            players_combs.append( combination % (info[7]+2) )
-            combination //= info[7]+2
+        message_no, ball, positions, is_down, status = self.codec.decode(msg)
+        if message_no is None: # invalid symbols
+            return
+        _, has_ball, _ = self.groups[message_no]
 
-        #============================================ 4. update world
+        #============================================ 2. update world
 
         if has_ball and w.ball_abs_pos_last_update < ago40ms: # update ball if it was not seen
             time_diff = (msg_time - w.ball_abs_pos_last_update) / 1000
-            ball = self.get_ball_position(ball_comb)
             w.ball_abs_vel = (ball - w.ball_abs_pos) / time_diff
             w.ball_abs_speed = np.linalg.norm(w.ball_abs_vel)
             w.ball_abs_pos_last_update = msg_time # (error: 0-40 ms)
             w.ball_abs_pos = ball
             w.is_ball_abs_pos_from_vision = False
-            
-        for c, ot in zip(players_combs, group):
-            
+
+        o = w.other_robots
+        rows, self_idx = self.group_rows[message_no], self.group_self_idx[message_no]
+        last_update = o.state_last_update[rows].tolist()
+        positions, is_down, status = positions.tolist(), is_down.tolist(), status.tolist()
+
+        for i, row in enumerate(rows.tolist()):
+
+            if status[i] != Radio_Codec.VALID: # out of bounds or unknown
+                continue
+
             # handle oneself case
-            if ot.is_self:
+            if i == self_idx:
                 # the ball's position has a fair amount of noise, whether seen by us or other players
                 # but our self-locatization mechanism is usually much better than how others perceive us
                 if r.loc_last_update < ago110ms: # so we wait until we miss 2 visual steps
-                    data = self.get_player_position(c, Radio.TP)
-                    if type(data)==tuple:
-                        x,y,is_down = data
-                        r.loc_head_position[:2] = x,y # z is kept unchanged
-                        r.loc_head_position_last_update = msg_time
-                        r.radio_fallen_state = is_down
-                        r.radio_last_update = msg_time
+                    r.loc_head_position[:2] = positions[i] # z is kept unchanged
+                    r.loc_head_position_last_update = msg_time
+                    r.radio_fallen_state = is_down[i]
+                    r.radio_last_update = msg_time
                 continue
 
             # do not update if other robot was recently seen
-            if ot.state_last_update >= ago40ms:
+            if last_update[i] >= ago40ms:
                 continue
 
-            info = Radio.TP if ot.is_teammate else Radio.OP
-            data = self.get_player_position(c, info)  
-            if type(data)==tuple:
-                x,y,is_down = data
-                p = np.array([x,y])
-                
-                if ot.state_abs_pos is not None:  # update the x & y components of the velocity
-                    time_diff = (msg_time - ot.state_last_update) / 1000
-                    velocity = np.append( (p - ot.state_abs_pos[:2]) / time_diff, 0) # v.z = 0
-                    vel_diff = velocity - ot.state_filtered_velocity
-                    if np.linalg.norm(vel_diff) < 4: # otherwise assume it was beamed
-                        ot.state_filtered_velocity /= (ot.vel_decay,ot.vel_decay,1) # neutralize decay (except in the z-axis)
-                        ot.state_filtered_velocity += ot.vel_filter * vel_diff
-                    
-                ot.state_fallen = is_down             
-                ot.state_last_update = msg_time    
-                ot.state_body_parts_abs_pos = {"head":p}
-                ot.state_abs_pos = p
-                ot.state_horizontal_dist = np.linalg.norm(p - r.loc_head_position[:2])
-                ot.state_ground_area = (p, 0.3 if is_down else 0.2)  # not very precise, but we cannot see the robot
\ No newline at end of file
+            self._update_player(row, positions[i], is_down[i], last_update[i], msg_time)
+
+
+    def _update_player(self, row, p, is_down, last_update, msg_time):
+        ''' Update the state of another robot (row of world.other_robots) with its 2D head position `p` from radio '''
+        o = self.world.other_robots
+        x, y = p
+
+        if o.state_abs_pos_dim[row]: # update the x & y components of the velocity
+            time_diff = (msg_time - last_update) / 1000
+            old_x, old_y = o.state_abs_pos[row,:2].tolist()
+            vel = o.state_filtered_velocity[row]
+            v_x, v_y, v_z = vel.tolist()
+            d_x, d_y, d_z = (x - old_x) / time_diff - v_x, (y - old_y) / time_diff - v_y, -v_z # v.z = 0
+            if d_x*d_x + d_y*d_y + d_z*d_z < 16: # otherwise assume it was beamed
+                decay, k = o.vel_decay[row].item(), o.vel_filter[row].item()
+                vel[:] = (v_x / decay + k * d_x, v_y / decay + k * d_y, v_z + k * d_z) # neutralize decay (except in the z-axis)
+
+        head = Other_Robots.HEAD
+        o.state_fallen[row] = is_down
+        o.state_last_update[row] = msg_time
+        o.state_parts_known[row] = False # body parts: 2D head position
+        o.state_parts_known[row,head] = True
+        o.state_parts_abs_pos[row,head,:2] = p
+        o.state_parts_dim[row] = 2
+        o.state_abs_pos[row,:2] = p
+        o.state_abs_pos_dim[row] = 2
+        head_x, head_y = self.world.robot.loc_head_position[:2].tolist()
+        o.state_horizontal_dist[row] = math.sqrt((x - head_x)*(x - head_x) + (y - head_y)*(y - head_y))
+        o.state_ground_area_is_known[row] = True # not very precise, but we cannot see the robot
+        o.state_ground_area_center[row] = p
+        o.state_ground_area_radius[row] = 0.3 if is_down else 0.2
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class Radio_Codec():
+    '''
+    Encoder/decoder of radio messages (see Radio)
+
+    A message is a mixed-radix number: message number (3), ball position (if the group has the ball), and the
+    combination of each player in the group. The number is written in base 89 (the first symbol in base 88, see Radio).
+    Quantization, clamping and symbol conversion use precomputed tables and integer arithmetic, and a whole group
+    is decoded at once into numpy arrays.
+    '''
+    # lines, columns, half lines index, half cols index, (lines-1)/x_span, (cols-1)/y_span, combinations, combinations*2states
+    TP = 321,221,160,110,10,  10,70941,141882 # teammate position
+    OP = 201,111,100,55, 6.25,5, 22311,44622  # opponent position
+    BP = 301,201,150,100,10,  10,60501        # ball position
+    SYMB = b"!#$%&*+,-./0123456789:<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[]^_`abcdefghijklmnopqrstuvwxyz{|}~;"
+    SLEN = len(SYMB)
+    SYMB_TO_IDX = bytes.maketrans(SYMB + bytes(sorted(set(range(256)) - set(SYMB))),      # translation table from symbols
+                                  bytes(range(SLEN)) + b"\xff" * (256 - SLEN))             # to indices (255: invalid symbol)
+
+    # Combination status of each player (see decode)
+    VALID, OUT_OF_BOUNDS, UNKNOWN = 0, -1, -2
+
+    @staticmethod
+    def _decoding_table(info):
+        ''' Position (x,y), is down? and status of every player combination of a grid (see Radio.get_player_position) '''
+        comb = np.arange(info[7]+2)
+        l, c = np.divmod(comb % info[6], info[1])
+        pos = np.column_stack((l / info[4] - 16, c / info[5] - 11))
+        status = np.full(len(comb), Radio_Codec.VALID, np.int64)
+        status[info[7]:] = Radio_Codec.OUT_OF_BOUNDS, Radio_Codec.UNKNOWN
+        pos[info[7]:] = 0
+        return pos, comb // info[6] == 1, status
+
+
+    def __init__(self, groups) -> None:
+        '''
+        Parameters
+        ----------
+        groups : list
+            layout of each message number: (has ball?, grid info of each player, e.g. (Radio_Codec.TP,)*5)
+        '''
+        self.groups = [(has_ball, tuple(infos)) for has_ball, infos in groups]
+        self.radices = [tuple(info[7]+2 for info in infos) for _, infos in self.groups] # combinations of each player
+        self.grids = [[(info, np.array([i == info for i in infos])) for info in dict.fromkeys(infos)] for _, infos in self.groups] # (grid, players)
+        self.tables = {info: Radio_Codec._decoding_table(info) for _, infos in self.groups for info in infos} # decoding table of each grid
+        self.buffer = bytearray(20) # a message has at most 20 symbols
+
+
+    @staticmethod
+    def player_combination(x:float, y:float, is_unknown:bool, is_down:bool, info) -> int:
+        ''' Returns the combination (0-based) of a player, there are info[7]+2 possible combinations (see Radio.get_player_combination) '''
+
+        if is_unknown:
+            return info[7]+1 # unknown combination
+
+        if x < -17 or x > 17 or y < -12 or y > 12:
+            return info[7]   # out of bounds combination (if it exceeds 1m in any axis)
+
+        l = round(info[4]*x+info[2]) # absorb out of bounds positions (up to 1m in each axis)
+        c = round(info[5]*y+info[3])
+        l = 0 if l < 0 else info[0]-1 if l >= info[0] else l
+        c = 0 if c < 0 else info[1]-1 if c >= info[1] else c
+
+        return l*info[1]+c + (info[6] if is_down else 0)
+
+
+    @staticmethod
+    def ball_combination(x:float, y:float) -> int:
+        ''' Returns the combination (0-based) of the ball, there are BP[6] possible combinations (the ball is forced in bounds) '''
+        BP = Radio_Codec.BP
+        l = round(BP[4]*x+BP[2])
+        c = round(BP[5]*y+BP[3])
+        l = 0 if l < 0 else BP[0]-1 if l >= BP[0] else l
+        c = 0 if c < 0 else BP[1]-1 if c >= BP[1] else c
+        return l*BP[1]+c
+
+
+    def encode(self, message_no:int, ball_x:float, ball_y:float, positions, is_unknown, is_down) -> bytes:
+        '''
+        Encode a message
+
+        Parameters
+        ----------
+        message_no : int
+            message number (index of the group layout)
+        ball_x, ball_y : float
+            ball position (ignored if the group does not have the ball)
+        positions : list
+            (x,y) position of each player of the group (ignored if unknown)
+        is_unknown : list
+            True if the player's position is unknown
+        is_down : list
+            True if the player has fallen
+        (python floats and bools are faster than numpy scalars to handle one by one, see ndarray.tolist)
+        '''
+        has_ball, infos = self.groups[message_no]
+        radices = self.radices[message_no]
+        pos, unknown, down = positions, is_unknown, is_down
+
+        # mixed-radix number, from the last player to the message number (Horner's method)
+        combination = 0
+        for i in range(len(infos)-1, -1, -1):
+            combination = combination * radices[i] + Radio_Codec.player_combination(pos[i][0], pos[i][1], unknown[i], down[i], infos[i])
+        if has_ball:
+            combination = combination * Radio_Codec.BP[6] + Radio_Codec.ball_combination(ball_x, ball_y)
+        combination = combination * 3 + message_no
+
+        # 1st msg symbol: ignore ';' due to server bug
+        buf, symb = self.buffer, Radio_Codec.SYMB
+        combination, d = divmod(combination, Radio_Codec.SLEN-1)
+        buf[0] = symb[d]
+        n = 1
+
+        # following msg symbols
+        while combination:
+            combination, d = divmod(combination, Radio_Codec.SLEN)
+            buf[n] = symb[d]
+            n += 1
+
+        assert n <= 20, "Radio message is too long"
+        return bytes(buf[:n])
+
+
+    def decode(self, msg):
+        '''
+        Decode a message
+
+        Returns
+        -------
+        message_no : int
+            message number (index of the group layout), or None if the message is invalid
+        ball : ndarray
+            3D ball position (on the ground), or None if the group does not have the ball
+        positions : ndarray
+            (n,2) position of each player of the group (undefined if its status is not VALID)
+        is_down : ndarray
+            (n,) True if the player has fallen
+        status : ndarray
+            (n,) status of each player: VALID, OUT_OF_BOUNDS or UNKNOWN
+        '''
+        digits = bytes(msg).translate(Radio_Codec.SYMB_TO_IDX)
+        if not digits or 255 in digits or digits[0] == Radio_Codec.SLEN-1:
+            return None, None, None, None, None
+
+        combination = 0
+        for d in reversed(digits[1:]):
+            combination = combination * Radio_Codec.SLEN + d
+        combination = combination * (Radio_Codec.SLEN-1) + digits[0]
+
+        combination, message_no = divmod(combination, 3)
+        has_ball, infos = self.groups[message_no]
+
+        ball = None
+        if has_ball:
+            combination, ball_comb = divmod(combination, Radio_Codec.BP[6])
+            l, c = divmod(ball_comb, Radio_Codec.BP[1])
+            ball = np.array([l/Radio_Codec.BP[4]-15, c/Radio_Codec.BP[5]-10, 0.042]) # assume ball is on ground
+
+        combs = []
+        for r in self.radices[message_no]:
+            combination, c = divmod(combination, r)
+            combs.append(c)
+
+        grids = self.grids[message_no]
+        if len(grids) == 1: # all players have the same grid (teammates or opponents)
+            pos, down, status = self.tables[grids[0][0]]
+            return message_no, ball, pos[combs], down[combs], status[combs]
+
+        n = len(infos)
+        positions, is_down, status = np.zeros((n,2)), np.zeros(n, bool), np.zeros(n, np.int64)
+        combs = np.array(combs, np.int64)
+        for info, rows in grids: # players with the same grid are decoded at once
+            table = self.tables[info]
+            positions[rows], is_down[rows], status[rows] = table[0][combs[rows]], table[1][combs[rows]], table[2][combs[rows]]
+
+        return message_no, ball, positions, is_down, status
@@ -0,0 +1,135 @@
+from communication.Server_Comm import Server_Comm
+from communication.World_Parser import World_Parser
+from world.World import World
+
+
+class Replay_Comm(Server_Comm):
+    '''
+    Stand-in for `Server_Comm` that replays a recording made with `Server_Comm.record_folder`, without sockets
+
+    Recorded server messages are fed to `World_Parser` and `World.update` exactly as they were received, and the
+    messages sent by the agent are compared with the recorded ones (see `sent_mismatches`).
+    To replay agents, set `Base_Agent.comm_class = Replay_Comm` and `Replay_Comm.folder` before creating them.
+    Agents recorded in the same process must be created in the same order as in the recorded process.
+    '''
+    folder = None # folder of the recording, each agent reads '{folder}/{team_name}_{unum}.rec'
+
+    def __init__(self, host:str, agent_port:int, monitor_port:int, unum:int, robot_type:int, team_name:str,
+                 world_parser:World_Parser, world:World, other_players, wait_for_server=True) -> None:
+
+        self.send_buff = []
+        self.world_parser = world_parser
+        self.unum = unum
+        self._unofficial_beam_msg_left  = "(agent (unum " + str(unum) + ") (team Left) (move "
+        self._unofficial_beam_msg_right = "(agent (unum " + str(unum) + ") (team Right) (move "
+        self.world = world
+        self.socket = None
+        self._recorder = None
+
+        with open(f"{Replay_Comm.folder}/{team_name}_{unum}.rec", "rb") as f:
+            self.records = Replay_Comm.read_records(f.read())
+        self.index = 0           # index of next record
+        self.sent_count = 0      # number of messages sent by the agent during the replay
+        self.sent_mismatches = 0 # number of sent messages that differ from the recording (or that were not recorded)
+
+        # Replay this agent's initialization, and what the other agents received in the meantime
+        self._replay_initialization()
+        for p in other_players:
+            p.scom._replay_initialization()
+
+
+    @staticmethod
+    def read_records(data:bytes):
+        ''' Returns a list of (record type, payload) from the contents of a recording '''
+        records = []
+        i, header = 0, Server_Comm.REC_HEADER
+        while i < len(data):
+            rec_type, size = header.unpack_from(data, i)
+            i += header.size
+            records.append((rec_type, data[i:i+size]))
+            i += size
+        return records
+
+
+    @property
+    def is_finished(self) -> bool:
+        ''' True if all records were replayed '''
+        return self.index >= len(self.records)
+
+
+    def _next_type(self):
+        return self.records[self.index][0] if self.index < len(self.records) else None
+
+
+    def _replay_initialization(self) -> None:
+        '''
+        Replay records until the next initialization marker (sent messages are not compared)
+        Nothing is replayed if there is no marker ahead (e.g. the agents were recorded in separate processes)
+        '''
+        if all(r[0] != Server_Comm.REC_INIT for r in self.records[self.index:]):
+            return
+
+        while True:
+            rec_type, payload = self.records[self.index]
+            self.index += 1
+            if rec_type == Server_Comm.REC_INIT:
+                return
+            if rec_type == Server_Comm.REC_MSG:
+                self.world_parser.parse(bytearray(payload))
+            elif rec_type == Server_Comm.REC_UPDATE:
+                self.world.update()
+
+
+    def receive(self, update=True):
+        ''' Replay the next recorded receive() call (the `update` argument is taken from the recording) '''
+        if self.is_finished:
+            raise EOFError("Replay_Comm: the recording has ended")
+
+        prof = self.world.profiler
+        prof.new_cycle()
+
+        while True:
+            rec_type, payload = self.records[self.index]
+            self.index += 1
+            if rec_type == Server_Comm.REC_MSG:
+                t = prof.now()
+                self.world_parser.parse(bytearray(payload))
+                prof.add(prof.PARSE, t)
+            elif rec_type == Server_Comm.REC_UPDATE:
+                t = prof.now()
+                self.world.update()
+                prof.add(prof.WORLD_UPDATE, t)
+                if self._next_type() != Server_Comm.REC_MSG: # otherwise, a new packet was received while on world.update()
+                    return
+            elif rec_type == Server_Comm.REC_NO_UPDATE:
+                return
+            else: # the agent did not send a recorded message
+                self.sent_mismatches += 1
+
+
+    def is_readable(self) -> bool:
+        return self._next_type() == Server_Comm.REC_MSG
+
+
+    def send_immediate(self, msg:bytes) -> None:
+        self.sent_count += 1
+        if self._next_type() == Server_Comm.REC_SENT:
+            self.sent_mismatches += self.records[self.index][1] != msg
+            self.index += 1
+        else:
+            self.sent_mismatches += 1
+
+
+    def send(self) -> None:
+        if self._next_type() == Server_Comm.REC_NOT_SENT:
+            self.index += 1
+            self.world.log("Server_Comm.py: Received a new packet while thinking!")
+            self.world.robot.command_encoder.reset()
+        else:
+            self.send_buff.append(b'(syn)')
+            self.send_immediate( b''.join(self.send_buff) )
+        self.send_buff = []
+
+
+    def close(self, close_monitor_socket = False):
+        pass
@@ -1,20 +1,31 @@
 from communication.World_Parser import World_Parser
 from itertools import count
-from select import select
+from pathlib import Path
+from select import poll, POLLIN
 from sys import exit
+from world.commons.Draw import Draw
 from world.World import World
 import socket
+import struct
 import time
 
 class Server_Comm():
     monitor_socket = None
+    record_folder = None # if not None, every agent created afterwards records its communication to '{record_folder}/{team_name}_{unum}.rec'
+
+    # Recording format: sequence of records, each with a 1-byte type, a 4-byte big-endian payload size, and the payload
+    REC_MSG, REC_UPDATE, REC_NO_UPDATE, REC_SENT, REC_NOT_SENT, REC_INIT = b'RUNSXI'
+    # REC_MSG:       server message, as received (without the size prefix)
+    # REC_UPDATE:    end of receive(), the world was updated
+    # REC_NO_UPDATE: end of receive(update=False)
+    # REC_SENT:      message sent to the server (without the size prefix)
+    # REC_NOT_SENT:  send() was skipped because a new server message had already arrived
+    # REC_INIT:      an agent finished its initialization (written to the file of every agent that exists in the process)
+    REC_HEADER = struct.Struct(">BI")
 
     def __init__(self, host:str, agent_port:int, monitor_port:int, unum:int, robot_type:int, team_name:str,
                  world_parser:World_Parser, world:World, other_players, wait_for_server=True) -> None:
 
-        self.BUFFER_SIZE = 8192
-        self.rcv_buff = bytearray(self.BUFFER_SIZE)
-        self.send_buff = []
         self.world_parser = world_parser
         self.unum = unum
 
@@ -23,7 +34,11 @@ class Server_Comm():
         self._unofficial_beam_msg_right = "(agent (unum " + str(unum) + ") (team Right) (move " 
         self.world = world
 
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM )
+        self._init_io(socket.socket(socket.AF_INET, socket.SOCK_STREAM ))
+
+        if Server_Comm.record_folder is not None:
+            Path(Server_Comm.record_folder).mkdir(parents=True, exist_ok=True)
+            self._recorder = open(f"{Server_Comm.record_folder}/{team_name}_{unum}.rec", "wb")
 
         if wait_for_server: print("Waiting for server at ", host, ":", agent_port, sep="",end=".",flush=True)
         while True:
@@ -59,6 +74,9 @@ class Server_Comm():
             print("\nError: server did not return a team side! Check server terminal!")
             exit()
 
+        for scom in [self] + [p.scom for p in other_players]: # the other players also received messages during this initialization
+            scom._record(Server_Comm.REC_INIT)
+
         # Monitor socket is shared by all agents on the same thread
         if Server_Comm.monitor_socket is None and monitor_port is not None:
             print("Connecting to server's monitor port at ", host, ":", monitor_port, sep="",end=".",flush=True)
@@ -68,6 +86,25 @@ class Server_Comm():
 
         
 
+    def _init_io(self, sock:socket.socket) -> None:
+        ''' Initialize the socket's poller and the persistent I/O buffers '''
+        self.socket = sock
+        self._poller = poll() # registered once, cheaper than building a new select() list for each readiness check
+        self._poller.register(self.socket, POLLIN)
+        self._recorder = None
+
+        self.BUFFER_SIZE = 8192
+        self.rcv_buff = bytearray(self.BUFFER_SIZE)
+        self.send_buff = []
+
+
+    def _grow_receive_buffer(self, min_size:int) -> None:
+        ''' Replace the receive buffer with a larger one '''
+        self.BUFFER_SIZE = max(min_size, 2 * self.BUFFER_SIZE)
+        self.rcv_buff = bytearray(self.BUFFER_SIZE)
+        self.world.log(f"Server_Comm.py: Receive buffer increased to {self.BUFFER_SIZE} bytes")
+
+
     def _receive_async(self, other_players, first_pass) -> None:
         '''Private function that receives asynchronous information during the initialization'''
 
@@ -96,30 +133,62 @@ class Server_Comm():
 
     def receive(self, update=True):
 
+        prof = self.world.profiler
+        prof.new_cycle()
+
         for i in count(): # parse all messages and perform value updates, but heavy computation is only done once at the end 
+            t = prof.now()
             try:
                 if self.socket.recv_into(self.rcv_buff, nbytes=4) != 4: raise ConnectionResetError()
+                t = prof.add_wait(t)
                 msg_size = int.from_bytes(self.rcv_buff[:4], byteorder='big', signed=False)
+                if msg_size > self.BUFFER_SIZE: self._grow_receive_buffer(msg_size)
                 if self.socket.recv_into(self.rcv_buff, nbytes=msg_size, flags=socket.MSG_WAITALL) != msg_size: raise ConnectionResetError()      
             except ConnectionResetError:
                 print("\nError: socket was closed by rcssserver3d!")
                 exit()
 
+            if self._recorder is not None: self._record(Server_Comm.REC_MSG, memoryview(self.rcv_buff)[:msg_size])
             self.world_parser.parse(self.rcv_buff[:msg_size])
-            if len(select([self.socket],[],[], 0.0)[0]) == 0: break
+            prof.add(prof.PARSE, t)
+            if not self.is_readable(): break
+
+        if self._recorder is not None: self._record(Server_Comm.REC_UPDATE if update else Server_Comm.REC_NO_UPDATE)
 
         if update:
             if i==1: self.world.log( "Server_Comm.py: The agent lost 1 packet! Is syncmode enabled?")
             if  i>1: self.world.log(f"Server_Comm.py: The agent lost {i} consecutive packets! Is syncmode disabled?")
+            if i>0: prof.lost_packets(i)
+            t = prof.now()
             self.world.update()
+            prof.add(prof.WORLD_UPDATE, t)
 
-            if len(select([self.socket],[],[], 0.0)[0]) != 0:
+            if self.is_readable():
                 self.world.log("Server_Comm.py: Received a new packet while on world.update()!")
                 self.receive()
 
 
+    def _record(self, rec_type:int, payload=b"") -> None:
+        if self._recorder is not None:
+            self._recorder.write(Server_Comm.REC_HEADER.pack(rec_type, len(payload)))
+            self._recorder.write(payload)
+
+
+    def stop_recording(self) -> None:
+        ''' Flush and close the recording file (it is also closed by `close()`) '''
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+
+    def is_readable(self) -> bool:
+        ''' Returns True if there is data (or a closed connection) waiting to be read, without blocking '''
+        return len(self._poller.poll(0)) != 0
+
+
     def send_immediate(self, msg:bytes) -> None:
         ''' Commit and send immediately '''
+        if self._recorder is not None: self._record(Server_Comm.REC_SENT, msg)
         try:
             self.socket.send( (len(msg)).to_bytes(4,byteorder='big') + msg ) #Add message length in the first 4 bytes
         except BrokenPipeError:
@@ -129,12 +198,16 @@ class Server_Comm():
 
     def send(self) -> None:
         ''' Send all committed messages '''
-        if len(select([self.socket],[],[], 0.0)[0]) == 0:
+        if not self.is_readable():
             self.send_buff.append(b'(syn)')
             self.send_immediate( b''.join(self.send_buff) )
         else:
             self.world.log("Server_Comm.py: Received a new packet while thinking!")
+            self.world.profiler.missed_send()
+            self.world.robot.command_encoder.reset() # the server did not get the last effector commands
+            if self._recorder is not None: self._record(Server_Comm.REC_NOT_SENT)
         self.send_buff = [] #clear buffer
+        Draw.send_frame() # drawings of this cycle (after the commands, so that they are not delayed)
 
     def commit(self, msg:bytes) -> None:
         assert type(msg) == bytes, "Message must be of type Bytes!"
@@ -145,7 +218,8 @@ class Server_Comm():
         self.send()
 
     def clear_buffer(self) -> None:
-        self.send_buff = []
+        self.send_buff.clear()
+        self.world.robot.command_encoder.reset() # committed effector commands may have been discarded
 
     def commit_announcement(self, msg:bytes) -> None:
         '''
@@ -279,6 +353,7 @@ class Server_Comm():
     def close(self, close_monitor_socket = False):
         ''' Close agent socket, and optionally the monitor socket (shared by players running on the same thread) '''
         self.socket.close()
+        self.stop_recording()
         if close_monitor_socket and Server_Comm.monitor_socket is not None:
             Server_Comm.monitor_socket.close()
             Server_Comm.monitor_socket = None
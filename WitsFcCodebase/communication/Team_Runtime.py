@@ -0,0 +1,117 @@
+from scripts.commons.UI import UI
+from time import perf_counter
+import numpy as np
+import selectors
+
+
+class Team_Runtime():
+    '''
+    Single-process event loop for a group of agents
+    
+    All agent sockets are registered in one selector (epoll on Linux). Whenever a socket is ready,
+    that agent receives and parses its pending messages, updates its world, and runs `think_and_send`
+    immediately. Agents are not processed in lockstep, so a slow agent does not delay the others.
+    '''
+
+    def __init__(self, agents:list) -> None:
+        '''
+        Parameters
+        ----------
+        agents : list
+            agents created by the same process (e.g. `Script.players`), with `scom` and `think_and_send()`
+        '''
+        self.agents = list(agents)
+        self.selector = selectors.DefaultSelector()
+        for i, a in enumerate(self.agents):
+            self.selector.register(a.scom.socket, selectors.EVENT_READ, i)
+
+        # Per-agent latency statistics (seconds)
+        n = len(self.agents)
+        self.cycles = np.zeros(n, int)
+        self.receive_last = np.zeros(n) # receive + parse + world update
+        self.receive_sum  = np.zeros(n)
+        self.think_last   = np.zeros(n) # think_and_send
+        self.think_sum    = np.zeros(n)
+        self.think_max    = np.zeros(n)
+
+
+    def step_agent(self, i) -> None:
+        ''' Receive pending messages for agent `i`, update its world, think and send '''
+        a = self.agents[i]
+        t0 = perf_counter()
+        a.scom.receive()
+        t1 = perf_counter()
+        a.think_and_send()
+        t2 = perf_counter()
+
+        self.cycles[i] += 1
+        self.receive_last[i] = t1 - t0
+        self.receive_sum[i] += t1 - t0
+        self.think_last[i] = t2 - t1
+        self.think_sum[i] += t2 - t1
+        if t2 - t1 > self.think_max[i]: self.think_max[i] = t2 - t1
+
+
+    def poll(self, timeout=None) -> int:
+        '''
+        Wait until at least one agent socket is ready, and process every ready agent
+
+        Parameters
+        ----------
+        timeout : float
+            maximum waiting time in seconds (None to wait indefinitely)
+
+        Returns
+        -------
+        processed : `int`
+            number of processed agents
+        '''
+        events = self.selector.select(timeout)
+        for key, _ in events:
+            self.step_agent(key.data)
+        return len(events)
+
+
+    def run(self, max_cycles=None, report_interval=0, report=None) -> None:
+        '''
+        Run the event loop
+
+        Parameters
+        ----------
+        max_cycles : int
+            stop after the first agent completes `max_cycles` cycles (None to run forever)
+        report_interval : int
+            report the latency statistics every `report_interval` cycles of the first agent (0 to disable)
+        report : function
+            called without arguments to report the latency statistics (default: `print_latency`)
+        '''
+        report = report or self.print_latency
+        for a in self.agents: # the agents were initialized by receiving a message, so each one starts by thinking
+            a.think_and_send()
+
+        next_report = report_interval
+        while max_cycles is None or self.cycles[0] < max_cycles:
+            self.poll()
+            if report_interval and self.cycles[0] >= next_report:
+                next_report += report_interval
+                report()
+
+
+    def get_latency(self):
+        ''' Returns per-agent latency statistics in milliseconds: (unum, cycles, receive avg, think last, think avg, think max) '''
+        c = np.maximum(self.cycles, 1)
+        return [(a.world.robot.unum, int(self.cycles[i]), self.receive_sum[i]/c[i]*1000, self.think_last[i]*1000, 
+                 self.think_sum[i]/c[i]*1000, self.think_max[i]*1000) for i, a in enumerate(self.agents)]
+
+
+    def print_latency(self) -> None:
+        table = [[],[],[],[],[],[]]
+        for row in self.get_latency():
+            for col, val in zip(table, row):
+                col.append(val if type(val) is int else f"{val:.2f}")
+        UI.print_table(table, ["Unum","Cycles","Receive avg (ms)","Think last (ms)","Think avg (ms)","Think max (ms)"], numbering=[False]*6)
+
+    
+    def close(self) -> None:
+        ''' Unregister all sockets (the sockets are not closed) '''
+        self.selector.close()
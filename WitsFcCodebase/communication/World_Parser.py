@@ -1,17 +1,20 @@
 from math_ops.Math_Ops import Math_Ops as M
+from world.commons.Other_Robots import Other_Robots
 from world.Robot import Robot
 from world.World import World
 import math
 import numpy as np
+import re
 
 
 class World_Parser():
+    TOKENIZER = re.compile(rb'[()]|[^\s()]+') # tokens: parentheses, tags and values
+
     def __init__(self, world:World, hear_callback) -> None:
         self.LOG_PREFIX = "World_Parser.py: "
         self.world = world
         self.hear_callback = hear_callback
         self.exp = None
-        self.depth = None
         self.LEFT_SIDE_FLAGS = {b'F2L':(-15,-10,0),
                                 b'F1L':(-15,+10,0),
                                 b'F2R':(+15,-10,0),
@@ -44,387 +47,360 @@ class World_Parser():
                                     "direct_free_kick_right": World.M_OUR_DIR_FREE_KICK, "Goal_Right": World.M_OUR_GOAL, "offside_right": World.M_OUR_OFFSIDE,
                                     "BeforeKickOff": World.M_BEFORE_KICKOFF, "GameOver": World.M_GAME_OVER, "PlayOn": World.M_PLAY_ON }
 
-
-    def find_non_digit(self,start):
-        while True:
-            if (self.exp[start] < ord('0') or self.exp[start] > ord('9')) and self.exp[start] != ord('.'): return start
-            start+=1
-
-    def find_char(self,start,char):
-        while True:
-            if self.exp[start] == char : return start
-            start+=1
-
-    def read_float(self, start):
-        if self.exp[start:start+3] == b'nan': return float('nan'), start+3 #handle nan values (they exist)
-        end = self.find_non_digit(start+1) #we assume the first one is a digit or minus sign
-        try:
-            retval = float(self.exp[start:end])
-        except:
-            self.world.log(f"{self.LOG_PREFIX}String to float conversion failed: {self.exp[start:end]} at msg[{start},{end}], \nMsg: {self.exp.decode()}")
-            retval = 0
-        return retval, end
-
-    def read_int(self, start):
-        end = self.find_non_digit(start+1) #we assume the first one is a digit or minus sign
-        return int(self.exp[start:end]), end
-
-    def read_bytes(self, start):
-        end = start
-        while True:
-            if self.exp[end] == ord(' ') or self.exp[end] == ord(')'): break
-            end+=1
-
-        return self.exp[start:end], end
-
-    def read_str(self, start):
-        b, end = self.read_bytes(start)
-        return b.decode(), end  
-
-    def get_next_tag(self, start):
-        min_depth = self.depth
-        while True:
-            if self.exp[start] == ord(")") :  #monitor xml element depth
-                self.depth -= 1
-                if min_depth > self.depth: min_depth = self.depth
-            elif self.exp[start] == ord("(") : break
-            start+=1
-            if start >= len(self.exp): return None, start, 0
-
-        self.depth += 1
-        start += 1
-        end = self.find_char(start, ord(" ")) 
-        return self.exp[start:end], end, min_depth
-
+        # Tag dispatch tables used by `parse`
+        self.root_handlers = {b'time':self._parse_time, b'GS':self._parse_game_state, b'GYR':self._parse_gyroscope,
+                              b'ACC':self._parse_accelerometer, b'HJ':self._parse_hinge_joint, b'FRP':self._parse_force_resistance,
+                              b'See':self._parse_vision, b'hear':self._parse_hear}
+        self.vision_handlers = {b'B':self._parse_ball, b'P':self._parse_player, b'L':self._parse_line, b'mypos':self._parse_cheat_pos,
+                                b'myorien':self._parse_cheat_ori, b'ballpos':self._parse_cheat_ball_pos, **dict.fromkeys(self.LEFT_SIDE_FLAGS, self._parse_flag)}
+        self.PERCEPTOR_TO_INDEX = {k.encode():v for k,v in Robot.MAP_PERCEPTOR_TO_INDEX.items()}
+
+        # Joint angles received in the current message, applied in a single batch (see `_apply_joints`)
+        no_of_joints = world.robot.no_of_joints
+        self.joints_angle_buffer = np.zeros(no_of_joints)
+        self.joints_received = np.zeros(no_of_joints, bool)
+        self.joints_received_count = 0
+        self.joints_sign = np.ones(no_of_joints)
+        self.joints_sign[Robot.FIX_INDICES_LIST] = -1
+        self.PLAYER_BODY_PARTS = {k.encode():v for k,v in Other_Robots.BODY_PART_INDEX.items()}
+
+
+    #--------------------------------------------------------------------- Tokenizer-based parser
+
+    def _new_step(self):
+        ''' Reset the variables that only hold information about the current server message '''
+        w = self.world
+        w.step += 1
+        w.line_count = 0
+        w.robot.frp = dict()
+        w.flags_posts = dict()
+        w.flags_corners = dict()
+        w.vision_is_up_to_date = False
+        w.ball_is_visible = False
+        w.robot.feet_toes_are_touching = dict.fromkeys(w.robot.feet_toes_are_touching, False)
+        w.time_local_ms += World.STEPTIME_MS
+
+        w.other_robots.is_visible.fill(False)
+        self.joints_received.fill(False) # joint angles received in this message (see `_apply_joints`)
+        self.joints_received_count = 0
+
+    @staticmethod
+    def _skip(t, i):
+        ''' Returns the index after the element that starts at t[i]=='(' '''
+        depth = 0
+        for i in range(i, len(t)):
+            if t[i] == b'(':
+                depth += 1
+            elif t[i] == b')':
+                depth -= 1
+                if depth == 0: return i+1
+        return len(t)
+
+    def _log_unknown(self, parent, t, i):
+        ''' Log unknown tag t[i+1] and skip its element '''
+        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside '{parent}': {t[i+1]} at token {i}, \nMsg: {bytes(self.exp).decode()}")
+        return self._skip(t, i)
 
     def parse(self, exp):
-
-        self.exp = exp #used by other member functions
-        self.depth = 0 #xml element depth
-        self.world.step += 1
-        self.world.line_count = 0
-        self.world.robot.frp = dict()
-        self.world.flags_posts = dict()
-        self.world.flags_corners = dict()
-        self.world.vision_is_up_to_date = False
-        self.world.ball_is_visible = False
-        self.world.robot.feet_toes_are_touching = dict.fromkeys(self.world.robot.feet_toes_are_touching, False)
-        self.world.time_local_ms += World.STEPTIME_MS
-
-        for p in self.world.teammates: p.is_visible = False
-        for p in self.world.opponents: p.is_visible = False
-
-        tag, end, _ = self.get_next_tag(0)
-
-        while end < len(exp):
-
-            if tag==b'time':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break 
-
-                    if tag==b'now':
-                        #last_time = self.world.time_server
-                        self.world.time_server, end = self.read_float(end+1)
-                        
-                        #Test server time reliability
-                        #increment = self.world.time_server - last_time
-                        #if increment < 0.019: print ("down",last_time,self.world.time_server)
-                        #if increment > 0.021: print ("up",last_time,self.world.time_server)
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'time': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'GS':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    if tag==b'unum':
-                        _, end = self.read_int(end+1) #We already know our unum
-                    elif tag==b'team':
-                        aux, end = self.read_str(end+1)
-                        is_left = bool(aux == "left")
-                        if self.world.team_side_is_left != is_left:
-                            self.world.team_side_is_left = is_left
-                            self.play_mode_to_id = self.LEFT_PLAY_MODE_TO_ID if is_left else self.RIGHT_PLAY_MODE_TO_ID
-                            self.world.draw.set_team_side(not is_left)
-                            self.world.team_draw.set_team_side(not is_left)
-                    elif tag==b'sl':
-                        if self.world.team_side_is_left:
-                            self.world.goals_scored, end  = self.read_int(end+1)
-                        else:
-                            self.world.goals_conceded, end  = self.read_int(end+1)
-                    elif tag==b'sr':
-                        if self.world.team_side_is_left:
-                            self.world.goals_conceded, end  = self.read_int(end+1)
-                        else:
-                            self.world.goals_scored, end  = self.read_int(end+1)
-                    elif tag==b't':
-                        self.world.time_game, end = self.read_float(end+1)
-                    elif tag==b'pm':
-                        aux, end = self.read_str(end+1)
-                        if self.play_mode_to_id is not None:
-                            self.world.play_mode = self.play_mode_to_id[aux]
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GS': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'GYR':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    '''
-                    The gyroscope measures the robot's torso angular velocity (rotation rate vector)
-                    The angular velocity's orientation is given by the right-hand rule.
-
-                    Original reference frame:
-                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
-
-                    New reference frame:
-                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
-
-                    '''
-
-                    if tag==b'n':
-                        pass
-                    elif tag==b'rt':
-                        self.world.robot.gyro[1], end = self.read_float(end+1)
-                        self.world.robot.gyro[0], end = self.read_float(end+1)
-                        self.world.robot.gyro[2], end = self.read_float(end+1)
-                        self.world.robot.gyro[1] *= -1
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GYR': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'ACC':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    '''
-                    The accelerometer measures the acceleration relative to freefall. It will read zero during any type of free fall.
-                    When at rest relative to the Earth's surface, it will indicate an upwards acceleration of 9.81m/s^2 (in SimSpark).
-
-                    Original reference frame:
-                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
-
-                    New reference frame:
-                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
-                    '''
-
-                    if tag==b'n':
-                        pass
-                    elif tag==b'a':
-                        self.world.robot.acc[1], end = self.read_float(end+1)
-                        self.world.robot.acc[0], end = self.read_float(end+1)
-                        self.world.robot.acc[2], end = self.read_float(end+1)
-                        self.world.robot.acc[1] *= -1
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'ACC': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'HJ':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    if tag==b'n':
-                        joint_name, end = self.read_str(end+1)
-                        joint_index = Robot.MAP_PERCEPTOR_TO_INDEX[joint_name]
-                    elif tag==b'ax':
-                        joint_angle, end = self.read_float(end+1)
-
-                        #Fix symmetry issues 2/4 (perceptors)
-                        if joint_name in Robot.FIX_PERCEPTOR_SET: joint_angle = -joint_angle
-
-                        old_angle = self.world.robot.joints_position[joint_index] 
-                        self.world.robot.joints_speed[joint_index] = (joint_angle - old_angle) / World.STEPTIME * math.pi / 180
-                        self.world.robot.joints_position[joint_index] = joint_angle
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'HJ': {tag} at {end}, \nMsg: {exp.decode()}")
-
-            elif tag==b'FRP':
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    '''
-                    The reference frame is used for the contact point and force vector applied to that point
-                        Note: The force vector is applied to the foot, so it usually points up
-
-                    Original reference frame:
-                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
-
-                    New reference frame:
-                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
-
-                    '''
-
-                    if tag==b'n':
-                        foot_toe_id, end = self.read_str(end+1)
-                        self.world.robot.frp[foot_toe_id] = foot_toe_ref = np.empty(6)
-                        self.world.robot.feet_toes_last_touch[foot_toe_id] = self.world.time_local_ms
-                        self.world.robot.feet_toes_are_touching[foot_toe_id] = True
-                    elif tag==b'c':
-                        foot_toe_ref[1], end = self.read_float(end+1)
-                        foot_toe_ref[0], end = self.read_float(end+1)
-                        foot_toe_ref[2], end = self.read_float(end+1)
-                        foot_toe_ref[1] *= -1
-                    elif tag==b'f':
-                        foot_toe_ref[4], end = self.read_float(end+1)
-                        foot_toe_ref[3], end = self.read_float(end+1)
-                        foot_toe_ref[5], end = self.read_float(end+1)
-                        foot_toe_ref[4] *= -1
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'FRP': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'See':
-                self.world.vision_is_up_to_date = True
-                self.world.vision_last_update = self.world.time_local_ms
-
-                while True:
-                    tag, end, min_depth = self.get_next_tag(end)
-                    if min_depth == 0: break
-
-                    tag_bytes = bytes(tag) #since bytearray is not hashable, it cannot be used as key for dictionaries
-
-                    if tag==b'G1R' or tag==b'G2R' or tag==b'G1L' or tag==b'G2L':
-                        _, end, _ = self.get_next_tag(end)
-
-                        c1, end = self.read_float(end+1)
-                        c2, end = self.read_float(end+1)
-                        c3, end = self.read_float(end+1)
-
-                        aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
-                        self.world.flags_posts[aux] = (c1,c2,c3)
-
-                    elif tag==b'F1R' or tag==b'F2R' or tag==b'F1L' or tag==b'F2L':
-                        _, end, _ = self.get_next_tag(end)
-
-                        c1, end = self.read_float(end+1)
-                        c2, end = self.read_float(end+1)
-                        c3, end = self.read_float(end+1)
-
-                        aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
-                        self.world.flags_corners[aux] = (c1,c2,c3)
-
-                    elif tag==b'B':
-                        _, end, _ = self.get_next_tag(end)
-
-                        self.world.ball_rel_head_sph_pos[0], end = self.read_float(end+1)
-                        self.world.ball_rel_head_sph_pos[1], end = self.read_float(end+1)
-                        self.world.ball_rel_head_sph_pos[2], end = self.read_float(end+1)
-                        self.world.ball_rel_head_cart_pos = M.deg_sph2cart(self.world.ball_rel_head_sph_pos)
-                        self.world.ball_is_visible = True
-                        self.world.ball_last_seen = self.world.time_local_ms
-
-                    elif tag==b'mypos':
-
-                        self.world.robot.cheat_abs_pos[0], end = self.read_float(end+1)
-                        self.world.robot.cheat_abs_pos[1], end = self.read_float(end+1)
-                        self.world.robot.cheat_abs_pos[2], end = self.read_float(end+1)
-
-                    elif tag==b'myorien':
-
-                        self.world.robot.cheat_ori, end = self.read_float(end+1)
-
-                    elif tag==b'ballpos':
-
-                        c1, end = self.read_float(end+1)
-                        c2, end = self.read_float(end+1)
-                        c3, end = self.read_float(end+1)
-
-                        self.world.ball_cheat_abs_vel[0] = (c1 - self.world.ball_cheat_abs_pos[0]) / World.VISUALSTEP
-                        self.world.ball_cheat_abs_vel[1] = (c2 - self.world.ball_cheat_abs_pos[1]) / World.VISUALSTEP
-                        self.world.ball_cheat_abs_vel[2] = (c3 - self.world.ball_cheat_abs_pos[2]) / World.VISUALSTEP
-
-                        self.world.ball_cheat_abs_pos[0] = c1
-                        self.world.ball_cheat_abs_pos[1] = c2
-                        self.world.ball_cheat_abs_pos[2] = c3
-
-                    elif tag==b'P':
-
-                        while True:
-                            previous_depth = self.depth
-                            previous_end = end
-                            tag, end, min_depth = self.get_next_tag(end)
-                            if min_depth < 2: #if =1 we are still inside 'See', if =0 we are already outside 'See'
-                                end = previous_end #The "P" tag is special because it's the only variable particle inside 'See'
-                                self.depth = previous_depth
-                                break # we restore the previous tag, and let 'See' handle it
-
-                            if tag==b'team':
-                                player_team, end = self.read_str(end+1)
-                                is_teammate = bool(player_team == self.world.team_name)
-                                if self.world.team_name_opponent is None and not is_teammate: #register opponent team name
-                                    self.world.team_name_opponent = player_team
-                            elif tag==b'id':
-                                player_id, end = self.read_int(end+1)
-                                player = self.world.teammates[player_id-1] if is_teammate else self.world.opponents[player_id-1]
-                                player.body_parts_cart_rel_pos = dict() #reset seen body parts
-                                player.is_visible = True
-                            elif tag==b'llowerarm' or tag==b'rlowerarm' or tag==b'lfoot' or tag==b'rfoot' or tag==b'head':
-                                tag_str = tag.decode()
-                                _, end, _ = self.get_next_tag(end)
-
-                                c1, end = self.read_float(end+1)
-                                c2, end = self.read_float(end+1)
-                                c3, end = self.read_float(end+1)
-
-                                if is_teammate: 
-                                    self.world.teammates[player_id-1].body_parts_sph_rel_pos[tag_str] = (c1,c2,c3)
-                                    self.world.teammates[player_id-1].body_parts_cart_rel_pos[tag_str] = M.deg_sph2cart((c1,c2,c3))
-                                else:
-                                    self.world.opponents[player_id-1].body_parts_sph_rel_pos[tag_str] = (c1,c2,c3)
-                                    self.world.opponents[player_id-1].body_parts_cart_rel_pos[tag_str] = M.deg_sph2cart((c1,c2,c3))
-                            else:
-                                self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'P': {tag} at {end}, \nMsg: {exp.decode()}")
-                        
-                    elif tag==b'L':
-                        l = self.world.lines[self.world.line_count]
-                        
-                        _, end, _ = self.get_next_tag(end)
-                        l[0], end = self.read_float(end+1)
-                        l[1], end = self.read_float(end+1)
-                        l[2], end = self.read_float(end+1)
-                        _, end, _ = self.get_next_tag(end)
-                        l[3], end = self.read_float(end+1)
-                        l[4], end = self.read_float(end+1)
-                        l[5], end = self.read_float(end+1)
-
-                        if np.isnan(l).any():
-                            self.world.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
-                        else:
-                            self.world.line_count += 1 #accept field line if there are no NaNs
-                        
-                    else:
-                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'see': {tag} at {end}, \nMsg: {exp.decode()}")
-
-
-            elif tag==b'hear':
-
-                team_name, end = self.read_str(end+1)
-
-                if team_name == self.world.team_name:   # discard message if it's not from our team
-                    
-                    timestamp, end = self.read_float(end+1)
-
-                    if self.exp[end+1] == ord('s'):     # this message was sent by oneself
-                        direction, end = "self", end+5
-                    else:                               # this message was sent by teammate
-                        direction, end = self.read_float(end+1)
-
-                    msg, end = self.read_bytes(end+1)
-                    self.hear_callback(msg, direction, timestamp)
-
-
-                tag, end, _ = self.get_next_tag(end)
-
-
+        '''
+        Parse server message and update the world state
+
+        The message is split into a flat list of tokens (parentheses, tags and values) in a single regex pass.
+        Each root element is then handled by the method registered for its tag in `self.root_handlers`.
+        Every handler receives the token list and the index of its first child, and returns the index
+        after its closing parenthesis.
+        '''
+        self.exp = exp
+        self._new_step()
+
+        t = World_Parser.TOKENIZER.findall(exp)
+        t.append(b')') # sentinel: handlers stop at the first token that is not '('
+        handlers = self.root_handlers
+        n = len(t) - 1
+        i = 0
+
+        while i < n:
+            if t[i] != b'(':
+                i += 1
+                continue
+            h = handlers.get(t[i+1])
+            if h is None:
+                self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {t[i+1]} at token {i}, \nMsg: {bytes(exp).decode()}")
+                i = self._skip(t, i)
+                continue
+            try:
+                i = h(t, i+2)
+            except ValueError:
+                self.world.log(f"{self.LOG_PREFIX}String to number conversion failed inside {t[i+1]}, \nMsg: {bytes(exp).decode()}")
+                i = self._skip(t, i)
+            except KeyError as e: # e.g. unknown joint name
+                self.world.log(f"{self.LOG_PREFIX}Unknown name {e} inside {t[i+1]}, \nMsg: {bytes(exp).decode()}")
+                i = self._skip(t, i)
+
+        self._apply_joints()
+
+    def _parse_time(self, t, i):
+        while t[i] == b'(':
+            if t[i+1] == b'now':
+                self.world.time_server = float(t[i+2])
+                i += 4
             else:
-                self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {tag} at {end}, \nMsg: {exp.decode()}")
-                tag, end, min_depth = self.get_next_tag(end)
-
+                i = self._log_unknown("time", t, i)
+        return i+1
+
+    def _parse_game_state(self, t, i):
+        w = self.world
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'unum':
+                pass # We already know our unum
+            elif tag == b'team':
+                is_left = bool(t[i+2] == b'left')
+                if w.team_side_is_left != is_left:
+                    w.team_side_is_left = is_left
+                    self.play_mode_to_id = self.LEFT_PLAY_MODE_TO_ID if is_left else self.RIGHT_PLAY_MODE_TO_ID
+                    w.draw.set_team_side(not is_left)
+                    w.team_draw.set_team_side(not is_left)
+            elif tag == b'sl':
+                if w.team_side_is_left:
+                    w.goals_scored = int(t[i+2])
+                else:
+                    w.goals_conceded = int(t[i+2])
+            elif tag == b'sr':
+                if w.team_side_is_left:
+                    w.goals_conceded = int(t[i+2])
+                else:
+                    w.goals_scored = int(t[i+2])
+            elif tag == b't':
+                w.time_game = float(t[i+2])
+            elif tag == b'pm':
+                if self.play_mode_to_id is not None:
+                    w.play_mode = self.play_mode_to_id[t[i+2].decode()]
+            else:
+                i = self._log_unknown("GS", t, i)
+                continue
+            i += 4
+        return i+1
+
+    def _parse_gyroscope(self, t, i):
+        # The gyroscope measures the robot's torso angular velocity (rotation rate vector)
+        # The angular velocity's orientation is given by the right-hand rule.
+        # Original reference frame:  X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+        # New reference frame:       X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'n':
+                i += 4
+            elif tag == b'rt':
+                g = self.world.robot.gyro
+                g[1] = -float(t[i+2])
+                g[0] =  float(t[i+3])
+                g[2] =  float(t[i+4])
+                i += 6
+            else:
+                i = self._log_unknown("GYR", t, i)
+        return i+1
+
+    def _parse_accelerometer(self, t, i):
+        # The accelerometer measures the acceleration relative to freefall. It will read zero during any type of free fall.
+        # When at rest relative to the Earth's surface, it will indicate an upwards acceleration of 9.81m/s^2 (in SimSpark).
+        # Original reference frame:  X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+        # New reference frame:       X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'n':
+                i += 4
+            elif tag == b'a':
+                a = self.world.robot.acc
+                a[1] = -float(t[i+2])
+                a[0] =  float(t[i+3])
+                a[2] =  float(t[i+4])
+                i += 6
+            else:
+                i = self._log_unknown("ACC", t, i)
+        return i+1
+
+    def _parse_hinge_joint(self, t, i):
+        # Angles are only collected here, they are applied to the robot in `_apply_joints` after the whole message is parsed
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'n':
+                joint_index = self.PERCEPTOR_TO_INDEX[t[i+2]]
+                i += 4
+            elif tag == b'ax':
+                self.joints_angle_buffer[joint_index] = float(t[i+2])
+                if not self.joints_received[joint_index]:
+                    self.joints_received[joint_index] = True
+                    self.joints_received_count += 1
+                i += 4
+            else:
+                i = self._log_unknown("HJ", t, i)
+        return i+1
+
+    def _apply_joints(self):
+        '''
+        Update joints' position and speed with the angles collected by `_parse_hinge_joint`
+        All joints are usually received in every message, so the update is done in place with whole-array operations
+        '''
+        r = self.world.robot
+        buf, pos, spd = self.joints_angle_buffer, r.joints_position, r.joints_speed
+
+        if self.joints_received_count == len(buf):
+            np.multiply(buf, self.joints_sign, out=buf) #Fix symmetry issues 2/4 (perceptors)
+            np.subtract(buf, pos, out=spd)
+            spd /= World.STEPTIME
+            spd *= math.pi
+            spd /= 180
+            pos[:] = buf
+        elif self.joints_received_count > 0: # partial update (not expected from the server)
+            m = self.joints_received
+            angles = buf[m] * self.joints_sign[m] #Fix symmetry issues 2/4 (perceptors)
+            spd[m] = (angles - pos[m]) / World.STEPTIME * math.pi / 180
+            pos[m] = angles
+
+    def _parse_force_resistance(self, t, i):
+        # The reference frame is used for the contact point and force vector applied to that point
+        #   Note: The force vector is applied to the foot, so it usually points up
+        # Original reference frame:  X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+        # New reference frame:       X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+        r = self.world.robot
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'n':
+                foot_toe_id = t[i+2].decode()
+                r.frp[foot_toe_id] = foot_toe_ref = np.empty(6)
+                r.feet_toes_last_touch[foot_toe_id] = self.world.time_local_ms
+                r.feet_toes_are_touching[foot_toe_id] = True
+                i += 4
+            elif tag == b'c':
+                foot_toe_ref[1] = -float(t[i+2])
+                foot_toe_ref[0] =  float(t[i+3])
+                foot_toe_ref[2] =  float(t[i+4])
+                i += 6
+            elif tag == b'f':
+                foot_toe_ref[4] = -float(t[i+2])
+                foot_toe_ref[3] =  float(t[i+3])
+                foot_toe_ref[5] =  float(t[i+4])
+                i += 6
+            else:
+                i = self._log_unknown("FRP", t, i)
+        return i+1
+
+    def _parse_vision(self, t, i):
+        w = self.world
+        w.vision_is_up_to_date = True
+        w.vision_last_update = w.time_local_ms
+        handlers = self.vision_handlers
+
+        while t[i] == b'(':
+            h = handlers.get(t[i+1])
+            if h is None:
+                i = self._log_unknown("see", t, i)
+            else:
+                i = h(t, i)
+        return i+1
+
+    #----------------------- Vision handlers receive the index of their own opening parenthesis
+
+    def _parse_flag(self, t, i):
+        # (G1L (pol c1 c2 c3)) or (F1L (pol c1 c2 c3))
+        tag = t[i+1]
+        aux = self.LEFT_SIDE_FLAGS[tag] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag]
+        pos = (float(t[i+4]), float(t[i+5]), float(t[i+6]))
+        if tag[0] == 71: # b'G'
+            self.world.flags_posts[aux] = pos
+        else:
+            self.world.flags_corners[aux] = pos
+        return i+9
+
+    def _parse_ball(self, t, i):
+        # (B (pol c1 c2 c3))
+        w = self.world
+        w.ball_rel_head_sph_pos[0] = float(t[i+4])
+        w.ball_rel_head_sph_pos[1] = float(t[i+5])
+        w.ball_rel_head_sph_pos[2] = float(t[i+6])
+        w.ball_rel_head_cart_pos = M.deg_sph2cart(w.ball_rel_head_sph_pos)
+        w.ball_is_visible = True
+        w.ball_last_seen = w.time_local_ms
+        return i+9
+
+    def _parse_cheat_pos(self, t, i):
+        # (mypos x y z)
+        p = self.world.robot.cheat_abs_pos
+        p[0] = float(t[i+2])
+        p[1] = float(t[i+3])
+        p[2] = float(t[i+4])
+        return i+6
+
+    def _parse_cheat_ori(self, t, i):
+        # (myorien ori)
+        self.world.robot.cheat_ori = float(t[i+2])
+        return i+4
+
+    def _parse_cheat_ball_pos(self, t, i):
+        # (ballpos x y z)
+        w = self.world
+        c1 = float(t[i+2])
+        c2 = float(t[i+3])
+        c3 = float(t[i+4])
+
+        w.ball_cheat_abs_vel[0] = (c1 - w.ball_cheat_abs_pos[0]) / World.VISUALSTEP
+        w.ball_cheat_abs_vel[1] = (c2 - w.ball_cheat_abs_pos[1]) / World.VISUALSTEP
+        w.ball_cheat_abs_vel[2] = (c3 - w.ball_cheat_abs_pos[2]) / World.VISUALSTEP
+
+        w.ball_cheat_abs_pos[0] = c1
+        w.ball_cheat_abs_pos[1] = c2
+        w.ball_cheat_abs_pos[2] = c3
+        return i+6
+
+    def _parse_player(self, t, i):
+        # (P (team name) (id n) (head (pol c1 c2 c3)) (rlowerarm (pol c1 c2 c3)) ...)
+        w = self.world
+        others = w.other_robots
+        i += 2
+        while t[i] == b'(':
+            tag = t[i+1]
+            if tag == b'team':
+                player_team = t[i+2].decode()
+                is_teammate = bool(player_team == w.team_name)
+                if w.team_name_opponent is None and not is_teammate: #register opponent team name
+                    w.team_name_opponent = player_team
+                i += 4
+            elif tag == b'id':
+                row = int(t[i+2]) - 1 if is_teammate else int(t[i+2]) + 4 # row in w.other_robots
+                others.parts_seen[row] = False #reset seen body parts
+                others.is_visible[row] = True
+                i += 4
+            elif tag in self.PLAYER_BODY_PARTS:
+                part = self.PLAYER_BODY_PARTS[tag]
+                others.parts_sph_rel_pos[row,part] = (float(t[i+4]), float(t[i+5]), float(t[i+6])) # converted to cartesian in World.update
+                others.parts_seen[row,part] = True
+                i += 9
+            else:
+                i = self._log_unknown("P", t, i)
+        return i+1
+
+    def _parse_line(self, t, i):
+        # (L (pol c1 c2 c3) (pol c4 c5 c6))
+        w = self.world
+        l = w.lines[w.line_count]
+        l[0] = float(t[i+4])
+        l[1] = float(t[i+5])
+        l[2] = float(t[i+6])
+        l[3] = float(t[i+10])
+        l[4] = float(t[i+11])
+        l[5] = float(t[i+12])
+
+        if np.isnan(l).any():
+            w.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
+        else:
+            w.line_count += 1 #accept field line if there are no NaNs
+        return i+15
+
+    def _parse_hear(self, t, i):
+        # (hear team timestamp self msg) or (hear team timestamp direction msg)
+        if t[i].decode() == self.world.team_name: # discard message if it's not from our team
+            timestamp = float(t[i+1])
+            direction = "self" if t[i+2] == b'self' else float(t[i+2])
+            self.hear_callback(t[i+3], direction, timestamp)
+        return self._skip(t, i-2)
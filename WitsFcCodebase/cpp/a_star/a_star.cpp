@@ -3,6 +3,7 @@
 #include <cmath>
 #include <algorithm>
 #include <chrono>
+#include <limits>
 #define SQRT2 1.414213562373095f
 #define LINES 321
 #define COLS 221
@@ -62,6 +63,17 @@ Node* min_node; // non-expanded node with lowest predicted total cost (f)
 
 namespace open{
 
+    // Default order: lowest predicted total cost (f) first (nodes with the same f are expanded in insertion order)
+    inline bool lower_f(const Node* a, const Node* b){
+        return a->f < b->f;
+    }
+
+    // Lowest f first, and the deepest node (highest g) among nodes with the same f (see Planner::expand)
+    inline bool lower_f_deeper_first(const Node* a, const Node* b){
+        return a->f < b->f or (a->f == b->f and a->g > b->g);
+    }
+
+    template<bool (*precedes)(const Node*, const Node*) = lower_f>
     Node* insert(Node* new_node, Node* root) {
 
         new_node->left = nullptr;
@@ -75,7 +87,7 @@ namespace open{
         }
 
         // If new_node is the new min node
-        if(new_node->f < MIN->f){
+        if(precedes(new_node, MIN)){
             MIN->left = new_node;
             new_node->up = MIN;
             MIN = new_node;
@@ -83,10 +95,9 @@ namespace open{
         }
 
         Node* node = root;
-        float key = new_node->f;
 
         while(true){
-            if (key < node->f)
+            if (precedes(new_node, node))
                 if(node->left == nullptr){
                     node->left = new_node;
                     break;
@@ -304,6 +315,7 @@ inline Node* expand_child(Node* open_root, float cost, float wall_index, Node* c
 
 float final_path[2050];
 int final_path_size;
+int expanded_nodes;
 
 inline void build_final_path(Node* const best_node, const Node* board, float status, const bool override_end=false, const float end_x=0, const float end_y=0){
     // Node* pt = best_node;
@@ -459,7 +471,7 @@ inline void add_space_cushion(float board_cost[]){
  *      The path is obstructed if start is inside any hard circumference
  */
 bool is_path_obstructed(float start_x, float start_y, float end_x, float end_y, float given_obstacles[], 
-                        int given_obst_size, bool go_to_goal, int wall_index, float board_cost[]){
+                        int given_obst_size, bool go_to_goal, int wall_index, const float board_cost[]){
 
 
     // Restrict start coordinates to map
@@ -620,6 +632,7 @@ bool is_path_obstructed(float start_x, float start_y, float end_x, float end_y,
 void astar(float params[], int params_size){
 
     auto t1 = high_resolution_clock::now();
+    expanded_nodes = 0;
 
     const float s_x = params[0]; // start x
     const float s_y = params[1]; // start y
@@ -790,6 +803,7 @@ void astar(float params[], int params_size){
         const int curr_col  = curr_pos % COLS;
         const float curr_cost = board_cost[curr_pos];
         measure_timeout = (measure_timeout+1) & 31; // check timeout at every 32 iterations
+        expanded_nodes++;
 
         // save best node based on distance to goal (useful if impossible/timeout)
         if(curr_cost > wall_index){ 
@@ -915,4 +929,1033 @@ void astar(float params[], int params_size){
     
     build_final_path(best_node, board, 2);
     return;
-}
\ No newline at end of file
+}
+
+
+//================================================================================================ Incremental planner
+
+#define MAX_H_OFFSET 2000 // the learned heuristic is reset when h_offset is too large, to avoid losing float precision
+#define MAX_REPAIRED_NODES 500 // the learned heuristic is reset when repairing it is more expensive than learning it again
+
+namespace{
+
+    float base_layout[2][LINES*COLS]; // field layout [0]: out of bounds allowed, [1]: not allowed (with space cushion)
+    bool base_layout_ready = false;
+
+    const float* get_base_layout(bool allow_out_of_bounds){
+        if(!base_layout_ready){
+            const float layout[LINES*COLS] = {L0_1,L2_5,L6_10,L11,LIN12_308,L309,L310_314,L2_5,L0_1};
+            std::copy(layout, layout+LINES*COLS, base_layout[0]);
+            std::copy(layout, layout+LINES*COLS, base_layout[1]);
+            add_space_cushion(base_layout[1]);
+            base_layout_ready = true;
+        }
+        return base_layout[allow_out_of_bounds ? 0 : 1];
+    }
+
+    inline bool is_inside(const int inner[4], const int outer[4]){
+        return inner[0] >= outer[0] and inner[1] <= outer[1] and inner[2] >= outer[2] and inner[3] <= outer[3];
+    }
+}
+
+
+bool Planner::Obstacle::operator==(const Obstacle& o) const{
+    return line==o.line and col==o.col and max_r==o.max_r and hard_end==o.hard_end and soft_end==o.soft_end 
+           and force==o.force and f_per_m==o.f_per_m;
+}
+
+Planner::Planner() : mode(NEW_SEARCH), expanded_nodes(0), repaired_nodes(0) {}
+
+Planner::~Planner(){
+    delete[] board_cost;
+    delete[] node_state;
+    delete[] board;
+    delete[] h;
+    delete[] h_stamp;
+    delete[] in_queue;
+}
+
+// The board is only allocated when the first search is needed (many queries have no obstacles in the way)
+void Planner::allocate(){
+    if(board != nullptr) return;
+    board_cost = new float[LINES*COLS];
+    node_state = new unsigned char[LINES*COLS];
+    board = new Node[LINES*COLS];
+    h = new float[LINES*COLS];
+    h_stamp = new unsigned[LINES*COLS](); // zero (h_id starts at 1)
+    in_queue = new unsigned char[LINES*COLS]();
+}
+
+void Planner::reset(){
+    map_oob = -1;      // rebuild map
+    map_obstacles.clear();
+    goal_cells.clear(); // (the map is rebuilt, so there is no need to unmark the goal)
+    h_id++;            // forget learned heuristic
+    h_learned = false;
+    h_offset = 0;
+    status = -1;       // forget last search
+    open_root = nullptr;
+    closed.clear();
+}
+
+
+/**
+ * @brief Paint obstacle inside area [l0,l1]x[c0,c1] (see astar)
+ * The result does not depend on the painting order: hard walls prevail, and the highest soft cost is kept
+ */
+void Planner::paint(const Obstacle& ob, int l0, int l1, int c0, int c1){
+    int i=0;
+    for(; i<ob.hard_end; i++){
+        int l = ob.line + expansion_pos_l[i];
+        int c = ob.col + expansion_pos_c[i];
+        if(l>=l0 and c>=c0 and l<=l1 and c<=c1){
+            board_cost[l*COLS+c] = -3;
+        }
+    }
+
+    for(; i<ob.soft_end; i++){
+        int l = ob.line + expansion_pos_l[i];
+        int c = ob.col + expansion_pos_c[i];
+        if(l>=l0 and c>=c0 and l<=l1 and c<=c1){
+            int p = l*COLS+c;
+            float cost = board_cost[p];
+            float fr = ob.force-(ob.f_per_m * expansion_pos_dist[i]);
+            if(cost > wall_index and cost < fr){
+                board_cost[p] = fr;
+            }
+        }
+    }
+}
+
+
+/**
+ * @brief Update the obstacles in the map (without goal marks)
+ * Only the area covered by obstacles that were added or removed is painted again
+ */
+void Planner::update_map(const std::vector<Obstacle>& obstacles, bool allow_out_of_bounds){
+    // 'changed' receives the cells where costs decreased (see repair_heuristic)
+
+    changed.clear();
+    const float* base = get_base_layout(allow_out_of_bounds);
+
+    if(map_oob != int(allow_out_of_bounds)){ // build map from scratch
+        std::copy(base, base+LINES*COLS, board_cost);
+        for(const Obstacle& ob : obstacles){
+            paint(ob, 0, LINES-1, 0, COLS-1);
+        }
+        map_oob = allow_out_of_bounds;
+        map_obstacles = obstacles;
+        map_version++;
+        return;
+    }
+
+    //------------------------------ Find area covered by obstacles that were added or removed (identical obstacles paint the same cells)
+    int l0=LINES, l1=-1, c0=COLS, c1=-1;
+    auto add_area = [&](const Obstacle& ob){
+        l0 = min(l0, ob.line - ob.max_r - 1);
+        l1 = max(l1, ob.line + ob.max_r + 1);
+        c0 = min(c0, ob.col - ob.max_r - 1);
+        c1 = max(c1, ob.col + ob.max_r + 1);
+    };
+
+    std::vector<bool> matched(map_obstacles.size(), false);
+    for(const Obstacle& ob : obstacles){
+        bool found = false;
+        for(size_t j=0; j<map_obstacles.size(); j++){
+            if(!matched[j] and map_obstacles[j] == ob){
+                matched[j] = found = true;
+                break;
+            }
+        }
+        if(!found) add_area(ob);
+    }
+    for(size_t j=0; j<map_obstacles.size(); j++){
+        if(!matched[j]) add_area(map_obstacles[j]);
+    }
+    map_obstacles = obstacles;
+
+    if(l1 < 0) return; // no changes
+
+    l0 = max(l0,0); l1 = min(l1,LINES-1);
+    c0 = max(c0,0); c1 = min(c1,COLS-1);
+    const int w = c1-c0+1;
+
+    //------------------------------ Restore layout in that area and paint every obstacle that overlaps it
+    old_cost.resize((l1-l0+1)*w);
+    for(int l=l0; l<=l1; l++){
+        std::copy(&board_cost[l*COLS+c0], &board_cost[l*COLS+c1+1], &old_cost[(l-l0)*w]);
+        std::copy(&base[l*COLS+c0], &base[l*COLS+c1+1], &board_cost[l*COLS+c0]);
+    }
+
+    for(const Obstacle& ob : obstacles){
+        if(ob.line+ob.max_r+1 >= l0 and ob.line-ob.max_r-1 <= l1 and ob.col+ob.max_r+1 >= c0 and ob.col-ob.max_r-1 <= c1){
+            paint(ob, l0, l1, c0, c1);
+        }
+    }
+
+    bool map_changed = false;
+    for(int l=l0; l<=l1; l++){
+        for(int c=c0; c<=c1; c++){
+            const float new_cost = board_cost[l*COLS+c];
+            const float prev_cost = old_cost[(l-l0)*w+c-c0];
+            if(new_cost != prev_cost){
+                map_changed = true;
+                // only cells that became cheaper to enter, or walls (whose accessible neighbors depend on their cost),
+                // may create cheaper paths (see repair_heuristic)
+                const float new_enter_cost  = new_cost  <= wall_index ? 100.f : std::fmaxf(0.f,new_cost);
+                const float prev_enter_cost = prev_cost <= wall_index ? 100.f : std::fmaxf(0.f,prev_cost);
+                if(new_enter_cost < prev_enter_cost or new_cost <= wall_index){
+                    changed.push_back(l*COLS+c);
+                }
+            }
+        }
+    }
+
+    if(map_changed) map_version++;
+}
+
+
+// Add (or remove) the goal marks (cost -1) to the map (see astar)
+void Planner::mark_goal(bool mark){
+    if(!mark){
+        for(auto& cell : goal_cells){
+            board_cost[cell.first] = cell.second;
+        }
+        goal_cells.clear();
+        return;
+    }
+
+    const int first = go_to_goal ? IN_GOAL_LINE*COLS+101 : end_pos;
+    const int last  = go_to_goal ? IN_GOAL_LINE*COLS+119 : end_pos;
+    for(int i=first; i<=last; i++){
+        if(board_cost[i] > wall_index){
+            goal_cells.emplace_back(i, board_cost[i]);
+            board_cost[i] = -1;
+        }
+    }
+}
+
+
+/**
+ * @brief Heuristic: learned value (if available) or diagonal distance to the goal
+ * When the target moves, the learned heuristic remains consistent if it is reduced by its value at the new target
+ * (Moving Target Adaptive A*). Instead of updating every node, that value is accumulated in h_offset.
+ */
+inline float Planner::heuristic(int pos, int line, int col) const{
+    float diagonal = diagonal_distance(go_to_goal,line,col,end_l,end_c);
+    return h_learned and h_stamp[pos] == h_id ? std::fmaxf(diagonal, h[pos] - h_offset) : diagonal;
+}
+
+
+/**
+ * @brief Adaptive A*: after a successful search, h(n) = g(goal) - g(n) for every expanded node n
+ * This heuristic is consistent and more informed than the diagonal distance
+ */
+void Planner::learn_heuristic(float goal_g){
+    for(int pos : closed){
+        float learned = goal_g - board[pos].g + h_offset;
+        if(h_stamp[pos] != h_id){
+            h[pos] = learned;
+            h_stamp[pos] = h_id;
+        }else{
+            h[pos] = std::fmaxf(h[pos], learned);
+        }
+    }
+    h_learned = true;
+}
+
+
+/**
+ * @brief Forget values learned outside the current heuristic window (they were not repaired when the map changed),
+ * and add the nodes on its border to 'changed' (they may have cheaper paths through the new area)
+ */
+void Planner::grow_heuristic_window(const int new_window[4]){
+    const int* old_window = h_window;
+
+    for(int l=new_window[0]; l<=new_window[1]; l++){
+        if(l < old_window[0] or l > old_window[1]){
+            std::fill(&h_stamp[l*COLS+new_window[2]], &h_stamp[l*COLS+new_window[3]+1], 0);
+        }else{
+            for(int c=new_window[2]; c<=min(old_window[2]-1,new_window[3]); c++) h_stamp[l*COLS+c] = 0;
+            for(int c=max(old_window[3]+1,new_window[2]); c<=new_window[3]; c++) h_stamp[l*COLS+c] = 0;
+        }
+    }
+
+    const int l0 = max(old_window[0],new_window[0]), l1 = min(old_window[1],new_window[1]);
+    const int c0 = max(old_window[2],new_window[2]), c1 = min(old_window[3],new_window[3]);
+    if(l0 > l1 or c0 > c1) return; // no overlap
+
+    for(int c=c0; c<=c1; c++){
+        if(new_window[0] < old_window[0]) changed.push_back(l0*COLS+c);
+        if(new_window[1] > old_window[1]) changed.push_back(l1*COLS+c);
+    }
+    for(int l=l0; l<=l1; l++){
+        if(new_window[2] < old_window[2]) changed.push_back(l*COLS+c0);
+        if(new_window[3] > old_window[3]) changed.push_back(l*COLS+c1);
+    }
+}
+
+
+/**
+ * @brief Keep the learned heuristic consistent after the cost of the nodes in 'changed' decreased (Generalized Adaptive A*)
+ * If the cost of reaching a node decreased, the learned heuristic of its neighbors may overestimate the real cost.
+ * In that case, h(n) is reduced to min(cost(n,child) + h(child)), and the correction is propagated to its neighbors.
+ * Returns false if more than MAX_REPAIRED_NODES need to be corrected (the heuristic is then inconsistent and must be reset)
+ */
+bool Planner::repair_heuristic(){
+    const int l_min=h_window[0], l_max=h_window[1], c_min=h_window[2], c_max=h_window[3];
+
+    queue.clear();
+    auto push_neighbors = [&](int pos){
+        const int line = pos / COLS, col = pos % COLS;
+        for(int l=max(line-1,l_min); l<=min(line+1,l_max); l++){
+            for(int c=max(col-1,c_min); c<=min(col+1,c_max); c++){
+                int p = l*COLS+c;
+                if(h_stamp[p] == h_id and !in_queue[p]){
+                    in_queue[p] = 1;
+                    queue.push_back(p);
+                }
+            }
+        }
+    };
+
+    for(int pos : changed){
+        push_neighbors(pos); // includes the changed node, since its own cost affects which children are accessible
+    }
+
+    for(size_t i=0; i<queue.size(); i++){
+        const int pos = queue[i];
+        in_queue[pos] = 0;
+        const float cost = board_cost[pos];
+        if(cost == -1) continue; // goal
+
+        const int line = pos / COLS, col = pos % COLS;
+        float best = std::numeric_limits<float>::max();
+        for(int l=max(line-1,l_min); l<=min(line+1,l_max); l++){
+            for(int c=max(col-1,c_min); c<=min(col+1,c_max); c++){
+                int p = l*COLS+c;
+                float child_cost = board_cost[p];
+                if(p == pos or (child_cost <= wall_index and child_cost < cost)) continue; // same rules as in 'search'
+                float edge = (l!=line and c!=col ? SQRT2 : 1) + (child_cost <= wall_index ? 100.f : std::fmaxf(0.f,child_cost));
+                best = min(best, edge + heuristic(p,l,c));
+            }
+        }
+
+        if(best < heuristic(pos,line,col) - 1e-3f){ // (tolerance avoids endless corrections caused by float rounding)
+            h[pos] = best + h_offset;
+            if(++repaired_nodes > MAX_REPAIRED_NODES){
+                for(size_t j=i+1; j<queue.size(); j++) in_queue[queue[j]] = 0;
+                return false;
+            }
+            push_neighbors(pos);
+        }
+    }
+    return true;
+}
+
+
+inline Node* Planner::expand(Node* open_root, int pos, int line, int col, float extra, Node* curr_node){
+    // child can be as inaccessible as current pos (but there is a cost penalty to avoid inaccessible paths)
+    float cost = board_cost[pos];
+    if(cost <= wall_index){
+        cost = 100.f;
+    }
+
+    float g = curr_node->g + extra + std::fmaxf(0.f,cost); // current cost + child distance
+    Node* child = &board[pos];
+
+    if (node_state[pos]){
+        if (g >= child->g){
+            return open_root; // if not an improvement, we discard the new child
+        }
+        open_root = open::delete_node(child, open_root); // if it is an improvement: remove reference, update it, add it again in correct order
+    }else{
+        node_state[pos] = 1;
+    }
+
+    // With a learned heuristic, most nodes ahead of the start have the same f
+    // Expanding the deepest of those nodes first avoids expanding all of them
+    child->g = g;
+    child->f = g + heuristic(pos, line, col);
+    child->parent = curr_node;
+    return open::insert<open::lower_f_deeper_first>(child, open_root);
+}
+
+
+void Planner::search(long timeout_us, std::chrono::high_resolution_clock::time_point t1, float opt_t_x, float opt_t_y){
+
+    const int l_min=window[0], l_max=window[1], c_min=window[2], c_max=window[3];
+    int measure_timeout=0;
+    MIN = open_min;
+
+    while (open_root != nullptr){
+
+        // Check timeout before expanding the next node, so that the search can be resumed
+        measure_timeout = (measure_timeout+1) & 31; // check timeout at every 32 iterations
+        if( measure_timeout==0 and duration_cast<microseconds>(high_resolution_clock::now() - t1).count() > timeout_us ){
+            status = 1;
+            open_min = MIN;
+            build_final_path(best_node, board, 1);
+            return;
+        }
+
+        // Get next best node (lowest predicted total cost (f))
+        Node* curr_node = MIN;
+        const int curr_pos = curr_node - board; 
+        const int curr_line = curr_pos / COLS;
+        const int curr_col  = curr_pos % COLS;
+        const float curr_cost = board_cost[curr_pos];
+        expanded_nodes++;
+
+        // save best node based on distance to goal (useful if impossible/timeout)
+        if(curr_cost > wall_index){ 
+            float dd = diagonal_distance(go_to_goal,curr_line,curr_col,end_l,end_c);
+            if(best_node_dist > dd){
+                best_node = curr_node;
+                best_node_dist = dd;
+            }
+        }
+
+        open_root = open::pop(open_root);
+        node_state[curr_pos] = 2;
+        closed.push_back(curr_pos);
+
+        // Check if we reached objective
+        if( curr_cost == -1 ){
+            status = 0;
+            open_min = MIN;
+            learn_heuristic(curr_node->g);
+            build_final_path(best_node, board, 0, !go_to_goal, opt_t_x, opt_t_y);
+            return;
+        }
+
+        // Expand child nodes (same order as astar)
+        const bool lcol_ok = curr_col > c_min;
+        const bool rcol_ok = curr_col < c_max;
+
+        auto try_child = [&](int pos, int line, int col, float extra){
+            const float cost = board_cost[pos];
+            // check if not an obstacle and if node is not closed (child can be as inaccessible as current pos)
+            if (node_state[pos]!=2 and !(cost <= wall_index and cost < curr_cost)){
+                open_root = expand(open_root, pos, line, col, extra, curr_node);
+            }
+        };
+
+        if(curr_line > l_min){
+            if(lcol_ok) try_child(curr_pos-COLS-1, curr_line-1, curr_col-1, SQRT2);
+            try_child(curr_pos-COLS, curr_line-1, curr_col, 1);
+            if(rcol_ok) try_child(curr_pos-COLS+1, curr_line-1, curr_col+1, SQRT2);
+        }
+        if(curr_line < l_max){
+            if(lcol_ok) try_child(curr_pos+COLS-1, curr_line+1, curr_col-1, SQRT2);
+            try_child(curr_pos+COLS, curr_line+1, curr_col, 1);
+            if(rcol_ok) try_child(curr_pos+COLS+1, curr_line+1, curr_col+1, SQRT2);
+        }
+        if(lcol_ok) try_child(curr_pos-1, curr_line, curr_col-1, 1);
+        if(rcol_ok) try_child(curr_pos+1, curr_line, curr_col+1, 1);
+    }
+
+    status = 2;
+    open_min = MIN;
+    build_final_path(best_node, board, 2);
+}
+
+
+/**
+ * @brief Describe each obstacle by the cells it paints (obstacles with the same description paint the same cells)
+ */
+std::vector<Planner::Obstacle> Planner::describe_obstacles(const float obstacles[], int obst_size){
+    std::vector<Obstacle> obst;
+    obst.reserve(obst_size/5);
+    for(int ob=0; ob<obst_size; ob+=5){
+        Obstacle o;
+        o.line = x_to_line(obstacles[ob]);
+        o.col = y_to_col(obstacles[ob+1]);
+        float hard_radius = fmaxf( 0, fminf(obstacles[ob+2], MAX_RADIUS) );
+        float soft_radius = fmaxf( 0, fminf(obstacles[ob+3], MAX_RADIUS) );
+        o.max_r = int( fmaxf(hard_radius, soft_radius)*10.f+1e-4 );
+        o.hard_end = std::upper_bound(expansion_pos_dist, expansion_pos_dist+expansion_positions_no, hard_radius) - expansion_pos_dist;
+        o.soft_end = std::upper_bound(expansion_pos_dist, expansion_pos_dist+expansion_positions_no, soft_radius) - expansion_pos_dist;
+        o.soft_end = max(o.soft_end, o.hard_end);
+        o.force = o.soft_end > o.hard_end ? obstacles[ob+4] : 0;
+        o.f_per_m = o.soft_end > o.hard_end ? o.force / soft_radius : 0;
+        obst.push_back(o);
+    }
+    return obst;
+}
+
+
+/**
+ * @brief Search window (l_min, l_max, c_min, c_max): area that contains the start, the end and every obstacle (see astar)
+ */
+void Planner::get_window(int start_l, int start_c, bool go_to_goal, int end_l, int end_c, bool allow_out_of_bounds,
+                         const std::vector<Obstacle>& obst, int window[4]){
+    int l_min = min(start_l, end_l);
+    int l_max = max(start_l, end_l);
+    int c_min, c_max;
+    if(go_to_goal){
+        c_min = min(start_c,119);
+        c_max = max(start_c,101);
+    }else{
+        c_min = min(start_c, end_c);
+        c_max = max(start_c, end_c);
+    } 
+
+    if (!allow_out_of_bounds){
+        l_min = min(l_min, 306);
+        l_max = max(14, l_max);
+        c_min = min(c_min, 206);
+        c_max = max(14, c_max);
+    }
+
+    for(const Obstacle& o : obst){
+        l_min = min(l_min,  o.line - o.max_r - 1  );
+        l_max = max(l_max,  o.line + o.max_r + 1  );
+        c_min = min(c_min,  o.col - o.max_r - 1  );
+        c_max = max(c_max,  o.col + o.max_r + 1  );
+    }
+
+    // adjust board limits if working area overlaps goal area (which includes walking margin)
+    if (c_max > 96 and c_min < 124){ // Otherwise it does not overlap any goal
+        if (l_max > 1 and l_min < 12 ){ // Overlaps our goal
+            l_max = max(12,l_max);      // Extend working area to include our goal
+            l_min = min(l_min,1);
+            c_max = max(124,c_max);
+            c_min = min(c_min,96);
+        }
+        if (l_max > 308 and l_min < 319 ){  // Overlaps their goal
+            l_max = max(319,l_max);         // Extend working area to include their goal
+            l_min = min(l_min,308);
+            c_max = max(124,c_max);
+            c_min = min(c_min,96);
+        }
+    }
+
+    window[0] = max(0, l_min);
+    window[1] = min(l_max, 320);
+    window[2] = max(0, c_min);
+    window[3] = min(c_max, 220);
+}
+
+
+// Same parameters as astar
+void Planner::compute(float params[], int params_size){
+
+    auto t1 = high_resolution_clock::now();
+    expanded_nodes = 0;
+    repaired_nodes = 0;
+
+    const float s_x = params[0]; // start x
+    const float s_y = params[1]; // start y
+    const bool allow_out_of_bounds = params[2];
+    const int new_wall_index = allow_out_of_bounds ? -3 : -2; // (cost <= wall_index) means 'unreachable'
+    const bool new_go_to_goal = params[3];
+    const float opt_t_x = params[4]; // optional target x
+    const float opt_t_y = params[5]; // optional target y
+    const int timeout_us = params[6];
+    float* obstacles = &params[7];
+    int obst_size = params_size-7; // size of obstacles array
+
+    //======================================================== Check if path is obstructed
+
+    if (!is_path_obstructed(s_x, s_y, opt_t_x, opt_t_y, obstacles, obst_size, new_go_to_goal, new_wall_index, get_base_layout(allow_out_of_bounds))){
+        mode = NO_OBSTACLES;
+        return; // return if path is not obstructed
+    }
+
+    allocate();
+
+    //======================================================== Define board basics (start, end, limits) (see astar)
+
+    const int start_l = x_to_line(s_x);
+    const int start_c = y_to_col(s_y);
+    const int new_start_pos = start_l * COLS + start_c;
+
+    int new_end_l, new_end_c;
+    if(!new_go_to_goal){
+        new_end_l = x_to_line(opt_t_x);
+        new_end_c = y_to_col(opt_t_y);
+    }else{
+        new_end_l = IN_GOAL_LINE;
+        new_end_c = 0; // not used
+    }
+
+    //======================================================== Describe obstacles and define the search window
+
+    const std::vector<Obstacle> obst = describe_obstacles(obstacles, obst_size);
+    int new_window[4];
+    get_window(start_l, start_c, new_go_to_goal, new_end_l, new_end_c, allow_out_of_bounds, obst, new_window);
+
+    //======================================================== Update goal, map and learned heuristic
+
+    const int new_end_pos = new_go_to_goal ? -1 : new_end_l*COLS+new_end_c;
+    const bool same_goal = new_wall_index == wall_index and new_go_to_goal == go_to_goal and new_end_pos == end_pos;
+
+    // The learned heuristic is reset if the goal changes, unless the target moved (see 'heuristic')
+    bool target_moved = false;
+    if(!same_goal){
+        if(h_learned and new_wall_index == wall_index and !go_to_goal and !new_go_to_goal and h_offset < MAX_H_OFFSET){
+            h_offset += heuristic(new_end_pos, new_end_l, new_end_c); // (heuristic of the previous target)
+            target_moved = true;
+        }else{
+            h_id++;
+            h_learned = false;
+            h_offset = 0;
+        }
+    }
+
+    const unsigned old_map_version = map_version;
+    mark_goal(false);
+    wall_index = new_wall_index;
+    go_to_goal = new_go_to_goal;
+    end_pos = new_end_pos;
+    end_l = new_end_l;
+    end_c = new_end_c;
+    update_map(obst, allow_out_of_bounds);
+    mark_goal(true);
+
+    // Repair the learned heuristic where costs may have decreased: changed cells, goal and new window area
+    if(h_learned){
+        if(target_moved or map_version != old_map_version){ // the cost of entering the goal is zero
+            for(auto& cell : goal_cells) changed.push_back(cell.first);
+        }
+        if(!is_inside(new_window, h_window)){
+            grow_heuristic_window(new_window);
+        }
+        std::copy(new_window, new_window+4, h_window);
+        if(!changed.empty() and !repair_heuristic()){
+            h_id++;
+            h_learned = false;
+            h_offset = 0;
+        }
+    }
+    std::copy(new_window, new_window+4, h_window);
+    //======================================================== Reuse or resume the last search if the query did not change
+
+    const bool same_query = status >= 0 and same_goal and new_start_pos == start_pos and search_map_version == map_version
+                            and std::equal(new_window, new_window+4, window);
+
+    if(same_query and status != 1){
+        mode = REUSED_PATH;
+        build_final_path(best_node, board, status, status == 0 and !go_to_goal, opt_t_x, opt_t_y);
+        return;
+    }
+
+    if(same_query){ // last search timed out
+        mode = RESUMED_SEARCH;
+    }else{
+        mode = NEW_SEARCH;
+        start_pos = new_start_pos;
+        search_map_version = map_version;
+        std::copy(new_window, new_window+4, window);
+        std::fill(node_state, node_state+LINES*COLS, 0);
+        closed.clear();
+
+        // add start node to open list
+        open_root = nullptr;
+        board[start_pos].g = 0;
+        board[start_pos].parent = nullptr;
+        open_root = open::insert<open::lower_f_deeper_first>(&board[start_pos], open_root);
+        open_min = MIN;
+        best_node = &board[start_pos];
+        best_node_dist = std::numeric_limits<float>::max(); // infinite distance if start is itself unreachable
+        if(board_cost[start_pos] > wall_index){
+            best_node_dist = diagonal_distance(go_to_goal,start_l,start_c,end_l,end_c);
+        }
+    }
+
+    search(timeout_us, t1, opt_t_x, opt_t_y);
+}
+
+
+
+/**
+ * @brief Update the map without goal marks (used by searches that do not have a single goal)
+ * The state of 'compute' is forgotten: the learned heuristic and the last search depend on the goal
+ */
+void Planner::update_map_without_goal(const std::vector<Obstacle>& obstacles, bool allow_out_of_bounds){
+    allocate();
+    mark_goal(false);
+    wall_index = allow_out_of_bounds ? -3 : -2;
+    update_map(obstacles, allow_out_of_bounds);
+    go_to_goal = false;
+    end_pos = -2; // no goal
+    h_id++;
+    h_learned = false;
+    h_offset = 0;
+    status = -1;
+    open_root = nullptr;
+}
+
+/**
+ * @brief Search the shared tree (see compute_batch) until the best path from its start to a target cell is known
+ * Nodes closed by previous targets keep their optimal cost, and the open nodes are sorted again with the new heuristic
+ * The target is only marked as goal (cost of entering is zero) when computing the cost of reaching it from a closed neighbor
+ */
+void Planner::search_target(long timeout_us, float t_x, float t_y){
+
+    auto t1 = high_resolution_clock::now();
+    const int l_min=window[0], l_max=window[1], c_min=window[2], c_max=window[3];
+
+    end_l = x_to_line(t_x);
+    end_c = y_to_col(t_y);
+    const int target_pos = end_l * COLS + end_c;
+    const bool reachable = board_cost[target_pos] > wall_index; // otherwise it is not a goal (see mark_goal)
+
+    //------------------------------ Sort open nodes by the new heuristic
+    std::vector<Node*>& open_nodes = queue_nodes;
+    open_nodes.clear();
+    if(open_root != nullptr) open_nodes.push_back(open_root);
+    for(size_t i=0; i<open_nodes.size(); i++){
+        if(open_nodes[i]->left  != nullptr) open_nodes.push_back(open_nodes[i]->left);
+        if(open_nodes[i]->right != nullptr) open_nodes.push_back(open_nodes[i]->right);
+    }
+    open_root = nullptr;
+    for(Node* node : open_nodes){
+        const int pos = node - board;
+        node->f = node->g + heuristic(pos, pos / COLS, pos % COLS);
+        open_root = open::insert<open::lower_f_deeper_first>(node, open_root);
+    }
+
+    //------------------------------ Cost of reaching the target from closed nodes
+    float target_g = std::numeric_limits<float>::max();
+    Node* target_parent = nullptr;
+
+    auto reach_target = [&](int pos){
+        const int dl = abs(pos / COLS - end_l), dc = abs(pos % COLS - end_c);
+        if(dl > 1 or dc > 1) return;
+        const float g = pos == target_pos ? 0 : board[pos].g + (dl and dc ? SQRT2 : 1);
+        if(g < target_g){
+            target_g = g;
+            target_parent = pos == target_pos ? nullptr : &board[pos];
+        }
+    };
+
+    if(reachable){
+        if(target_pos == start_pos){
+            reach_target(target_pos);
+        }else{
+            for(int l=max(end_l-1,l_min); l<=min(end_l+1,l_max); l++){
+                for(int c=max(end_c-1,c_min); c<=min(end_c+1,c_max); c++){
+                    const int pos = l*COLS+c;
+                    if(pos != target_pos and node_state[pos] == 2) reach_target(pos);
+                }
+            }
+        }
+    }
+
+    //------------------------------ Expand nodes until no open node can lead to a cheaper path (f is a lower bound)
+    int measure_timeout=0;
+    status = 2;
+
+    while (open_root != nullptr and MIN->f < target_g){
+
+        measure_timeout = (measure_timeout+1) & 31; // check timeout at every 32 iterations
+        if( measure_timeout==0 and duration_cast<microseconds>(high_resolution_clock::now() - t1).count() > timeout_us ){
+            status = 1;
+            break;
+        }
+
+        Node* curr_node = MIN;
+        const int curr_pos = curr_node - board; 
+        const int curr_line = curr_pos / COLS;
+        const int curr_col  = curr_pos % COLS;
+        const float curr_cost = board_cost[curr_pos];
+        expanded_nodes++;
+
+        open_root = open::pop(open_root);
+        node_state[curr_pos] = 2;
+        closed.push_back(curr_pos);
+
+        if(reachable and curr_pos != target_pos){ // (any node can enter the target, see astar)
+            reach_target(curr_pos);
+        }
+
+        const bool lcol_ok = curr_col > c_min;
+        const bool rcol_ok = curr_col < c_max;
+
+        auto try_child = [&](int pos, int line, int col, float extra){
+            const float cost = board_cost[pos];
+            if (node_state[pos]!=2 and !(cost <= wall_index and cost < curr_cost)){
+                open_root = expand(open_root, pos, line, col, extra, curr_node);
+            }
+        };
+
+        if(curr_line > l_min){
+            if(lcol_ok) try_child(curr_pos-COLS-1, curr_line-1, curr_col-1, SQRT2);
+            try_child(curr_pos-COLS, curr_line-1, curr_col, 1);
+            if(rcol_ok) try_child(curr_pos-COLS+1, curr_line-1, curr_col+1, SQRT2);
+        }
+        if(curr_line < l_max){
+            if(lcol_ok) try_child(curr_pos+COLS-1, curr_line+1, curr_col-1, SQRT2);
+            try_child(curr_pos+COLS, curr_line+1, curr_col, 1);
+            if(rcol_ok) try_child(curr_pos+COLS+1, curr_line+1, curr_col+1, SQRT2);
+        }
+        if(lcol_ok) try_child(curr_pos-1, curr_line, curr_col-1, 1);
+        if(rcol_ok) try_child(curr_pos+1, curr_line, curr_col+1, 1);
+    }
+
+    //------------------------------ Build path
+    if(status != 1 and target_g < std::numeric_limits<float>::max()){
+        status = 0;
+        Node& target = board[target_pos];
+        Node* const parent = target.parent;
+        const float g = target.g;
+        target.parent = target_parent; // (the target node may belong to the tree, so it is restored afterwards)
+        target.g = target_g;
+        build_final_path(&target, board, 0, true, t_x, t_y);
+        target.parent = parent;
+        target.g = g;
+        return;
+    }
+
+    // Timeout or impossible: path to the closest closed node (see astar)
+    best_node = &board[start_pos];
+    best_node_dist = std::numeric_limits<float>::max();
+    for(int pos : closed){
+        if(board_cost[pos] > wall_index){
+            float dd = diagonal_distance(false, pos / COLS, pos % COLS, end_l, end_c);
+            if(best_node_dist > dd){
+                best_node = &board[pos];
+                best_node_dist = dd;
+            }
+        }
+    }
+    build_final_path(best_node, board, status);
+}
+
+
+/**
+ * @brief Compute the best path for several start/target pairs with the same obstacles
+ * The obstacle map is built once, and queries with the same start cell share one search tree: nodes closed for a target
+ * already have their optimal cost for the next targets, so each target only expands what the previous ones did not.
+ * The search window of a shared tree covers all its targets, so paths may be cheaper than those of 'compute'.
+ * Queries that go to the opponent's goal are computed with 'compute'.
+ * 
+ * Parameters:
+ * - allow_out_of_bounds, timeout (us, per query), number of queries (n)
+ * - n queries: start x, start y, go_to_goal, optional target x, optional target y
+ * - obstacles (same format as astar)
+ * 
+ * Output (batch_path), for each query:
+ * - size of the query's output (k), followed by k values with the same format as 'final_path' (path, status, cost)
+ */
+void Planner::compute_batch(float params[], int params_size){
+
+    const bool allow_out_of_bounds = params[0];
+    const int timeout_us = params[1];
+    const int n = params[2];
+    const int new_wall_index = allow_out_of_bounds ? -3 : -2;
+    float* obstacles = &params[3 + n*5];
+    const int obst_size = params_size - 3 - n*5;
+
+    std::vector<std::vector<float>> output(n);
+    std::vector<float> query;      // parameters of a query, in the format of 'compute'
+    int total_expanded = 0, total_repaired = 0;
+
+    auto save_output = [&](int i){
+        output[i].assign(final_path, final_path + final_path_size);
+    };
+
+    //------------------------------ Queries without obstacles in the way
+
+    std::vector<int> queries;      // queries with obstacles in the way
+    for(int i=0; i<n; i++){
+        const float* q = &params[3 + i*5]; // start x, start y, go_to_goal, target x, target y
+        if (is_path_obstructed(q[0], q[1], q[3], q[4], obstacles, obst_size, q[2], new_wall_index, get_base_layout(allow_out_of_bounds))){
+            queries.push_back(i);
+        }else{
+            save_output(i);
+        }
+    }
+
+    auto start_cell = [&](int i){
+        const float* q = &params[3 + i*5];
+        return x_to_line(q[0]) * COLS + y_to_col(q[1]);
+    };
+    auto target_dist = [&](int i){
+        const float* q = &params[3 + i*5];
+        return (q[3]-q[0])*(q[3]-q[0]) + (q[4]-q[1])*(q[4]-q[1]);
+    };
+
+    // Queries with a target point are solved by search trees (one per start cell), the others are solved by 'compute'
+    // (closest targets first, since their closed nodes are more likely to be on the way to the others)
+    std::vector<int> tree_queries, goal_queries;
+    for(int i : queries){
+        (params[3 + i*5 + 2] ? goal_queries : tree_queries).push_back(i);
+    }
+    std::sort(tree_queries.begin(), tree_queries.end(), [&](int a, int b){
+        const int sa = start_cell(a), sb = start_cell(b);
+        return sa < sb or (sa == sb and target_dist(a) < target_dist(b));
+    });
+
+    //------------------------------ Queries with a target point (queries with the same start cell share a search tree)
+    if(!tree_queries.empty()){
+        const std::vector<Obstacle> obst = describe_obstacles(obstacles, obst_size);
+
+        update_map_without_goal(obst, allow_out_of_bounds);
+        expanded_nodes = 0;
+
+        for(size_t first=0, last; first<tree_queries.size(); first=last){
+            start_pos = start_cell(tree_queries[first]);
+            const int start_l = start_pos / COLS, start_c = start_pos % COLS;
+
+            // The window covers the window of every query of this tree
+            window[0] = window[2] = std::numeric_limits<int>::max();
+            window[1] = window[3] = std::numeric_limits<int>::min();
+            for(last=first; last<tree_queries.size() and start_cell(tree_queries[last]) == start_pos; last++){
+                const float* q = &params[3 + tree_queries[last]*5];
+                int w[4];
+                get_window(start_l, start_c, false, x_to_line(q[3]), y_to_col(q[4]), allow_out_of_bounds, obst, w);
+                window[0] = min(window[0], w[0]);
+                window[1] = max(window[1], w[1]);
+                window[2] = min(window[2], w[2]);
+                window[3] = max(window[3], w[3]);
+            }
+
+            // New tree
+            std::fill(node_state, node_state+LINES*COLS, 0);
+            closed.clear();
+            board[start_pos].g = 0;
+            board[start_pos].parent = nullptr;
+            node_state[start_pos] = 1;
+            open_root = open::insert(&board[start_pos], nullptr);
+
+            for(size_t j=first; j<last; j++){
+                const float* q = &params[3 + tree_queries[j]*5];
+                search_target(timeout_us, q[3], q[4]);
+                save_output(tree_queries[j]);
+            }
+        }
+
+        total_expanded += expanded_nodes;
+        status = -1; // the shared tree cannot be resumed by 'compute'
+        open_root = nullptr;
+    }
+
+    //------------------------------ Queries that go to the opponent's goal (the learned heuristic is reused by the next ones)
+    for(int i : goal_queries){
+        const float* q = &params[3 + i*5];
+        if(query.empty()){
+            query.resize(7 + obst_size);
+            std::copy(obstacles, obstacles + obst_size, query.begin() + 7);
+        }
+        query[0] = q[0]; query[1] = q[1]; query[2] = allow_out_of_bounds; query[3] = q[2];
+        query[4] = q[3]; query[5] = q[4]; query[6] = timeout_us;
+        compute(query.data(), query.size());
+        total_expanded += expanded_nodes;
+        total_repaired += repaired_nodes;
+        save_output(i);
+    }
+
+    batch_path.clear();
+    for(auto& out : output){
+        batch_path.push_back(out.size());
+        batch_path.insert(batch_path.end(), out.begin(), out.end());
+    }
+
+    mode = NEW_SEARCH;
+    expanded_nodes = total_expanded;
+    repaired_nodes = total_repaired;
+}
+
+
+/**
+ * @brief Cost-to-go field: minimum cost of the path from every cell to a seed cell (e.g. the ball), with Dijkstra's algorithm
+ * The costs are those of astar (the seed is the goal), so the cost of a cell is the cost of the path found by astar
+ * from that cell to the seed (without window restrictions). Edges are followed backwards, from the seed.
+ * 
+ * Parameters:
+ * - seed x, seed y, allow_out_of_bounds, max_cost (m)
+ * - number of stop positions (n), n stop positions (x, y): the field is complete when the cost of any of them is known
+ *   (e.g. to find the player closest to the seed, only the area around the seed that is closer than that player is needed)
+ * - obstacles (same format as astar)
+ * 
+ * Output:
+ * - field: LINES*COLS costs in meters (infinity if the seed is unreachable or the cost is not below field_limit)
+ * - field_limit: every cell whose cost is below this value (m) is in the field (max_cost, or less if a stop position was reached)
+ */
+void Planner::compute_cost_field(float params[], int params_size){
+
+    const int seed = x_to_line(params[0]) * COLS + y_to_col(params[1]);
+    const bool allow_out_of_bounds = params[2];
+    float max_cost = params[3] * 10; // (cell units)
+    const int stop_no = params[4];
+    const float inf = std::numeric_limits<float>::infinity();
+
+    std::vector<int> stop_cells(stop_no);
+    for(int i=0; i<stop_no; i++){
+        stop_cells[i] = x_to_line(params[5+i*2]) * COLS + y_to_col(params[6+i*2]);
+    }
+
+    float* obstacles = &params[5 + stop_no*2];
+    update_map_without_goal(describe_obstacles(obstacles, params_size - 5 - stop_no*2), allow_out_of_bounds);
+    expanded_nodes = 0;
+    repaired_nodes = 0;
+
+    // Bucket queue (Dial's algorithm): bucket b holds cells with cost in [b,b+1[
+    // Every edge costs at least 1, so cells in the current bucket cannot improve each other and are processed in any order
+    field.assign(LINES*COLS, inf);
+    std::fill(node_state, node_state+LINES*COLS, 0);
+    for(auto& bucket : buckets) bucket.clear();
+
+    auto push = [&](int pos, float g){
+        const size_t b = size_t(g);
+        if(b >= buckets.size()) buckets.resize(b+1);
+        buckets[b].push_back(pos);
+    };
+
+    field[seed] = 0;
+    push(seed, 0);
+
+    for(size_t b=0; b<buckets.size() and b<max_cost; b++){
+        for(size_t k=0; k<buckets[b].size(); k++){ // (the bucket does not grow while it is processed)
+            const int pos = buckets[b][k];
+            if(node_state[pos]) continue; // already processed (the cell was added again with a lower cost)
+            node_state[pos] = 2;
+            const float g = field[pos];
+            if(g >= max_cost) continue;
+            expanded_nodes++;
+
+            // when a stop cell is reached, the current bucket is completed (every cell with cost below b+1 is known)
+            if(std::find(stop_cells.begin(), stop_cells.end(), pos) != stop_cells.end()){
+                max_cost = min(max_cost, float(b+1));
+            }
+
+            // cost of entering this cell (see astar), zero for the seed, which is the goal
+            const float cost = board_cost[pos];
+            const bool is_wall = pos != seed and cost <= wall_index;
+            const float enter = pos == seed ? 0 : (is_wall ? 100.f : std::fmaxf(0.f,cost));
+
+            const int line = pos / COLS;
+            const int col  = pos % COLS;
+
+            // Relax the neighbors that can enter this cell (a wall can only be entered from a cell with the same or lower cost)
+            auto relax = [&](int n, float step){
+                if(node_state[n] or (is_wall and cost < board_cost[n])) return;
+                const float n_g = g + step + enter;
+                if(n_g < field[n]){
+                    field[n] = n_g;
+                    push(n, n_g);
+                }
+            };
+
+            if(line > 0 and line < LINES-1 and col > 0 and col < COLS-1){
+                relax(pos-COLS-1, SQRT2); relax(pos-COLS, 1); relax(pos-COLS+1, SQRT2);
+                relax(pos-1, 1);                              relax(pos+1, 1);
+                relax(pos+COLS-1, SQRT2); relax(pos+COLS, 1); relax(pos+COLS+1, SQRT2);
+            }else{ // border
+                for(int l=max(line-1,0); l<=min(line+1,LINES-1); l++){
+                    for(int c=max(col-1,0); c<=min(col+1,COLS-1); c++){
+                        if(l != line or c != col) relax(l*COLS+c, l != line and c != col ? SQRT2 : 1);
+                    }
+                }
+            }
+        }
+    }
+
+    for(float& f : field){
+        f = f >= max_cost ? inf : f / 10.f;
+    }
+    field_limit = max_cost / 10.f;
+}
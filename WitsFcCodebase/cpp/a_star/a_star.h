@@ -7,6 +7,9 @@
  * DATE:         2022
  */
 
+#include <vector>
+#include <chrono>
+
 struct Node{
 
     //------------- BST parameters
@@ -23,4 +26,103 @@ struct Node{
 
 extern void astar(float params[], int params_size);
 extern float final_path[2050];
-extern int final_path_size;
\ No newline at end of file
+extern int final_path_size;
+extern int expanded_nodes; // nodes expanded by the last astar call
+
+
+/**
+ * Incremental A* planner: same parameters and output as 'astar', but the map and the search state are kept between calls
+ * - the obstacle map is repaired only where obstacles changed
+ * - identical queries reuse the previous path (or resume the previous search if it timed out)
+ * - after each successful search, the heuristic of expanded nodes is improved (Adaptive A*), so that the next search
+ *   expands fewer nodes; when the target or the obstacles move, the learned heuristic is corrected to keep it consistent
+ */
+class Planner{
+  public:
+
+    // How the last path was obtained
+    enum Mode { NEW_SEARCH=0, RESUMED_SEARCH=1, REUSED_PATH=2, NO_OBSTACLES=3 };
+
+    Planner();
+    ~Planner();
+    Planner(const Planner&) = delete;
+    Planner& operator=(const Planner&) = delete;
+
+    void compute(float params[], int params_size); // writes to final_path (see astar)
+    void compute_batch(float params[], int params_size); // writes to batch_path (see compute_batch)
+    void compute_cost_field(float params[], int params_size); // writes to field (see compute_cost_field)
+    void reset();                                  // forget the map, the learned heuristic and the last search
+
+    std::vector<float> batch_path; // output of compute_batch
+    std::vector<float> field;      // output of compute_cost_field (lines x columns)
+    float field_limit = 0;         // output of compute_cost_field (see compute_cost_field)
+    static const int GRID_LINES = 321, GRID_COLS = 221;
+
+    int mode;            // see Mode
+    int expanded_nodes;  // nodes expanded in the last call
+    int repaired_nodes;  // nodes whose heuristic was repaired in the last call
+
+  private:
+
+    struct Obstacle{
+        int line, col, max_r;  // center cell, footprint radius (cells)
+        int hard_end, soft_end;// expansion positions [0,hard_end) are hard walls, [hard_end,soft_end) have soft cost
+        float force, f_per_m;  // soft cost parameters (zero if there is no soft area)
+        bool operator==(const Obstacle& o) const;
+    };
+
+    static std::vector<Obstacle> describe_obstacles(const float obstacles[], int obst_size);
+    static void get_window(int start_l, int start_c, bool go_to_goal, int end_l, int end_c, bool allow_out_of_bounds,
+                           const std::vector<Obstacle>& obst, int window[4]);
+    void allocate();
+    void update_map(const std::vector<Obstacle>& obstacles, bool allow_out_of_bounds); // fills 'changed'
+    void paint(const Obstacle& ob, int l0, int l1, int c0, int c1);
+    void mark_goal(bool mark);
+    void grow_heuristic_window(const int new_window[4]);
+    bool repair_heuristic();
+    void learn_heuristic(float goal_g);
+    float heuristic(int pos, int line, int col) const;
+    inline Node* expand(Node* open_root, int pos, int line, int col, float extra, Node* curr_node);
+    void search(long timeout_us, std::chrono::high_resolution_clock::time_point t1, float opt_t_x, float opt_t_y);
+    void search_target(long timeout_us, float t_x, float t_y);
+    void update_map_without_goal(const std::vector<Obstacle>& obstacles, bool allow_out_of_bounds);
+
+    //------------- Persistent map
+    float* board_cost = nullptr;
+    unsigned char* node_state = nullptr; // 0-unknown, 1-open, 2-closed
+    Node* board = nullptr;
+    std::vector<Obstacle> map_obstacles;
+    int map_oob = -1;               // allow_out_of_bounds used to build the map (-1: no map)
+    int wall_index = -2;
+    unsigned map_version = 0;
+    std::vector<int> changed;       // cells changed by the last map update
+    std::vector<float> old_cost;    // auxiliary buffer used to detect changed cells
+
+    //------------- Goal (cells with cost -1)
+    bool go_to_goal = false;
+    int end_pos = -1, end_l = 0, end_c = 0;
+    std::vector<std::pair<int,float>> goal_cells; // goal cell, cost without goal mark
+
+    //------------- Learned heuristic (see 'heuristic')
+    float* h = nullptr;             // learned heuristic + h_offset
+    unsigned* h_stamp = nullptr;    // h[pos] is valid if h_stamp[pos] == h_id
+    float h_offset = 0;             // sum of the heuristic of every new target (Moving Target Adaptive A*)
+    unsigned h_id = 1;
+    bool h_learned = false;         // true if any value was learned since the last reset (h_id change)
+    int h_window[4] = {0,-1,0,-1};  // search window (l_min, l_max, c_min, c_max) where the heuristic is consistent
+    unsigned char* in_queue = nullptr;
+    std::vector<int> queue;
+
+    //------------- Current / last search
+    int window[4];
+    int start_pos = -1;
+    int status = -1;                // -1: no search, 0-success, 1-timeout, 2-impossible
+    unsigned search_map_version = 0;
+    Node* open_root = nullptr;
+    Node* open_min = nullptr;
+    Node* best_node = nullptr;
+    float best_node_dist = 0;
+    std::vector<int> closed;
+    std::vector<Node*> queue_nodes; // auxiliary buffer used to sort the open nodes again (see search_target)
+    std::vector<std::vector<int>> buckets; // bucket queue of compute_cost_field (cells by integer cost)
+};
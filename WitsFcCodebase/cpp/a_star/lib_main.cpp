@@ -6,6 +6,21 @@ namespace py = pybind11;
 using namespace std;
 
 
+py::array_t<float> get_final_path(){
+
+    py::array_t<float> retval = py::array_t<float>(final_path_size); //allocate
+    py::buffer_info buff = retval.request();
+    float *ptr = (float *) buff.ptr;
+
+    for(int i=0; i<final_path_size; i++){
+        ptr[i] = final_path[i];
+    }
+
+
+    return retval;
+}
+
+
 py::array_t<float> compute( py::array_t<float> parameters ){
 
     // ================================================= 1. Parse data
@@ -19,25 +34,65 @@ py::array_t<float> compute( py::array_t<float> parameters ){
     
     // ================================================= 3. Prepare data to return
     
-    py::array_t<float> retval = py::array_t<float>(final_path_size); //allocate
-    py::buffer_info buff = retval.request();
-    float *ptr = (float *) buff.ptr;
+    return get_final_path();
+}
 
-    for(int i=0; i<final_path_size; i++){
-        ptr[i] = final_path[i];
-    }
 
+py::array_t<float> planner_compute( Planner& planner, py::array_t<float> parameters ){
 
-    return retval;
+    py::buffer_info parameters_buf = parameters.request();
+    int params_len = parameters_buf.shape[0];
+
+    planner.compute( (float*)parameters_buf.ptr, params_len );
+
+    return get_final_path();
 }
 
 
 
 using namespace pybind11::literals; // to add informative argument names as -> "argname"_a
 
+py::array_t<float> planner_compute_batch( Planner& planner, py::array_t<float> parameters ){
+
+    py::buffer_info parameters_buf = parameters.request();
+    int params_len = parameters_buf.shape[0];
+
+    planner.compute_batch( (float*)parameters_buf.ptr, params_len );
+
+    return py::array_t<float>(planner.batch_path.size(), planner.batch_path.data());
+}
+
+
+py::array_t<float> planner_cost_field( Planner& planner, py::array_t<float> parameters ){
+
+    py::buffer_info parameters_buf = parameters.request();
+    int params_len = parameters_buf.shape[0];
+
+    planner.compute_cost_field( (float*)parameters_buf.ptr, params_len );
+
+    return py::array_t<float>({Planner::GRID_LINES, Planner::GRID_COLS}, planner.field.data());
+}
+
+
 PYBIND11_MODULE(a_star, m) {  // the python module name, m is the interface to create bindings
     m.doc() = "Custom A-star implementation"; // optional module docstring
 
     // optional arguments names
     m.def("compute", &compute, "Compute the best path", "parameters"_a); 
+    m.def("get_expanded_nodes", [](){ return expanded_nodes; }, "Number of nodes expanded by the last call to 'compute'");
+
+    py::class_<Planner>(m, "Planner", "Incremental A-star planner, which keeps the map and the search state between calls")
+        .def(py::init<>())
+        .def("compute", &planner_compute, "Compute the best path (same parameters and output as a_star.compute)", "parameters"_a)
+        .def("compute_batch", &planner_compute_batch, "Compute the best path for several start/target pairs with the same obstacles, "
+             "parameters: allow_out_of_bounds, timeout, n, n*(start x, start y, go_to_goal, target x, target y), obstacles; "
+             "output: for each query, its size k followed by k values (path, status, cost)", "parameters"_a)
+        .def("cost_field", &planner_cost_field, "Minimum path cost (m) from every cell to a seed cell, "
+             "parameters: seed x, seed y, allow_out_of_bounds, max_cost, n, n stop positions (x,y), obstacles; "
+             "output: 321x221 array (cell of x,y: round(10*x+160), round(10*y+110)), infinity if unreachable or not below field_limit", "parameters"_a)
+        .def("reset", &Planner::reset, "Forget the map, the learned heuristic and the last search")
+        .def_readonly("field_limit", &Planner::field_limit, "Every cell whose cost is below this value is in the last cost field: max_cost, or less if a stop position was reached")
+        .def_readonly("mode", &Planner::mode, "How the last path was obtained: 0-new search, 1-resumed search (the previous one timed out), 2-reused path (same query), 3-no obstacles")
+        .def_readonly("expanded_nodes", &Planner::expanded_nodes, "Number of nodes expanded in the last call")
+        .def_readonly("repaired_nodes", &Planner::repaired_nodes, "Number of nodes whose learned heuristic was repaired in the last call");
 }
\ No newline at end of file
@@ -49,8 +49,12 @@ void get_intersection_with_ball(float x, float y, float max_robot_sp_per_step, f
  * @param by ball position (y)
  * @param vx ball velocity (x)
  * @param vy ball velocity (y)
+ * @param pos output ball positions (600 floats)
+ * @param vel output ball velocities (600 floats)
+ * @param spd output ball linear speeds (300 floats)
+ * @return number of values written to pos/vel (2 per step)
  */
-void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy){
+int predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy, float pos[], float vel[], float spd[]){
 
     // acceleration = Rolling Drag Force * mass (constant = 0.026 kg)
     // acceleration = k1 * velocity^2 + k2 * velocity
@@ -60,11 +64,11 @@ void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy
     const double k1_x = (vx < 0) ? -k1 : k1; // invert k1 if vx is negative, because vx^2 absorbs the sign
     const double k1_y = (vy < 0) ? -k1 : k1; // invert k1 if vy is negative, because vy^2 absorbs the sign
     
-    ball_pos_pred[0] = bx; // current ball position
-    ball_pos_pred[1] = by;
-    ball_vel_pred[0] = vx; // current ball velocity
-    ball_vel_pred[1] = vy;
-    ball_spd_pred[0] = sqrt(vx*vx+vy*vy);
+    pos[0] = bx; // current ball position
+    pos[1] = by;
+    vel[0] = vx; // current ball velocity
+    vel[1] = vy;
+    spd[0] = sqrt(vx*vx+vy*vy);
 
     int counter = 2;
 
@@ -92,13 +96,49 @@ void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy
         vy += acc_y*0.02;
 
         // store as 32b
-        ball_spd_pred[counter/2] = sqrt(vx*vx+vy*vy);
-        ball_vel_pred[counter] = vx;
-        ball_pos_pred[counter++] = bx;
-        ball_vel_pred[counter] = vy;
-        ball_pos_pred[counter++] = by;
+        spd[counter/2] = sqrt(vx*vx+vy*vy);
+        vel[counter] = vx;
+        pos[counter++] = bx;
+        vel[counter] = vy;
+        pos[counter++] = by;
         
     }
 
-    pos_pred_len = counter;
-}
\ No newline at end of file
+    return counter;
+}
+
+/**
+ * @brief Predict ball position/velocity, see predict_rolling_ball_pos_vel_spd (the output is written to ball_pos_pred, etc.)
+ */
+void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy){
+    pos_pred_len = predict_rolling_ball_pos_vel_spd(bx, by, vx, vy, ball_pos_pred, ball_vel_pred, ball_spd_pred);
+}
+
+
+//============================================================================ Predictor
+
+void Predictor::predict(float bx, float by, float vx, float vy){
+    len = predict_rolling_ball_pos_vel_spd(bx, by, vx, vy, pos, vel, spd);
+    index = 0;
+}
+
+void Predictor::set_stationary(float bx, float by){
+    pos[0] = bx;
+    pos[1] = by;
+    vel[0] = vel[1] = spd[0] = 0;
+    len = 2;
+    index = 0;
+}
+
+bool Predictor::advance(){
+    if(len - index*2 <= 2) return false; // the last step is kept
+    index++;
+    return true;
+}
+
+/**
+ * @brief Get intersection with moving ball, starting at the current step (see get_intersection_with_ball)
+ */
+void Predictor::get_intersection(float x, float y, float max_robot_sp_per_step, float &ret_x, float &ret_y, float &ret_d) const{
+    get_intersection_with_ball(x, y, max_robot_sp_per_step, const_cast<float*>(pos) + index*2, len - index*2, ret_x, ret_y, ret_d);
+}
@@ -8,3 +8,27 @@ extern int pos_pred_len;
 extern void get_intersection_with_ball(float x, float y, float max_robot_sp_per_step, float ball_pos[], float ball_pos_len,
                                        float &ret_x, float &ret_y, float &ret_d);
 extern void predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy);
+extern int predict_rolling_ball_pos_vel_spd(double bx, double by, double vx, double vy, float pos[], float vel[], float spd[]);
+
+
+/**
+ * Ball predictor with its own prediction buffer (each agent keeps one, so agents of the same process do not share the buffer)
+ * The prediction is made once, when a new ball position arrives, and 'index' advances one step per cycle,
+ * so that intersection queries only need the robot state
+ */
+class Predictor{
+  public:
+
+    void predict(float bx, float by, float vx, float vy); // rolling ball prediction (see predict_rolling_ball_pos_vel_spd)
+    void set_stationary(float bx, float by);               // the ball is not moving (single step)
+    bool advance();                                        // advance to the next predicted step, if available
+    void get_intersection(float x, float y, float max_robot_sp_per_step, float &ret_x, float &ret_y, float &ret_d) const;
+
+    int steps() const { return (len - index*2) / 2; }      // number of predicted steps, starting at the current step
+
+    float pos[600]; // ball position   (x,y) prediction for 300*0.02s = 6s 
+    float vel[600]; // ball velocity   (x,y) prediction for 300*0.02s = 6s 
+    float spd[300]; // ball linear speed (s) prediction for 300*0.02s = 6s 
+    int len = 0;    // number of values in pos/vel (2 per step)
+    int index = 0;  // current step
+};
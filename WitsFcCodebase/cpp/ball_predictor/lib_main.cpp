@@ -88,6 +88,48 @@ py::array_t<float> get_intersection( py::array_t<float> parameters ){
 }
 
 
+/**
+ * @brief Get point of intersection with moving ball, for several robots (see Predictor::get_intersection)
+ * 
+ * @param players 
+ *        (N,2) robot positions
+ * @param max_speeds_per_step 
+ *        (N,) robot max speed per step
+ * @return (N,3) intersection_x, intersection_y, intersection_distance
+ */
+py::array_t<float> predictor_get_intersections( const Predictor& predictor,
+                                                py::array_t<float, py::array::c_style | py::array::forcecast> players,
+                                                py::array_t<float, py::array::c_style | py::array::forcecast> max_speeds_per_step ){
+
+    const int n = max_speeds_per_step.size();
+    if(players.size() != n*2) throw py::value_error("players must have shape (N,2), where N is the number of speeds");
+
+    const float* p = players.data();
+    const float* sp = max_speeds_per_step.data();
+
+    py::array_t<float> retval = py::array_t<float>({n, 3}); //allocate
+    float *ptr = retval.mutable_data();
+
+    for(int i=0; i<n; i++){
+        predictor.get_intersection(p[i*2], p[i*2+1], sp[i], ptr[i*3], ptr[i*3+1], ptr[i*3+2]);
+    }
+    return retval;
+}
+
+
+/**
+ * @brief Read-only view of a prediction buffer, starting at the current step (the view keeps the predictor alive)
+ */
+py::array_t<float> predictor_view( py::object self, float* (*get)(Predictor&), int width ){
+    Predictor& p = self.cast<Predictor&>();
+    const py::ssize_t steps = p.steps();
+    py::array_t<float> view = (width == 1) ? py::array_t<float>({steps}, get(p) + p.index, self)
+                                           : py::array_t<float>({steps, py::ssize_t(width)}, get(p) + p.index*width, self);
+    py::detail::array_proxy(view.ptr())->flags &= ~py::detail::npy_api::NPY_ARRAY_WRITEABLE_;
+    return view;
+}
+
+
 using namespace pybind11::literals; // to add informative argument names as -> "argname"_a
 
 PYBIND11_MODULE(ball_predictor, m) {  // the python module name, m is the interface to create bindings
@@ -96,5 +138,28 @@ PYBIND11_MODULE(ball_predictor, m) {  // the python module name, m is the interf
     // optional arguments names
     m.def("predict_rolling_ball", &predict_rolling_ball, "Predict rolling ball", "parameters"_a); 
     m.def("get_intersection", &get_intersection, "Get point of intersection with moving ball", "parameters"_a); 
+
+    py::class_<Predictor>(m, "Predictor", "Ball predictor that keeps its prediction buffer, the current step advances once per cycle")
+        .def(py::init<>())
+        .def("predict", &Predictor::predict, "Predict rolling ball from its 2D position and velocity (the current step is the first one)",
+             "ball_x"_a, "ball_y"_a, "ball_vel_x"_a, "ball_vel_y"_a)
+        .def("set_stationary", &Predictor::set_stationary, "The ball is not moving (single step prediction)", "ball_x"_a, "ball_y"_a)
+        .def("advance", &Predictor::advance, "Advance to the next predicted step, returns False if the current step is the last one")
+        .def("get_intersection", [](const Predictor& p, float x, float y, float max_sp){
+                float ret[3];
+                p.get_intersection(x, y, max_sp, ret[0], ret[1], ret[2]);
+                return py::array_t<float>(3, ret);
+             }, "Get point of intersection with moving ball, returns intersection_x, intersection_y, intersection_distance",
+             "robot_x"_a, "robot_y"_a, "robot_max_speed_per_step"_a)
+        .def("get_intersections", &predictor_get_intersections, "Get points of intersection with moving ball for N robots, returns (N,3) "
+             "intersection_x, intersection_y, intersection_distance", "players"_a, "robots_max_speed_per_step"_a)
+        .def_property_readonly("pos", [](py::object self){ return predictor_view(self, [](Predictor& p){ return p.pos; }, 2); },
+             "(steps,2) view of the predicted ball positions, starting at the current step")
+        .def_property_readonly("vel", [](py::object self){ return predictor_view(self, [](Predictor& p){ return p.vel; }, 2); },
+             "(steps,2) view of the predicted ball velocities, starting at the current step")
+        .def_property_readonly("spd", [](py::object self){ return predictor_view(self, [](Predictor& p){ return p.spd; }, 1); },
+             "(steps,) view of the predicted ball linear speeds, starting at the current step")
+        .def_property_readonly("steps", &Predictor::steps, "Number of predicted steps, starting at the current step")
+        .def_readonly("index", &Predictor::index, "Current step (number of steps since the last prediction)");
 }
 
@@ -1,19 +1,50 @@
+from collections import deque
 from pathlib import Path
 from datetime import datetime
+import atexit
+import os
 import random
 from string import ascii_uppercase
+import threading
+import time
 
 class Logger():
+    '''
+    Buffered logger: `write` appends a record to an in-memory queue, and a background thread formats the records and
+    writes them in batches, keeping one open file per topic (so that disk I/O never stalls the agent's cycle).
+
+    - The queue is bounded (MAX_QUEUE records), records are dropped when it is full and the number of dropped records
+      is written to the log as soon as there is space again
+    - Log files are rotated when they exceed MAX_BYTES (topic.log -> topic.log.1 -> ... -> topic.log.BACKUPS)
+    - All records are written at exit (or when `flush` is called)
+
+    All loggers of the process share the writer thread, which is started when the first record is written
+    (and again in a forked process, where the parent's thread does not exist).
+    '''
     _folder = None
 
+    MAX_QUEUE = 100000         # maximum number of records waiting to be written (shared by all topics)
+    MAX_BYTES = 10 * 2**20     # log files are rotated when they exceed this size
+    BACKUPS = 3                # number of rotated files kept per topic
+    FLUSH_INTERVAL = 0.5       # maximum time (s) between a record being written and reaching the file
+    BATCH = 1000               # the writer thread is woken up earlier if this number of records is waiting
+
+    _queue = deque()           # records: (topic, msg, time, step, dropped)
+    _cond = threading.Condition()
+    _writer = None             # writer thread (None if it was not started in this process)
+    _pending = 0               # records in the queue or being written
+    dropped_total = 0          # records dropped by all loggers because the queue was full
+
     def __init__(self, is_enabled:bool, topic:str) -> None:
-        self.no_of_entries = 0 
+        self.no_of_entries = 0
+        self.no_of_dropped = 0 # records dropped because the queue was full
+        self._unreported = 0   # dropped records that were not yet reported in the log
         self.enabled = is_enabled
         self.topic = topic
 
     def write(self, msg:str, timestamp:bool=True, step:int=None) -> None:
         '''
-        Write `msg` to file named `self.topic`
+        Write `msg` to file named `self.topic` (the record is written by a background thread)
 
         Parameters
         ----------
@@ -26,23 +57,154 @@ class Logger():
         if not self.enabled: return
 
         # The log folder is only created if needed
-        if Logger._folder is None: 
-            rnd = ''.join(random.choices(ascii_uppercase, k=6)) # Useful if multiple processes are running in parallel  
+        if Logger._folder is None:
+            rnd = ''.join(random.choices(ascii_uppercase, k=6)) # Useful if multiple processes are running in parallel
             Logger._folder = "./logs/" + datetime.now().strftime("%Y-%m-%d_%H.%M.%S__") + rnd + "/"
             print("\nLogger Info: see",Logger._folder)
             Path(Logger._folder).mkdir(parents=True, exist_ok=True)
 
+        if Logger._writer is None:
+            Logger._start_writer()
+
+        if Logger._pending >= Logger.MAX_QUEUE:
+            self.no_of_dropped += 1
+            self._unreported += 1
+            Logger.dropped_total += 1
+            return
+
         self.no_of_entries += 1
+        with Logger._cond:
+            Logger._queue.append((self.topic, msg, time.time() if timestamp else None, step, self._unreported))
+            Logger._pending += 1
+            if len(Logger._queue) == Logger.BATCH:
+                Logger._cond.notify()
+                if not Logger._writer.is_alive(): # (checked once per batch)
+                    Logger._start_writer()
+        self._unreported = 0
 
-        with open(Logger._folder + self.topic + ".log", 'a+') as f:
+    @staticmethod
+    def flush(timeout=None) -> bool:
+        '''
+        Wait until all records written so far are in their files
+
+        Parameters
+        ----------
+        timeout : float
+            maximum waiting time (s), default is `None` (no limit)
+
+        Returns
+        -------
+        flushed : bool
+            False if the timeout expired first
+        '''
+        if Logger._writer is None: # the writer thread was not started in this process
+            return True
+        if not Logger._writer.is_alive():
+            Logger._start_writer()
+        with Logger._cond:
+            Logger._cond.notify_all()
+            return Logger._cond.wait_for(lambda: Logger._pending == 0, timeout)
+
+    @staticmethod
+    def _start_writer():
+        Logger._writer = threading.Thread(target=Logger._write_loop, name="Logger", daemon=True)
+        Logger._writer.start()
+
+    @staticmethod
+    def _after_fork():
+        ''' The writer thread does not exist in a forked process (and the parent's records are not written again) '''
+        Logger._queue = deque()
+        Logger._cond = threading.Condition()
+        Logger._pending = 0
+        Logger._writer = None
+
+    @staticmethod
+    def _write_loop():
+        ''' Background thread: write all queued records in batches (one open file per topic) '''
+        files = dict()       # key: topic, value: [file, size]
+        stamp = [None, None] # last timestamp (second, string)
+        cond = Logger._cond
+
+        while True:
+            with cond:
+                cond.wait_for(lambda: Logger._queue, Logger.FLUSH_INTERVAL)
+                batch = Logger._queue
+                Logger._queue = deque()
+
+            try:
+                Logger._write_batch(batch, files, stamp)
+            except Exception as e: # (the writer thread must not die, or every later record would be lost)
+                print(f"Logger Error: {len(batch)} records were lost: {e!r}")
+            finally:
+                with cond:
+                    Logger._pending -= len(batch)
+                    if Logger._pending == 0:
+                        cond.notify_all() # (see flush)
+
+    @staticmethod
+    def _write_batch(batch, files, stamp):
+        ''' Format the records of each topic and write them (rotating files that exceed MAX_BYTES) '''
+        lines = dict()
+        for topic, msg, t, step, dropped in batch:
+            out = lines.get(topic)
+            if out is None:
+                out = lines[topic] = []
+            if dropped:
+                out.append(f"{{Logger}} {dropped} records were dropped (queue full)\n")
             prefix = ""
-            write_step = step is not None
-            if timestamp or write_step:
+            if t is not None or step is not None:
                 prefix = "{"
-                if timestamp: 
-                    prefix += datetime.now().strftime("%a %H:%M:%S")
-                    if write_step: prefix += " "
-                if write_step:
+                if t is not None:
+                    sec = int(t)
+                    if sec != stamp[0]: # (the timestamp string is reused while the second does not change)
+                        stamp[:] = sec, datetime.fromtimestamp(sec).strftime("%a %H:%M:%S")
+                    prefix += stamp[1]
+                    if step is not None: prefix += " "
+                if step is not None:
                     prefix += f'Step:{step}'
                 prefix += "} "
-            f.write(prefix + msg + "\n")
\ No newline at end of file
+            try:
+                out.append(prefix + str(msg) + "\n")
+            except Exception as e: # e.g. an object whose __str__ fails
+                out.append(prefix + f"{{Logger}} record could not be formatted: {e!r}\n")
+
+        for topic, out in lines.items():
+            path = Logger._folder + topic + ".log"
+            try:
+                text = "".join(out)
+                f = files.get(topic)
+                if f is None:
+                    f = files[topic] = [Logger._open(path), os.path.getsize(path)]
+                if f[1] > 0 and f[1] + len(text) > Logger.MAX_BYTES:
+                    f[0].close()
+                    Logger._rotate(path)
+                    f = files[topic] = [Logger._open(path), 0]
+                f[0].write(text)
+                f[0].flush()
+                f[1] += len(text)
+            except Exception as e: # (the records of this topic are lost, but the agent keeps running)
+                print(f"Logger Error: could not write to {path}: {e!r}")
+                f = files.pop(topic, None) # (the file is opened again for the next records)
+                if f is not None:
+                    try: f[0].close()
+                    except Exception: pass
+
+    @staticmethod
+    def _open(path:str):
+        return open(path, 'a+', errors='backslashreplace') # (e.g. lone surrogates in a message are escaped)
+
+    @staticmethod
+    def _rotate(path:str):
+        ''' topic.log -> topic.log.1 -> ... -> topic.log.BACKUPS (the oldest file is deleted) '''
+        for i in range(Logger.BACKUPS-1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i+1}")
+        if Logger.BACKUPS > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+
+atexit.register(Logger.flush, 5) # (records that are not written in 5 s are lost, the process must not hang at exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Logger._after_fork)
@@ -0,0 +1,165 @@
+from scripts.commons.UI import UI
+from time import perf_counter_ns
+import atexit
+import numpy as np
+import signal
+
+
+class Profiler():
+    '''
+    Low-overhead cycle-budget profiler
+
+    Each stage accumulates its duration during a cycle (a stage can run several times per cycle, e.g. path planning).
+    When the next cycle starts, the accumulated duration of every stage that ran is written to that stage's ring buffer,
+    which keeps the last `capacity` cycles. Percentiles are computed only when the statistics are printed.
+
+    A cycle starts when the first server message arrives (after the socket wait) and ends when the next
+    `Server_Comm.receive` begins. Cycles longer than the step time are counted as missed deadlines, and
+    the packets reported as lost by `Server_Comm.receive` are linked to the previous cycle's deadline.
+
+    The profiler is disabled by default, in which case all methods are no-ops. It is enabled for all agents in the
+    process through `Profiler.enable()` (Script option 'C'). Statistics are printed at exit or on SIGUSR1.
+    '''
+    WAIT, PARSE, WORLD_UPDATE, POSE, LOCALIZATION, OTHER_ROBOTS, BALL_PREDICTION, STRATEGY, SELECT_SKILL, BEHAVIOR, PATH_PLANNING, COMMAND_SEND = range(12)
+
+    # Nested stages are indented (their time is included in the parent stage)
+    STAGE_NAMES = ("Socket wait", "Parse", "World update", "  Pose", "  Localization", "  Other robots", "  Ball prediction",
+                   "Strategy", "select_skill", "  Behavior", "    Path planning", "get_command + send")
+
+    is_enabled = False
+    instances = []
+
+    def __init__(self, topic:str, budget_ms=20, capacity=4096) -> None:
+        '''
+        Parameters
+        ----------
+        topic : str
+            name used when printing statistics (e.g. team name and uniform number)
+        budget_ms : float
+            cycle deadline in milliseconds
+        capacity : int
+            number of cycles kept by each stage's ring buffer
+        '''
+        self.topic = topic
+        self.enabled = Profiler.is_enabled
+        if not self.enabled:
+            self.now = self.add = self.add_wait = Profiler._zero
+            self.new_cycle = self.lost_packets = self.missed_send = Profiler._none
+            return
+
+        n = len(Profiler.STAGE_NAMES)
+        self.budget_ns = int(budget_ms * 1e6)
+        self.capacity = capacity
+        self.samples = np.zeros((n, capacity), np.int64) # ring buffer per stage (ns)
+        self.counts = [0] * n                            # number of samples written per stage
+        self.cycle_samples = np.zeros(capacity, np.int64)
+        self.cycle_count = 0
+
+        self._acc = [0] * n      # accumulated time per stage in the current cycle
+        self._ran = [False] * n  # stages that ran in the current cycle
+        self._cycle_start = None # arrival time of the first message in the current cycle
+
+        self.missed_deadlines = 0
+        self.last_cycle_missed = False
+        self.lost_packet_events = 0
+        self.lost_packets_total = 0
+        self.lost_after_missed_deadline = 0
+        self.missed_sends = 0
+
+        Profiler.instances.append(self)
+
+    @staticmethod
+    def _zero(*args):
+        return 0
+
+    @staticmethod
+    def _none(*args):
+        pass
+
+    @staticmethod
+    def enable():
+        ''' Enable profiling for all agents created afterwards, and print all statistics at exit or on SIGUSR1 '''
+        if Profiler.is_enabled: return
+        Profiler.is_enabled = True
+        atexit.register(Profiler.print_all)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: Profiler.print_all())
+
+    def now(self) -> int:
+        return perf_counter_ns()
+
+    def add(self, stage:int, t0:int) -> int:
+        ''' Add the time elapsed since `t0` to `stage`, returns the current time (to start the next stage) '''
+        t = perf_counter_ns()
+        self._acc[stage] += t - t0
+        self._ran[stage] = True
+        return t
+
+    def add_wait(self, t0:int) -> int:
+        ''' Add the socket wait time since `t0`, the cycle starts when the first message arrives '''
+        t = self.add(Profiler.WAIT, t0)
+        if self._cycle_start is None:
+            self._cycle_start = t
+        return t
+
+    def new_cycle(self) -> None:
+        ''' Close the current cycle (if any) and write its stage durations to the ring buffers '''
+        t = perf_counter_ns()
+        acc, ran = self._acc, self._ran
+        for s in range(len(acc)):
+            if ran[s]:
+                self.samples[s, self.counts[s] % self.capacity] = acc[s]
+                self.counts[s] += 1
+                acc[s] = 0
+                ran[s] = False
+
+        if self._cycle_start is not None:
+            duration = t - self._cycle_start
+            self.cycle_samples[self.cycle_count % self.capacity] = duration
+            self.cycle_count += 1
+            self.last_cycle_missed = duration > self.budget_ns
+            self.missed_deadlines += self.last_cycle_missed
+            self._cycle_start = None
+
+    def lost_packets(self, n:int) -> None:
+        ''' Register `n` lost packets (consecutive messages received in the same cycle) '''
+        self.lost_packet_events += 1
+        self.lost_packets_total += n
+        self.lost_after_missed_deadline += self.last_cycle_missed
+
+    def missed_send(self) -> None:
+        ''' Register a cycle where the command was not sent because a new message had already arrived '''
+        self.missed_sends += 1
+
+    def get_percentiles(self):
+        '''
+        Returns
+        -------
+        rows : `list`
+            list of (stage name, number of cycles, p50, p95, p99, max) for each stage that ran, and the whole cycle
+            (durations in milliseconds, percentiles of the last `capacity` cycles, number of cycles since the start)
+        '''
+        rows = []
+        for name, buffer, count in zip(Profiler.STAGE_NAMES + ("Cycle (without wait)",), 
+                                       (*self.samples, self.cycle_samples), (*self.counts, self.cycle_count)):
+            if count == 0: continue
+            s = buffer[:min(count, self.capacity)] / 1e6
+            rows.append((name, count, *np.percentile(s, (50,95,99)), np.max(s)))
+        return rows
+
+    def print_stats(self) -> None:
+        if not self.enabled: return
+        table = [[],[],[],[],[],[]]
+        for row in self.get_percentiles():
+            for col, val in zip(table, row):
+                col.append(val if type(val) in (str,int) else f"{val:.3f}")
+        print(f"\nProfiler: {self.topic}")
+        UI.print_table(table, ["Stage","Cycles","p50 (ms)","p95 (ms)","p99 (ms)","Max (ms)"], numbering=[False]*6)
+        print(f"Missed deadlines (>{self.budget_ns/1e6:g} ms): {self.missed_deadlines}/{self.cycle_count}   "
+              f"Lost packet warnings: {self.lost_packet_events} ({self.lost_packets_total} packets, "
+              f"{self.lost_after_missed_deadline} after a missed deadline)   Commands not sent: {self.missed_sends}")
+
+    @staticmethod
+    def print_all() -> None:
+        for p in Profiler.instances:
+            p.print_stats()
@@ -1,6 +1,4 @@
-from math import asin, atan, atan2, pi, sqrt
-from math_ops.Matrix_3x3 import Matrix_3x3
-from math_ops.Math_Ops import Math_Ops as M
+from math import atan, cos, pi, sin, sqrt
 import numpy as np
 
 class Inverse_Kinematics():
@@ -15,10 +13,17 @@ class Inverse_Kinematics():
     TORSO_HIP_Z = 0.115 # distance in the z-axis, between the torso and each hip (same for all robots)
     TORSO_HIP_X = 0.01  # distance in the x-axis, between the torso and each hip (same for all robots) (hip is 0.01m to the back)
 
+    LEFT_LEG_INDICES  = [2,4,6,8,10,12] # joints computed by leg() and legs() (hip yaw, hip roll, hip pitch, knee, foot pitch, foot roll)
+    RIGHT_LEG_INDICES = [3,5,7,9,11,13]
+
     def __init__(self, robot) -> None:
         self.robot = robot
         self.NAO_SPECS = Inverse_Kinematics.NAO_SPECS_PER_ROBOT[robot.type]
 
+        # Range of motion of the leg joints, rows: right leg, left leg (see legs())
+        self.legs_min = np.array([[robot.joints_info[i].min for i in idx] for idx in (Inverse_Kinematics.RIGHT_LEG_INDICES, Inverse_Kinematics.LEFT_LEG_INDICES)], float)
+        self.legs_max = np.array([[robot.joints_info[i].max for i in idx] for idx in (Inverse_Kinematics.RIGHT_LEG_INDICES, Inverse_Kinematics.LEFT_LEG_INDICES)], float)
+
     def torso_to_hip_transform(self, coords, is_batch=False):
         '''
         Convert cartesian coordinates that are relative to torso to coordinates that are relative the center of both hip joints
@@ -109,25 +114,27 @@ class Inverse_Kinematics():
 
         vec = (p2 - p1) / resolution
 
+        hip_points = p1 + vec * np.arange(1,resolution+1)[:,None]
+        values, unreachable, out_of_range = self.legs(hip_points, foot_ori3d, is_left, dynamic_pose)
 
-        hip_points = [p1 + vec * i for i in range(1,resolution+1)]
-        interpolation = [self.leg(p, foot_ori3d, is_left, dynamic_pose) for p in hip_points]
+        indices = Inverse_Kinematics.LEFT_LEG_INDICES if is_left else Inverse_Kinematics.RIGHT_LEG_INDICES
 
-        indices = [2,4,6,8,10,12] if is_left else [3,5,7,9,11,13]
+        def step(i):
+            return [values[i], Inverse_Kinematics._error_codes(indices, unreachable[i], out_of_range[i])]
 
-        last_joint_values = self.robot.joints_position[indices[0:4]] #exclude feet joints to compute ankle trajectory
-        next_step = interpolation[0]
+        # python floats are faster than numpy arrays to compare one by one (exclude feet joints to compute ankle trajectory)
+        ankle_values = values[:,0:4].tolist()
+        last_joint_values = self.robot.joints_position[indices[0:4]].tolist()
+        next_step = 0
         trajectory = []
 
-        for p in interpolation[1:-1]:
-            if np.any(np.abs(p[1][0:4]-last_joint_values) > 7.03): 
-                trajectory.append(next_step[1:3])
-                last_joint_values = next_step[1][0:4]
-                next_step = p
-            else:
-                next_step = p
+        for i in range(1, resolution-1):
+            if any(abs(a-b) > 7.03 for a,b in zip(ankle_values[i], last_joint_values)):
+                trajectory.append(step(next_step))
+                last_joint_values = ankle_values[next_step]
+            next_step = i
 
-        trajectory.append(interpolation[-1][1:3])
+        trajectory.append(step(resolution-1))
 
         return indices, trajectory
 
@@ -161,82 +168,123 @@ class Inverse_Kinematics():
                     (-1) Foot is too far (unreachable)
                     (x)  Joint x is out of range
         '''
+        values, unreachable, out_of_range = self.legs((ankle_pos3d,), foot_ori3d, is_left, dynamic_pose)
+        indices = Inverse_Kinematics.LEFT_LEG_INDICES if is_left else Inverse_Kinematics.RIGHT_LEG_INDICES
+        return indices, values[0], Inverse_Kinematics._error_codes(indices, unreachable[0], out_of_range[0])
 
-        error_codes = []
-        leg_y_dev, upper_leg_height, upper_leg_depth, lower_leg_len, knee_extra_angle, _ = self.NAO_SPECS
-        sign = -1 if is_left else 1
-
-        # Then we translate to origin of leg by shifting the y coordinate
-        ankle_pos3d = np.asarray(ankle_pos3d) + (0,sign*leg_y_dev,0)
 
-        # First we rotate the leg, then we rotate the coordinates to abstract from the rotation
-        ankle_pos3d = Matrix_3x3().rotate_z_deg(-foot_ori3d[2]).multiply(ankle_pos3d)
+    @staticmethod
+    def _error_codes(indices, unreachable, out_of_range):
+        ''' Error codes of leg() from the errors of legs() '''
+        error_codes = [-1] if unreachable else []
+        if out_of_range.any():
+            error_codes += [i for i,e in zip(indices, out_of_range) if e]
+        return error_codes
 
-        # Use geometric solution to compute knee angle and foot pitch
-        dist = np.linalg.norm(ankle_pos3d)  #dist hip <-> ankle
-        sq_dist = dist * dist
-        sq_upper_leg_h = upper_leg_height * upper_leg_height
-        sq_lower_leg_l = lower_leg_len * lower_leg_len
-        sq_upper_leg_l = upper_leg_depth * upper_leg_depth + sq_upper_leg_h
-        upper_leg_len = sqrt(sq_upper_leg_l)
-        knee = M.acos((sq_upper_leg_l + sq_lower_leg_l - sq_dist)/(2 * upper_leg_len * lower_leg_len)) + knee_extra_angle # Law of cosines
-        foot = M.acos((sq_lower_leg_l + sq_dist - sq_upper_leg_l)/(2 * lower_leg_len * dist)) # foot perpendicular to vec(origin->ankle_pos)
 
-        # Check if target is reachable
-        if dist > upper_leg_len + lower_leg_len: 
-            error_codes.append(-1)
+    def legs(self, ankle_pos3d, foot_ori3d, is_left, dynamic_pose:bool):
+        '''
+        Compute inverse kinematics for N ankle positions and foot orientations at once (see leg())
 
-        # Knee and foot
-        knee_angle = pi - knee
-        foot_pitch = foot - atan(ankle_pos3d[0] / np.linalg.norm(ankle_pos3d[1:3]))
-        foot_roll = atan(ankle_pos3d[1] / min(-0.05, ankle_pos3d[2])) * -sign  # avoid instability of foot roll (not relevant above -0.05m)
+        Parameters
+        ----------
+        ankle_pos3d : array_like, shape (N,3)
+            (x,y,z) position of each ankle in 3D, relative to the center of both hip joints
+        foot_ori3d : array_like, shape (N,3) or length 3
+            rotation of each foot around x,y,z (rotation around x & y are biases, relative to a vertical pose, or dynamic pose, if enabled)
+        is_left : `bool` or array_like of `bool`, shape (N,)
+            True to select the left leg, False to select the right leg (for all points, or for each point)
+        dynamic_pose : `bool`
+            enable dynamic feet rotation to be parallel to the ground, based on IMU
 
-        # Raw hip angles if all joints were straightforward
-        raw_hip_yaw = foot_ori3d[2]
-        raw_hip_pitch = foot_pitch - knee_angle
-        raw_hip_roll = -sign * foot_roll
+        Returns
+        -------
+        values : ndarray, shape (N,6)
+            values of the computed joints of each point (joint indices: LEFT_LEG_INDICES or RIGHT_LEG_INDICES)
+        unreachable : ndarray, shape (N,)
+            True if the foot is too far (error code -1 of leg())
+        out_of_range : ndarray, shape (N,6)
+            True if the joint was out of range (and was limited to its range of motion)
+        '''
+        leg_y_dev, upper_leg_height, upper_leg_depth, lower_leg_len, knee_extra_angle, _ = self.NAO_SPECS
+        is_left = np.asarray(is_left, bool)
+        sign = np.where(is_left, -1.0, 1.0)
+        ori = np.asarray(foot_ori3d, float)
+        ori_x, ori_y, ori_z = ori[...,0], ori[...,1], ori[...,2] * (pi/180)
+
+        # Translate to origin of leg, then rotate the coordinates to abstract from the foot yaw
+        p = np.array(ankle_pos3d, float)
+        p[:,1] += sign * leg_y_dev
+        cz, sz = np.cos(ori_z), np.sin(ori_z)
+        x = cz * p[:,0] + sz * p[:,1]
+        y = cz * p[:,1] - sz * p[:,0]
+        z = p[:,2]
 
-        # Rotate 45deg due to yaw joint orientation, then rotate yaw, roll and pitch
-        m = Matrix_3x3().rotate_y_rad(raw_hip_pitch).rotate_x_rad(raw_hip_roll).rotate_z_deg(raw_hip_yaw).rotate_x_deg(-45*sign)
+        # Use geometric solution to compute knee angle and foot pitch
+        sq_dist = x*x + y*y + z*z
+        dist = np.sqrt(sq_dist) #dist hip <-> ankle
+        sq_lower_leg_l = lower_leg_len * lower_leg_len
+        sq_upper_leg_l = upper_leg_depth * upper_leg_depth + upper_leg_height * upper_leg_height
+        upper_leg_len = sqrt(sq_upper_leg_l)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            knee = np.arccos(np.clip((sq_upper_leg_l + sq_lower_leg_l - sq_dist)/(2 * upper_leg_len * lower_leg_len), -1, 1)) + knee_extra_angle # Law of cosines
+            foot = np.arccos(np.clip((sq_lower_leg_l + sq_dist - sq_upper_leg_l)/(2 * lower_leg_len * dist), -1, 1)) # foot perpendicular to vec(origin->ankle_pos)
+            unreachable = dist > upper_leg_len + lower_leg_len
+
+            # Knee and foot
+            knee_angle = pi - knee
+            foot_pitch = foot - np.arctan(x / np.sqrt(y*y + z*z))
+            foot_roll = np.arctan(y / np.minimum(-0.05, z)) * -sign # avoid instability of foot roll (not relevant above -0.05m)
+
+        # Raw hip angles if all joints were straightforward (yaw, roll, pitch)
+        # m = Ry(pitch) * Rx(roll) * Rz(yaw) * Rx(-45deg*sign), where the yaw rotation is the foot yaw
+        cp, sp = np.cos(foot_pitch - knee_angle), np.sin(foot_pitch - knee_angle)
+        cr, sr = np.cos(-sign * foot_roll), np.sin(-sign * foot_roll)
+        c45, s45 = cos(pi/4), -sin(pi/4) * sign
+
+        # Only the required elements are computed: m[1,0], m[1,1] and column 2 (of the full matrix)
+        a1 = (sp*sr, cr, cp*sr)                         # column 1 of Ry * Rx (column 0 is (cp, 0, -sp))
+        a2 = (sp*cr, -sr, cp*cr)                        # column 2 of Ry * Rx (and of Ry * Rx * Rz)
+        b1 = (cz*a1[0] - sz*cp, cz*cr, cz*a1[2] + sz*sp) # column 1 of Ry * Rx * Rz
+        m10 = sz*cr                                     # m[1,0] (column 0 of Ry * Rx * Rz is cz*col0 + sz*col1)
+        m11 = c45*b1[1] + s45*a2[1]
+        m02, m12, m22 = [c45*v - s45*u for u,v in zip(b1,a2)]
 
         # Get actual hip angles considering the yaw joint orientation
-        hip_roll = (pi/4) - (sign * asin(m.m[1,2])) #Add pi/4 due to 45deg rotation
-        hip_pitch = - atan2(m.m[0,2],m.m[2,2])
-        hip_yaw = sign * atan2(m.m[1,0],m.m[1,1])
+        hip_roll = (pi/4) - (sign * np.arcsin(np.clip(m12, -1, 1))) #Add pi/4 due to 45deg rotation
+        hip_pitch = - np.arctan2(m02, m22)
+        hip_yaw = sign * np.arctan2(m10, m11)
 
         # Convert rad to deg
-        values = np.array([hip_yaw,hip_roll,hip_pitch,-knee_angle,foot_pitch,foot_roll]) * 57.2957795 #rad to deg
+        values = np.array((hip_yaw, hip_roll, hip_pitch, -knee_angle, foot_pitch, foot_roll)).T * 57.2957795 #rad to deg
 
         # Set feet rotation bias (based on vertical pose, or dynamic_pose)
-        values[4] -= foot_ori3d[1]
-        values[5] -= foot_ori3d[0] * sign
-
-        indices = [2,4,6,8,10,12] if is_left else [3,5,7,9,11,13]
+        values[:,4] -= ori_y
+        values[:,5] -= ori_x * sign
 
         if dynamic_pose:
 
-            # Rotation of torso in relation to foot
-            m : Matrix_3x3 = Matrix_3x3.from_rotation_deg((self.robot.imu_torso_roll, self.robot.imu_torso_pitch, 0))
-            m.rotate_z_deg(foot_ori3d[2], True)
+            # Rotation of torso in relation to foot: Ry(imu pitch) * Rx(imu roll) * Rz(foot yaw), last row
+            imu_roll, imu_pitch = self.robot.imu_torso_roll * (pi/180), self.robot.imu_torso_pitch * (pi/180)
+            r20, r21, r22 = -sin(imu_pitch), cos(imu_pitch) * sin(imu_roll), cos(imu_pitch) * cos(imu_roll)
+            m20 = r20 * cz + r21 * sz
+            m21 = r21 * cz - r20 * sz
 
-            roll =  m.get_roll_deg()
-            pitch = m.get_pitch_deg()
+            roll = np.where((m21 == 0) & (r22 == 0), 180, np.arctan2(m21, r22) * 180 / pi)
+            pitch = np.arctan2(-m20, np.sqrt(m21*m21 + r22*r22)) * 180 / pi
 
             # Simple balance algorithm
             correction = 1 #correction to motivate a vertical torso (in degrees)
-            roll  = 0 if abs(roll)  < correction else roll  - np.copysign(correction,roll)
-            pitch = 0 if abs(pitch) < correction else pitch - np.copysign(correction,pitch)
-     
-            values[4] += pitch
-            values[5] += roll * sign
+            roll  = np.where(np.abs(roll)  < correction, 0, roll  - np.copysign(correction,roll))
+            pitch = np.where(np.abs(pitch) < correction, 0, pitch - np.copysign(correction,pitch))
 
+            values[:,4] += pitch
+            values[:,5] += roll * sign
 
-        # Check and limit range of joints
-        for i in range(len(indices)):
-            if values[i] < self.robot.joints_info[indices[i]].min or values[i] > self.robot.joints_info[indices[i]].max: 
-                error_codes.append(indices[i])
-                values[i] = np.clip(values[i], self.robot.joints_info[indices[i]].min, self.robot.joints_info[indices[i]].max)
 
+        # Check and limit range of joints
+        joints_min, joints_max = self.legs_min[is_left.astype(int)], self.legs_max[is_left.astype(int)]
+        out_of_range = (values < joints_min) | (values > joints_max)
+        np.clip(values, joints_min, joints_max, out=values)
 
-        return indices, values, error_codes
-
+        return values, unreachable, out_of_range
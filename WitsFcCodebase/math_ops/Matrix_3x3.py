@@ -1,4 +1,4 @@
-from math import asin, atan2, pi, sqrt
+from math import asin, atan2, cos, pi, sin, sqrt
 import numpy as np
 
 class Matrix_3x3():
@@ -346,5 +346,42 @@ class Matrix_3x3():
             return self
         else:                       # multiplication by matrix, return new Matrix_3x3
             return Matrix_3x3(np.matmul(a, b))
-    
 
+
+    #------------------ Allocation-free kernels (results are written to a preallocated `out`, which is also returned)
+    # np.dot is used when possible, since np.matmul allocates a temporary iterator (np.dot requires a contiguous output)
+
+    @staticmethod
+    def multiply_into(a:'Matrix_3x3', b:'Matrix_3x3', out:'Matrix_3x3'):
+        ''' out = a * b   (`out` must not be `a` or `b`) '''
+        if out.m.flags.c_contiguous:
+            np.dot(a.m, b.m, out=out.m)
+        else:
+            np.matmul(a.m, b.m, out=out.m)
+        return out
+
+    @staticmethod
+    def multiply_vec_into(a:'Matrix_3x3', vec, out):
+        ''' out = a * vec   (`vec` and `out` are 3D vectors, `out` may be `vec`, computed with Python floats) '''
+        (r00,r01,r02), (r10,r11,r12), (r20,r21,r22) = a.m.tolist()
+        v0, v1, v2 = np.asarray(vec).tolist()
+        out[0] = r00*v0 + r01*v1 + r02*v2
+        out[1] = r10*v0 + r11*v1 + r12*v2
+        out[2] = r20*v0 + r21*v1 + r22*v2
+        return out
+
+    @staticmethod
+    def from_rotation_deg_into(euler_vec, out:'Matrix_3x3'):
+        '''
+        Equivalent to `Matrix_3x3.from_rotation_deg(euler_vec)`, written to `out`
+        Rotation order: RotZ*RotY*RotX
+        '''
+        x = euler_vec[0] * (pi/180)
+        y = euler_vec[1] * (pi/180)
+        z = euler_vec[2] * (pi/180)
+        cx, sx, cy, sy, cz, sz = cos(x), sin(x), cos(y), sin(y), cos(z), sin(z)
+        m = out.m
+        m[0,0] = cz*cy; m[0,1] = cz*sy*sx - sz*cx; m[0,2] = cz*sy*cx + sz*sx
+        m[1,0] = sz*cy; m[1,1] = sz*sy*sx + cz*cx; m[1,2] = sz*sy*cx - cz*sx
+        m[2,0] = -sy;   m[2,1] = cy*sx;            m[2,2] = cy*cx
+        return out
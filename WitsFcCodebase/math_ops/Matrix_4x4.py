@@ -122,7 +122,7 @@ class Matrix_4x4():
     
     def get_inclination_deg(self):
         ''' Get inclination of z-axis in relation to reference z-axis '''
-        return 90 - (asin(np.clip(self.m[2,2],-1,1)) * 180 / pi)
+        return 90 - (asin(min(max(self.m[2,2],-1),1)) * 180 / pi) # (np.clip is much slower for scalars)
 
     def rotate_deg(self, rotation_vec, rotation_deg, in_place=False):
         '''
@@ -437,4 +437,62 @@ class Matrix_4x4():
         if is_spherical and mat.ndim == 1: mat = M.deg_sph2cart(mat)
         return self.multiply(mat,False)
 
-    
\ No newline at end of file
+
+    #------------------ Allocation-free kernels (results are written to a preallocated `out`, which is also returned)
+    # np.dot is used when possible, since np.matmul allocates a temporary iterator (np.dot requires a contiguous output)
+    # Single rigid transformations are computed with Python floats, which is faster than numpy calls on 3x3 slices
+
+    @staticmethod
+    def multiply_into(a:'Matrix_4x4', b:'Matrix_4x4', out:'Matrix_4x4'):
+        ''' out = a * b   (`out` must not be `a` or `b`) '''
+        if out.m.flags.c_contiguous:
+            np.dot(a.m, b.m, out=out.m)
+        else:
+            np.matmul(a.m, b.m, out=out.m)
+        return out
+
+    @staticmethod
+    def invert_rigid_into(a:'Matrix_4x4', out:'Matrix_4x4'):
+        '''
+        out = a^-1, assuming `a` is a rigid transformation (rotation + translation)
+        The rotation is inverted through its transpose: [R t]^-1 = [R^T -R^T*t]   (`out` may be `a`)
+        '''
+        (r00,r01,r02,x), (r10,r11,r12,y), (r20,r21,r22,z), _ = a.m.tolist()
+        out.m[:] = ((r00, r10, r20, -(r00*x + r10*y + r20*z)),
+                    (r01, r11, r21, -(r01*x + r11*y + r21*z)),
+                    (r02, r12, r22, -(r02*x + r12*y + r22*z)),
+                    (0,   0,   0,   1))
+        return out
+
+    @staticmethod
+    def transform_point_into(a:'Matrix_4x4', vec, out):
+        ''' out = a * vec   (`vec` and `out` are 3D vectors, `out` may be `vec`) '''
+        (r00,r01,r02,x), (r10,r11,r12,y), (r20,r21,r22,z), _ = a.m.tolist()
+        v0, v1, v2 = np.asarray(vec).tolist()
+        out[0] = r00*v0 + r01*v1 + r02*v2 + x
+        out[1] = r10*v0 + r11*v1 + r12*v2 + y
+        out[2] = r20*v0 + r21*v1 + r22*v2 + z
+        return out
+
+    @staticmethod
+    def transform_points_batch(a:'Matrix_4x4', points, out=None):
+        '''
+        Transform a batch of 3D points with a single matrix multiplication
+
+        Parameters
+        ----------
+        a : `Matrix_4x4`
+            transformation matrix
+        points : ndarray
+            array of 3D points with shape (N,3)
+        out : ndarray, optional
+            preallocated output array with shape (N,3) (must not be `points`), a new array is returned if `out` is None
+
+        Returns
+        -------
+        out : ndarray
+            transformed points with shape (N,3)
+        '''
+        out = np.matmul(points, a.m[:3,:3].T, out=out)
+        out += a.m[:3,3]
+        return out
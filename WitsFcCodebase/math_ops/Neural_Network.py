@@ -25,4 +25,98 @@ def run_mlp(obs, weights, activation_function="tanh"):
             np.tanh(out, out=out) 
         elif activation_function != "none":
             raise NotImplementedError
-    return np.matmul(weights[-1][1],out) + weights[-1][0] # final layer
\ No newline at end of file
+    return np.matmul(weights[-1][1],out) + weights[-1][0] # final layer
+
+class Policy():
+    '''
+    Multilayer perceptron built once from a list of MLP layers (equivalent to `run_mlp`)
+
+    The weights are converted to contiguous float32 arrays when the policy is created, and all
+    intermediate activations are written to preallocated buffers, so each call allocates nothing.
+    A batch of observations (e.g. one per teammate) is evaluated with a single matrix product per layer.
+    The returned array is the output buffer of the last layer, so it is overwritten by the next call with the same
+    batch size (copy it to keep it). Buffers are kept for single observations and for the last batch size only.
+    '''
+
+    def __init__(self, weights, activation_function="tanh") -> None:
+        '''
+        Parameters
+        ----------
+        weights : list
+            list of MLP layers of type (bias, kernel), as used by `run_mlp` (extra layer items are ignored)
+        activation_function : str
+            activation function for hidden layers
+            set to "none" to disable
+        '''
+        if activation_function not in ("tanh", "none"):
+            raise NotImplementedError
+
+        self.biases  = [np.ascontiguousarray(w[0], np.float32) for w in weights]
+        self.kernels = [np.ascontiguousarray(w[1], np.float32) for w in weights]
+        self.use_tanh = activation_function == "tanh"
+        self.input_size = self.kernels[0].shape[1]
+        self.output_size = self.kernels[-1].shape[0]
+        self._single_layers = None # (input buffer, list of layers) for a single observation
+        self._batch_layers = None  # (input buffer, list of layers) for the last batch size
+        self._batch_size = None
+
+
+    def _get_layers(self, batch_size):
+        '''
+        Returns the input buffer and the layers for a given batch size, as a list of (kernel, bias, output buffer, is hidden)
+        For batches, the kernel is transposed (view) and the bias is tiled, so that no call needs to broadcast or allocate
+        '''
+        if batch_size is None:
+            if self._single_layers is None:
+                input_buf = np.empty(self.input_size, np.float32)
+                layers = [(k, b, np.empty(len(b), np.float32), i < len(self.biases)-1) 
+                          for i, (k, b) in enumerate(zip(self.kernels, self.biases))]
+                self._single_layers = (input_buf, layers)
+            return self._single_layers
+
+        if self._batch_size != batch_size: # replace the buffers of the previous batch size (if any)
+            input_buf = np.empty((batch_size, self.input_size), np.float32)
+            layers = [(k.T, np.tile(b, (batch_size,1)), np.empty((batch_size, len(b)), np.float32), i < len(self.biases)-1) 
+                      for i, (k, b) in enumerate(zip(self.kernels, self.biases))]
+            self._batch_layers = (input_buf, layers)
+            self._batch_size = batch_size
+        return self._batch_layers
+
+
+    def forward(self, obs):
+        '''
+        Run multilayer perceptron for a single observation or a batch of observations
+        
+        Parameters
+        ----------
+        obs : ndarray
+            neural network inputs, with shape (input_size,) or (batch_size, input_size)
+            float32 arrays are used directly, other types are converted into an input buffer
+
+        Returns
+        -------
+        out : ndarray
+            float32 array with shape (output_size,) or (batch_size, output_size)
+            it is an internal buffer, overwritten by the next call with the same batch size (copy it to keep it),
+            and released when a batch of a different size is evaluated
+        '''
+        is_batch = obs.ndim == 2
+        input_buf, layers = self._get_layers(len(obs) if is_batch else None)
+
+        if obs.dtype != np.float32:
+            np.copyto(input_buf, obs)
+            obs = input_buf
+
+        out = obs
+        for kernel, bias, buf, is_hidden in layers:
+            if is_batch:
+                np.dot(out, kernel, out=buf) # (batch,in) x (in,units)
+            else:
+                np.dot(kernel, out, out=buf) # (units,in) x (in,)
+            np.add(buf, bias, out=buf)
+            if is_hidden and self.use_tanh:
+                np.tanh(buf, out=buf)
+            out = buf
+        return out
+
+    __call__ = forward
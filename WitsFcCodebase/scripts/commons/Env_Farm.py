@@ -0,0 +1,330 @@
+from multiprocessing import resource_tracker, shared_memory
+from scripts.commons.Server import Server
+from scripts.commons.UI import UI
+from stable_baselines3.common.vec_env import VecEnv
+from time import perf_counter
+import multiprocessing as mp
+import numpy as np
+import os
+
+
+class Env_Farm(VecEnv):
+    '''
+    Vectorized environment where each environment runs in its own worker process, connected to its own rcssserver3d
+    (drop-in replacement for SubprocVecEnv, see the `train` method of the gyms)
+
+    - Each environment is allocated a server of a `Server` pool. If a worker crashes or gets stuck, its server is
+      recycled (restarted if it is not responding), the worker is restarted and the episode of that environment is
+      truncated (the other environments are not affected)
+    - Observations, actions, rewards and dones are exchanged through shared memory, and each command is synchronized
+      with two semaphores per worker (only non-empty `info` dicts and get_attr/set_attr/env_method calls are pickled)
+    - Throughput metrics: env-steps per second (total and per core) and time spent inside each environment (see `print_stats`)
+
+    Workers are forked, so `env_fn` can be a closure (each environment is only created inside its worker)
+    '''
+    STEP, RESET, CONTROL, CLOSE = range(4) # worker commands
+    STEP_TIMEOUT = 60                      # maximum time (s) to execute a command before the worker is considered stuck
+    MAX_RECOVERIES = 3                     # maximum consecutive restarts of a worker before giving up
+
+    def __init__(self, env_fn, n_envs:int, servers:Server, pin=False) -> None:
+        '''
+        Parameters
+        ----------
+        env_fn : Callable
+            env_fn(server_p, monitor_p) creates an environment (gym.Env) connected to the server with the given ports
+        n_envs : int
+            number of environments (each one is allocated a server of `servers`)
+        servers : Server
+            server pool
+        pin : bool
+            pin each worker to a CPU core (round robin), default is False (the OS balances workers and servers among all cores)
+        '''
+        self.env_fn = env_fn
+        self.servers = servers
+        self.server_ids = [servers.allocate() for _ in range(n_envs)]
+        cores = sorted(os.sched_getaffinity(0))
+        self.n_cores = len(cores) # cores shared by all workers and servers
+        self.cores = [cores[i % len(cores)] if pin else None for i in range(n_envs)]
+        self.restarts = [0] * n_envs
+
+        self.ctx = mp.get_context("fork")
+        self.go = [None] * n_envs   # semaphores released by the main process when there is a new command
+        self.done = [None] * n_envs # semaphores released by the worker when the command is done
+        self.pipes = [None] * n_envs
+        self.workers = [None] * n_envs
+        self.shm = None
+
+        # Workers must share the resource tracker of this process (otherwise, the tracker of a worker that exits would
+        # destroy the shared memory, which is only destroyed by this process, see `close`)
+        resource_tracker.ensure_running()
+        for i in range(n_envs):
+            self._start(i)
+
+        # The first worker reports the spaces, then the shared memory is created and its layout is sent to all workers
+        observation_space, action_space = self.pipes[0].recv()
+        for p in self.pipes[1:]:
+            p.recv()
+
+        self.layout = [("obs",          (n_envs, *observation_space.shape), observation_space.dtype),
+                       ("terminal_obs", (n_envs, *observation_space.shape), observation_space.dtype),
+                       ("actions",      (n_envs, *action_space.shape),      action_space.dtype),
+                       ("rewards",      (n_envs,), np.float64),
+                       ("dones",        (n_envs,), np.bool_),
+                       ("has_info",     (n_envs,), np.bool_),
+                       ("commands",     (n_envs,), np.int64),
+                       ("env_time",     (n_envs,), np.float64), # time spent inside env.step and env.reset
+                       ("env_steps",    (n_envs,), np.int64)]
+        size = sum(Env_Farm._aligned(np.dtype(d).itemsize * int(np.prod(s))) for _,s,d in self.layout)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.a = Env_Farm._map(self.shm, self.layout)
+        self.a["env_time"][:] = 0
+        self.a["env_steps"][:] = 0
+
+        for p in self.pipes:
+            p.send((self.shm.name, self.layout))
+
+        self.steps = 0         # number of calls to step_wait
+        self.start_time = None # time of the first step
+        self.last_obs = None   # observations returned by the last call to reset or step_wait
+        self.closed = False
+        super().__init__(n_envs, observation_space, action_space)
+
+
+    @staticmethod
+    def _aligned(nbytes):
+        return (nbytes + 63) // 64 * 64 # (each array starts at a multiple of 64 bytes, to avoid sharing cache lines)
+
+    @staticmethod
+    def _map(shm, layout) -> dict:
+        ''' Numpy arrays inside the shared memory block, key: name '''
+        arrays, offset = dict(), 0
+        for name, shape, dtype in layout:
+            arrays[name] = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            offset += Env_Farm._aligned(arrays[name].nbytes)
+        return arrays
+
+
+    def _start(self, i):
+        '''
+        Start worker `i` (a restarted worker receives the shared memory layout as an argument)
+        The semaphores are always new: a worker that died may have left tokens that were released but not acquired
+        (e.g. a command sent to a worker that was killed while waiting, or a stuck worker that finished just before being killed)
+        '''
+        self.go[i], self.done[i] = self.ctx.Semaphore(0), self.ctx.Semaphore(0)
+        parent, child = self.ctx.Pipe()
+        layout = None if self.shm is None else (self.shm.name, self.layout)
+        self.pipes[i] = parent
+        self.workers[i] = self.ctx.Process(target=Env_Farm._worker, daemon=True,
+            args=(i, self.env_fn, self.servers.ports[self.server_ids[i]], self.cores[i], child, self.go[i], self.done[i], layout))
+        self.workers[i].start()
+        child.close()
+
+
+    @staticmethod
+    def _worker(i, env_fn, ports, core, pipe, go, done, layout):
+        ''' Worker process: create the environment and execute the commands of the main process '''
+        if core is not None:
+            os.sched_setaffinity(0, {core})
+
+        env = env_fn(*ports)
+
+        if layout is None: # first start: report the spaces and wait for the shared memory
+            pipe.send((env.observation_space, env.action_space))
+            layout = pipe.recv()
+            restarted = False
+        else:
+            restarted = True
+
+        shm = shared_memory.SharedMemory(name=layout[0])
+        a = Env_Farm._map(shm, layout[1])
+        obs, actions, rewards, dones, has_info = a["obs"], a["actions"], a["rewards"], a["dones"], a["has_info"]
+        commands, env_time, env_steps = a["commands"], a["env_time"], a["env_steps"]
+
+        if restarted: # the main process is waiting for a new observation (see _recover)
+            obs[i] = env.reset()
+            done.release()
+
+        while True:
+            go.acquire()
+            cmd = commands[i]
+            t = perf_counter()
+
+            if cmd == Env_Farm.STEP:
+                o, rewards[i], d, info = env.step(actions[i])
+                if d: # automatic reset (the last observation is kept as the terminal observation)
+                    a["terminal_obs"][i] = o
+                    o = env.reset()
+                obs[i] = o
+                dones[i] = d
+                has_info[i] = bool(info)
+                if info: pipe.send(info)
+                env_steps[i] += 1
+            elif cmd == Env_Farm.RESET:
+                obs[i] = env.reset()
+            elif cmd == Env_Farm.CONTROL:
+                method, name, args, kwargs = pipe.recv()
+                if method == "get_attr":
+                    pipe.send(getattr(env, name))
+                elif method == "set_attr":
+                    pipe.send(setattr(env, name, args))
+                elif method == "env_is_wrapped":
+                    pipe.send(False) # (environments are not wrapped by Env_Farm)
+                else: # env_method
+                    pipe.send(getattr(env, name)(*args, **kwargs))
+            else: # CLOSE
+                env.close()
+                del obs, actions, rewards, dones, has_info, commands, env_time, env_steps, a
+                shm.close()
+                done.release()
+                return
+
+            env_time[i] += perf_counter() - t
+            done.release()
+
+
+    def _send(self, cmd, indices):
+        for i in indices:
+            self.a["commands"][i] = cmd
+            self.go[i].release()
+
+    def _wait(self, i) -> bool:
+        ''' Wait until worker `i` executes its command, returns False if it crashed or got stuck (it is then restarted) '''
+        waited = 0
+        while not self.done[i].acquire(timeout=0.5):
+            waited += 0.5
+            if not self.workers[i].is_alive() or waited >= Env_Farm.STEP_TIMEOUT:
+                self._recover(i, stuck=self.workers[i].is_alive())
+                return False
+        return True
+
+    def _recover(self, i, stuck):
+        '''
+        Restart worker `i`, after restarting its server if it is not responding (or if the worker got stuck, which is
+        usually caused by a server that stopped sending messages but still accepts connections)
+        '''
+        for attempt in range(Env_Farm.MAX_RECOVERIES):
+            w, s = self.workers[i], self.server_ids[i]
+            reason = "got stuck" if stuck else f"exited with code {w.exitcode}"
+            print(f"Env_Farm: worker {i} (PID:{w.pid}, server port:{self.servers.ports[s][0]}) {reason}, restarting")
+            if w.is_alive():
+                w.kill()
+            w.join()
+            self.pipes[i].close()
+
+            if stuck:
+                self.servers.restart(s)
+            else:
+                self.servers.check([s])
+
+            self.restarts[i] += 1
+            self._start(i)
+            if self.done[i].acquire(timeout=Env_Farm.STEP_TIMEOUT): # the restarted worker resets its environment
+                return
+            stuck = self.workers[i].is_alive()
+
+        raise RuntimeError(f"Env_Farm: worker {i} could not be restarted after {Env_Farm.MAX_RECOVERIES} attempts")
+
+
+    def reset(self):
+        self._send(Env_Farm.RESET, range(self.num_envs))
+        for i in range(self.num_envs):
+            self._wait(i) # (a restarted worker also writes a new observation)
+        self.last_obs = self.a["obs"].copy()
+        return self.last_obs
+
+    def step_async(self, actions):
+        if self.start_time is None:
+            self.start_time = perf_counter()
+        self.a["actions"][:] = actions
+        self._send(Env_Farm.STEP, range(self.num_envs))
+
+    def step_wait(self):
+        a, infos = self.a, []
+        for i in range(self.num_envs):
+            if self._wait(i):
+                info = self.pipes[i].recv() if a["has_info"][i] else {}
+            else: # the episode is truncated, the terminal observation is the last observation before the crash
+                a["terminal_obs"][i] = self.last_obs[i]
+                a["rewards"][i], a["dones"][i] = 0, True
+                info = {"TimeLimit.truncated": True}
+            if a["dones"][i]:
+                info["terminal_observation"] = a["terminal_obs"][i].copy()
+            infos.append(info)
+        self.steps += 1
+        self.last_obs = a["obs"].copy()
+        return self.last_obs, a["rewards"].copy(), a["dones"].copy(), infos
+
+
+    def _control(self, method, name, args, kwargs, indices):
+        indices = self._get_indices(indices)
+        for i in indices:
+            self.pipes[i].send((method, name, args, kwargs))
+        self._send(Env_Farm.CONTROL, indices)
+        results = []
+        for i in indices:
+            results.append(self.pipes[i].recv())
+            self._wait(i)
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        return self._control("get_attr", attr_name, None, None, indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._control("set_attr", attr_name, value, None, indices)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._control("env_method", method_name, method_args, method_kwargs, indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._control("env_is_wrapped", None, None, None, indices)
+
+    def seed(self, seed=None):
+        return [self._control("env_method", "seed", (None if seed is None else seed + i,), {}, [i])[0] for i in range(self.num_envs)]
+
+    def get_images(self):
+        return [None] * self.num_envs
+
+
+    def get_throughput(self) -> dict:
+        '''
+        Throughput since the first step
+
+        Returns
+        -------
+        throughput : dict
+            env_steps_per_s: environment steps per second (all environments)
+            env_steps_per_s_per_core: the same, divided by the number of available cores (shared by workers and servers)
+            env_time_per_step_ms: average time spent inside env.step (and env.reset) by each environment
+            restarts: number of restarts of each worker
+        '''
+        elapsed = 0 if self.start_time is None else perf_counter() - self.start_time
+        env_steps = self.a["env_steps"]
+        total = int(env_steps.sum())
+        return {"env_steps_per_s": total / elapsed if elapsed > 0 else 0,
+                "env_steps_per_s_per_core": total / elapsed / self.n_cores if elapsed > 0 else 0,
+                "env_time_per_step_ms": (self.a["env_time"] * 1000 / np.maximum(env_steps, 1)).tolist(),
+                "restarts": list(self.restarts)}
+
+    def print_stats(self):
+        ''' Print throughput and the stats of each environment '''
+        t = self.get_throughput()
+        table = [(i, self.workers[i].pid, self.servers.ports[s][0], int(self.a["env_steps"][i]), f"{t['env_time_per_step_ms'][i]:.2f}",
+                  self.restarts[i], self.servers.restarts[s]) for i, s in enumerate(self.server_ids)]
+        UI.print_table([[row[c] for row in table] for c in range(7)],
+                       ["Env", "PID", "Port", "Steps", "ms/step", "Worker restarts", "Server restarts"], numbering=[False]*7)
+        print(f"Env_Farm: {t['env_steps_per_s']:.1f} env-steps/s, {t['env_steps_per_s_per_core']:.1f} env-steps/s per core ({self.n_cores} cores)")
+
+
+    def close(self):
+        if self.closed: return
+        self._send(Env_Farm.CLOSE, range(self.num_envs))
+        for i, w in enumerate(self.workers):
+            if not self.done[i].acquire(timeout=5):
+                w.kill()
+            w.join()
+            self.pipes[i].close()
+            self.servers.release(self.server_ids[i])
+        del self.a
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
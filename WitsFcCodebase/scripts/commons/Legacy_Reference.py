@@ -0,0 +1,841 @@
+'''
+Previous implementations of optimized methods, used by scripts/utils/Benchmarks.py to validate the current
+implementations (same results for the same inputs) and to measure the speedup
+Each class extends the production class with the previous implementation, so this module is not used by the agents
+'''
+from communication.Radio import Radio
+from communication.World_Parser import World_Parser
+from math import asin, atan, atan2, pi, sqrt
+from math_ops.Inverse_Kinematics import Inverse_Kinematics
+from math_ops.Math_Ops import Math_Ops as M
+from math_ops.Matrix_3x3 import Matrix_3x3
+from math_ops.Matrix_4x4 import Matrix_4x4
+from typing import List
+from world.commons.Other_Robot import Other_Robot
+from world.Robot import Robot
+from world.World import World
+import math
+import numpy as np
+
+
+class World_Parser_Legacy(World_Parser):
+    ''' World_Parser with the byte-by-byte parser (`parse_legacy`) '''
+
+    def __init__(self, world:World, hear_callback) -> None:
+        super().__init__(world, hear_callback)
+        self.depth = None
+
+    def find_non_digit(self,start):
+        while True:
+            if (self.exp[start] < ord('0') or self.exp[start] > ord('9')) and self.exp[start] != ord('.'): return start
+            start+=1
+
+    def find_char(self,start,char):
+        while True:
+            if self.exp[start] == char : return start
+            start+=1
+
+    def read_float(self, start):
+        if self.exp[start:start+3] == b'nan': return float('nan'), start+3 #handle nan values (they exist)
+        end = self.find_non_digit(start+1) #we assume the first one is a digit or minus sign
+        try:
+            retval = float(self.exp[start:end])
+        except:
+            self.world.log(f"{self.LOG_PREFIX}String to float conversion failed: {self.exp[start:end]} at msg[{start},{end}], \nMsg: {self.exp.decode()}")
+            retval = 0
+        return retval, end
+
+    def read_int(self, start):
+        end = self.find_non_digit(start+1) #we assume the first one is a digit or minus sign
+        return int(self.exp[start:end]), end
+
+    def read_bytes(self, start):
+        end = start
+        while True:
+            if self.exp[end] == ord(' ') or self.exp[end] == ord(')'): break
+            end+=1
+
+        return self.exp[start:end], end
+
+    def read_str(self, start):
+        b, end = self.read_bytes(start)
+        return b.decode(), end  
+
+    def get_next_tag(self, start):
+        min_depth = self.depth
+        while True:
+            if self.exp[start] == ord(")") :  #monitor xml element depth
+                self.depth -= 1
+                if min_depth > self.depth: min_depth = self.depth
+            elif self.exp[start] == ord("(") : break
+            start+=1
+            if start >= len(self.exp): return None, start, 0
+
+        self.depth += 1
+        start += 1
+        end = self.find_char(start, ord(" ")) 
+        return self.exp[start:end], end, min_depth
+
+    def parse_legacy(self, exp):
+        '''
+        Reference parser that walks the message byte by byte (the World_Parser.parse before the tokenizer)
+        '''
+
+        self.exp = exp #used by other member functions
+        self.depth = 0 #xml element depth
+        self._new_step()
+
+        tag, end, _ = self.get_next_tag(0)
+
+        while end < len(exp):
+
+            if tag==b'time':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break 
+
+                    if tag==b'now':
+                        #last_time = self.world.time_server
+                        self.world.time_server, end = self.read_float(end+1)
+                        
+                        #Test server time reliability
+                        #increment = self.world.time_server - last_time
+                        #if increment < 0.019: print ("down",last_time,self.world.time_server)
+                        #if increment > 0.021: print ("up",last_time,self.world.time_server)
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'time': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'GS':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    if tag==b'unum':
+                        _, end = self.read_int(end+1) #We already know our unum
+                    elif tag==b'team':
+                        aux, end = self.read_str(end+1)
+                        is_left = bool(aux == "left")
+                        if self.world.team_side_is_left != is_left:
+                            self.world.team_side_is_left = is_left
+                            self.play_mode_to_id = self.LEFT_PLAY_MODE_TO_ID if is_left else self.RIGHT_PLAY_MODE_TO_ID
+                            self.world.draw.set_team_side(not is_left)
+                            self.world.team_draw.set_team_side(not is_left)
+                    elif tag==b'sl':
+                        if self.world.team_side_is_left:
+                            self.world.goals_scored, end  = self.read_int(end+1)
+                        else:
+                            self.world.goals_conceded, end  = self.read_int(end+1)
+                    elif tag==b'sr':
+                        if self.world.team_side_is_left:
+                            self.world.goals_conceded, end  = self.read_int(end+1)
+                        else:
+                            self.world.goals_scored, end  = self.read_int(end+1)
+                    elif tag==b't':
+                        self.world.time_game, end = self.read_float(end+1)
+                    elif tag==b'pm':
+                        aux, end = self.read_str(end+1)
+                        if self.play_mode_to_id is not None:
+                            self.world.play_mode = self.play_mode_to_id[aux]
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GS': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'GYR':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    '''
+                    The gyroscope measures the robot's torso angular velocity (rotation rate vector)
+                    The angular velocity's orientation is given by the right-hand rule.
+
+                    Original reference frame:
+                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+
+                    New reference frame:
+                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+
+                    '''
+
+                    if tag==b'n':
+                        pass
+                    elif tag==b'rt':
+                        self.world.robot.gyro[1], end = self.read_float(end+1)
+                        self.world.robot.gyro[0], end = self.read_float(end+1)
+                        self.world.robot.gyro[2], end = self.read_float(end+1)
+                        self.world.robot.gyro[1] *= -1
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'GYR': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'ACC':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    '''
+                    The accelerometer measures the acceleration relative to freefall. It will read zero during any type of free fall.
+                    When at rest relative to the Earth's surface, it will indicate an upwards acceleration of 9.81m/s^2 (in SimSpark).
+
+                    Original reference frame:
+                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+
+                    New reference frame:
+                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+                    '''
+
+                    if tag==b'n':
+                        pass
+                    elif tag==b'a':
+                        self.world.robot.acc[1], end = self.read_float(end+1)
+                        self.world.robot.acc[0], end = self.read_float(end+1)
+                        self.world.robot.acc[2], end = self.read_float(end+1)
+                        self.world.robot.acc[1] *= -1
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'ACC': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'HJ':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    if tag==b'n':
+                        joint_name, end = self.read_str(end+1)
+                        joint_index = Robot.MAP_PERCEPTOR_TO_INDEX[joint_name]
+                    elif tag==b'ax':
+                        joint_angle, end = self.read_float(end+1)
+
+                        #Fix symmetry issues 2/4 (perceptors)
+                        if joint_name in Robot.FIX_PERCEPTOR_SET: joint_angle = -joint_angle
+
+                        old_angle = self.world.robot.joints_position[joint_index] 
+                        self.world.robot.joints_speed[joint_index] = (joint_angle - old_angle) / World.STEPTIME * math.pi / 180
+                        self.world.robot.joints_position[joint_index] = joint_angle
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'HJ': {tag} at {end}, \nMsg: {exp.decode()}")
+
+            elif tag==b'FRP':
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    '''
+                    The reference frame is used for the contact point and force vector applied to that point
+                        Note: The force vector is applied to the foot, so it usually points up
+
+                    Original reference frame:
+                        X:left(-)/right(+)      Y:back(-)/front(+)      Z:down(-)/up(+)
+
+                    New reference frame:
+                        X:back(-)/front(+)      Y:right(-)/left(+)      Z:down(-)/up(+)
+
+                    '''
+
+                    if tag==b'n':
+                        foot_toe_id, end = self.read_str(end+1)
+                        self.world.robot.frp[foot_toe_id] = foot_toe_ref = np.empty(6)
+                        self.world.robot.feet_toes_last_touch[foot_toe_id] = self.world.time_local_ms
+                        self.world.robot.feet_toes_are_touching[foot_toe_id] = True
+                    elif tag==b'c':
+                        foot_toe_ref[1], end = self.read_float(end+1)
+                        foot_toe_ref[0], end = self.read_float(end+1)
+                        foot_toe_ref[2], end = self.read_float(end+1)
+                        foot_toe_ref[1] *= -1
+                    elif tag==b'f':
+                        foot_toe_ref[4], end = self.read_float(end+1)
+                        foot_toe_ref[3], end = self.read_float(end+1)
+                        foot_toe_ref[5], end = self.read_float(end+1)
+                        foot_toe_ref[4] *= -1
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'FRP': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'See':
+                self.world.vision_is_up_to_date = True
+                self.world.vision_last_update = self.world.time_local_ms
+
+                while True:
+                    tag, end, min_depth = self.get_next_tag(end)
+                    if min_depth == 0: break
+
+                    tag_bytes = bytes(tag) #since bytearray is not hashable, it cannot be used as key for dictionaries
+
+                    if tag==b'G1R' or tag==b'G2R' or tag==b'G1L' or tag==b'G2L':
+                        _, end, _ = self.get_next_tag(end)
+
+                        c1, end = self.read_float(end+1)
+                        c2, end = self.read_float(end+1)
+                        c3, end = self.read_float(end+1)
+
+                        aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
+                        self.world.flags_posts[aux] = (c1,c2,c3)
+
+                    elif tag==b'F1R' or tag==b'F2R' or tag==b'F1L' or tag==b'F2L':
+                        _, end, _ = self.get_next_tag(end)
+
+                        c1, end = self.read_float(end+1)
+                        c2, end = self.read_float(end+1)
+                        c3, end = self.read_float(end+1)
+
+                        aux = self.LEFT_SIDE_FLAGS[tag_bytes] if self.world.team_side_is_left else self.RIGHT_SIDE_FLAGS[tag_bytes]
+                        self.world.flags_corners[aux] = (c1,c2,c3)
+
+                    elif tag==b'B':
+                        _, end, _ = self.get_next_tag(end)
+
+                        self.world.ball_rel_head_sph_pos[0], end = self.read_float(end+1)
+                        self.world.ball_rel_head_sph_pos[1], end = self.read_float(end+1)
+                        self.world.ball_rel_head_sph_pos[2], end = self.read_float(end+1)
+                        self.world.ball_rel_head_cart_pos = M.deg_sph2cart(self.world.ball_rel_head_sph_pos)
+                        self.world.ball_is_visible = True
+                        self.world.ball_last_seen = self.world.time_local_ms
+
+                    elif tag==b'mypos':
+
+                        self.world.robot.cheat_abs_pos[0], end = self.read_float(end+1)
+                        self.world.robot.cheat_abs_pos[1], end = self.read_float(end+1)
+                        self.world.robot.cheat_abs_pos[2], end = self.read_float(end+1)
+
+                    elif tag==b'myorien':
+
+                        self.world.robot.cheat_ori, end = self.read_float(end+1)
+
+                    elif tag==b'ballpos':
+
+                        c1, end = self.read_float(end+1)
+                        c2, end = self.read_float(end+1)
+                        c3, end = self.read_float(end+1)
+
+                        self.world.ball_cheat_abs_vel[0] = (c1 - self.world.ball_cheat_abs_pos[0]) / World.VISUALSTEP
+                        self.world.ball_cheat_abs_vel[1] = (c2 - self.world.ball_cheat_abs_pos[1]) / World.VISUALSTEP
+                        self.world.ball_cheat_abs_vel[2] = (c3 - self.world.ball_cheat_abs_pos[2]) / World.VISUALSTEP
+
+                        self.world.ball_cheat_abs_pos[0] = c1
+                        self.world.ball_cheat_abs_pos[1] = c2
+                        self.world.ball_cheat_abs_pos[2] = c3
+
+                    elif tag==b'P':
+
+                        while True:
+                            previous_depth = self.depth
+                            previous_end = end
+                            tag, end, min_depth = self.get_next_tag(end)
+                            if min_depth < 2: #if =1 we are still inside 'See', if =0 we are already outside 'See'
+                                end = previous_end #The "P" tag is special because it's the only variable particle inside 'See'
+                                self.depth = previous_depth
+                                break # we restore the previous tag, and let 'See' handle it
+
+                            if tag==b'team':
+                                player_team, end = self.read_str(end+1)
+                                is_teammate = bool(player_team == self.world.team_name)
+                                if self.world.team_name_opponent is None and not is_teammate: #register opponent team name
+                                    self.world.team_name_opponent = player_team
+                            elif tag==b'id':
+                                player_id, end = self.read_int(end+1)
+                                row = player_id-1 if is_teammate else player_id+4
+                                self.world.other_robots.parts_seen[row] = False #reset seen body parts
+                                self.world.other_robots.is_visible[row] = True
+                            elif tag==b'llowerarm' or tag==b'rlowerarm' or tag==b'lfoot' or tag==b'rfoot' or tag==b'head':
+                                part = self.PLAYER_BODY_PARTS[bytes(tag)]
+                                _, end, _ = self.get_next_tag(end)
+
+                                c1, end = self.read_float(end+1)
+                                c2, end = self.read_float(end+1)
+                                c3, end = self.read_float(end+1)
+
+                                self.world.other_robots.parts_sph_rel_pos[row,part] = (c1,c2,c3)
+                                self.world.other_robots.parts_seen[row,part] = True
+                            else:
+                                self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'P': {tag} at {end}, \nMsg: {exp.decode()}")
+                        
+                    elif tag==b'L':
+                        l = self.world.lines[self.world.line_count]
+                        
+                        _, end, _ = self.get_next_tag(end)
+                        l[0], end = self.read_float(end+1)
+                        l[1], end = self.read_float(end+1)
+                        l[2], end = self.read_float(end+1)
+                        _, end, _ = self.get_next_tag(end)
+                        l[3], end = self.read_float(end+1)
+                        l[4], end = self.read_float(end+1)
+                        l[5], end = self.read_float(end+1)
+
+                        if np.isnan(l).any():
+                            self.world.log(f"{self.LOG_PREFIX}Received field line with NaNs {l}")
+                        else:
+                            self.world.line_count += 1 #accept field line if there are no NaNs
+                        
+                    else:
+                        self.world.log(f"{self.LOG_PREFIX}Unknown tag inside 'see': {tag} at {end}, \nMsg: {exp.decode()}")
+
+
+            elif tag==b'hear':
+
+                team_name, end = self.read_str(end+1)
+
+                if team_name == self.world.team_name:   # discard message if it's not from our team
+                    
+                    timestamp, end = self.read_float(end+1)
+
+                    if self.exp[end+1] == ord('s'):     # this message was sent by oneself
+                        direction, end = "self", end+5
+                    else:                               # this message was sent by teammate
+                        direction, end = self.read_float(end+1)
+
+                    msg, end = self.read_bytes(end+1)
+                    self.hear_callback(msg, direction, timestamp)
+
+
+                tag, end, _ = self.get_next_tag(end)
+
+
+            else:
+                self.world.log(f"{self.LOG_PREFIX}Unknown root tag: {tag} at {end}, \nMsg: {exp.decode()}")
+                tag, end, min_depth = self.get_next_tag(end)
+
+
+class Robot_Legacy(Robot):
+    ''' Robot with the per-joint forward kinematics (`update_pose_legacy`) and command builder (`get_command_legacy`) '''
+
+    def update_pose_legacy(self):
+        ''' Reference forward kinematics, one joint at a time (the Robot.update_pose before batching) '''
+
+        if self.fwd_kinematics_list is None:
+            self._initialize_kinematics()
+
+        for body_part, j, child_body_part in self.fwd_kinematics_list:
+            ji = self.joints_info[j]
+            self.joints_transform[j].m[:] = body_part.transform.m
+            self.joints_transform[j].translate(ji.anchor0_axes, True)
+            child_body_part.transform.m[:] = self.joints_transform[j].m
+            child_body_part.transform.rotate_deg(ji.axes, self.joints_position[j], True)
+            child_body_part.transform.translate(ji.anchor1_axes_neg, True)
+
+        self.rel_cart_CoM_position = np.average([b.transform.get_translation() for b in self.body_parts.values()], 0,
+                                                [b.mass                        for b in self.body_parts.values()])
+
+
+    def get_command_legacy(self) -> bytes:
+        '''
+        Builds commands string from self.joints_target_speed, one joint at a time (the Robot.get_command before Command_Encoder)
+        '''
+        j_speed = self.joints_target_speed * self.FIX_EFFECTOR_MASK #Fix symmetry issues 3/4 (effectors)
+        cmd = "".join(f"({self.joints_info[i].effector} {j_speed[i]:.5f})" for i in range(self.no_of_joints)).encode('utf-8')
+
+        self.joints_target_last_speed = self.joints_target_speed           #1. both point to the same array
+        self.joints_target_speed = np.zeros_like(self.joints_target_speed) #2. create new array for joints_target_speed
+        return cmd
+
+
+class Radio_Legacy(Radio):
+    ''' Radio with the per-player encoder and decoder (`broadcast_legacy`, `receive_legacy`) '''
+
+    def check_broadcast_requirements_legacy(self):
+        '''
+        Check if broadcast group is valid, one player at a time (the Radio.check_broadcast_requirements before batching)
+
+        Returns
+        -------
+        ready : bool
+            True if all requirements are met
+
+        Sequence: g0,g1,g2, ig0,ig1,ig2, iig0,iig1,iig2  (whole cycle: 0.36s)
+            igx  means      'incomplete group', where <=1 element  can be MIA recently
+            iigx means 'very incomplete group', where <=2 elements can be MIA recently
+            Rationale: prevent incomplete messages from monopolizing the broadcast space 
+
+        However:
+        - 1st round: when 0 group  members are missing,          that group will update 3 times every 0.36s
+        - 2nd round: when 1 group  member  is  recently missing, that group will update 2 times every 0.36s
+        - 3rd round: when 2 group  members are recently missing, that group will update 1 time  every 0.36s
+        -            when >2 group members are recently missing, that group will not be updated
+
+        Players that have never been seen or heard are not considered for the 'recently missing'.
+        If there is only 1 group member since the beginning, the respective group can be updated, except in the 1st round.
+        In this way, the 1st round cannot be monopolized by clueless agents, which is important during games with 22 players.
+        '''
+
+        w = self.world
+        r = w.robot
+        ago40ms = w.time_local_ms - 40
+        ago370ms = w.time_local_ms - 370 # maximum delay (up to 2 MIAs) is 360ms because radio has a delay of 20ms (otherwise max delay would be 340ms)
+        group : List[Other_Robot]
+
+        idx9 = int((w.time_server * 25)+0.1) % 9 # sequence of 9 phases
+        max_MIA = idx9 // 3                      # maximum number of MIA players (based on server time)
+        group_idx = idx9 % 3                     # group number                  (based on server time)
+        group, has_ball, is_self_included = self.groups[group_idx]
+
+        #============================================ 0. check if group is valid
+
+        if has_ball and w.ball_abs_pos_last_update < ago40ms: # Ball is included and not up to date
+            return False
+
+        if is_self_included and r.loc_last_update < ago40ms: # Oneself is included and unable to self-locate
+            return False
+
+        # Get players that have been previously seen or heard but not recently
+        MIAs = [not ot.is_self and ot.state_last_update < ago370ms and ot.state_last_update > 0 for ot in group]
+        self.MIAs = [ot.state_last_update == 0 or MIAs[i] for i,ot in enumerate(group)] # add players that have never been seen
+
+        if sum(MIAs) > max_MIA: # checking if number of recently missing members is not above threshold
+            return False
+
+        # never seen before players are always ignored except when:
+        # - this is the 0 MIAs round (see explanation above)
+        # - all are MIA
+        if (max_MIA == 0 and any(self.MIAs)) or all(self.MIAs): 
+            return False
+
+        # Check for invalid members. Conditions:
+        # - Player is other and not MIA and:  
+        #      - last update was >40ms ago OR
+        #      - last update did not include the head (head is important to provide state and accurate position)
+
+        if any(
+            (not ot.is_self and not self.MIAs[i] and                   
+                (ot.state_last_update < ago40ms or ot.state_last_update==0 or len(ot.state_abs_pos)<3)#  (last update: has no head or is old)                          
+            ) for i,ot in enumerate(group)
+        ):
+            return False
+
+        return True
+
+
+    def broadcast_legacy(self):
+        '''
+        Commit messages to teammates if certain conditions are met (the Radio.broadcast before Radio_Codec)
+        Messages contain: positions/states of every moving entity
+        '''
+
+        if not self.check_broadcast_requirements_legacy():
+            return
+            
+        w = self.world
+        ot : Other_Robot
+
+        group_idx = int((w.time_server * 25)+0.1) % 3 # group number based on server time
+        group, has_ball, _ = self.groups[group_idx]
+
+        #============================================ 1. create combination
+
+        # add message number
+        combination = group_idx
+        no_of_combinations = 3
+
+        # add ball combination
+        if has_ball: 
+            c, n = self.get_ball_combination(w.ball_abs_pos[0], w.ball_abs_pos[1])   
+            combination += c * no_of_combinations
+            no_of_combinations *= n
+
+
+        # add group combinations
+        for i,ot in enumerate(group):
+            c, n = self.get_player_combination(ot.state_abs_pos,                           # player position
+                                               self.MIAs[i], ot.state_fallen,              # is unknown, is down
+                                               Radio.TP if ot.is_teammate else Radio.OP)   # is teammate
+            combination += c * no_of_combinations
+            no_of_combinations *= n
+
+
+        assert(no_of_combinations < 9.61e38) # 88*89^19 (first character cannot be ';')
+
+        #============================================ 2. create message
+
+        # 1st msg symbol: ignore ';' due to server bug
+        msg = Radio.SYMB[combination % (Radio.SLEN-1)]
+        combination //= (Radio.SLEN-1)
+
+        # following msg symbols
+        while combination:
+            msg += Radio.SYMB[combination % Radio.SLEN]
+            combination //= Radio.SLEN
+
+        #============================================ 3. commit message
+
+        self.commit_announcement(msg.encode()) # commit message
+
+
+    def receive_legacy(self, msg:bytearray):
+        ''' Update the world with a message from a teammate, one player at a time (the Radio.receive before Radio_Codec) '''
+        w = self.world
+        r = w.robot
+        ago40ms = w.time_local_ms - 40
+        ago110ms = w.time_local_ms - 110
+        msg_time = w.time_local_ms - 20 # message was sent in the last step
+
+        #============================================ 1. get combination
+
+        # read first symbol, which cannot be ';' due to server bug
+        combination = Radio.SYMB_TO_IDX[msg[0]]
+        total_combinations = Radio.SLEN-1
+
+        if len(msg)>1:
+            for m in msg[1:]:
+                combination += total_combinations * Radio.SYMB_TO_IDX[m]
+                total_combinations *= Radio.SLEN
+
+        #============================================ 2. get msg ID
+
+        message_no = combination % 3
+        combination //= 3
+        group, has_ball, _ = self.groups[message_no]
+
+        #============================================ 3. get data
+
+        if has_ball:
+            ball_comb = combination % Radio.BP[6]
+            combination //= Radio.BP[6]
+
+        players_combs = []
+        ot : Other_Robot
+        for ot in group:
+            info = Radio.TP if ot.is_teammate else Radio.OP
+            players_combs.append( combination % (info[7]+2) )
+            combination //= info[7]+2
+
+        #============================================ 4. update world
+
+        if has_ball and w.ball_abs_pos_last_update < ago40ms: # update ball if it was not seen
+            time_diff = (msg_time - w.ball_abs_pos_last_update) / 1000
+            ball = self.get_ball_position(ball_comb)
+            w.ball_abs_vel = (ball - w.ball_abs_pos) / time_diff
+            w.ball_abs_speed = np.linalg.norm(w.ball_abs_vel)
+            w.ball_abs_pos_last_update = msg_time # (error: 0-40 ms)
+            w.ball_abs_pos = ball
+            w.is_ball_abs_pos_from_vision = False
+            
+        for c, ot in zip(players_combs, group):
+            
+            # handle oneself case
+            if ot.is_self:
+                # the ball's position has a fair amount of noise, whether seen by us or other players
+                # but our self-locatization mechanism is usually much better than how others perceive us
+                if r.loc_last_update < ago110ms: # so we wait until we miss 2 visual steps
+                    data = self.get_player_position(c, Radio.TP)
+                    if type(data)==tuple:
+                        x,y,is_down = data
+                        r.loc_head_position[:2] = x,y # z is kept unchanged
+                        r.loc_head_position_last_update = msg_time
+                        r.radio_fallen_state = is_down
+                        r.radio_last_update = msg_time
+                continue
+
+            # do not update if other robot was recently seen
+            if ot.state_last_update >= ago40ms:
+                continue
+
+            info = Radio.TP if ot.is_teammate else Radio.OP
+            data = self.get_player_position(c, info)  
+            if type(data)==tuple:
+                x,y,is_down = data
+                p = np.array([x,y])
+                
+                if ot.state_abs_pos is not None:  # update the x & y components of the velocity
+                    time_diff = (msg_time - ot.state_last_update) / 1000
+                    velocity = np.append( (p - ot.state_abs_pos[:2]) / time_diff, 0) # v.z = 0
+                    vel_diff = velocity - ot.state_filtered_velocity
+                    if np.linalg.norm(vel_diff) < 4: # otherwise assume it was beamed
+                        ot.state_filtered_velocity /= (ot.vel_decay,ot.vel_decay,1) # neutralize decay (except in the z-axis)
+                        ot.state_filtered_velocity += ot.vel_filter * vel_diff
+                    
+                ot.state_fallen = is_down             
+                ot.state_last_update = msg_time    
+                ot.state_body_parts_abs_pos = {"head":p}
+                ot.state_abs_pos = p
+                ot.state_horizontal_dist = np.linalg.norm(p - r.loc_head_position[:2])
+                ot.state_ground_area = (p, 0.3 if is_down else 0.2)  # not very precise, but we cannot see the robot
+
+
+class Inverse_Kinematics_Legacy(Inverse_Kinematics):
+    ''' Inverse_Kinematics with the scalar leg solver (`leg_legacy`) '''
+
+    def leg_legacy(self, ankle_pos3d, foot_ori3d, is_left:bool, dynamic_pose:bool):
+        '''
+        The Inverse_Kinematics.leg before batching, with scalar operations (see legs())
+
+        Compute inverse kinematics for the leg, considering as input the relative 3D position of the ankle and 3D orientation* of the foot
+        *the yaw can be controlled directly, but the pitch and roll are biases (see below)
+
+        Parameters
+        ----------
+        ankle_pos3d : array_like, length 3
+            (x,y,z) position of ankle in 3D, relative to the center of both hip joints
+        foot_ori3d : array_like, length 3
+            rotation around x,y,z (rotation around x & y are biases, relative to a vertical pose, or dynamic pose, if enabled)
+        is_left : `bool`
+            set to True to select left leg, False to select right leg
+        dynamic_pose : `bool`
+            enable dynamic feet rotation to be parallel to the ground, based on IMU
+
+        Returns
+        -------
+        indices : `list`
+            indices of computed joints
+        values : `list`
+            values of computed joints
+        error_codes : `list`
+            list of error codes
+                Error codes:
+                    (-1) Foot is too far (unreachable)
+                    (x)  Joint x is out of range
+        '''
+
+        error_codes = []
+        leg_y_dev, upper_leg_height, upper_leg_depth, lower_leg_len, knee_extra_angle, _ = self.NAO_SPECS
+        sign = -1 if is_left else 1
+
+        # Then we translate to origin of leg by shifting the y coordinate
+        ankle_pos3d = np.asarray(ankle_pos3d) + (0,sign*leg_y_dev,0)
+
+        # First we rotate the leg, then we rotate the coordinates to abstract from the rotation
+        ankle_pos3d = Matrix_3x3().rotate_z_deg(-foot_ori3d[2]).multiply(ankle_pos3d)
+
+        # Use geometric solution to compute knee angle and foot pitch
+        dist = np.linalg.norm(ankle_pos3d)  #dist hip <-> ankle
+        sq_dist = dist * dist
+        sq_upper_leg_h = upper_leg_height * upper_leg_height
+        sq_lower_leg_l = lower_leg_len * lower_leg_len
+        sq_upper_leg_l = upper_leg_depth * upper_leg_depth + sq_upper_leg_h
+        upper_leg_len = sqrt(sq_upper_leg_l)
+        knee = M.acos((sq_upper_leg_l + sq_lower_leg_l - sq_dist)/(2 * upper_leg_len * lower_leg_len)) + knee_extra_angle # Law of cosines
+        foot = M.acos((sq_lower_leg_l + sq_dist - sq_upper_leg_l)/(2 * lower_leg_len * dist)) # foot perpendicular to vec(origin->ankle_pos)
+
+        # Check if target is reachable
+        if dist > upper_leg_len + lower_leg_len: 
+            error_codes.append(-1)
+
+        # Knee and foot
+        knee_angle = pi - knee
+        foot_pitch = foot - atan(ankle_pos3d[0] / np.linalg.norm(ankle_pos3d[1:3]))
+        foot_roll = atan(ankle_pos3d[1] / min(-0.05, ankle_pos3d[2])) * -sign  # avoid instability of foot roll (not relevant above -0.05m)
+
+        # Raw hip angles if all joints were straightforward
+        raw_hip_yaw = foot_ori3d[2]
+        raw_hip_pitch = foot_pitch - knee_angle
+        raw_hip_roll = -sign * foot_roll
+
+        # Rotate 45deg due to yaw joint orientation, then rotate yaw, roll and pitch
+        m = Matrix_3x3().rotate_y_rad(raw_hip_pitch).rotate_x_rad(raw_hip_roll).rotate_z_deg(raw_hip_yaw).rotate_x_deg(-45*sign)
+
+        # Get actual hip angles considering the yaw joint orientation
+        hip_roll = (pi/4) - (sign * asin(m.m[1,2])) #Add pi/4 due to 45deg rotation
+        hip_pitch = - atan2(m.m[0,2],m.m[2,2])
+        hip_yaw = sign * atan2(m.m[1,0],m.m[1,1])
+
+        # Convert rad to deg
+        values = np.array([hip_yaw,hip_roll,hip_pitch,-knee_angle,foot_pitch,foot_roll]) * 57.2957795 #rad to deg
+
+        # Set feet rotation bias (based on vertical pose, or dynamic_pose)
+        values[4] -= foot_ori3d[1]
+        values[5] -= foot_ori3d[0] * sign
+
+        indices = [2,4,6,8,10,12] if is_left else [3,5,7,9,11,13]
+
+        if dynamic_pose:
+
+            # Rotation of torso in relation to foot
+            m : Matrix_3x3 = Matrix_3x3.from_rotation_deg((self.robot.imu_torso_roll, self.robot.imu_torso_pitch, 0))
+            m.rotate_z_deg(foot_ori3d[2], True)
+
+            roll =  m.get_roll_deg()
+            pitch = m.get_pitch_deg()
+
+            # Simple balance algorithm
+            correction = 1 #correction to motivate a vertical torso (in degrees)
+            roll  = 0 if abs(roll)  < correction else roll  - np.copysign(correction,roll)
+            pitch = 0 if abs(pitch) < correction else pitch - np.copysign(correction,pitch)
+     
+            values[4] += pitch
+            values[5] += roll * sign
+
+
+        # Check and limit range of joints
+        for i in range(len(indices)):
+            if values[i] < self.robot.joints_info[indices[i]].min or values[i] > self.robot.joints_info[indices[i]].max: 
+                error_codes.append(indices[i])
+                values[i] = np.clip(values[i], self.robot.joints_info[indices[i]].min, self.robot.joints_info[indices[i]].max)
+
+
+        return indices, values, error_codes
+
+
+class World_Legacy(World):
+    ''' World with the per-robot update of visible robots (`update_other_robot_legacy`) '''
+
+    def update_other_robot_legacy(self,other_robot : Other_Robot):
+        ''' 
+        Update other robot state based on the relative position of visible body parts
+        (also updated by Radio, with the exception of state_orientation)
+        The World.update_other_robot before Other_Robots.update_visible, which updates all visible robots at once
+        '''
+        o = other_robot
+        r = self.robot
+
+        # update body parts absolute positions (all body parts are transformed at once)
+        # Using the IMU could be beneficial if we see other robots but can't self-locate
+        rel_pos = o.body_parts_cart_rel_pos
+        abs_pos = Matrix_4x4.transform_points_batch( r.loc_head_to_field_transform, np.array(list(rel_pos.values())).reshape(-1,3) )
+        o.state_body_parts_abs_pos = dict(zip(rel_pos, abs_pos))
+
+        # auxiliary variables 
+        bps_apos = o.state_body_parts_abs_pos                 # read-only shortcut
+        bps_2d_apos_list = [v[:2] for v in bps_apos.values()] # list of body parts' 2D absolute positions
+        avg_2d_pt = np.average(bps_2d_apos_list, axis=0)      # 2D avg pos of visible body parts
+        head_is_visible = 'head' in bps_apos
+
+        # evaluate robot's state (unchanged if head is not visible)
+        if head_is_visible:
+            o.state_fallen = bps_apos['head'][2] < 0.3
+
+        # compute velocity if head is visible
+        if o.state_abs_pos is not None:
+            time_diff = (self.time_local_ms - o.state_last_update) / 1000
+            if head_is_visible:
+                # if last position is 2D, we assume that the z coordinate did not change, so that v.z=0
+                old_p = o.state_abs_pos if len(o.state_abs_pos)==3 else np.append(o.state_abs_pos, bps_apos['head'][2])            
+                velocity = (bps_apos['head'] - old_p) / time_diff
+                decay = o.vel_decay # neutralize decay in all axes
+            else: # if head is not visible, we only update the x & y components of the velocity
+                velocity = np.append( (avg_2d_pt - o.state_abs_pos[:2]) / time_diff, 0)
+                decay = (o.vel_decay,o.vel_decay,1) # neutralize decay (except in the z-axis)
+            # apply filter
+            if np.linalg.norm(velocity - o.state_filtered_velocity) < 4: # otherwise assume it was beamed
+                o.state_filtered_velocity /= decay # neutralize decay
+                o.state_filtered_velocity += o.vel_filter * (velocity-o.state_filtered_velocity)
+
+        # compute robot's position (preferably based on head)  
+        if head_is_visible:  
+            o.state_abs_pos = bps_apos['head'] # 3D head position, if head is visible
+        else:   
+            o.state_abs_pos = avg_2d_pt # 2D avg pos of visible body parts
+
+        # compute robot's horizontal distance (head distance, or avg. distance of visible body parts)
+        o.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - o.state_abs_pos[:2])
+        
+        # compute orientation based on pair of lower arms or feet, or average of both
+        lr_vec = None
+        if 'llowerarm' in bps_apos and 'rlowerarm' in bps_apos:
+            lr_vec = bps_apos['rlowerarm'] - bps_apos['llowerarm']
+            
+        if 'lfoot' in bps_apos and 'rfoot' in bps_apos:
+            if lr_vec is None:
+                lr_vec = bps_apos['rfoot'] - bps_apos['lfoot']
+            else:
+                lr_vec = (lr_vec + (bps_apos['rfoot'] - bps_apos['lfoot'])) / 2
+        
+        if lr_vec is not None:
+            o.state_orientation = atan2(lr_vec[1],lr_vec[0]) * 180 / pi + 90
+
+        # compute projection of player area on ground (circle) 
+        if o.state_horizontal_dist < 4: # we don't need precision if the robot is farther than 4m 
+            max_dist = np.max(np.linalg.norm(bps_2d_apos_list - avg_2d_pt, axis=1))
+        else:
+            max_dist = 0.2
+        o.state_ground_area = (avg_2d_pt,max_dist)
+
+        # update timestamp
+        o.state_last_update = self.time_local_ms
@@ -28,7 +28,9 @@ class Script():
                         'r': ('Robot Type',         '1'),
                         'P': ('Penalty Shootout',   '0'),
                         'F': ('magmaFatProxy',      '0'),
-                        'D': ('Debug Mode',         '1')}
+                        'D': ('Debug Mode',         '1'),
+                        'C': ('Cycle Profiler',     '0'),
+                        'R': ('Record Messages',    '0')}
 
         # list of arguments: 1-letter ID, data type, choices      
         self.op_types = {'i': (str, None),
@@ -39,7 +41,9 @@ class Script():
                          'r': (int, [0,1,2,3,4]),
                          'P': (int, [0,1]),
                          'F': (int, [0,1]),
-                         'D': (int, [0,1])}
+                         'D': (int, [0,1]),
+                         'C': (int, [0,1]),
+                         'R': (int, [0,1])}
             
         '''
         End of arguments specification
@@ -62,10 +66,19 @@ class Script():
         if getattr(sys, 'frozen', False): # disable debug mode when running from binary
             self.args.D = 0
 
+        if self.args.C: # profile the cycle budget of every agent created by this process (printed at exit or on SIGUSR1)
+            from logs.Profiler import Profiler
+            Profiler.enable()
+
         self.players = [] # list of created players
 
         Script.build_cpp_modules(exit_on_build = (cpp_builder_unum != 0 and cpp_builder_unum != self.args.u))
 
+        if self.args.R: # record all server messages and commands of every agent created by this process (see Replay_Comm)
+            from communication.Server_Comm import Server_Comm
+            from datetime import datetime
+            Server_Comm.record_folder = "./logs/recordings/" + datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
+
         if self.args.D:
             try:
                 print(f"\nNOTE: for help run \"python {__main__.__file__} -h\"")
@@ -95,7 +108,7 @@ class Script():
                 exit()
                 
             with open("config.json", "r") as f:
-                self.options = json.loads(f.read())
+                self.options.update(json.loads(f.read())) # options missing from an older config file keep their hardcoded default
 
 
     @staticmethod
@@ -1,24 +1,40 @@
+import os
+import signal
+import socket
 import subprocess
+import time
 
 class Server():
+    '''
+    Pool of rcssserver3d processes, server i uses the port pair (first_server_p+i, first_monitor_p+i)
+
+    Servers are allocated to environments (see `allocate`, `release`), and servers that crashed or stopped accepting
+    connections are recycled (see `check`, `restart`).
+    '''
+    STARTUP_TIMEOUT = 10 # maximum time (s) for a server to accept connections after being started
+
     def __init__(self, first_server_p, first_monitor_p, n_servers) -> None:
         try:
             import psutil
             self.check_running_servers(psutil, first_server_p, first_monitor_p, n_servers)
         except ModuleNotFoundError:
             print("Info: Cannot check if the server is already running, because the psutil module was not found")
-            
+
         self.first_server_p = first_server_p
         self.n_servers = n_servers
-        self.rcss_processes = []
+        self.ports = [(first_server_p+i, first_monitor_p+i) for i in range(n_servers)] # (agent port, monitor port) of each server
+        self.rcss_processes = [None] * n_servers
+        self.restarts = [0] * n_servers
+        self.free = list(range(n_servers)) # servers that were not allocated
 
         # makes it easier to kill test servers without affecting train servers
-        cmd = "simspark" if n_servers == 1 else "rcssserver3d"
+        self.cmd = "simspark" if n_servers == 1 else "rcssserver3d"
         for i in range(n_servers):
-            self.rcss_processes.append(
-                subprocess.Popen((f"{cmd} --agent-port {first_server_p+i} --server-port {first_monitor_p+i}").split(),
-                stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, start_new_session=True)
-            )
+            self._start(i)
+
+    def _start(self, i):
+        self.rcss_processes[i] = subprocess.Popen((f"{self.cmd} --agent-port {self.ports[i][0]} --server-port {self.ports[i][1]}").split(),
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, start_new_session=True)
 
     def check_running_servers(self, psutil, first_server_p, first_monitor_p, n_servers):
         ''' Check if any server is running on chosen ports '''
@@ -28,7 +44,7 @@ class Server():
         range2 = (first_monitor_p,first_monitor_p + n_servers)
         bad_processes = []
 
-        for p in p_list:  
+        for p in p_list:
             # currently ignoring remaining default port when only one of the ports is specified (uncommon scenario)
             ports = [int(arg) for arg in p.cmdline()[1:] if arg.isdigit()]
             if len(ports) == 0:
@@ -52,7 +68,82 @@ class Server():
                     for p in bad_processes:
                         p.kill()
                     return
-            
+
+
+    def allocate(self) -> int:
+        ''' Allocate a server (e.g. to an environment), returns its index (see `ports`) '''
+        assert self.free, f"All {self.n_servers} servers are allocated!"
+        return self.free.pop(0)
+
+    def release(self, i):
+        ''' Release an allocated server, so that it can be allocated again '''
+        assert i not in self.free, f"Server {i} is not allocated!"
+        self.free.append(i)
+
+
+    def is_running(self, i) -> bool:
+        ''' True if the process of server `i` has not exited '''
+        return self.rcss_processes[i].poll() is None
+
+    def is_healthy(self, i, timeout=1) -> bool:
+        ''' True if server `i` is running and accepts connections on its monitor port '''
+        if not self.is_running(i):
+            return False
+        try:
+            with socket.create_connection(("localhost", self.ports[i][1]), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def wait_until_healthy(self, i, timeout=STARTUP_TIMEOUT) -> bool:
+        ''' Wait until server `i` accepts connections, returns False if it did not happen before the timeout '''
+        end = time.time() + timeout
+        while time.time() < end:
+            if self.is_healthy(i):
+                return True
+            if not self.is_running(i):
+                return False
+            time.sleep(0.1)
+        return False
+
+    def restart(self, i) -> bool:
+        ''' Kill server `i` (if it is running) and start it again, returns True if it accepts connections '''
+        self._kill(i)
+        self._start(i)
+        self.restarts[i] += 1
+        return self.wait_until_healthy(i)
+
+    def check(self, indices=None) -> list:
+        '''
+        Health check: restart the servers that exited or do not accept connections
+
+        Parameters
+        ----------
+        indices : list
+            servers to check, default is `None` (all servers)
+
+        Returns
+        -------
+        restarted : list
+            indices of the restarted servers
+        '''
+        restarted = []
+        for i in range(self.n_servers) if indices is None else indices:
+            if not self.is_healthy(i):
+                print(f"Server: rcssserver3d on port {self.ports[i][0]} is not responding, restarting")
+                self.restart(i)
+                restarted.append(i)
+        return restarted
+
+
+    def _kill(self, i):
+        p = self.rcss_processes[i]
+        if p.poll() is None:
+            try:
+                os.killpg(p.pid, signal.SIGKILL) # the server runs in its own session (including any child process)
+            except ProcessLookupError:
+                pass
+        p.wait()
 
     def kill(self):
         for p in self.rcss_processes:
@@ -0,0 +1,139 @@
+from communication.Team_Runtime import Team_Runtime
+from logs.Logger import Logger
+from logs.Profiler import Profiler
+from scripts.commons.UI import UI
+from time import sleep, time
+import multiprocessing as mp
+import numpy as np
+import os
+import queue
+
+
+class Team_Launcher():
+    '''
+    Launch a team across several worker processes, with one CPU core per worker
+
+    Each worker creates its own agents (nothing is shared between workers) and runs them in a `Team_Runtime` event loop.
+    The launcher supervises the workers: a worker that crashes (non-zero exit code) is restarted with the same agents,
+    after a delay that doubles with each restart, up to `MAX_RESTARTS` times (a crash at startup would otherwise become
+    a fork loop), while a worker that exits normally (e.g. the server closed the connection) is not.
+    Per-agent cycle times are periodically sent by the workers and printed by the launcher.
+    Set OMP_NUM_THREADS=1 before numpy is imported, so that each worker uses a single core.
+    '''
+    MAX_RESTARTS = 5          # a worker that crashes more often is not restarted again
+    RESTART_DELAY = 1         # delay (in seconds) before the first restart of a worker, doubled for each following restart
+    MAX_RESTART_DELAY = 30
+
+    def __init__(self, host:str, agent_port:int, monitor_port:int, team_name:str, n_procs:int, unums=range(1,6),
+                 enable_log=True, enable_draw=True, pin=True, report_interval=3000) -> None:
+        '''
+        Parameters
+        ----------
+        n_procs : int
+            number of worker processes, the agents are split evenly among them
+            (e.g. 5 -> 1 agent per process, 1 -> all agents in the same process)
+        unums : iterable
+            uniform numbers of the agents to launch
+        pin : bool
+            pin each worker to a different CPU core (cores are reused if there are more workers than cores)
+        report_interval : int
+            each worker reports its agents' cycle times every `report_interval` cycles (3000 cycles = 1 minute)
+        '''
+        self.agent_args = (host, agent_port, monitor_port, team_name, enable_log, enable_draw)
+        self.groups = [tuple(int(u) for u in g) for g in np.array_split(list(unums), min(n_procs, len(unums)))]
+        cores = sorted(os.sched_getaffinity(0)) if pin and hasattr(os, "sched_setaffinity") else [None]
+        self.cores = [cores[i % len(cores)] for i in range(len(self.groups))]
+        self.report_interval = report_interval
+
+        self.ctx = mp.get_context("fork") # the launcher holds no agent state or sockets, so each (re)started worker begins clean
+        self.stats_queue = self.ctx.Queue()
+        self.workers = [None] * len(self.groups)
+        self.restarts = [0] * len(self.groups)
+        self.restart_time = [None] * len(self.groups) # time at which a crashed worker is restarted (None if not scheduled)
+        self.given_up = [False] * len(self.groups)    # True if a worker crashed more than MAX_RESTARTS times
+        self.stats = dict() # key: unum, value: row of Team_Runtime.get_latency()
+
+
+    @staticmethod
+    def worker(unums, core, agent_args, report_interval, stats_queue):
+        ''' Worker process: create agents for the given uniform numbers and run them until the server closes the connection '''
+        if core is not None:
+            os.sched_setaffinity(0, {core})
+
+        from agent.Agent import Agent
+        host, agent_port, monitor_port, team_name, enable_log, enable_draw = agent_args
+        agents = [Agent(host, agent_port, monitor_port, u, team_name, enable_log, enable_draw) for u in unums]
+
+        runtime = Team_Runtime(agents)
+        try:
+            runtime.run(report_interval=report_interval, report=lambda: stats_queue.put(runtime.get_latency()))
+        finally: # atexit handlers and file finalizers are not called when a worker process exits
+            Profiler.print_all()
+            Logger.flush(timeout=5)
+            for a in agents:
+                a.scom.stop_recording()
+
+
+    def _start(self, i):
+        self.workers[i] = self.ctx.Process(target=Team_Launcher.worker, daemon=True,
+            args=(self.groups[i], self.cores[i], self.agent_args, self.report_interval, self.stats_queue))
+        self.workers[i].start()
+
+
+    def _supervise(self, i):
+        ''' Schedule the restart of a worker that crashed, and restart it when its delay has passed '''
+        w = self.workers[i]
+        if w.is_alive() or w.exitcode == 0 or self.given_up[i]:
+            return
+
+        if self.restart_time[i] is None: # the crash was just detected
+            if self.restarts[i] >= Team_Launcher.MAX_RESTARTS:
+                self.given_up[i] = True
+                print(f"Team_Launcher: worker with agents {self.groups[i]} exited with code {w.exitcode}, "
+                      f"giving up after {self.restarts[i]} restarts")
+                return
+            delay = min(Team_Launcher.RESTART_DELAY * 2**self.restarts[i], Team_Launcher.MAX_RESTART_DELAY)
+            self.restart_time[i] = time() + delay
+            print(f"Team_Launcher: worker with agents {self.groups[i]} exited with code {w.exitcode}, "
+                  f"restarting in {delay}s (#{self.restarts[i]+1})")
+        elif time() >= self.restart_time[i]:
+            self.restart_time[i] = None
+            self.restarts[i] += 1
+            self._start(i)
+
+
+    def print_stats(self):
+        table = [[],[],[],[],[],[],[],[]]
+        for i, (unums, core) in enumerate(zip(self.groups, self.cores)):
+            for u in unums:
+                s = self.stats.get(u)
+                row = (u, self.workers[i].pid, "-" if core is None else core, self.restarts[i],
+                       *(("-",)*4 if s is None else (s[1], f"{s[2]+s[4]:.2f}", f"{s[4]:.2f}", f"{s[5]:.2f}")))
+                for col, val in zip(table, row):
+                    col.append(val)
+        UI.print_table(table, ["Unum","PID","Core","Restarts","Cycles","Cycle avg (ms)","Think avg (ms)","Think max (ms)"], numbering=[False]*8)
+
+
+    def run(self):
+        ''' Start all workers and supervise them until all exit normally or are given up (or ctrl+c) '''
+        for i in range(len(self.groups)):
+            self._start(i)
+            sleep(0.5) # the rcssserver3d handshake is more reliable when agents connect one at a time
+
+        last_print = 0
+        try:
+            while any(w.is_alive() or (w.exitcode != 0 and not g) for w, g in zip(self.workers, self.given_up)):
+                try:
+                    for row in self.stats_queue.get(timeout=1):
+                        self.stats[row[0]] = row
+                    if time() - last_print > self.report_interval * 0.01: # workers report at roughly the same time, print once
+                        last_print = time()
+                        self.print_stats()
+                except queue.Empty:
+                    pass
+
+                for i in range(len(self.workers)):
+                    self._supervise(i)
+        except KeyboardInterrupt:
+            for w in self.workers:
+                w.terminate()
@@ -2,7 +2,7 @@ from agent.Base_Agent import Base_Agent as Agent
 from behaviors.custom.Step.Step import Step
 from world.commons.Draw import Draw
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import SubprocVecEnv
+from scripts.commons.Env_Farm import Env_Farm
 from scripts.commons.Server import Server
 from scripts.commons.Train_Base import Train_Base
 from time import sleep
@@ -213,15 +213,13 @@ class Train(Train_Base):
         print("Model path:", model_path)
 
         #--------------------------------------- Run algorithm
-        def init_env(i_env):
-            def thunk():
-                return Basic_Run( self.ip , self.server_p + i_env, self.monitor_p_1000 + i_env, self.robot_type, False )
-            return thunk
+        def init_env(server_p, monitor_p):
+            return Basic_Run( self.ip , server_p, monitor_p, self.robot_type, False )
 
         servers = Server( self.server_p, self.monitor_p_1000, n_envs+1 ) #include 1 extra server for testing
 
-        env = SubprocVecEnv( [init_env(i) for i in range(n_envs)] )
-        eval_env = SubprocVecEnv( [init_env(n_envs)] )
+        env = Env_Farm( init_env, n_envs, servers )
+        eval_env = Env_Farm( init_env, 1, servers )
 
         try:
             if "model_file" in args: # retrain
@@ -233,9 +231,11 @@ class Train(Train_Base):
         except KeyboardInterrupt:
             sleep(1) # wait for child processes
             print("\nctrl+c pressed, aborting...\n")
+            env.print_stats()
             servers.kill()
             return
     
+        env.print_stats()
         env.close()
         eval_env.close()
         servers.kill()
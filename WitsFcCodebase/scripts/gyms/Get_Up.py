@@ -1,10 +1,10 @@
 from agent.Base_Agent import Base_Agent as Agent
 from pathlib import Path
+from scripts.commons.Env_Farm import Env_Farm
 from scripts.commons.Server import Server
 from scripts.commons.Train_Base import Train_Base
 from stable_baselines3 import PPO
 from stable_baselines3.common.base_class import BaseAlgorithm
-from stable_baselines3.common.vec_env import SubprocVecEnv
 from time import sleep
 from world.commons.Draw import Draw
 import gym
@@ -130,7 +130,7 @@ class Get_Up(gym.Env):
         angles[2:] += action[1:] # exclude head
         new_delta = max((delta + action[0])//20*20, 20)
 
-        self.player.behavior.slot_engine.behaviors[self.get_up_names[self.fall_direction]][self.current_slot] = ( new_delta, slice(0,22), angles )
+        self.player.behavior.slot_engine.set_slot(self.get_up_names[self.fall_direction], self.current_slot, new_delta, slice(0,22), angles)
 
         self.current_slot += 1
         terminal = bool(self.current_slot == len(self.obs))
@@ -176,15 +176,13 @@ class Train(Train_Base):
 
         print("Model path:", model_path)
 
-        def init_env(i_env):
-            def thunk():
-                return Get_Up( self.ip , self.server_p + i_env, self.monitor_p_1000 + i_env, self.robot_type, self.fall_direction, False )
-            return thunk
+        def init_env(server_p, monitor_p):
+            return Get_Up( self.ip , server_p, monitor_p, self.robot_type, self.fall_direction, False )
 
         servers = Server( self.server_p, self.monitor_p_1000, n_envs+1 ) #include 1 extra server for testing
 
-        env = SubprocVecEnv( [init_env(i) for i in range(n_envs)] )
-        eval_env = SubprocVecEnv( [init_env(n_envs)] )
+        env = Env_Farm( init_env, n_envs, servers )
+        eval_env = Env_Farm( init_env, 1, servers )
 
         try:
             if "model_file" in args:
@@ -196,6 +194,7 @@ class Train(Train_Base):
         except KeyboardInterrupt:
             sleep(1) # wait for child processes
             print("\nctrl+c pressed, aborting...\n")
+            env.print_stats()
             servers.kill()
             return
 
@@ -203,6 +202,7 @@ class Train(Train_Base):
         # Generate slot behavior XML
         self.generate_get_up_behavior(model, model_path, eval_env.get_attr('original_slots')[0], "last_model.xml")
         
+        env.print_stats()
         env.close()
         eval_env.close()
         servers.kill()
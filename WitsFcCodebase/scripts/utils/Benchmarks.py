@@ -0,0 +1,1508 @@
+from communication.Radio import Radio
+from communication.Radio_Codec import Radio_Codec
+from communication.Replay_Comm import Replay_Comm
+from cpp.a_star import a_star
+from cpp.ball_predictor import ball_predictor
+from communication.Server_Comm import Server_Comm
+from communication.World_Parser import World_Parser
+from logs.Logger import Logger
+from math_ops.Matrix_3x3 import Matrix_3x3
+from math_ops.Matrix_4x4 import Matrix_4x4
+from math_ops.Inverse_Kinematics import Inverse_Kinematics
+from math_ops.Math_Ops import Math_Ops as M
+from math_ops.Neural_Network import Policy, run_mlp
+from os import listdir, path
+from scripts.commons.Legacy_Reference import Inverse_Kinematics_Legacy, Radio_Legacy, Robot_Legacy, World_Legacy, World_Parser_Legacy
+from scripts.commons.Script import Script
+from scripts.commons.UI import UI
+from behaviors.custom.Step.Step_Generator import Step_Generator
+from behaviors.Slot_Engine import Slot_Engine
+from strategy.Assignment import RoleAssigner, stable_matching_assignment
+from strategy.DecisionMaker import DecisionMaker
+from strategy.Strategy import Strategy
+from strategy.World_Snapshot import World_Snapshot
+from time import perf_counter
+from world.commons.Cost_Field import Cost_Field
+from world.commons.Draw import Draw
+from world.commons.Other_Robots import Other_Robots
+from world.Robot import Robot
+from world.World import World
+import numpy as np
+import pickle
+import shutil
+import socket
+import struct
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as xmlp
+
+
+class Benchmarks():
+    '''
+    Offline micro-benchmarks for performance-critical code paths
+    A server is not required, all inputs are synthesized or loaded from disk
+    '''
+
+    def __init__(self, script:Script) -> None:
+        self.script = script
+        self.benchmarks = {"World_Parser": self.world_parser, "Forward Kinematics": self.forward_kinematics,
+                           "Matrix Kernels": self.matrix_kernels, "Neural Network": self.neural_network,
+                           "Replay": self.replay, "Server_Comm I/O": self.server_comm_io,
+                           "Command Encoder": self.command_encoder, "Other Robots": self.other_robots,
+                           "Strategy Snapshot": self.strategy_snapshot, "Role Assignment": self.role_assignment,
+                           "Path Planning": self.path_planning, "Multi-query Paths": self.multi_query_paths,
+                           "Cost Field": self.cost_field, "Ball Predictor": self.ball_prediction,
+                           "Radio Codec": self.radio_codec, "Draw Frames": self.draw_frames,
+                           "Slot Engine": self.slot_engine, "Inverse Kinematics": self.inverse_kinematics,
+                           "Step Generator": self.step_generator}
+
+
+    #--------------------------------------------------------------------- Helpers
+
+    @staticmethod
+    def new_world(robot_type=0, team_name="Home", unum=1, world_class=World):
+        ''' Create a standalone world (no server connection, no drawings, no logs) '''
+        return world_class(robot_type, team_name, unum, False, False, Logger(False, f"{team_name}_{unum}"), "localhost")
+
+    @staticmethod
+    def time_it(func, repeats):
+        ''' Returns the best wall-clock time (in seconds) of `repeats` calls to `func` '''
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = perf_counter()
+            func()
+            best = min(best, perf_counter() - t0)
+        return best
+
+    @staticmethod
+    def peak_alloc(func, repeats):
+        ''' Returns the highest peak of traced memory (in bytes) above the baseline, for `repeats` calls to `func` '''
+        func() # warm up
+        tracemalloc.start()
+        worst = 0
+        for _ in range(repeats):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+        return worst
+
+    @staticmethod
+    def synthesize_server_msgs(n, team_name="Home", opponent_name="Away", seed=0):
+        '''
+        Generate realistic server messages for a 22-joint robot playing on the left side
+
+        Vision is included in every 3rd message (like the real server), with goal posts, corner flags,
+        ball, field lines and teammates/opponents. Every 5th message includes a radio message.
+
+        Parameters
+        ----------
+        n : `int`
+            number of messages
+        seed : `int`
+            random generator seed
+
+        Returns
+        -------
+        msgs : `list`
+            list of `bytearray` messages (same type as the messages received by `Server_Comm`)
+        '''
+        rng = np.random.default_rng(seed)
+        joints = list(Robot.MAP_PERCEPTOR_TO_INDEX)[:22]
+        flags = ("F1L","F2L","F1R","F2R","G1L","G2L","G1R","G2R")
+        parts = ("head","rlowerarm","llowerarm","rfoot","lfoot")
+        pol = lambda: f"(pol {rng.uniform(0.5,20):.2f} {rng.uniform(-60,60):.2f} {rng.uniform(-40,5):.2f})"
+        msgs = []
+
+        for i in range(n):
+            m = [f"(time (now {100+i*0.02:.2f}))(GS (unum 1) (team left) (t {i*0.02:.2f}) (pm PlayOn))",
+                 f"(GYR (n torso) (rt {rng.normal():.2f} {rng.normal():.2f} {rng.normal():.2f}))",
+                 f"(ACC (n torso) (a {rng.normal():.2f} {rng.normal():.2f} {9.81+rng.normal():.2f}))"]
+            m += [f"(HJ (n {j}) (ax {rng.uniform(-90,90):.2f}))" for j in joints]
+            for foot in ("lf","rf")[:rng.integers(3)]:
+                m.append(f"(FRP (n {foot}) (c {rng.normal()*0.01:.2f} {rng.normal()*0.01:.2f} -0.02) (f {rng.normal():.2f} {rng.normal():.2f} {rng.uniform(5,25):.2f}))")
+
+            if i % 3 == 0:
+                see = [f"({f} {pol()})" for f in flags if rng.random() < 0.5]
+                see.append(f"(B {pol()})")
+                for team in (team_name, opponent_name):
+                    for unum in rng.choice(np.arange(1,6), 3, replace=False):
+                        see.append(f"(P (team {team}) (id {unum}) " + " ".join(f"({p} {pol()})" for p in parts) + ")")
+                see += [f"(L {pol()} {pol()})" for _ in range(rng.integers(2,8))]
+                m.append("(See " + " ".join(see) + ")")
+
+            if i % 5 == 0:
+                m.append(f"(hear {team_name} {100+i*0.02:.2f} {'self' if i % 10 == 0 else f'{rng.uniform(-180,180):.2f}'} 8YE,Pao7{i:04d})")
+
+            msgs.append(bytearray("".join(m).encode()))
+        return msgs
+
+
+    #--------------------------------------------------------------------- Benchmarks
+
+    def world_parser(self):
+        '''
+        Compare the tokenizer-based `World_Parser.parse` against the byte-by-byte `World_Parser_Legacy.parse_legacy`
+        Both parsers are fed the same messages and must produce the same world state
+        '''
+        msgs = Benchmarks.synthesize_server_msgs(3000)
+        w_new, w_old = Benchmarks.new_world(), Benchmarks.new_world()
+        heard_new, heard_old = [], []
+        p_new = World_Parser(w_new, lambda *args: heard_new.append(args))
+        p_old = World_Parser_Legacy(w_old, lambda *args: heard_old.append(args))
+
+        # Validation: compare the relevant world state after each message
+        mismatches = 0
+        for msg in msgs:
+            p_new.parse(msg)
+            p_old.parse_legacy(msg)
+            r1, r2 = w_new.robot, w_old.robot
+            o1, o2 = w_new.other_robots, w_old.other_robots
+            same = (np.array_equal(r1.joints_position, r2.joints_position) and np.array_equal(r1.joints_speed, r2.joints_speed) and
+                    np.array_equal(r1.gyro, r2.gyro) and np.array_equal(r1.acc, r2.acc) and
+                    r1.frp.keys() == r2.frp.keys() and all(np.array_equal(r1.frp[k], r2.frp[k]) for k in r1.frp) and
+                    w_new.time_server == w_old.time_server and w_new.time_game == w_old.time_game and w_new.play_mode == w_old.play_mode and
+                    w_new.flags_posts == w_old.flags_posts and w_new.flags_corners == w_old.flags_corners and
+                    w_new.ball_is_visible == w_old.ball_is_visible and np.array_equal(w_new.ball_rel_head_sph_pos, w_old.ball_rel_head_sph_pos) and
+                    w_new.line_count == w_old.line_count and np.array_equal(w_new.lines[:w_new.line_count], w_old.lines[:w_old.line_count]) and
+                    np.array_equal(o1.is_visible, o2.is_visible) and np.array_equal(o1.parts_seen, o2.parts_seen) and
+                    np.array_equal(o1.parts_sph_rel_pos[o1.parts_seen], o2.parts_sph_rel_pos[o2.parts_seen]))
+            mismatches += not same
+
+        same_radio = [(bytes(m),d,t) for m,d,t in heard_new] == [(bytes(m),d,t) for m,d,t in heard_old]
+
+        # Throughput (all messages & proprioception-only messages)
+        proprio = [m for m in msgs if b'(See ' not in m]
+
+        def run(parse, msgs):
+            for msg in msgs: parse(msg)
+
+        t_old = Benchmarks.time_it(lambda: run(p_old.parse_legacy, msgs), 3)
+        t_new = Benchmarks.time_it(lambda: run(p_new.parse, msgs), 3)
+        tp_old = Benchmarks.time_it(lambda: run(p_old.parse_legacy, proprio), 3)
+        tp_new = Benchmarks.time_it(lambda: run(p_new.parse, proprio), 3)
+        avg_len = sum(len(m) for m in msgs) / len(msgs)
+
+        UI.print_table([["parse_legacy","parse"],
+                        [f"{len(msgs)/t_old:.0f}", f"{len(msgs)/t_new:.0f}"],
+                        [f"{t_old/len(msgs)*1e6:.1f}", f"{t_new/len(msgs)*1e6:.1f}"],
+                        [f"{tp_old/len(proprio)*1e6:.1f}", f"{tp_new/len(proprio)*1e6:.1f}"],
+                        ["1.00x", f"{t_old/t_new:.2f}x"]],
+                       ["Parser","Messages/s","us/message","us/message (no vision)","Speedup"], numbering=[False]*5)
+        print(f"Messages: {len(msgs)} (average size: {avg_len:.0f} bytes)")
+        print(f"World state mismatches: {mismatches}   Radio messages match: {same_radio}\n")
+
+
+    def forward_kinematics(self):
+        '''
+        Compare the batched `Robot.update_pose` against the per-joint `Robot_Legacy.update_pose_legacy`, for all robot types
+        '''
+        rng = np.random.default_rng(0)
+        steps = 2000
+        table = [[],[],[],[],[]]
+
+        for robot_type in range(5):
+            r1, r2 = Robot(1, robot_type), Robot_Legacy(1, robot_type)
+            poses = rng.uniform(-90, 90, (steps, r1.no_of_joints))
+
+            # Validation: body parts, joints and CoM must match
+            error = 0
+            for pose in poses[:100]:
+                r1.joints_position[:] = r2.joints_position[:] = pose
+                r1.update_pose()
+                r2.update_pose_legacy()
+                error = max(error, np.max(np.abs(r1.rel_cart_CoM_position - r2.rel_cart_CoM_position)),
+                            *(np.max(np.abs(r1.body_parts[k].transform.m - r2.body_parts[k].transform.m)) for k in r1.body_parts),
+                            *(np.max(np.abs(a.m - b.m)) for a,b in zip(r1.joints_transform, r2.joints_transform)))
+
+            def run(r, update):
+                for pose in poses:
+                    r.joints_position[:] = pose
+                    update()
+
+            t_old = Benchmarks.time_it(lambda: run(r2, r2.update_pose_legacy), 3) / steps
+            t_new = Benchmarks.time_it(lambda: run(r1, r1.update_pose), 3) / steps
+
+            for col, val in zip(table, (robot_type, f"{t_old*1e6:.1f}", f"{t_new*1e6:.1f}", f"{t_old/t_new:.2f}x", f"{error:.1e}")):
+                col.append(val)
+
+        UI.print_table(table, ["Robot type","update_pose_legacy (us)","update_pose (us)","Speedup","Max abs error"], numbering=[False]*5)
+        print()
+
+
+    def matrix_kernels(self):
+        '''
+        Compare the allocating Matrix_4x4/Matrix_3x3 methods against the allocation-free kernels,
+        and measure the memory allocated by the per-step Robot updates (forward kinematics, localization and IMU)
+        Memory is measured with `tracemalloc` as the peak of traced memory during each call
+        '''
+        rng = np.random.default_rng(0)
+        a = Matrix_4x4().rotate_deg((0.6,0,0.8), 30, True).translate((1.0,2.0,0.5), True)
+        b = Matrix_4x4().rotate_deg((0,1,0), -40, True).translate((0.1,-0.3,0.2), True)
+        r3 = Matrix_3x3.from_rotation_deg((5,-10,60))
+        out, out3, vec, vec_out = Matrix_4x4(), Matrix_3x3(), rng.random(3), np.empty(3)
+        pts = rng.random((10,3))
+        pts_out = np.empty((10,3))
+
+        ops = [("4x4 multiply",        lambda: a.multiply(b),                       lambda: Matrix_4x4.multiply_into(a, b, out)),
+               ("4x4 invert",          lambda: a.invert(),                          lambda: Matrix_4x4.invert_rigid_into(a, out)),
+               ("4x4 transform point", lambda: a(vec),                              lambda: Matrix_4x4.transform_point_into(a, vec, vec_out)),
+               ("4x4 transform 10 pts",lambda: [a(p) for p in pts],                 lambda: Matrix_4x4.transform_points_batch(a, pts, pts_out)),
+               ("3x3 multiply",        lambda: r3.multiply(r3),                     lambda: Matrix_3x3.multiply_into(r3, r3, out3)),
+               ("3x3 from rotation",   lambda: Matrix_3x3.from_rotation_deg(vec),   lambda: Matrix_3x3.from_rotation_deg_into(vec, out3))]
+
+        table = [[],[],[],[],[]]
+        for name, old, new in ops:
+            expected, result = old(), new()
+            expected = expected.m if hasattr(expected, "m") else np.asarray(expected)
+            assert np.allclose(expected, result.m if hasattr(result, "m") else result), f"{name}: kernel does not match the method"
+            for col, val in zip(table, (name, Benchmarks.peak_alloc(old, 100), Benchmarks.peak_alloc(new, 100),
+                                        f"{Benchmarks.time_it(old, 1000)*1e6:.2f}", f"{Benchmarks.time_it(new, 1000)*1e6:.2f}")):
+                col.append(val)
+
+        UI.print_table(table, ["Operation","Method (bytes)","Kernel (bytes)","Method (us)","Kernel (us)"], numbering=[False]*5)
+
+        # Per-step robot updates in steady state
+        r = Robot(1, 0)
+        h2f = Matrix_4x4().rotate_z_deg(35, True).translate((0.0,0.0,0.5), True)
+        loc = np.zeros(35, np.float32)
+        loc[0:16] = h2f.m.flat
+        loc[16:32] = h2f.invert().m.flat
+        loc[32:35] = (1, 0.5, 1)
+        time_ms = [0]
+
+        def visual_step():
+            time_ms[0] += 20
+            r.update_pose()
+            r.update_localization(loc, time_ms[0])
+            r.update_imu(time_ms[0])
+
+        def imu_step():
+            time_ms[0] += 20
+            r.update_pose()
+            r.loc_is_up_to_date = False
+            r.update_imu(time_ms[0])
+
+        table = [["update_pose","Visual step (pose + localization + IMU)","IMU step (pose + IMU)"],
+                 [Benchmarks.peak_alloc(r.update_pose, 500), Benchmarks.peak_alloc(visual_step, 500), Benchmarks.peak_alloc(imu_step, 500)]]
+        UI.print_table(table, ["Robot update","Peak allocation per step (bytes)"], numbering=[False]*2)
+        print("Note: update_pose allocates no arrays, its peak is the temporary iterator of each batched np.matmul (~0.5 KB)")
+        print("      the visual step also stores a copy of the head position in its history queue (and the queue grows in blocks)\n")
+
+
+    def neural_network(self):
+        '''
+        Compare `run_mlp` against `Policy`, evaluating each observation separately or the whole batch at once
+        Batch size 5 corresponds to one process evaluating the walk policy of all teammates
+        '''
+        with open(M.get_active_directory("/behaviors/custom/Walk/walk_R0.pkl"), 'rb') as f:
+            model = pickle.load(f)
+        policy = Policy(model)
+        rng = np.random.default_rng(0)
+        table = [[],[],[],[],[],[],[]]
+
+        for batch_size in (1, 5, 64):
+            obs = rng.uniform(-1, 1, (batch_size, policy.input_size)).astype(np.float32)
+            repeats = max(10, 5000 // batch_size)
+
+            expected = np.array([run_mlp(o, model) for o in obs])
+            error = max(np.max(np.abs(policy.forward(obs) - expected)), max(np.max(np.abs(policy(o) - e)) for o,e in zip(obs, expected)))
+
+            def run_each(f):
+                for o in obs: f(o)
+
+            t_old = Benchmarks.time_it(lambda: run_each(lambda o: run_mlp(o, model)), repeats) / batch_size
+            t_each = Benchmarks.time_it(lambda: run_each(policy), repeats) / batch_size
+            t_batch = Benchmarks.time_it(lambda: policy.forward(obs), repeats) / batch_size
+            alloc = Benchmarks.peak_alloc(lambda: policy.forward(obs), 100)
+
+            for col, val in zip(table, (batch_size, f"{t_old*1e6:.2f}", f"{t_each*1e6:.2f}", f"{t_batch*1e6:.2f}",
+                                        f"{t_old/t_batch:.2f}x", alloc, f"{error:.1e}")):
+                col.append(val)
+
+        UI.print_table(table, ["Batch size","run_mlp (us/obs)","Policy (us/obs)","Policy batch (us/obs)","Speedup (batch)",
+                               "Batch peak alloc (bytes)","Max abs error"], numbering=[False]*7)
+        print(f"Model: walk_R0.pkl, layers: {[k.shape for k in policy.kernels]}\n")
+
+
+    def replay(self):
+        '''
+        Replay a recording of one or more agents (Script option -R 1) through the full pipeline, without a server:
+        World_Parser, World.update, think_and_send (decision making, behaviors, path planning) and the command
+        The commands sent by the agents are compared with the recorded ones to detect behavior regressions
+        '''
+        from agent.Agent import Agent
+        from agent.Base_Agent import Base_Agent
+
+        folder = "./logs/recordings/"
+        recordings = sorted(d for d in listdir(folder) if path.isdir(folder + d)) if path.isdir(folder) else []
+        if not recordings:
+            print(f"No recordings found in '{folder}'. To record a match, run any agent script with '-R 1'.\n")
+            return
+        idx = UI.print_table([recordings], ["Recordings"], numbering=[True], prompt='Choose recording: ')[0]
+        Replay_Comm.folder = folder + recordings[idx]
+
+        # Files are named '{team_name}_{unum}.rec', agents are created in the same order as Run_Full_Team.py
+        files = [f[:-4].rsplit("_", 1) for f in listdir(Replay_Comm.folder) if f.endswith(".rec")]
+        files = sorted((int(unum), team) for team, unum in files)
+
+        Base_Agent.comm_class = Replay_Comm
+        try:
+            agents = [Agent(None, None, None, unum, team, False, False) for unum, team in files]
+        finally:
+            Base_Agent.comm_class = Server_Comm
+
+        cycle_times = [[] for _ in agents]
+        active = list(range(len(agents)))
+        while active:
+            for i in list(active):
+                a = agents[i]
+                if a.scom.is_finished: # the recording ended after a server message
+                    active.remove(i)
+                    continue
+                t0 = perf_counter()
+                a.think_and_send()
+                if a.scom.is_finished: # the recording ended after a command
+                    active.remove(i)
+                    continue
+                a.scom.receive()
+                cycle_times[i].append(perf_counter() - t0)
+
+        table = [[],[],[],[],[],[],[]]
+        for a, times in zip(agents, cycle_times):
+            times = np.array(times) * 1000
+            for col, val in zip(table, (a.world.robot.unum, len(times), f"{np.mean(times):.2f}", f"{np.percentile(times,95):.2f}",
+                                        f"{np.max(times):.2f}", a.scom.sent_count, a.scom.sent_mismatches)):
+                col.append(val)
+            a.terminate()
+
+        UI.print_table(table, ["Unum","Cycles","Cycle avg (ms)","Cycle p95 (ms)","Cycle max (ms)","Commands","Mismatched commands"], numbering=[False]*7)
+        print()
+
+
+    def server_comm_io(self):
+        '''
+        Compare the Server_Comm I/O path (message copied out of the receive buffer, size prefix concatenated with the
+        joined commands) against a copy-free alternative (parsing a memoryview of the buffer, scatter-gather send)
+        The server is replaced by a local socket pair, messages are parsed but the world is not updated
+        Allocations are measured with tracemalloc: the copy-free path saves ~2 KB (receive) and ~0.3 KB (send) per
+        cycle, but it is not faster (equal within noise or slower), so Server_Comm keeps the copies
+        '''
+        msgs = Benchmarks.synthesize_server_msgs(30)
+        w = Benchmarks.new_world()
+        scom = Server_Comm.__new__(Server_Comm) # no server connection
+        server_sock, agent_sock = socket.socketpair()
+        scom._init_io(agent_sock)
+        scom.world, scom.world_parser = w, World_Parser(w, lambda *args: None)
+        cmd_parts = [w.robot.get_command(), b'(say 8YE,Pao7)']
+        sink = bytearray(1 << 16)
+        size_prefix, snd_prefix, rcv_view = struct.Struct(">I"), bytearray(4), memoryview(scom.rcv_buff)
+
+        def serve_all(): # queue all messages in the socket (the kernel buffer can hold all of them)
+            server_sock.sendall(b''.join(len(m).to_bytes(4,'big') + m for m in msgs))
+
+        def receive_copy():
+            scom.receive(update=False) # one message at a time, since all messages are already queued
+
+        def receive_view():
+            buff, sock = scom.rcv_buff, scom.socket
+            sock.recv_into(buff, nbytes=4)
+            msg_size = size_prefix.unpack_from(buff)[0]
+            sock.recv_into(buff, nbytes=msg_size, flags=socket.MSG_WAITALL)
+            scom.world_parser.parse(rcv_view[:msg_size])
+
+        def send_copy():
+            scom.send_buff.extend(cmd_parts)
+            scom.send()
+            server_sock.recv_into(sink)
+
+        def send_scatter():
+            parts = scom.send_buff
+            parts.extend(cmd_parts)
+            parts.append(b'(syn)')
+            size = sum(map(len, parts))
+            size_prefix.pack_into(snd_prefix, 0, size)
+            scom.socket.sendmsg((snd_prefix, *parts))
+            parts.clear()
+            server_sock.recv_into(sink)
+
+        def receive_stats(receive): # best time and peak traced allocation per message, while parsing all messages
+            best, peak = float('inf'), 0
+            for r in range(20):
+                serve_all()
+                if r == 19: tracemalloc.start()
+                for _ in msgs:
+                    if r < 19:
+                        t0 = perf_counter()
+                        receive()
+                        best = min(best, perf_counter() - t0)
+                    else:
+                        base = tracemalloc.get_traced_memory()[0]
+                        tracemalloc.reset_peak()
+                        receive()
+                        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+            tracemalloc.stop()
+            return best, peak
+
+        scom.is_readable = lambda: False # with all messages queued, receive() would otherwise parse all of them at once
+        table = [[],[],[],[],[]]
+        for name, receive, send in (("Copy + send (Server_Comm)", receive_copy, send_copy),
+                                    ("memoryview + sendmsg", receive_view, send_scatter)):
+            t_rcv, peak_rcv = receive_stats(receive)
+            t_snd = Benchmarks.time_it(send, 5000)
+            peak_snd = Benchmarks.peak_alloc(send, 100)
+            for col, val in zip(table, (name, f"{t_rcv*1e6:.1f}", f"{peak_rcv}", f"{t_snd*1e6:.2f}", f"{peak_snd}")):
+                col.append(val)
+        del scom.is_readable
+
+        avg_len = sum(len(m) for m in msgs) / len(msgs)
+        cmd_len = sum(len(c) for c in cmd_parts) + 5
+        print(f"Average message: {avg_len:.0f} bytes, command: {cmd_len} bytes (peak allocations include the parser)")
+        UI.print_table(table, ["I/O path","Receive+parse (us/msg)","Receive peak alloc (bytes)","Send (us)","Send peak alloc (bytes)"],
+                       numbering=[False]*5)
+        server_sock.close()
+        agent_sock.close()
+
+
+    def command_encoder(self):
+        '''
+        Compare `Robot_Legacy.get_command_legacy` against `Robot.get_command` (all joints, or skipping unchanged joints)
+        Each scenario is a sequence of joint target speeds, where only some joints are actuated in each step
+        '''
+        r = Benchmarks.new_world().robot
+        r_old = Robot_Legacy(r.unum, r.type)
+        enc = r.command_encoder
+        rng = np.random.default_rng(0)
+        steps = 500
+        scenarios = { # name: actuated joints in each step
+            "Walk (legs+arms)":   [range(2, r.no_of_joints)] * steps,
+            "Track ball (head)":  [range(0, 2)] * steps,
+            "Stand still":        [range(0)] * steps,
+            "Kick (slot motion)": [range(2, 14) if i % 50 < 20 else range(0) for i in range(steps)] }
+        table = [[],[],[],[],[],[],[]]
+
+        for name, actuated in scenarios.items():
+            speeds = np.zeros((steps, r.no_of_joints))
+            for i, joints in enumerate(actuated):
+                speeds[i, joints] = rng.uniform(-6, 6, len(joints))
+
+            def run(robot, get_command):
+                cmds = []
+                for s in speeds:
+                    robot.joints_target_speed[:] = s
+                    cmds.append(get_command())
+                return cmds
+
+            expected = run(r_old, r_old.get_command_legacy)
+            enc.skip_unchanged = False
+            assert run(r, r.get_command) == expected, "Command_Encoder output differs from the legacy encoder!"
+            t_old = Benchmarks.time_it(lambda: run(r_old, r_old.get_command_legacy), 20) / steps
+            t_new = Benchmarks.time_it(lambda: run(r, r.get_command), 20) / steps
+
+            enc.skip_unchanged = True
+            enc.reset()
+            skip_bytes = sum(map(len, run(r, r.get_command))) / steps
+            t_skip = Benchmarks.time_it(lambda: run(r, r.get_command), 20) / steps
+            enc.skip_unchanged = False
+
+            for col, val in zip(table, (name, f"{t_old*1e6:.2f}", f"{t_new*1e6:.2f}", f"{t_skip*1e6:.2f}", f"{t_old/t_new:.1f}x",
+                                        f"{sum(map(len, expected)) / steps:.0f}", f"{skip_bytes:.0f}")):
+                col.append(val)
+
+        UI.print_table(table, ["Scenario","Legacy (us/step)","Encoder (us/step)","Encoder+skip (us/step)","Speedup",
+                               "Bytes/step","Bytes/step (skip)"], numbering=[False]*7)
+        print(f"Robot type 0, {r.no_of_joints} joints, {steps} steps per scenario, outputs of legacy and encoder match\n")
+
+
+    def other_robots(self):
+        '''
+        Compare the per-robot `World_Legacy.update_other_robot_legacy` against `Other_Robots.update_visible`,
+        with the batched path for all visible robots and with the default scalar path for a few visible robots
+        Several vision cycles are simulated, with a varying number of visible robots and visible body parts
+        '''
+        rng = np.random.default_rng(0)
+        cycles = 200
+        table = [[],[],[],[],[],[],[]]
+        scalar_max_rows = Other_Robots.SCALAR_MAX_ROWS
+
+        for n_visible in (1, 2, 3, 5, 7, 9):
+            w_old = Benchmarks.new_world(world_class=World_Legacy)
+            w_batch, w_auto = Benchmarks.new_world(), Benchmarks.new_world()
+
+            # Synthesize the relative position of the body parts seen in each cycle (rows 1-9, row 0 is self)
+            seen = rng.random((cycles, 10, 5)) < 0.7
+            seen[:,:,0] |= ~seen.any(axis=2)   # at least one body part per visible robot
+            seen[:,0] = False
+            seen[:,n_visible+1:] = False
+            sph = np.stack([rng.uniform(0.5, 8, (cycles,10,5)), rng.uniform(-60, 60, (cycles,10,5)), rng.uniform(-40, 5, (cycles,10,5))], axis=3)
+            sph += np.arange(cycles)[:,None,None,None] * 0.01 # slow motion
+
+            def load(w, c):
+                w.time_local_ms += World.VISUALSTEP_MS
+                o = w.other_robots
+                o.parts_seen[:] = seen[c]
+                o.parts_sph_rel_pos[:] = sph[c]
+                o.is_visible[:] = seen[c].any(axis=1)
+                o.update_cart_rel_pos()
+
+            def run_old(w, c):
+                load(w, c)
+                for p in w.teammates + w.opponents:
+                    if p.is_visible and not p.is_self: w.update_other_robot_legacy(p)
+
+            def run_new(w, c, max_rows):
+                Other_Robots.SCALAR_MAX_ROWS = max_rows
+                load(w, c)
+                o, r = w.other_robots, w.robot
+                o.update_visible(o.is_visible, w.time_local_ms, r.loc_head_to_field_transform, r.loc_head_position)
+
+            # Validation: the state of all robots must match after each cycle
+            error = 0
+            for c in range(cycles):
+                run_old(w_old, c)
+                run_new(w_batch, c, 0)
+                run_new(w_auto, c, scalar_max_rows)
+                o2 = w_old.other_robots
+                for o1 in (w_batch.other_robots, w_auto.other_robots):
+                    assert np.array_equal(o1.state_abs_pos_dim, o2.state_abs_pos_dim) and np.array_equal(o1.state_fallen, o2.state_fallen)
+                    assert np.array_equal(o1.state_parts_known, o2.state_parts_known)
+                    error = max(error, np.max(np.abs(o1.state_parts_abs_pos[o1.state_parts_known] - o2.state_parts_abs_pos[o2.state_parts_known])),
+                                *(np.max(np.abs(getattr(o1,k) - getattr(o2,k))) for k in ("state_abs_pos","state_filtered_velocity",
+                                "state_horizontal_dist","state_orientation","state_ground_area_center","state_ground_area_radius")))
+
+            t_old = Benchmarks.time_it(lambda: [run_old(w_old, c) for c in range(cycles)], 5) / cycles
+            t_batch = Benchmarks.time_it(lambda: [run_new(w_batch, c, 0) for c in range(cycles)], 5) / cycles
+            t_auto = Benchmarks.time_it(lambda: [run_new(w_auto, c, scalar_max_rows) for c in range(cycles)], 5) / cycles
+            Other_Robots.SCALAR_MAX_ROWS = scalar_max_rows
+
+            for col, val in zip(table, (n_visible, f"{t_old*1e6:.1f}", f"{t_batch*1e6:.1f}", f"{t_auto*1e6:.1f}", f"{t_old/t_batch:.2f}x",
+                                        f"{t_old/t_auto:.2f}x", f"{error:.1e}")):
+                col.append(val)
+
+        UI.print_table(table, ["Visible robots","Legacy (us/cycle)","Batched (us/cycle)","update_visible (us/cycle)","Speedup (batched)",
+                               "Speedup","Max abs error"], numbering=[False]*7)
+        print(f"update_visible updates up to {scalar_max_rows} robots one at a time, all include the conversion of body parts to cartesian coordinates\n")
+
+
+    def strategy_snapshot(self):
+        '''
+        Strategy work of a team of 5 agents in one process, in each cycle:
+        Strategy, formation, role assignment and the decision queries of an attacking player
+        The snapshot is either shared by all agents (same sensing data) or built by each agent
+        Queries that depend on the agent's world (e.g. ball prediction) must not be shared, which is checked at the end
+        '''
+        rng = np.random.default_rng(0)
+        cycles = 200
+        worlds = [Benchmarks.new_world(unum=u) for u in range(1,6)]
+        decision_makers = [DecisionMaker(None) for _ in worlds]
+        assigners = [RoleAssigner() for _ in worlds] # (one per agent, see Agent)
+
+        # Synthesize the sensing data of each cycle (the same for all agents)
+        states = []
+        for c in range(cycles):
+            dim = rng.choice([2,3], 10)
+            states.append((rng.uniform(-15, 15, (10,3)), dim, rng.uniform(-15, 15, 2)))
+
+        def load(c):
+            pos, dim, ball = states[c]
+            for w in worlds:
+                o = w.other_robots
+                w.time_local_ms = (c+1) * World.STEPTIME_MS
+                o.state_abs_pos[:], o.state_abs_pos_dim[:], o.state_last_update[:] = pos, dim, w.time_local_ms
+                w.ball_abs_pos[:2] = ball
+                w.ball_predictor.set_stationary(*ball)
+                w.ball_2d_pred_pos, w.ball_2d_pred_vel, w.ball_2d_pred_spd = w.ball_predictor.pos, w.ball_predictor.vel, w.ball_predictor.spd
+                w.play_mode, w.play_mode_group, w.team_side_is_left = World.M_PLAY_ON, World.MG_OTHER, True
+
+        def think(shared):
+            for w, dm, assigner in zip(worlds, decision_makers, assigners):
+                if not shared: World_Snapshot._cache.clear()
+                s = Strategy(w)
+                dm.update(s)
+                s.snapshot.role_assignment("play_on", False, assigner)
+                dm.should_pass()
+                dm.get_best_pass_target()
+                dm.count_opponents_in_radius((s.ball_2d + (15,0)) / 2, 4.0)
+                dm.get_closest_teammate_to_position(s.ball_2d)
+
+        for w in worlds:
+            w.ball_abs_pos_history.extend([np.zeros(3)] * 6)
+
+        table = [[],[],[]]
+        for name, shared in (("Snapshot per agent", False), ("Shared snapshot", True)):
+            def run():
+                for c in range(cycles):
+                    load(c)
+                    think(shared)
+            t = Benchmarks.time_it(run, 3) / cycles
+            for col, val in zip(table, (name, f"{t*1e6:.0f}", f"{t*1e6/len(worlds):.0f}")):
+                col.append(val)
+
+        # A shared snapshot must answer queries that depend on the agent's world (ball prediction) with the caller's world
+        load(0)
+        snapshots = []
+        for k, w in enumerate(worlds):
+            w.ball_predictor.predict(*states[0][2], 1 + k, -0.5 * k) # same sensing data, different ball velocity
+            snapshots.append(World_Snapshot.get(w, states[0][2]))
+        assert all(s is snapshots[0] for s in snapshots), "The snapshot should be shared"
+        positions = np.concatenate((snapshots[0].teammates_pos, snapshots[0].opponents_pos))
+        for w in worlds:
+            expected = w.get_intersections_with_ball(positions, World_Snapshot.INTERCEPT_SPEED)
+            assert all(np.array_equal(a, b, equal_nan=True) for a, b in zip(snapshots[0].intercepts(w), expected)), \
+                "A shared snapshot answered with another agent's ball prediction"
+
+        UI.print_table(table, ["Strategy (5 agents)","Team (us/cycle)","Per agent (us)"], numbering=[False]*3)
+        print()
+
+
+    def role_assignment(self):
+        '''
+        Compare the stable matching (Gale-Shapley) role assignment against the optimal assignment (Hungarian algorithm),
+        without and with warm start (`RoleAssigner` defaults)
+        Players walk randomly around a formation that follows the ball, and their observed position is noisy (0.2 m)
+        Role flapping is measured as the number of cycles where any player changed role
+        '''
+        rng = np.random.default_rng(0)
+        cycles = 500
+        table = [[],[],[],[],[],[],[],[],[]]
+
+        for size in (5, 7, 11):
+            base = rng.uniform((-14,-9), (14,9), (size,2))
+            ball = np.cumsum(rng.normal(0, 0.02, (cycles,2)), axis=0)
+            players = base + rng.normal(0, 2, (size,2)) + np.cumsum(rng.normal(0, 0.01, (cycles,size,2)), axis=0)
+            players += rng.normal(0, 0.2, players.shape) # observation noise
+            formations = [list(base + 0.3 * b) for b in ball]
+            teammates = [list(p) for p in players]
+
+            def run(assign):
+                return [assign(t, f) for t, f in zip(teammates, formations)]
+
+            def stats(results):
+                travel = np.mean([sum(np.linalg.norm(t[u-1] - pos) for u, pos in r.items()) for t, r in zip(teammates, results)])
+                roles = [{u: next(j for j,f in enumerate(form) if f is pos) for u, pos in r.items()} for r, form in zip(results, formations)]
+                switches = sum(a != b for a, b in zip(roles, roles[1:]))
+                return travel, switches
+
+            cold, warm = RoleAssigner(switch_penalty=0), RoleAssigner()
+            def run_warm():
+                warm.previous.clear()
+                return run(warm.assign)
+
+            t_gs = Benchmarks.time_it(lambda: run(stable_matching_assignment), 3) / cycles
+            t_cold = Benchmarks.time_it(lambda: run(cold.assign), 3) / cycles
+            t_warm = Benchmarks.time_it(run_warm, 3) / cycles
+
+            (travel_gs, sw_gs), (travel_cold, sw_cold), (travel_warm, sw_warm) = \
+                stats(run(stable_matching_assignment)), stats(run(cold.assign)), stats(run_warm())
+
+            for col, val in zip(table, (size, f"{t_gs*1e6:.0f}", f"{t_cold*1e6:.0f}", f"{t_warm*1e6:.0f}", f"{travel_gs:.2f}",
+                                        f"{travel_cold:.2f}", f"{travel_warm:.2f}", f"{sw_gs}/{sw_cold}/{sw_warm}", f"{(1-travel_cold/travel_gs):.1%}")):
+                col.append(val)
+
+        UI.print_table(table, ["Players","Gale-Shapley (us)","Hungarian (us)","Warm start (us)","Travel GS (m)",
+                               "Travel optimal (m)","Travel warm (m)","Role switches GS/opt/warm","Travel saved"], numbering=[False]*9)
+        print(f"{cycles} cycles per size, role switches: cycles where any player changed role\n")
+
+
+    def path_planning(self):
+        '''
+        Compare the A* planner (a_star.compute) against the incremental planner (a_star.Planner), which keeps the
+        obstacle map, the learned heuristic and the last search between cycles
+        A robot walks along its path (1 cm per cycle) among slowly moving obstacles, towards a target that is sometimes nudged
+        The scenes are recorded once, with a_star.compute, and replayed to both planners
+        '''
+        rng = np.random.default_rng(0)
+        episodes, cycles = 10, 150
+
+        # Record the path parameters of each cycle (see Path_Manager.get_path)
+        scenes = []
+        for _ in range(episodes):
+            oob = rng.random() < 0.7
+            start = rng.uniform((-14,-9), (14,9))
+            target = None if rng.random() < 0.2 else rng.uniform((-14,-9), (14,9))
+            n = rng.integers(2, 8)
+            center = start if target is None else start + (target - start) * rng.uniform(0.2, 0.8, (n,1))
+            obst = np.column_stack([center + rng.normal(0, 1, (n,2)), rng.uniform(0.2, 0.6, n), rng.choice([0.6,1.0,2.3], n), rng.choice([1.0,1.5], n)])
+            vel = rng.normal(0, 0.01, (n,2))
+            scene = []
+            for _ in range(cycles):
+                obst[:,:2] += vel
+                obst[:,2] = np.clip(obst[:,2] + rng.normal(0, 0.005, n), 0.15, 0.7)
+                if target is not None and rng.random() < 0.02:
+                    target = target + rng.normal(0, 0.3, 2)
+                params = np.array([*start, int(oob), int(target is None), *(target if target is not None else (0,0)), 3000, *obst.ravel()], np.float32)
+                scene.append(params)
+                path = a_star.compute(params)[:-2]
+                if len(path) >= 4:
+                    step = path[2:4] - start
+                    step_len = np.linalg.norm(step)
+                    start = start + (step / step_len * 0.01 if step_len > 0.01 else step)
+            scenes.append(scene)
+
+        # Replay (the best of 3 runs is kept for each cycle)
+        total = episodes * cycles
+        times = np.full((2,total), np.inf)
+        expanded, results, modes = np.zeros((2,total)), [[None]*total, [None]*total], np.zeros((total,), int)
+        for _ in range(3):
+            i = 0
+            for scene in scenes:
+                planner = a_star.Planner()
+                for params in scene:
+                    t0 = perf_counter()
+                    results[0][i] = a_star.compute(params)
+                    times[0,i] = min(times[0,i], perf_counter() - t0)
+                    expanded[0,i] = a_star.get_expanded_nodes()
+                    t0 = perf_counter()
+                    results[1][i] = planner.compute(params)
+                    times[1,i] = min(times[1,i], perf_counter() - t0)
+                    expanded[1,i], modes[i] = planner.expanded_nodes, planner.mode
+                    i += 1
+
+        ref_status = np.array([r[-2] for r in results[0]])
+        new_status = np.array([r[-2] for r in results[1]])
+        solved = (ref_status == 0) & (new_status == 0)
+        cost_ratio = np.array([n[-1] / r[-1] for r, n in zip(results[0], results[1])])[solved]
+
+        table = [[],[],[],[],[],[]]
+        mode_names = ("New search", "Resumed search", "Reused path", "No obstacles")
+        for m, name in [(None, "All")] + list(enumerate(mode_names)):
+            rows = np.ones(total, bool) if m is None else modes == m
+            if not rows.any(): continue
+            for col, val in zip(table, (name, np.count_nonzero(rows), f"{np.mean(times[0,rows])*1e6:.0f}", f"{np.mean(times[1,rows])*1e6:.0f}",
+                                        f"{np.mean(expanded[0,rows]):.0f}", f"{np.mean(expanded[1,rows]):.0f}")):
+                col.append(val)
+
+        UI.print_table(table, ["Planner mode","Cycles","a_star.compute (us)","Planner (us)","Expanded (compute)","Expanded (Planner)"], numbering=[False]*6)
+        print(f"{episodes} episodes x {cycles} cycles, timeouts (3 ms) compute/Planner: {np.count_nonzero(ref_status == 1)}/{np.count_nonzero(new_status == 1)}, "
+              f"path cost Planner/compute (both solved): mean {np.mean(cost_ratio):.6f}, max {np.max(cost_ratio):.6f}\n")
+
+
+    def multi_query_paths(self):
+        '''
+        Compare N calls to a_star.compute against one call to a_star.Planner.compute_batch, with the same obstacles
+        - candidate targets: one start (our position) and N targets around it (e.g. to rank dribble or receiving targets)
+        - players to target: N starts around one target (e.g. which teammate is closer to the ball, avoiding obstacles)
+        '''
+        rng = np.random.default_rng(0)
+        scenes_no = 30
+        table = [[],[],[],[],[],[],[]]
+
+        for name, same_start in (("Candidate targets", True), ("Players to target", False)):
+            for n in (4, 8, 16):
+                scenes = []
+                for _ in range(scenes_no):
+                    center = rng.uniform((-12,-7), (12,7))
+                    others = center + rng.normal(0, 3, (n,2))
+                    starts, targets = (np.tile(center, (n,1)), others) if same_start else (others, np.tile(center, (n,1)))
+                    obst = np.column_stack([center + rng.normal(0, 3, (8,2)), rng.uniform(0.2, 0.6, 8), rng.choice([0.6,1.0,2.3], 8), rng.choice([1.0,1.5], 8)])
+                    single = [np.array([*s, 1, 0, *t, 3000, *obst.ravel()], np.float32) for s, t in zip(starts, targets)]
+                    batch = np.array([1, 3000, n, *np.column_stack([starts, np.zeros(n), targets]).ravel(), *obst.ravel()], np.float32)
+                    scenes.append((single, batch))
+
+                def run_single():
+                    return [[a_star.compute(p) for p in single] for single, _ in scenes]
+
+                planner = a_star.Planner() # (the planner is kept between cycles, like Path_Manager.batch_planner)
+                def run_batch():
+                    return [planner.compute_batch(batch) for _, batch in scenes]
+
+                t_single = Benchmarks.time_it(run_single, 3) / scenes_no
+                t_batch = Benchmarks.time_it(run_batch, 3) / scenes_no
+
+                # Expanded nodes and path costs
+                exp_single = exp_batch = 0
+                costs_single, costs_batch = [], []
+                for single, batch in scenes:
+                    for p in single:
+                        costs_single.append(a_star.compute(p)[-2:])
+                        exp_single += a_star.get_expanded_nodes()
+                    ret = planner.compute_batch(batch)
+                    exp_batch += planner.expanded_nodes
+                    i = 0
+                    while i < len(ret):
+                        size = int(ret[i])
+                        costs_batch.append(ret[i+size-1:i+size+1])
+                        i += size + 1
+
+                costs_single, costs_batch = np.array(costs_single), np.array(costs_batch)
+                solved = (costs_single[:,0] != 1) & (costs_batch[:,0] != 1)
+                worse = np.count_nonzero(costs_batch[solved,1] > costs_single[solved,1] * (1 + 1e-5))
+
+                for col, val in zip(table, (name, n, f"{t_single*1e6:.0f}", f"{t_batch*1e6:.0f}", f"{exp_single/scenes_no:.0f}",
+                                            f"{exp_batch/scenes_no:.0f}", worse)):
+                    col.append(val)
+
+        UI.print_table(table, ["Queries","N","N x compute (us)","compute_batch (us)","Expanded (compute)","Expanded (batch)","Costlier paths"], numbering=[False]*7)
+        print(f"{scenes_no} scenes per row, costlier paths: batch paths with a higher cost than the path of 'compute' (ignoring timeouts)\n")
+
+
+    def cost_field(self):
+        '''
+        Compare N calls to a_star.compute (each player to the ball) against one cost field from the ball (see Cost_Field)
+        - full field: the cost of every cell, then N lookups
+        - stop at closest: the field is only computed until the first player is reached (see World_Snapshot.fastest_teammate_to_ball)
+        And the election of the active player of a team: straight line, cost field only if the straight line is contested, and N x A*
+        Opponents are soft obstacles, as in World.get_ball_cost_field
+        '''
+        rng = np.random.default_rng(0)
+        scenes_no = 30
+        table = [[],[],[],[],[],[],[]]
+        planner = a_star.Planner()
+
+        for n in (5, 10):
+            scenes = []
+            for _ in range(scenes_no):
+                ball = rng.uniform((-13,-8), (13,8))
+                players = np.clip(ball + rng.normal(0, 5, (n,2)), (-15,-10), (15,10))
+                obst = [(*o, 0, 1.0, 1.0) for o in np.clip(ball + rng.normal(0, 3, (5,2)), (-15,-10), (15,10))]
+                single = [np.array([*p, 1, 0, *ball, 1e6, *np.ravel(obst)], np.float32) for p in players]
+                scenes.append((ball, players, obst, single))
+
+            def run_single():
+                return [[a_star.compute(p)[-2:] for p in single] for _, _, _, single in scenes]
+
+            def run_field():
+                return [Cost_Field(planner, ball, obst).costs(players) for ball, players, obst, _ in scenes]
+
+            def run_stop():
+                return [np.argmin(Cost_Field(planner, ball, obst, stop_positions=players).costs(players)) for ball, players, obst, _ in scenes]
+
+            t_single = Benchmarks.time_it(run_single, 3) / scenes_no
+            t_field = Benchmarks.time_it(run_field, 3) / scenes_no
+            t_stop = Benchmarks.time_it(run_stop, 3) / scenes_no
+
+            ref = np.array(run_single())       # (scenes, n, 2) status and cost of each path
+            field = np.array(run_field())      # (scenes, n) cost of each player
+            solved = ref[...,0] == 0
+            err = np.abs(field[solved] - ref[...,1][solved])
+            ref_closest = np.argmin(np.where(ref[...,0] != 1, ref[...,1], np.inf), axis=1)
+            same_closest = np.count_nonzero(np.array(run_stop()) == ref_closest)
+
+            for col, val in zip(table, (n, f"{t_single*1e6:.0f}", f"{t_field*1e6:.0f}", f"{t_stop*1e6:.0f}", f"{np.mean(err):.3f}",
+                                        f"{np.max(err):.3f}", f"{same_closest}/{scenes_no}")):
+                col.append(val)
+
+        UI.print_table(table, ["Players","N x compute (us)","Full field (us)","Stop at closest (us)","Mean cost error (m)",
+                               "Max cost error (m)","Same closest player"], numbering=[False]*7)
+        print(f"{scenes_no} scenes per row, cost error: |field cost - path cost| of players whose path was searched (status 0)\n"
+              f"(a_star.compute returns a straight line if it is clear of obstacles, which can be shorter than the 8-connected grid path of the field)\n")
+
+        # Active player election of a team (once per snapshot), 5 teammates and 5 opponents around the ball
+        w = Benchmarks.new_world(unum=1)
+        o = w.other_robots
+        scenes = []
+        for _ in range(200):
+            ball = rng.uniform((-13,-8), (13,8))
+            scenes.append((ball, np.clip(ball + rng.normal(0, 5, (5,2)), (-15,-10), (15,10)), np.clip(ball + rng.normal(0, 3, (5,2)), (-15,-10), (15,10))))
+
+        def load(ball, players, opponents):
+            w.time_local_ms += World.STEPTIME_MS
+            o.state_abs_pos[:,:2] = np.concatenate((players, opponents))
+            o.state_abs_pos_dim[:], o.state_last_update[:], o.state_fallen[:] = 3, w.time_local_ms, False
+            return World_Snapshot(w, ball)
+
+        eligible = np.ones(5, bool)
+        def elect(method):
+            out = []
+            for ball, players, opponents in scenes:
+                snap = load(ball, players, opponents)
+                if method == "straight":
+                    out.append(int(np.argmin(snap.teammates_targets_dist[:,World_Snapshot.SLOW_BALL])) + 1)
+                elif method == "gated":
+                    out.append(snap.fastest_teammate_to_ball(w, eligible))
+                else: # one A* per teammate
+                    obst = np.ravel([(*p, 0, 1.0, 1.0) for p in opponents])
+                    res = np.array([a_star.compute(np.array([*p, 1, 0, *ball, 1e6, *obst], np.float32))[-2:] for p in players])
+                    out.append(int(np.argmin(np.where(res[:,0] != 1, res[:,1], np.inf))) + 1)
+            return out
+
+        methods = ("straight", "gated", "A*")
+        times = [Benchmarks.time_it(lambda: elect(m), 3) / len(scenes) for m in methods]
+        results = [elect(m) for m in methods]
+        contested = sum(load(*sc).is_contested(eligible) for sc in scenes)
+        table = [["Straight line", "Field if contested", "N x A*"], [f"{t*1e6:.0f}" for t in times],
+                 [f"{sum(a == b for a, b in zip(r, results[2]))}/{len(scenes)}" for r in results]]
+        UI.print_table(table, ["Election (5 players)", "Time per snapshot (us)", "Same as A*"], numbering=[False]*3)
+        print(f"The straight line to the ball was contested by an opponent in {contested}/{len(scenes)} scenes (field computed)\n"
+              f"World_Snapshot.ELECT_BY_TRAVEL_COST is {World_Snapshot.ELECT_BY_TRAVEL_COST} (straight line election by default)\n")
+
+
+    def ball_prediction(self):
+        '''
+        Ball prediction and intersection queries of one agent, for a rolling ball seen every other cycle (vision)
+        - module functions: the prediction is copied to new arrays, which are sliced every cycle, and each intersection
+          query copies the whole prediction into its parameters
+        - ball_predictor.Predictor: the prediction stays in the predictor's buffer, and each query only passes the robot state
+        In each cycle, the intersection point of every teammate and opponent (10 robots) is computed
+        '''
+        rng = np.random.default_rng(0)
+        episodes, cycles = 50, 100
+        scenes = [(rng.uniform((-14,-9),(14,9)), rng.normal(0,3,2), rng.uniform((-15,-10),(15,10),(10,2)).astype(np.float32),
+                   rng.uniform(0.3,0.8,10).astype(np.float32)*0.02) for _ in range(episodes)]
+
+        def run_module():
+            out = []
+            for ball, vel, players, speeds in scenes:
+                for c in range(cycles):
+                    if c % 2 == 0: # new prediction (see World.update)
+                        pred_ret = ball_predictor.predict_rolling_ball(np.array([*ball, *vel], np.float32))
+                        sample_no = len(pred_ret) // 5 * 2
+                        pos, spd = pred_ret[:sample_no].reshape(-1, 2), pred_ret[sample_no*2:]
+                    elif len(pos) > 1:
+                        pos, spd = pos[1:], spd[1:]
+                    out.append([ball_predictor.get_intersection(np.array([*p, s, *pos.flat], np.float32)) for p, s in zip(players, speeds)])
+            return out
+
+        predictor = ball_predictor.Predictor()
+        def run_predictor():
+            out = []
+            for ball, vel, players, speeds in scenes:
+                for c in range(cycles):
+                    if c % 2 == 0:
+                        predictor.predict(*ball, *vel)
+                    else:
+                        predictor.advance()
+                    pos, spd = predictor.pos, predictor.spd
+                    out.append(predictor.get_intersections(players, speeds))
+            return out
+
+        t_module = Benchmarks.time_it(run_module, 3) / (episodes * cycles)
+        t_predictor = Benchmarks.time_it(run_predictor, 3) / (episodes * cycles)
+        same = np.array_equal(np.array(run_module()), np.array(run_predictor()))
+
+        UI.print_table([["Module functions","Predictor"],[f"{t_module*1e6:.1f}",f"{t_predictor*1e6:.1f}"]],
+                       ["Ball prediction","Time per cycle (us)"], numbering=[False]*2)
+        print(f"{episodes} episodes x {cycles} cycles, same intersections: {same}\n")
+
+
+    def radio_codec(self):
+        '''
+        Compare the legacy radio encoder/decoder (Radio_Legacy.broadcast_legacy, Radio_Legacy.receive_legacy) against Radio_Codec
+        (Radio.broadcast, Radio.receive), for random world states (some players unknown, fallen, or out of bounds)
+        - the messages and the world state after receiving them must be the same
+        - round trip: decoding an encoded group must return the same players (unknown, out of bounds, fallen) and the
+          same positions, up to the grid resolution, for random groups and edge cases (field limits, 1m absorption band,
+          all unknown, all out of bounds, maximum combination)
+        - invalid messages (invalid symbols, leading ';') must not be decoded
+        '''
+        rng = np.random.default_rng(0)
+        cycles = 3000
+
+        def load(w, c, seed):
+            ''' Random state of world `w` in cycle `c` (the same for the same seed) '''
+            g = np.random.default_rng(seed)
+            o, r = w.other_robots, w.robot
+            w.time_local_ms = 10000 + c * World.STEPTIME_MS
+            w.time_server = c * 0.02
+            o.state_last_update[:] = np.where(g.random(10) < 0.03, 0, w.time_local_ms - g.choice([0,0,0,20,20,60,400], 10))
+            o.state_abs_pos[:] = g.uniform((-18,-13,0.2), (18,13,0.6), (10,3))
+            o.state_abs_pos_dim[:] = np.where(o.state_last_update == 0, 0, g.choice([2,3,3,3], 10))
+            o.state_fallen[:] = g.random(10) < 0.2
+            o.state_filtered_velocity[:] = g.normal(0, 1, (10,3))
+            o.state_horizontal_dist[:] = o.state_parts_known[:] = o.state_ground_area_is_known[:] = 0
+            w.ball_abs_pos = np.array([*g.uniform((-16,-11), (16,11)), 0.042])
+            w.ball_abs_pos_last_update = w.time_local_ms - g.choice([0,60])
+            r.loc_last_update = w.time_local_ms - g.choice([0,0,200])
+            r.loc_head_position[:] = g.uniform((-15,-10,0.4), (15,10,0.5))
+
+        def state(w):
+            o, r = w.other_robots, w.robot
+            return [o.state_fallen, o.state_last_update, o.state_abs_pos, o.state_abs_pos_dim, o.state_filtered_velocity, o.state_horizontal_dist,
+                    o.state_parts_abs_pos, o.state_parts_known, o.state_parts_dim, o.state_ground_area_center, o.state_ground_area_radius,
+                    o.state_ground_area_is_known, w.ball_abs_pos, w.ball_abs_vel, r.loc_head_position, r.radio_fallen_state, r.radio_last_update]
+
+        # Messages of each cycle (sender with unum 2), legacy and codec
+        sender = Benchmarks.new_world(unum=2)
+        msgs = [[], []]
+        radio = Radio_Legacy(sender, lambda m: msgs[commit].append(m))
+        seeds = rng.integers(0, 2**31, cycles)
+
+        def send(legacy):
+            ''' Returns the time spent in the broadcast calls '''
+            t = 0
+            for c in range(cycles):
+                load(sender, c, seeds[c])
+                t0 = perf_counter()
+                radio.broadcast_legacy() if legacy else radio.broadcast()
+                t += perf_counter() - t0
+            return t
+        commit = 0; send(True)
+        commit = 1; send(False)
+        assert msgs[0] == msgs[1], "Radio_Codec messages differ from the legacy messages!"
+        t_send_legacy = min(send(True) for _ in range(3)) / cycles
+        t_send = min(send(False) for _ in range(3)) / cycles
+
+        # World state after receiving each message (receiver with unum 4)
+        receivers = [Benchmarks.new_world(unum=4), Benchmarks.new_world(unum=4)]
+        radios = [Radio_Legacy(receivers[0], None), Radio(receivers[1], None)]
+        mismatches = 0
+        for c, msg in enumerate(msgs[0]):
+            for w, rd, receive in zip(receivers, radios, ("receive_legacy", "receive")):
+                load(w, c, seeds[c] + 1)
+                getattr(rd, receive)(msg)
+            mismatches += any(not np.array_equal(a, b) for a, b in zip(state(receivers[0]), state(receivers[1])))
+        assert mismatches == 0, "World states differ after Radio.receive and Radio.receive_legacy!"
+
+        def receive(legacy):
+            ''' Returns the time spent in the receive calls '''
+            t = 0
+            for c, msg in enumerate(msgs[0]):
+                load(receivers[0], c, seeds[c] + 1)
+                t0 = perf_counter()
+                radios[0].receive_legacy(msg) if legacy else radios[0].receive(msg)
+                t += perf_counter() - t0
+            return t
+        t_recv_legacy = min(receive(True) for _ in range(3)) / len(msgs[0])
+        t_recv = min(receive(False) for _ in range(3)) / len(msgs[0])
+
+        # Encode/decode throughput and round trip (all groups, without the broadcast requirements)
+        codec = radio.codec
+        groups = []
+        for _ in range(cycles):
+            no = int(rng.integers(0, 3))
+            n = len(codec.groups[no][1])
+            groups.append((no, *rng.uniform((-16,-11), (16,11)), rng.uniform((-18,-13), (18,13), (n,2)), rng.random(n) < 0.1, rng.random(n) < 0.2))
+        lists = [(no, bx, by, pos.tolist(), unknown.tolist(), down.tolist()) for no, bx, by, pos, unknown, down in groups]
+        encoded = [codec.encode(*g) for g in lists]
+        t_encode = Benchmarks.time_it(lambda: [codec.encode(*g) for g in lists], 3) / cycles
+        t_decode = Benchmarks.time_it(lambda: [codec.decode(m) for m in encoded], 3) / cycles
+
+        def round_trip(codec, no, bx, by, pos, unknown, down):
+            ''' True if decoding the encoded group returns the same players, up to the grid resolution '''
+            pos, unknown, down = np.asarray(pos, float).reshape(-1,2), np.asarray(unknown, bool), np.asarray(down, bool)
+            m = codec.encode(no, bx, by, pos.tolist(), unknown.tolist(), down.tolist())
+            d_no, ball, d_pos, d_down, status = codec.decode(m)
+            infos = codec.groups[no][1]
+            grid = np.array([(1/i[4], 1/i[5]) for i in infos]).reshape(-1,2)             # cell size of each player (x,y)
+            oob = ~unknown & ((np.abs(pos[:,0]) > 17) | (np.abs(pos[:,1]) > 12))
+            clipped = np.clip(pos, (-16,-11), (16,11))                                   # (positions are absorbed up to 1m out of bounds)
+            ok = len(m) <= 20 and d_no == no and np.array_equal(status == Radio_Codec.UNKNOWN, unknown) and np.array_equal(status == Radio_Codec.OUT_OF_BOUNDS, oob)
+            valid = status == Radio_Codec.VALID
+            ok = ok and np.array_equal(d_down[valid], down[valid]) and np.all(np.abs(d_pos - clipped)[valid] <= grid[valid] / 2 + 1e-9)
+            if codec.groups[no][0]:
+                ok = ok and np.all(np.abs(ball[:2] - np.clip((bx, by), (-15,-10), (15,10))) <= 0.05 + 1e-9)
+            return bool(ok)
+
+        round_trip_errors = sum(not round_trip(codec, *g) for g in groups)
+        assert round_trip_errors == 0, f"Radio_Codec round trip failed for {round_trip_errors}/{cycles} random groups!"
+
+        # Edge cases: field limits and the 1m absorption band, all unknown, all out of bounds, maximum combination
+        # (also for the 11 player layout of the original radio, whose maximum combination has 20 symbols)
+        TP, OP = Radio_Codec.TP, Radio_Codec.OP
+        codec_11 = Radio_Codec([(True, [TP]*2 + [OP]*5), (False, [TP]*7), (False, [TP]*2 + [OP]*6)])
+        edges = []
+        limits_x = (-17-1e-9, -17, -16.5, -16, 0, 16, 16.5, 17, 17+1e-9)
+        limits_y = (-12-1e-9, -12, -11.5, -11, 0, 11, 11.5, 12, 12+1e-9)
+        for c in (codec, codec_11):
+            for no, (_, infos) in enumerate(c.groups):
+                n = len(infos)
+                for x in limits_x:
+                    for y in limits_y:
+                        for down in (False, True):
+                            edges.append((c, no, x, y, [(x,y)]*n, [False]*n, [down]*n))
+                edges.append((c, no, 0, 0, [(0,0)]*n, [True]*n, [False]*n))                      # all unknown
+                edges.append((c, no, 0, 0, ([(20,0),(0,-20),(-18,13)]*n)[:n], [False]*n, [False]*n)) # all out of bounds
+                edges.append((c, no, 15, 10, [(0,0)]*n, [True]*n, [False]*n))                    # maximum combination (ball at the corner)
+        edge_errors = [e[1:] for e in edges if not round_trip(*e)]
+        assert not edge_errors, f"Radio_Codec round trip failed for edge case {edge_errors[0]}"
+
+        longest = [max(len(c.encode(no, 15, 10, [(0,0)]*len(infos), [True]*len(infos), [False]*len(infos))) for no, (_, infos) in enumerate(c.groups))
+                   for c in (codec, codec_11)]
+        assert longest[1] == 20, f"The maximum combination of the 11 player layout should have 20 symbols, not {longest[1]}"
+
+        # Invalid messages: empty, invalid symbols, leading ';' (see Radio_Codec.encode)
+        valid_msg = encoded[0]
+        for msg in (b"", b";", b";" + valid_msg[1:], valid_msg + b" ", valid_msg[:1] + b"\x00" + valid_msg[2:], b'"' + valid_msg[1:], "\u00e9".encode()):
+            assert codec.decode(msg) == (None,) * 5, f"Invalid radio message was decoded: {msg}"
+
+        table = [["Broadcast (check+encode)", "Receive (decode+update)"], [f"{t_send_legacy*1e6:.1f}", f"{t_recv_legacy*1e6:.1f}"],
+                 [f"{t_send*1e6:.1f}", f"{t_recv*1e6:.1f}"], [f"{t_send_legacy/t_send:.1f}x", f"{t_recv_legacy/t_recv:.1f}x"]]
+        UI.print_table(table, ["Radio", "Legacy (us)", "Radio_Codec (us)", "Speedup"], numbering=[False]*4)
+        print(f"{cycles} cycles, {len(msgs[0])} messages, messages and world states match the legacy radio\n"
+              f"Codec only: encode {t_encode*1e6:.1f} us/msg, decode {t_decode*1e6:.1f} us/msg, "
+              f"round trip: {cycles} random groups and {len(edges)} edge cases match (longest message: {longest[0]} symbols)\n")
+
+
+    def draw_frames(self):
+        '''
+        Compare immediate drawings (one datagram per command) against batched frames (see Draw.send_frame), for 5 agents
+        drawing path obstacles, path segments, formation positions and a status annotation in every cycle
+        RoboViz is replaced by a local UDP socket, whose datagrams are parsed to check that RoboViz would show the same
+        drawings at the end of every cycle, and that a RoboViz started in the middle of the run shows all drawings after
+        the next full refresh (see Draw.REFRESH_INTERVAL)
+        '''
+        cycles = 300
+        rng = np.random.default_rng(0)
+        robots = np.cumsum(rng.normal(0, 0.01, (cycles, 10, 2)), axis=0) + rng.uniform((-14,-9), (14,9), (10,2))
+        robots[:, 5:] = np.round(robots[:, 5:], 1) # opponents are seen with less precision (their drawings change less often)
+        balls = np.repeat(rng.uniform((-10,-6), (10,6), (cycles//50, 2)), 50, axis=0) # the ball moves every 50 cycles
+
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        receiver.setblocking(False)
+        old_socket, Draw._socket = Draw._socket, socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        Draw._socket.connect(receiver.getsockname())
+
+        draws = []
+        for unum in range(1, 6):
+            draws.append(Draw(True, unum, "127.0.0.1", 0))
+            draws[-1].set_team_side(False)
+
+        def cycle(c):
+            for i, d in enumerate(draws):
+                obstacles = [(*robots[c,j], 0.15, 1.0, 5) for j in range(10) if j != i] + [(*balls[c], 0, 0.5, 8)]
+                for o in obstacles:
+                    if o[3] > 0: d.circle(o[:2], o[3], o[4]/2, d.Color.orange, "path_obstacles", False)
+                    if o[2] > 0: d.circle(o[:2], o[2], 1, d.Color.red, "path_obstacles", False)
+                d.flush("path_obstacles")
+                path = np.linspace(robots[c,i], balls[c], 12)
+                for j in range(len(path)-1):
+                    d.line(path[j], path[j+1], 1, d.Color.green_lawn, "path_segments", False)
+                d.flush("path_segments")
+                formation = np.round(balls[c] * 0.5 + (-8 + 3*i, 2*i - 4), 1)
+                d.line(robots[c,i], formation, 2, d.Color.blue, "formation_line")
+                for j in range(5):
+                    d.circle(balls[c] * 0.5 + (-8 + 3*j, 2*j - 4), 0.3, 2, d.Color.cyan, f"formation_{j}")
+                d.annotation((0, 10.5), "ACTIVE - PLAY_ON" if i == c // 100 else "Supporting (SUPPORT)", d.Color.white, "status")
+            Draw.send_frame()
+
+        def parse(datagram, back, front):
+            ''' Apply the commands of a datagram to the buffers of a RoboViz model (key: drawing id, value: commands) '''
+            i = 0
+            while i < len(datagram):
+                kind, shape = datagram[i], datagram[i+1]
+                if kind == 0: # swap buffers of every drawing whose id starts with the given prefix
+                    end = datagram.index(0, i+2)
+                    prefix = datagram[i+2:end]
+                    for id in [k for k in back.keys() | front.keys() if k.startswith(prefix)]:
+                        front[id] = back.pop(id, [])
+                    i = end + 1
+                    continue
+                if kind == 1:
+                    size = {0: 29, 1: 47, 2: 29, 3: 29}.get(shape) or 7 + 18 * datagram[i+2]
+                else: # annotation (position, color, text)
+                    size = datagram.index(0, i+23) + 1 - i
+                end = datagram.index(0, i+size)
+                back.setdefault(datagram[i+size:end], []).append(datagram[i:i+size])
+                i = end + 1
+
+        results = []
+        late_start = cycles // 2 # a RoboViz started at this cycle only receives the following datagrams
+        for batched in (False, True):
+            Draw.batched = batched
+            Draw.clear_all()
+            Draw.sent_datagrams = Draw.sent_bytes = Draw.skipped_drawings = 0
+            back, front, shown, t = {}, {}, [], 0
+            late_back, late_front, late_shown = {}, {}, []
+            while True: # drain the clear_all datagram
+                try: receiver.recv(1 << 16)
+                except BlockingIOError: break
+            for c in range(cycles):
+                if c == late_start: # the next frame is a full refresh
+                    Draw._last_refresh = -Draw.REFRESH_INTERVAL
+                t0 = perf_counter()
+                cycle(c)
+                t += perf_counter() - t0
+                while True:
+                    try: datagram = receiver.recv(1 << 16)
+                    except BlockingIOError: break
+                    parse(datagram, back, front)
+                    if c >= late_start: parse(datagram, late_back, late_front)
+                shown.append({k: v for k, v in front.items() if v})
+                late_shown.append({k: v for k, v in late_front.items() if v})
+            assert shown[late_start+1:] == late_shown[late_start+1:], "A RoboViz started late would not show all drawings after a refresh!"
+            results.append((t, Draw.sent_datagrams, Draw.sent_bytes, Draw.skipped_drawings, shown))
+
+        Draw.batched = True
+        Draw._socket.close()
+        Draw._socket = old_socket
+        receiver.close()
+        assert results[0][4] == results[1][4], "RoboViz would show different drawings with batched frames!"
+
+        table = [["Immediate", "Batched frames"]]
+        table.append([f"{r[0]/cycles*1e6:.0f}" for r in results])
+        table.append([f"{r[1]/cycles:.1f}" for r in results])
+        table.append([f"{r[2]/cycles:.0f}" for r in results])
+        table.append([f"{r[3]/cycles:.1f}" for r in results])
+        UI.print_table(table, ["Draw", "Time per cycle (us)", "Syscalls per cycle", "Bytes per cycle", "Unchanged drawings skipped"], numbering=[False]*5)
+        print(f"{cycles} cycles, 5 agents, RoboViz would show the same drawings at the end of every cycle "
+              f"(and all drawings after a full refresh if it was started late)\n")
+
+
+    def slot_engine(self):
+        '''
+        Compare the previous Slot_Engine (XML files parsed by every agent, slots stored as lists) against compiled motions
+        - construction: XML parsing (previous), compilation (no cache), disk cache (another process), memory cache (another agent)
+        - execution: every slot behavior of every robot type, with synthetic joint feedback
+          (the joint target speeds must be the same in every step)
+        '''
+        slot_dir = M.get_active_directory("/behaviors/slot/")
+        worlds = [Benchmarks.new_world(robot_type=t) for t in range(5)]
+
+        def parse_previous(w):
+            ''' Previous Slot_Engine.__init__: behaviors[name] = [(delta_ms, indices, angles), ...] '''
+            behaviors = dict()
+            for d in ("common", f"r{w.robot.type}"):
+                for fname in listdir(slot_dir + d):
+                    if not fname.endswith(".xml"): continue
+                    slots = []
+                    for xml_slot in xmlp.parse(path.join(slot_dir, d, fname)).getroot():
+                        indices = [int(action.attrib['id']) for action in xml_slot]
+                        angles = [float(action.attrib['angle']) for action in xml_slot]
+                        slots.append((float(xml_slot.attrib['delta']) * 1000, indices, angles))
+                    behaviors[fname[:-4]] = slots
+            return behaviors
+
+        def execute_previous(state, slots, w, reset):
+            ''' Previous Slot_Engine.execute (state: [slot number, slot start time, start angles]) '''
+            r = w.robot
+            if reset: state[:] = [0, w.time_local_ms, np.copy(r.joints_position)]
+            elapsed_ms = w.time_local_ms - state[1]
+            delta_ms, indices, angles = slots[state[0]]
+            if elapsed_ms >= delta_ms:
+                state[2][indices] = angles
+                if state[0]+1 == len(slots): return True
+                state[0] += 1
+                elapsed_ms = 0
+                state[1] = w.time_local_ms
+                delta_ms, indices, angles = slots[state[0]]
+            progress = (elapsed_ms+20) / delta_ms
+            target = (angles - state[2][indices]) * progress + state[2][indices]
+            r.set_joints_target_position_direct(indices,target,False)
+            return bool(elapsed_ms+20 >= delta_ms and state[0] + 1 == len(slots))
+
+        # Construction (5 agents, one of each robot type)
+        tmp = tempfile.mkdtemp()
+        try:
+            tmp_dir = path.join(tmp, "slot") + "/"
+            shutil.copytree(slot_dir, tmp_dir, ignore=shutil.ignore_patterns(".compiled"))
+            def load(w):
+                behaviors = Slot_Engine.load_dir(tmp_dir, "common")
+                behaviors.update(Slot_Engine.load_dir(tmp_dir, f"r{w.robot.type}"))
+                return behaviors
+            def no_cache():
+                shutil.rmtree(tmp_dir + ".compiled", ignore_errors=True)
+                Slot_Engine._motions.clear()
+                for w in worlds: load(w)
+            def disk_cache():
+                Slot_Engine._motions.clear()
+                for w in worlds: load(w)
+            t_parse = Benchmarks.time_it(lambda: [parse_previous(w) for w in worlds], 10) / 5
+            t_compile = Benchmarks.time_it(no_cache, 10) / 5
+            t_disk = Benchmarks.time_it(disk_cache, 10) / 5
+            t_memory = Benchmarks.time_it(lambda: [load(w) for w in worlds], 10) / 5
+        finally:
+            shutil.rmtree(tmp)
+
+        # Execution
+        steps, mismatches, t_previous, t_compiled = 0, 0, 0, 0
+        for w in worlds:
+            r = w.robot
+            engine = Slot_Engine(w)
+            previous = parse_previous(w)
+            for name in sorted(engine.behaviors):
+                for repeat in range(5):
+                    feedback = np.random.default_rng(repeat).uniform(-30, 30, r.no_of_joints)
+                    speeds = []
+                    for compiled in (False, True):
+                        r.joints_position[:] = feedback
+                        r.joints_target_last_speed[:] = 0
+                        w.time_local_ms = 1000
+                        state, reset, done, t = [None]*3, True, False, 0
+                        speeds.append([])
+                        while not done:
+                            r.joints_target_speed[:] = 0
+                            t0 = perf_counter()
+                            done = engine.execute(name, reset) if compiled else execute_previous(state, previous[name], w, reset)
+                            t += perf_counter() - t0
+                            speeds[-1].append(r.joints_target_speed.copy())
+                            r.joints_position += r.joints_target_speed * 0.8 * 1.1459156 # joints move 80% of the expected amount
+                            r.joints_target_last_speed[:] = r.joints_target_speed
+                            w.time_local_ms += 20
+                            reset = False
+                        if compiled: t_compiled += t
+                        else: t_previous += t
+                    steps += len(speeds[0])
+                    mismatches += len(speeds[0]) != len(speeds[1]) or not np.array_equal(speeds[0], speeds[1])
+        assert mismatches == 0, "Compiled slot behaviors produce different joint targets!"
+
+        UI.print_table([["Previous (XML)", "Compiled (no cache)", "Compiled (disk cache)", "Compiled (memory cache)"],
+                        [f"{t*1e3:.2f}" for t in (t_parse, t_compile, t_disk, t_memory)]],
+                       ["Slot behaviors", "Load per agent (ms)"], numbering=[False]*2)
+        UI.print_table([["Previous (lists)", "Compiled"], [f"{t_previous/steps*1e6:.1f}", f"{t_compiled/steps*1e6:.1f}"]],
+                       ["Slot behaviors", "Time per step (us)"], numbering=[False]*2)
+        print(f"{steps} steps of every slot behavior (5 robot types, 5 start poses), same joint targets in every step\n")
+
+
+    def inverse_kinematics(self):
+        '''
+        Compare the scalar leg inverse kinematics (Inverse_Kinematics_Legacy.leg_legacy) against the batched solver (legs)
+        for random ankle targets and foot orientations of every robot type (some unreachable or out of range),
+        with and without dynamic pose (random IMU roll and pitch)
+        - joint values must match (up to floating point rounding) and error codes must be the same
+        - trajectories (get_linear_leg_trajectory) must have the same steps
+        '''
+        n = 2000
+        rng = np.random.default_rng(0)
+        max_error, code_mismatches, traj_mismatches = 0, 0, 0
+        t_legacy, t_leg, t_legs, t_ik_legacy, t_ik, t_traj_legacy, t_traj = [0]*7
+
+        for robot_type in range(5):
+            w = Benchmarks.new_world(robot_type=robot_type)
+            r, ik = w.robot, Inverse_Kinematics_Legacy(w.robot) # leg_legacy + current solvers
+            pos = rng.uniform((-0.12,-0.12,-0.3), (0.12,0.12,-0.05), (n,3))
+            ori = rng.uniform((-20,-20,-45), (20,20,45), (n,3))
+            is_left = rng.random(n) < 0.5
+
+            for dynamic_pose in (False, True):
+                r.imu_torso_roll, r.imu_torso_pitch = rng.uniform(-10, 10, 2)
+
+                # Single points
+                t0 = perf_counter()
+                legacy = [ik.leg_legacy(pos[i], ori[i], bool(is_left[i]), dynamic_pose) for i in range(n)]
+                t_legacy += perf_counter() - t0
+                t0 = perf_counter()
+                single = [ik.leg(pos[i], ori[i], bool(is_left[i]), dynamic_pose) for i in range(n)]
+                t_leg += perf_counter() - t0
+                t0 = perf_counter()
+                values, unreachable, out_of_range = ik.legs(pos, ori, is_left, dynamic_pose)
+                t_legs += perf_counter() - t0
+
+                for i in range(n):
+                    max_error = max(max_error, np.max(np.abs(legacy[i][1] - values[i])), np.max(np.abs(legacy[i][1] - single[i][1])))
+                    codes = Inverse_Kinematics._error_codes(legacy[i][0], unreachable[i], out_of_range[i])
+                    code_mismatches += legacy[i][0] != single[i][0] or legacy[i][2] != single[i][2] or legacy[i][2] != codes
+
+            # Both legs of a walking step (see Walk.Env.execute_ik)
+            def execute_ik_legacy():
+                for i in range(0, 200, 2):
+                    ik.leg_legacy(pos[i], ori[i], True, False)
+                    ik.leg_legacy(pos[i+1], ori[i+1], False, False)
+            def execute_ik():
+                for i in range(0, 200, 2):
+                    ik.legs(pos[i:i+2], ori[i:i+2], (True, False), False)
+            t_ik_legacy += Benchmarks.time_it(execute_ik_legacy, 3) / 100
+            t_ik += Benchmarks.time_it(execute_ik, 3) / 100
+
+            # Trajectories (previous implementation: one leg_legacy call per point)
+            def trajectory_legacy(is_left, p1, p2, resolution=100):
+                vec = (p2 - p1) / resolution
+                interpolation = [ik.leg_legacy(p1 + vec * i, (0,0,0), is_left, True) for i in range(1,resolution+1)]
+                indices = [2,4,6,8,10,12] if is_left else [3,5,7,9,11,13]
+                last_joint_values = r.joints_position[indices[0:4]]
+                next_step = interpolation[0]
+                trajectory = []
+                for p in interpolation[1:-1]:
+                    if np.any(np.abs(p[1][0:4]-last_joint_values) > 7.03):
+                        trajectory.append(next_step[1:3])
+                        last_joint_values = next_step[1][0:4]
+                    next_step = p
+                trajectory.append(interpolation[-1][1:3])
+                return indices, trajectory
+
+            for i in range(10):
+                r.joints_position[:] = rng.uniform(-30, 30, r.no_of_joints)
+                args = (bool(is_left[i]), pos[i], pos[i+10])
+                t0 = perf_counter()
+                indices_a, a = trajectory_legacy(*args)
+                t_traj_legacy += perf_counter() - t0
+                t0 = perf_counter()
+                indices_b, b = ik.get_linear_leg_trajectory(*args)
+                t_traj += perf_counter() - t0
+                traj_mismatches += indices_a != indices_b or len(a) != len(b) or \
+                                   any(np.max(np.abs(x[0] - y[0])) > 1e-9 or x[1] != y[1] for x,y in zip(a,b))
+
+        assert max_error < 1e-9 and code_mismatches == 0 and traj_mismatches == 0, "The batched leg IK differs from the scalar leg IK!"
+        points = 5 * 2 * n
+        table = [["leg (1 point)", "Walk/Dribble step (2 legs)", "Batch of 2000 points (per point)", "Trajectory (100 points)"],
+                 [f"{t_legacy/points*1e6:.1f}", f"{t_ik_legacy/5*1e6:.1f}", f"{t_legacy/points*1e6:.1f}", f"{t_traj_legacy/50*1e3:.2f} ms"],
+                 [f"{t_leg/points*1e6:.1f}", f"{t_ik/5*1e6:.1f}", f"{t_legs/points*1e6:.2f}", f"{t_traj/50*1e3:.2f} ms"],
+                 [f"{t_legacy/t_leg:.1f}x", f"{t_ik_legacy/t_ik:.1f}x", f"{t_legacy/t_legs:.0f}x", f"{t_traj_legacy/t_traj:.0f}x"]]
+        UI.print_table(table, ["Leg IK", "Scalar (us)", "Batched (us)", "Speedup"], numbering=[False]*4)
+        print(f"{points} points (5 robot types, with and without dynamic pose), max joint difference: {max_error:.1e} deg, "
+              f"same error codes and trajectories\n")
+
+
+    def step_generator(self):
+        '''
+        Compare the previous Step_Generator (trajectory formulas evaluated in every time step) against gait tables
+        (Step_Generator.get_table), for a walk where the step parameters change from time to time
+        - the targets and the step progress must be the same in every time step
+        - the lookahead (get_future_positions) must match the targets of the following time steps
+        '''
+        import math
+        steps = 20000
+        rng = np.random.default_rng(0)
+        feet_y_dev, sample_time, max_ankle_z, leg_length = 0.055 * 1.2, 0.02, -0.091, 0.22
+        params = []
+        p = (8, 0.025, 0.22 * 0.8)
+        for i in range(steps):
+            if rng.random() < 0.01: # new parameters
+                p = (int(rng.integers(5, 10)), float(rng.choice([0.02,0.025,0.03])), leg_length * float(rng.choice([0.75,0.8,0.85])))
+            params.append((i == 0 or rng.random() < 0.001, *p))
+
+        def previous(state, reset, ts_per_step, z_span, z_extension):
+            ''' Previous Step_Generator.get_target_positions (state: [ts_per_step, swing height, max extension, ts, is left active, switch, progress]) '''
+            if reset:
+                state[:6] = ts_per_step, z_span, z_extension, 0, False, False
+            elif state[5]:
+                state[3:6] = 0, not state[4], False
+            else:
+                state[3] += 1
+            W = math.sqrt(Step_Generator.Z0/Step_Generator.GRAVITY)
+            step_time = state[0] * sample_time
+            time_delta = state[3] * sample_time
+            y0 = feet_y_dev
+            y_swing = y0 + y0 * (  math.sinh((step_time - time_delta)/W) + math.sinh(time_delta/W)  ) / math.sinh(-step_time/W)
+            z0 = min(-state[2], max_ankle_z)
+            zh = min(state[1], max_ankle_z - z0)
+            progress = state[3] / state[0]
+            state[6] = state[3] / (state[0]-1)
+            active_z_swing = zh * math.sin(math.pi * progress)
+            if state[3] + 1 >= state[0]:
+                state[:3] = ts_per_step, z_span, z_extension
+                state[5] = True
+            if state[4]:
+                return y0+y_swing, active_z_swing+z0, -y0+y_swing, z0
+            else:
+                return y0-y_swing, z0, -y0-y_swing, active_z_swing+z0
+
+        state = [0]*7
+        t0 = perf_counter()
+        expected = [(previous(state, *q), state[6]) for q in params]
+        t_previous = perf_counter() - t0
+
+        Step_Generator.get_table.cache_clear()
+        g = Step_Generator(feet_y_dev, sample_time, max_ankle_z)
+        t0 = perf_counter()
+        targets = [(g.get_target_positions(*q), g.external_progress) for q in params]
+        t_tables = perf_counter() - t0
+        assert targets == expected, "The gait tables produce different targets!"
+
+        # Lookahead (8 time steps), when the following time steps have the same parameters as the current one
+        g = Step_Generator(feet_y_dev, sample_time, max_ankle_z)
+        lookahead_errors, t_lookahead = 0, 0
+        for i in range(steps - 8):
+            g.get_target_positions(*params[i])
+            if all(not q[0] and q[1:] == params[i][1:] for q in params[i+1:i+9]):
+                t0 = perf_counter()
+                future = g.get_future_positions(8)
+                t_lookahead += perf_counter() - t0
+                lookahead_errors += not np.array_equal(future, [e[0] for e in expected[i+1:i+9]])
+        assert lookahead_errors == 0, "The lookahead does not match the following targets!"
+
+        info = Step_Generator.get_table.cache_info()
+        UI.print_table([["Previous (formulas)", "Gait tables"], [f"{t_previous/steps*1e6:.2f}", f"{t_tables/steps*1e6:.2f}"]],
+                       ["Step_Generator", "Time per step (us)"], numbering=[False]*2)
+        print(f"{steps} time steps, same targets, {info.misses} tables computed ({info.hits} hits), "
+              f"lookahead of 8 time steps: {t_lookahead/(steps-8)*1e6:.1f} us on average\n")
+
+
+    def execute(self):
+        names = list(self.benchmarks)
+
+        while True:
+            idx = UI.print_table([names], ["Benchmarks"], numbering=[True], prompt='Choose benchmark (ctrl+c to return): ')[0]
+            self.benchmarks[names[idx]]()
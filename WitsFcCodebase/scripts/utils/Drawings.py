@@ -32,4 +32,6 @@ class Drawings():
                 draw.line(    (2,0,0), (2.5,0.5,1), 2, Draw.Color.cyan, "solid", False)
                 draw.line(    (3,0,0), (2.5,0.5,1), 2, Draw.Color.cyan, "solid", False)
                 draw.line(    (2,1,0), (2.5,0.5,1), 2, Draw.Color.cyan, "solid", False)
-                draw.line(    (3,1,0), (2.5,0.5,1), 2, Draw.Color.cyan, "solid", True)
\ No newline at end of file
+                draw.line(    (3,1,0), (2.5,0.5,1), 2, Draw.Color.cyan, "solid", True)
+
+                Draw.send_frame() # agents send their drawings at the end of each cycle (see Server_Comm.send)
\ No newline at end of file
@@ -130,9 +130,10 @@ def gale_shapley_algorithm(player_preferences, formation_preferences, teammate_p
     
     return player_to_formation
 
-def role_assignment(teammate_positions, formation_positions): 
+def stable_matching_assignment(teammate_positions, formation_positions): 
     """
     Assign roles to teammates using the Gale-Shapley algorithm for stable matching.
+    (previous role assignment, kept for reference, see role_assignment)
     
     Args:
         teammate_positions: List of teammate positions as ndarrays
@@ -159,4 +160,154 @@ def role_assignment(teammate_positions, formation_positions):
         unum = player_idx + 1  # Convert 0-based index to 1-based unum
         point_preferences[unum] = formation_positions[formation_idx]
     
-    return point_preferences
\ No newline at end of file
+    return point_preferences
+
+
+def linear_assignment(cost):
+    """
+    Solve the linear assignment problem with the Hungarian algorithm (shortest augmenting paths with potentials).
+    Each row is assigned to a different column so that the total cost is minimum.
+    
+    Args:
+        cost: Cost matrix with shape (rows, columns), where rows <= columns
+    
+    Returns:
+        ndarray: Column assigned to each row
+    """
+    n, m = cost.shape
+    assert n <= m, "There must be at least as many columns as rows"
+    
+    # Plain lists are faster than numpy for the team sizes used here (up to 11x11)
+    # 1-based indices, column 0 is a dummy column used to start each augmenting path
+    c = [None] + [[0.0] + row for row in np.asarray(cost, float).tolist()]
+    inf = float("inf")
+    u = [0.0] * (n+1)               # row potentials
+    v = [0.0] * (m+1)               # column potentials
+    p = [0] * (m+1)                 # row matched to each column (0 if none)
+    way = [0] * (m+1)               # previous column in the augmenting path
+    columns = range(1, m+1)
+    
+    for i in range(1, n+1):
+        p[0] = i
+        j0 = 0
+        min_v = [inf] * (m+1)
+        used = [False] * (m+1)
+        
+        # Grow the shortest path tree until a free column is reached
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row, u_i0 = c[i0], u[i0]
+            delta, j1 = inf, 0
+            for j in columns:
+                if not used[j]:
+                    reduced = row[j] - u_i0 - v[j]
+                    if reduced < min_v[j]:
+                        min_v[j] = reduced
+                        way[j] = j0
+                    if min_v[j] < delta:
+                        delta, j1 = min_v[j], j
+            for j in range(m+1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        
+        # Augment along the path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    
+    assignment = np.zeros(n, int)
+    for j in columns:
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+class RoleAssigner:
+    """
+    Optimal role assignment: each teammate is assigned to a formation position so that the total travel distance is minimum.
+    
+    The previous assignment is used as a warm start: changing a player's role costs an extra `switch_penalty` meters,
+    which avoids role flicker when two assignments are almost equivalent.
+    """
+    
+    def __init__(self, switch_penalty=0.5):
+        """
+        Args:
+            switch_penalty: Extra cost (meters) of assigning a player to a role different from the previous one
+        """
+        self.switch_penalty = switch_penalty
+        self.previous = {}  # previous assignment, unum -> formation index
+    
+    def cost_matrix(self, players, positions, unums):
+        """
+        Build the cost matrix: distance between each player and each formation position, plus role-switch penalty
+        
+        Args:
+            players: Known teammate positions with shape (n,2)
+            positions: Formation positions with shape (m,2)
+            unums: Uniform number of each player
+        
+        Returns:
+            ndarray: Cost matrix with shape (n,m)
+        """
+        diff = players[:,None,:] - positions[None,:,:]
+        cost = np.sqrt(diff[...,0]**2 + diff[...,1]**2)
+        
+        if self.switch_penalty:
+            cost += self.switch_penalty
+            for row, unum in enumerate(unums):
+                previous_role = self.previous.get(unum)
+                if previous_role is not None and previous_role < len(positions):
+                    cost[row, previous_role] -= self.switch_penalty
+        return cost
+    
+    def assign(self, teammate_positions, formation_positions):
+        """
+        Assign roles to teammates (compatible with role_assignment)
+        
+        Args:
+            teammate_positions: List of teammate positions as ndarrays (None if unknown)
+            formation_positions: List of formation positions as ndarrays
+        
+        Returns:
+            dict: Mapping from unum (1-5) to assigned formation position
+        """
+        unums = [i + 1 for i, pos in enumerate(teammate_positions) if pos is not None]
+        if not unums or not formation_positions:
+            return {}
+        players = np.array([teammate_positions[u-1][:2] for u in unums], float)
+        positions = np.array([pos[:2] for pos in formation_positions], float)
+        
+        cost = self.cost_matrix(players, positions, unums)
+        if len(unums) <= len(positions):
+            roles = dict(zip(unums, linear_assignment(cost).tolist()))
+        else: # more players than positions: some players are not assigned
+            roles = {unums[row]: role for role, row in enumerate(linear_assignment(cost.T).tolist())}
+        
+        self.previous = roles
+        return {unum: formation_positions[role] for unum, role in roles.items()}
+
+
+def role_assignment(teammate_positions, formation_positions, assigner=None): 
+    """
+    Assign roles to teammates so that the total travel distance is minimum (see RoleAssigner).
+    
+    Args:
+        teammate_positions: List of teammate positions as ndarrays
+        formation_positions: List of formation positions as ndarrays
+        assigner: RoleAssigner of the agent (warm start), default is None (no warm start)
+    
+    Returns:
+        dict: Mapping from unum (1-5) to assigned formation position
+    """
+    if assigner is None:
+        assigner = RoleAssigner(switch_penalty=0)
+    return assigner.assign(teammate_positions, formation_positions)
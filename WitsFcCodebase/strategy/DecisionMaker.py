@@ -14,6 +14,10 @@ class DecisionMaker:
     def __init__(self, strategy_data):
         self.strategy = strategy_data
         
+    def update(self, strategy_data):
+        """Use the strategy data of a new cycle"""
+        self.strategy = strategy_data
+        
     def am_i_closest_to_ball(self):
         """Check if I am the closest player to the ball"""
         return self.strategy.active_player_unum == self.strategy.player_unum
@@ -28,17 +32,7 @@ class DecisionMaker:
         Returns:
             int: Uniform number of closest teammate (1-5)
         """
-        min_dist = float('inf')
-        closest_unum = None
-        
-        for i, teammate_pos in enumerate(self.strategy.teammate_positions):
-            if teammate_pos is not None:
-                dist = np.linalg.norm(teammate_pos - position)
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_unum = i + 1
-                    
-        return closest_unum
+        return self.strategy.snapshot.closest_teammate(position)
     
     def is_opponent_nearby(self, threshold=2.0):
         """
@@ -50,15 +44,7 @@ class DecisionMaker:
         Returns:
             bool: True if opponent is within threshold
         """
-        my_pos = self.strategy.mypos
-        
-        for opp_pos in self.strategy.opponent_positions:
-            if opp_pos is not None:
-                dist = np.linalg.norm(opp_pos - my_pos)
-                if dist < threshold:
-                    return True
-                    
-        return False
+        return self.strategy.snapshot.count_in_radius(True, self.strategy.mypos, threshold) > 0
     
     def count_teammates_in_radius(self, position, radius=3.0):
         """
@@ -71,13 +57,7 @@ class DecisionMaker:
         Returns:
             int: Number of teammates in radius
         """
-        count = 0
-        for teammate_pos in self.strategy.teammate_positions:
-            if teammate_pos is not None:
-                dist = np.linalg.norm(teammate_pos - position)
-                if dist < radius:
-                    count += 1
-        return count
+        return self.strategy.snapshot.count_in_radius(False, position, radius)
     
     def count_opponents_in_radius(self, position, radius=3.0):
         """
@@ -90,13 +70,7 @@ class DecisionMaker:
         Returns:
             int: Number of opponents in radius
         """
-        count = 0
-        for opp_pos in self.strategy.opponent_positions:
-            if opp_pos is not None:
-                dist = np.linalg.norm(opp_pos - position)
-                if dist < radius:
-                    count += 1
-        return count
+        return self.strategy.snapshot.count_in_radius(True, position, radius)
     
     def should_pass(self):
         """
@@ -123,32 +97,21 @@ class DecisionMaker:
         Returns:
             tuple: (unum, position) of best pass target, or None if no good target
         """
-        best_target = None
-        best_score = -float('inf')
+        # Scores of all teammates are computed once per cycle (NaN if position unknown)
+        snapshot = self.strategy.snapshot
+        scores = snapshot.pass_scores.copy()
+        scores[self.strategy.player_unum - 1] = np.nan  # Skip self
         
-        for i, teammate_pos in enumerate(self.strategy.teammate_positions):
-            unum = i + 1
-            
-            # Skip self
-            if unum == self.strategy.player_unum:
-                continue
-            
-            # Skip if position unknown
-            if teammate_pos is None:
-                continue
-            
-            # Calculate score based on multiple factors
-            score = self._evaluate_pass_target(teammate_pos)
-            
-            if score > best_score:
-                best_score = score
-                best_target = (unum, teammate_pos)
+        if np.all(np.isnan(scores)):
+            return None
         
-        return best_target
+        i = int(np.nanargmax(scores))
+        return (i + 1, snapshot.teammate_positions[i])
     
     def _evaluate_pass_target(self, target_pos):
         """
         Evaluate how good a pass target is
+        (get_best_pass_target uses World_Snapshot.pass_scores, which computes this score for all teammates at once)
         
         Args:
             target_pos: Position of potential pass target
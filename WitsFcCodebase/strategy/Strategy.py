@@ -1,6 +1,7 @@
 import math
 import numpy as np
 from math_ops.Math_Ops import Math_Ops as M
+from strategy.World_Snapshot import World_Snapshot
 
 
 
@@ -16,19 +17,13 @@ class Strategy():
         if world.team_side_is_left:
             self.side = 0
 
-        self.teammate_positions = [teammate.state_abs_pos[:2] if teammate.state_abs_pos is not None 
-                                    else None
-                                    for teammate in world.teammates
-                                    ]
-        
-        self.opponent_positions = [opponent.state_abs_pos[:2] if opponent.state_abs_pos is not None 
-                                    else None
-                                    for opponent in world.opponents
-                                    ]
-
+        # Team-level view of the world, shared with other agents of this process that have the same sensing data
+        self.slow_ball_pos = world.get_predicted_ball_pos(0.5) # predicted future 2D ball position when ball speed <= 0.5 m/s
+        self.snapshot = World_Snapshot.get(world, self.slow_ball_pos)
 
+        self.teammate_positions = self.snapshot.teammate_positions
+        self.opponent_positions = self.snapshot.opponent_positions
 
-        
 
         self.team_dist_to_ball = None
         self.team_dist_to_oppGoal = None
@@ -52,25 +47,25 @@ class Strategy():
 
         self.PM_GROUP = world.play_mode_group
 
-        self.slow_ball_pos = world.get_predicted_ball_pos(0.5) # predicted future 2D ball position when ball speed <= 0.5 m/s
-
+        snap = self.snapshot
         # list of squared distances between teammates (including self) and slow ball (sq distance is set to 1000 in some conditions)
-        self.teammates_ball_sq_dist = [np.sum((p.state_abs_pos[:2] - self.slow_ball_pos) ** 2)  # squared distance between teammate and ball
-                                  if p.state_last_update != 0 and (world.time_local_ms - p.state_last_update <= 360 or p.is_self) and not p.state_fallen
-                                  else 1000 # force large distance if teammate does not exist, or its state info is not recent (360 ms), or it has fallen
-                                  for p in world.teammates ]
+        # force large distance if teammate does not exist, or its state info is not recent (360 ms), or it has fallen
+        recent = snap.teammates_recent.copy()
+        recent[self.player_unum-1] = True # own state is always recent
+        teammates_dist = snap.teammates_targets_dist[:,World_Snapshot.SLOW_BALL]
+        self.teammates_ball_sq_dist = np.where(snap.teammates_usable & recent, teammates_dist * teammates_dist, 1000).tolist()
 
         # list of squared distances between opponents and slow ball (sq distance is set to 1000 in some conditions)
-        self.opponents_ball_sq_dist = [np.sum((p.state_abs_pos[:2] - self.slow_ball_pos) ** 2)  # squared distance between teammate and ball
-                                  if p.state_last_update != 0 and world.time_local_ms - p.state_last_update <= 360 and not p.state_fallen
-                                  else 1000 # force large distance if opponent does not exist, or its state info is not recent (360 ms), or it has fallen
-                                  for p in world.opponents ]
+        self.opponents_ball_sq_dist = snap.opponents_slow_ball_sq_dist.tolist()
 
         self.min_teammate_ball_sq_dist = min(self.teammates_ball_sq_dist)
         self.min_teammate_ball_dist = math.sqrt(self.min_teammate_ball_sq_dist)   # distance between ball and closest teammate
-        self.min_opponent_ball_dist = math.sqrt(min(self.opponents_ball_sq_dist)) # distance between ball and closest opponent
+        self.min_opponent_ball_dist = snap.min_opponent_ball_dist                 # distance between ball and closest opponent
 
-        self.active_player_unum = self.teammates_ball_sq_dist.index(self.min_teammate_ball_sq_dist) + 1
+        # the active player is the closest teammate to the slow ball (among those considered above)
+        # or, optionally, the teammate with the lowest travel cost (see World_Snapshot.fastest_teammate_to_ball)
+        fastest = snap.fastest_teammate_to_ball(world, snap.teammates_usable & recent) if World_Snapshot.ELECT_BY_TRAVEL_COST else None
+        self.active_player_unum = fastest if fastest is not None else self.teammates_ball_sq_dist.index(self.min_teammate_ball_sq_dist) + 1
 
         self.my_desired_position = self.mypos
         self.my_desired_orientation = self.ball_dir
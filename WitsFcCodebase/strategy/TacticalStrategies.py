@@ -15,6 +15,11 @@ class TacticalStrategies:
         self.strategy = strategy_data
         self.decision_maker = decision_maker
         
+    def update(self, strategy_data):
+        """Use the strategy data of a new cycle (also updates the decision maker)"""
+        self.strategy = strategy_data
+        self.decision_maker.update(strategy_data)
+        
     def get_attacking_action(self, agent):
         """
         Determine attacking action for the active player (closest to ball)
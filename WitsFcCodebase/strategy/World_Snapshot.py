@@ -0,0 +1,290 @@
+"""
+World Snapshot
+Team-level view of the world computed once per cycle and shared by every strategy component
+"""
+
+import numpy as np
+from functools import cached_property
+
+from strategy.Assignment import role_assignment
+from world.commons.Cost_Field import Cost_Field
+from formation.DynamicFormation import DynamicFormation
+
+
+class World_Snapshot:
+    """
+    Immutable arrays of teammate and opponent positions, their distances to the ball and goals,
+    and memoized queries derived from them.
+
+    Everything in the snapshot depends only on what the agent senses (not on which agent it is),
+    so agents of the same process with the same sensing data share one snapshot (see `get`).
+    Agent-specific information (own position, orientation, etc.) belongs to `Strategy`, and queries that depend on
+    state that is not part of the sharing key (e.g. ball prediction) receive the caller's world and are memoized per world.
+    """
+
+    # Columns of teammates_targets_dist / opponents_targets_dist
+    BALL, SLOW_BALL, THEIR_GOAL, OUR_GOAL = range(4)
+    THEIR_GOAL_POS = (15, 0)
+    OUR_GOAL_POS = (-15, 0)
+    RECENT_MS = 360  # a robot's state is considered recent if it was updated in the last 360 ms
+    INTERCEPT_SPEED = 0.4 # average speed (m/s) at which robots are assumed to chase the ball (see intercepts)
+    ELECT_BY_TRAVEL_COST = False # elect the active player by travel cost instead of straight-line distance (see fastest_teammate_to_ball)
+    CONTESTED_RADIUS = 1.0 # an opponent closer than this to the straight line between a teammate and the ball contests it (see is_contested)
+
+    MAX_SHARED = 16  # maximum number of snapshots kept for the current cycle
+    _cache = {}      # shared snapshots of the current cycle, key: sensing data (see `get`)
+    _cache_time = None
+
+    def __init__(self, world, slow_ball_pos):
+        """
+        Args:
+            world: World of any agent
+            slow_ball_pos: predicted 2D ball position when ball speed <= 0.5 m/s
+        """
+        others = world.other_robots
+        known = others.state_abs_pos_dim != 0
+
+        self.time_local_ms = world.time_local_ms
+        self.play_mode = world.play_mode
+        self.play_mode_group = world.play_mode_group
+        self.team_side_is_left = world.team_side_is_left
+        self.ball_2d = world.ball_abs_pos[:2].copy()
+        self.slow_ball_pos = np.array(slow_ball_pos[:2], float)
+
+        # Positions of teammates (rows 0-4, ordered by unum) and opponents (rows 5-9), NaN if unknown
+        positions = np.where(known[:,None], others.state_abs_pos[:,:2], np.nan)
+        self.teammates_pos, self.opponents_pos = positions[:5], positions[5:]
+        self.teammates_known, self.opponents_known = known[:5], known[5:]
+
+        # True if the robot exists, its state info is recent and it has not fallen (own state is always recent, see Strategy)
+        age = world.time_local_ms - others.state_last_update
+        usable = (others.state_last_update != 0) & ~others.state_fallen
+        self.teammates_usable, self.opponents_usable = usable[:5], usable[5:]
+        self.teammates_recent, self.opponents_recent = (age <= World_Snapshot.RECENT_MS)[:5], (age <= World_Snapshot.RECENT_MS)[5:]
+
+        self._memo = {}
+
+
+    @staticmethod
+    def get(world, slow_ball_pos):
+        """
+        Return the snapshot for the current cycle, reusing the snapshot of another agent
+        of this process if the sensing data is the same
+
+        Args:
+            world: World of the current agent
+            slow_ball_pos: predicted 2D ball position when ball speed <= 0.5 m/s
+
+        Returns:
+            World_Snapshot: shared snapshot
+        """
+        if World_Snapshot._cache_time != world.time_local_ms or len(World_Snapshot._cache) >= World_Snapshot.MAX_SHARED:
+            World_Snapshot._cache.clear()
+            World_Snapshot._cache_time = world.time_local_ms
+
+        others = world.other_robots
+        key = (world.play_mode, world.play_mode_group, world.team_side_is_left, world.ball_abs_pos[:2].tobytes(),
+               np.asarray(slow_ball_pos[:2], float).tobytes(), others.state_abs_pos[:,:2].tobytes(), others.state_abs_pos_dim.tobytes(),
+               others.state_last_update.tobytes(), others.state_fallen.tobytes())
+
+        snapshot = World_Snapshot._cache.get(key)
+        if snapshot is None:
+            snapshot = World_Snapshot._cache[key] = World_Snapshot(world, slow_ball_pos)
+        return snapshot
+
+
+    #--------------------------------------------------------------------- Distance matrices (lazy)
+
+    @cached_property
+    def targets(self):
+        """ Ball, slow ball, their goal and our goal (see BALL, SLOW_BALL, THEIR_GOAL, OUR_GOAL) """
+        return np.array([self.ball_2d, self.slow_ball_pos, World_Snapshot.THEIR_GOAL_POS, World_Snapshot.OUR_GOAL_POS], float)
+
+    @cached_property
+    def teammates_targets_dist(self):
+        """ (5,4) distance between each teammate and each target (NaN if unknown) """
+        return np.linalg.norm(self.teammates_pos[:,None] - self.targets, axis=2)
+
+    @cached_property
+    def opponents_targets_dist(self):
+        """ (5,4) distance between each opponent and each target (NaN if unknown) """
+        return np.linalg.norm(self.opponents_pos[:,None] - self.targets, axis=2)
+
+    @cached_property
+    def teammates_opponents_dist(self):
+        """ (5,5) distance between each teammate (rows) and each opponent (columns) (NaN if unknown) """
+        return np.linalg.norm(self.teammates_pos[:,None] - self.opponents_pos, axis=2)
+
+    @cached_property
+    def opponents_slow_ball_sq_dist(self):
+        """ Squared distance between opponents and slow ball (1000 if the opponent does not exist, its state is not recent, or it has fallen) """
+        d = self.opponents_targets_dist[:,World_Snapshot.SLOW_BALL]
+        return np.where(self.opponents_usable & self.opponents_recent, d * d, 1000)
+
+    @cached_property
+    def min_opponent_ball_dist(self):
+        """ Distance between slow ball and closest opponent """
+        return float(np.sqrt(np.min(self.opponents_slow_ball_sq_dist)))
+
+    @cached_property
+    def teammate_positions(self):
+        """ List of teammate positions (None if unknown) """
+        return [p if k else None for p,k in zip(self.teammates_pos, self.teammates_known)]
+
+    @cached_property
+    def opponent_positions(self):
+        """ List of opponent positions (None if unknown) """
+        return [p if k else None for p,k in zip(self.opponents_pos, self.opponents_known)]
+
+    @cached_property
+    def pass_scores(self):
+        """ (5,) pass score of each teammate, see DecisionMaker._evaluate_pass_target (NaN if unknown) """
+        goal_dist = self.teammates_targets_dist[:,World_Snapshot.THEIR_GOAL]
+        ball_dist = self.teammates_targets_dist[:,World_Snapshot.BALL]
+        score = 30 - goal_dist                                                       # Closer to goal is better
+        score += np.where(ball_dist < 3, -10, np.where(ball_dist > 15, -15, 5))      # Too close, too far, or good distance
+        score -= np.sum(self.teammates_opponents_dist < 2.0, axis=1) * 5             # Opponents near the target
+        score += np.where(self.teammates_pos[:,0] > self.ball_2d[0], 8, 0)           # Target ahead of ball
+        return np.where(self.teammates_known, score, np.nan)
+
+
+    #--------------------------------------------------------------------- Memoized queries
+
+    def count_in_radius(self, opponents:bool, position, radius):
+        """
+        Count teammates or opponents within a radius of a position
+
+        Args:
+            opponents: True to count opponents, False to count teammates
+            position: Center position
+            radius: Radius in meters
+
+        Returns:
+            int: Number of players in radius
+        """
+        key = ("count", opponents, position[0], position[1], radius)
+        count = self._memo.get(key)
+        if count is None:
+            positions = self.opponents_pos if opponents else self.teammates_pos
+            d = positions - (position[0], position[1])
+            count = self._memo[key] = int(np.count_nonzero(d[:,0]*d[:,0] + d[:,1]*d[:,1] < radius * radius))
+        return count
+
+    def closest_teammate(self, position):
+        """
+        Find the closest teammate to a given position
+
+        Args:
+            position: Target position (x, y)
+
+        Returns:
+            int: Uniform number of closest teammate (1-5), or None if no teammate position is known
+        """
+        key = ("closest", position[0], position[1])
+        if key not in self._memo:
+            d = np.linalg.norm(self.teammates_pos - (position[0], position[1]), axis=1)
+            self._memo[key] = None if np.all(np.isnan(d)) else int(np.nanargmin(d)) + 1
+        return self._memo[key]
+
+    def intercepts(self, world):
+        """
+        Intersection points with the moving ball of teammates (rows 0-4) and opponents (rows 5-9), computed in one call
+        (see World.get_intersections_with_ball), assuming they chase the ball at INTERCEPT_SPEED
+
+        Args:
+            world: World of the calling agent (its ball prediction is not part of the sharing key, see `get`)
+
+        Returns:
+            tuple: (10,2) intersection points and (10,) distances to them (NaN if the robot position is unknown)
+        """
+        key = ("intercepts", world)
+        if key not in self._memo:
+            positions = np.concatenate((self.teammates_pos, self.opponents_pos))
+            self._memo[key] = world.get_intersections_with_ball(positions, World_Snapshot.INTERCEPT_SPEED)
+        return self._memo[key]
+
+    def fastest_teammate_to_ball(self, world, eligible):
+        """
+        Find the teammate with the lowest travel cost to the slow ball, avoiding opponents (used by Strategy if ELECT_BY_TRAVEL_COST)
+
+        If no opponent contests the straight line between an eligible teammate and the slow ball, this is the closest teammate.
+        Otherwise, a cost field is computed (once per snapshot, only until the first eligible teammate is reached),
+        with the snapshot's opponents as soft obstacles (see World.get_ball_cost_field)
+
+        Args:
+            world: World of the calling agent (only its planner is used, the result depends only on the snapshot)
+            eligible: (5,) boolean mask of teammates that can be chosen
+
+        Returns:
+            int: Uniform number of the fastest teammate (1-5), or None if no eligible teammate position is known
+        """
+        key = ("fastest", eligible.tobytes())
+        if key not in self._memo:
+            eligible = eligible & self.teammates_known
+            unum = None
+            if eligible.any():
+                unum = int(np.argmin(np.where(eligible, self.teammates_targets_dist[:,World_Snapshot.SLOW_BALL], np.inf))) + 1
+                if self.is_contested(eligible):
+                    obstacles = [(*o, 0, 1.0, 1.0) for o in self.opponents_pos[self.opponents_known & self.opponents_usable & self.opponents_recent]]
+                    field = Cost_Field(world.cost_field_planner, self.slow_ball_pos, obstacles, True, stop_positions=self.teammates_pos[eligible])
+                    costs = np.where(eligible, field.costs(self.teammates_pos), np.inf)
+                    if np.isfinite(costs).any(): # (otherwise, the ball is unreachable)
+                        unum = int(np.argmin(costs)) + 1
+            self._memo[key] = unum
+        return self._memo[key]
+
+    def is_contested(self, eligible):
+        """
+        Check if a recently seen opponent is closer than CONTESTED_RADIUS to the straight line between an eligible teammate and the slow ball
+
+        Args:
+            eligible: (5,) boolean mask of teammates
+
+        Returns:
+            bool: True if any of those straight lines is contested
+        """
+        opponents = self.opponents_pos[self.opponents_known & self.opponents_usable & self.opponents_recent]
+        teammates = self.teammates_pos[eligible & self.teammates_known]
+        if len(opponents) == 0 or len(teammates) == 0:
+            return False
+        seg = self.slow_ball_pos - teammates                                      # (t,2) segment of each teammate
+        rel = opponents[None,:,:] - teammates[:,None,:]                           # (t,o,2) opponents relative to each teammate
+        sq_len = np.maximum(np.sum(seg * seg, axis=1), 1e-12)
+        k = np.clip(np.sum(rel * seg[:,None,:], axis=2) / sq_len[:,None], 0, 1)   # closest point of each segment to each opponent
+        d = rel - k[...,None] * seg[:,None,:]
+        return bool(np.any(np.sum(d * d, axis=2) < World_Snapshot.CONTESTED_RADIUS ** 2))
+
+    def formation(self, play_mode_group, is_our_set_piece):
+        """
+        Dynamic formation for the current ball position and game state (see DynamicFormation.generate_formation)
+
+        Args:
+            play_mode_group: Type of play mode (kickoff, play_on, etc.)
+            is_our_set_piece: True if it's our set piece
+
+        Returns:
+            list: Formation positions for 5 players
+        """
+        key = ("formation", play_mode_group, is_our_set_piece)
+        if key not in self._memo:
+            self._memo[key] = DynamicFormation.generate_formation(ball_pos=self.ball_2d, play_mode_group=play_mode_group,
+                                                                  is_left_team=self.team_side_is_left, is_our_set_piece=is_our_set_piece)
+        return self._memo[key]
+
+    def role_assignment(self, play_mode_group, is_our_set_piece, assigner=None):
+        """
+        Assign each teammate to a formation position (see Assignment.role_assignment)
+
+        Args:
+            play_mode_group: Type of play mode (kickoff, play_on, etc.)
+            is_our_set_piece: True if it's our set piece
+            assigner: RoleAssigner of the calling agent (its warm start depends on the agent's previous assignment,
+                      so the result is memoized per assigner), default is None (no warm start)
+
+        Returns:
+            dict: Mapping from unum (1-5) to assigned formation position
+        """
+        key = ("roles", play_mode_group, is_our_set_piece, assigner)
+        if key not in self._memo:
+            self._memo[key] = role_assignment(self.teammate_positions, self.formation(play_mode_group, is_our_set_piece), assigner)
+        return self._memo[key]
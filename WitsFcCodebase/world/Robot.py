@@ -4,6 +4,7 @@ from math_ops.Math_Ops import Math_Ops as M
 from math_ops.Matrix_3x3 import Matrix_3x3
 from math_ops.Matrix_4x4 import Matrix_4x4
 from world.commons.Body_Part import Body_Part
+from world.commons.Command_Encoder import Command_Encoder
 from world.commons.Joint_Info import Joint_Info
 import numpy as np
 import xml.etree.ElementTree as xmlp
@@ -63,9 +64,9 @@ class Robot():
         # Localization variables relative to head
         self.loc_head_to_field_transform = Matrix_4x4()  # Transformation matrix from head to field
         self.loc_field_to_head_transform = Matrix_4x4()  # Transformation matrix from field to head
-        self.loc_rotation_head_to_field = Matrix_3x3()   # Rotation matrix from head to field
-        self.loc_rotation_field_to_head = Matrix_3x3()   # Rotation matrix from field to head
-        self.loc_head_position = np.zeros(3)             # Absolute head position (m)
+        self.loc_rotation_head_to_field = self.loc_head_to_field_transform.get_rotation() # Rotation matrix from head to field (view)
+        self.loc_rotation_field_to_head = self.loc_field_to_head_transform.get_rotation() # Rotation matrix from field to head (view)
+        self.loc_head_position = self.loc_head_to_field_transform.get_translation()       # Absolute head position (m) (view)
         self.loc_head_position_history = deque(maxlen=40)# Absolute head position history (queue with up to 40 old positions at intervals of 0.04s, where index 0 is the previous position)
         self.loc_head_velocity = np.zeros(3)             # Absolute head velocity (m/s) (Warning: possibly noisy)
         self.loc_head_orientation = 0                    # Head orientation (deg)
@@ -76,8 +77,8 @@ class Robot():
         self.radio_last_update = 0                       # World.time_local_ms when radio_fallen_state was last updated (and possibly loc_head_position)
 
         # Localization variables relative to torso
-        self.loc_torso_to_field_rotation = Matrix_3x3()  # Rotation matrix from torso to field  
         self.loc_torso_to_field_transform = Matrix_4x4() # Transformation matrix from torso to field
+        self.loc_torso_to_field_rotation = self.loc_torso_to_field_transform.get_rotation() # Rotation matrix from torso to field (view)
         self.loc_torso_roll = 0                          # Torso roll        (deg)
         self.loc_torso_pitch = 0                         # Torso pitch       (deg) 
         self.loc_torso_orientation = 0                   # Torso orientation (deg)
@@ -131,6 +132,17 @@ class Robot():
         self.imu_weak_CoM_position = np.zeros(3)          # Absolute CoM position (m)                      (src: Localization + Gyro + Acc)
         self.imu_weak_CoM_velocity = np.zeros(3)          # Absolute CoM velocity (m/s)                    (src: Localization + Gyro + Acc)
 
+        # Preallocated buffers, so that the per-step matrix math does not allocate memory
+        self._loc_raw = np.empty(35)                      # Localization data converted to 64 bits
+        self._loc_raw_head_to_field = self._loc_raw[0:16].reshape((4,4))  # (views of _loc_raw)
+        self._loc_raw_field_to_head = self._loc_raw[16:32].reshape((4,4))
+        self._loc_raw_head_position = self._loc_raw_head_to_field[:3,3]
+        self._aux_vec = np.empty(3)                       # Auxiliary 3D vector
+        self._aux_transform = Matrix_4x4()                # Auxiliary transformation matrix
+        self._imu_gyro_step = np.empty(3)                 # Gyroscope rotation in the last step (deg)
+        self._imu_gyro_rotation = Matrix_3x3()            # Gyroscope rotation matrix in the last step
+        self._imu_aux_rotation = Matrix_3x3()             # Auxiliary rotation matrix
+
 
         #Using explicit variables to enable IDE suggestions
         self.J_HEAD_YAW = 0
@@ -184,6 +196,9 @@ class Robot():
 
         assert joint_no == self.no_of_joints, "The Robot XML and the robot type don't match!"
 
+        # Effector commands encoder (see get_command)
+        self.command_encoder = Command_Encoder([j.effector for j in self.joints_info], self.FIX_EFFECTOR_MASK)
+
 
     def get_head_abs_vel(self, history_steps:int):
         '''
@@ -238,11 +253,83 @@ class Robot():
             self.joints_info[i].min = -self.joints_info[i].max
             self.joints_info[i].max = -aux
 
+        self._compile_kinematic_chain()
+
+
+    def _compile_kinematic_chain(self):
+        '''
+        Build the array representation of the kinematic chain used by `update_pose`
+
+        All transformation matrices are stored in two preallocated stacks:
+            - body parts (B,4,4), sorted by depth in the kinematic tree (head is at index 0)
+            - joints     (J,4,4), sorted by joint index
+        `body_parts[name].transform` and `joints_transform[j]` are rebound to Matrix_4x4 objects backed by views
+        into these stacks, so they always reflect the latest pose without any copies.
+        '''
+        J = self.no_of_joints
+        parent = {self.joints_info[j].anchor1_part : (part,j) for part in self.body_parts for j in self.body_parts[part].joints}
+
+        def depth(part):
+            return 0 if part not in parent else depth(parent[part][0]) + 1
+
+        # Body parts that are not reachable from the head (if any) keep an identity transform at the end of the stack
+        reachable = [p for p in self.body_parts if p == "head" or p in parent]
+        names = sorted(reachable, key=depth) + [p for p in self.body_parts if p not in reachable]
+        index = {name:i for i,name in enumerate(names)}
+
+        self._fk_body = np.tile(np.identity(4), (len(names),1,1))   # body part to head transformation matrices
+        self._fk_joints = np.tile(np.identity(4), (J,1,1))          # joint to head transformation matrices
+        self._fk_local = np.tile(np.identity(4), (J,1,1))           # child body part to parent body part, for each joint
+        self._fk_gather = np.empty((max(J,len(names)),4,4))         # buffer for gathered parent transforms
+        self._fk_gather_local = np.empty((J,4,4))                   # buffer for gathered local transforms
+
+        for name, i in index.items():
+            self.body_parts[name].transform = Matrix_4x4(self._fk_body[i])
+        self.joints_transform = [Matrix_4x4(self._fk_joints[j]) for j in range(J)]
+
+        # Constant joint data (axes were already fixed for symmetry)
+        axes = np.array([self.joints_info[j].axes for j in range(J)])
+        x, y, z = axes.T
+        zeros = np.zeros(J)
+        skew = np.array([[zeros,-z,y],[z,zeros,-x],[-y,x,zeros]]).transpose(2,0,1) # cross product matrices of rotation axes
+        outer = axes[:,:,None] * axes[:,None,:]                                     # outer products of rotation axes
+        self._fk_rot_basis = np.stack((skew, outer, np.broadcast_to(np.identity(3), (J,3,3))), -1).reshape(J,9,3)
+        self._fk_anchor0 = np.array([self.joints_info[j].anchor0_axes for j in range(J)])[:,:,None]
+        self._fk_anchor1_neg = np.array([self.joints_info[j].anchor1_axes_neg for j in range(J)])[:,:,None]
+        self._fk_anchor0_mat = np.tile(np.identity(4), (J,1,1))
+        self._fk_anchor0_mat[:,:3,3:] = self._fk_anchor0
+        self._fk_joint_parent = np.array([index[self.joints_info[j].anchor0_part] for j in range(J)])
+
+        # Joints grouped by depth of their child body part: (joint indices, parent body part indices, gather buffers, child transforms)
+        # (all views are created once, since creating them in every step allocates memory)
+        self._fk_levels = []
+        for d in range(1, max(depth(p) for p in reachable)+1):
+            children = [p for p in names if p in parent and depth(p) == d]
+            joints = np.array([parent[p][1] for p in children])
+            n, start = len(children), index[children[0]]
+            self._fk_levels.append((joints, self._fk_joint_parent[joints], self._fk_gather[:n], self._fk_gather_local[:n], self._fk_body[start:start+n]))
+        self._fk_gather_joints = self._fk_gather[:J]
+        self._fk_local_rot = self._fk_local[:,:3,:3]
+        self._fk_local_vec = self._fk_local[:,:3,3:]
+        self._fk_body_pos = self._fk_body[:,:3,3]
+
+        masses = np.array([self.body_parts[name].mass for name in names])
+        self._fk_mass_weights = masses / np.sum(masses)
+
+        # Preallocated buffers for the joint rotations: rotation = basis @ (sin, 1-cos, cos)
+        self._fk_angles = np.empty(J)
+        self._fk_rot_coef = np.empty((J,3,1))
+        self._fk_sin, self._fk_cos1, self._fk_cos = self._fk_rot_coef[:,0,0], self._fk_rot_coef[:,1,0], self._fk_rot_coef[:,2,0]
+        self._fk_rot_flat = np.empty((J,9,1))
+        self._fk_rot = self._fk_rot_flat.reshape(J,3,3)
+        self._fk_vec = np.empty((J,3,1))
+
 
     def update_localization(self, localization_raw, time_local_ms): 
 
         # parse raw data
-        loc = localization_raw.astype(float) #32bits to 64bits for consistency
+        loc = self._loc_raw
+        np.copyto(loc, localization_raw) #32bits to 64bits for consistency
         self.loc_is_up_to_date = bool(loc[32])
         self.loc_head_z_is_up_to_date = bool(loc[34])
 
@@ -258,36 +345,35 @@ class Robot():
         if self.loc_is_up_to_date:
             time_diff = (time_local_ms - self.loc_last_update) / 1000
             self.loc_last_update = time_local_ms
-            self.loc_head_to_field_transform.m[:] = loc[0:16].reshape((4,4))
-            self.loc_field_to_head_transform.m[:] = loc[16:32].reshape((4,4))
-        
+
             # extract data (related to the robot's head)
-            self.loc_rotation_head_to_field = self.loc_head_to_field_transform.get_rotation()
-            self.loc_rotation_field_to_head = self.loc_field_to_head_transform.get_rotation()
-            p = self.loc_head_to_field_transform.get_translation()
-            self.loc_head_velocity = (p - self.loc_head_position) / time_diff
-            self.loc_head_position = p
+            # (loc_head_position is a view of loc_head_to_field_transform, so the velocity is computed before the update)
+            np.subtract(self._loc_raw_head_position, self.loc_head_position, out=self.loc_head_velocity)
+            self.loc_head_velocity /= time_diff
+            np.copyto(self.loc_head_to_field_transform.m, self._loc_raw_head_to_field)
+            np.copyto(self.loc_field_to_head_transform.m, self._loc_raw_field_to_head)
             self.loc_head_position_last_update = time_local_ms
             self.loc_head_orientation = self.loc_head_to_field_transform.get_yaw_deg()
             self.radio_fallen_state = False
 
             # extract data (related to the center of mass)
-            p = self.loc_head_to_field_transform(self.rel_cart_CoM_position)
-            self.loc_CoM_velocity = (p - self.loc_CoM_position) / time_diff
-            self.loc_CoM_position = p
+            p = Matrix_4x4.transform_point_into(self.loc_head_to_field_transform, self.rel_cart_CoM_position, self._aux_vec)
+            np.subtract(p, self.loc_CoM_position, out=self.loc_CoM_velocity)
+            self.loc_CoM_velocity /= time_diff
+            self.loc_CoM_position[:] = p
 
             # extract data (related to the robot's torso)
-            t = self.get_body_part_to_field_transform('torso')
-            self.loc_torso_to_field_transform = t
-            self.loc_torso_to_field_rotation = t.get_rotation()
+            t = Matrix_4x4.multiply_into(self.loc_head_to_field_transform, self.body_parts['torso'].transform, self.loc_torso_to_field_transform)
             self.loc_torso_orientation = t.get_yaw_deg()
             self.loc_torso_pitch = t.get_pitch_deg()
             self.loc_torso_roll = t.get_roll_deg()
             self.loc_torso_inclination = t.get_inclination_deg()
             p = t.get_translation()
-            self.loc_torso_velocity = (p - self.loc_torso_position) / time_diff
-            self.loc_torso_position = p
-            self.loc_torso_acceleration = self.loc_torso_to_field_rotation.multiply(self.acc) + Robot.GRAVITY
+            np.subtract(p, self.loc_torso_position, out=self.loc_torso_velocity)
+            self.loc_torso_velocity /= time_diff
+            self.loc_torso_position[:] = p
+            Matrix_3x3.multiply_vec_into(self.loc_torso_to_field_rotation, self.acc, self.loc_torso_acceleration)
+            self.loc_torso_acceleration += Robot.GRAVITY
 
 
     def head_to_body_part_transform(self, body_part_name, coords, is_batch=False):
@@ -312,7 +398,7 @@ class Robot():
         coord : `list` or ndarray
             A numpy array is returned if is_batch is False, otherwise, a list of arrays is returned
         '''
-        head_to_bp_transform : Matrix_4x4 = self.body_parts[body_part_name].transform.invert()
+        head_to_bp_transform : Matrix_4x4 = Matrix_4x4.invert_rigid_into(self.body_parts[body_part_name].transform, self._aux_transform)
         
         if is_batch:
             return [head_to_bp_transform(c) for c in coords]
@@ -354,20 +440,41 @@ class Robot():
         return self.get_joint_to_field_transform(joint_index).get_translation()
 
     def update_pose(self):
+        '''
+        Forward kinematics: update body parts' and joints' transformation matrices (relative to head) and the CoM position
+        The local transform of each joint is computed for all joints at once (batched Rodrigues rotations),
+        and then composed with the parent transforms, one batched multiplication per level of the kinematic tree
+        '''
 
         if self.fwd_kinematics_list is None:
             self._initialize_kinematics()
 
-        for body_part, j, child_body_part in self.fwd_kinematics_list:
-            ji = self.joints_info[j]
-            self.joints_transform[j].m[:] = body_part.transform.m
-            self.joints_transform[j].translate(ji.anchor0_axes, True)
-            child_body_part.transform.m[:] = self.joints_transform[j].m
-            child_body_part.transform.rotate_deg(ji.axes, self.joints_position[j], True)
-            child_body_part.transform.translate(ji.anchor1_axes_neg, True)
+        # Local transform of each joint: translate(anchor0) * rotate(axis, angle) * translate(-anchor1)
+        # where rotate(axis, angle) = sin*skew(axis) + (1-cos)*outer(axis,axis) + cos*I
+        ang, rot = self._fk_angles, self._fk_rot
+        np.multiply(self.joints_position, pi/180, out=ang)
+        np.sin(ang, out=self._fk_sin)
+        np.cos(ang, out=self._fk_cos)
+        np.subtract(1, self._fk_cos, out=self._fk_cos1)
+        np.matmul(self._fk_rot_basis, self._fk_rot_coef, out=self._fk_rot_flat)
 
-        self.rel_cart_CoM_position = np.average([b.transform.get_translation() for b in self.body_parts.values()], 0,
-                                                [b.mass                        for b in self.body_parts.values()])
+        np.copyto(self._fk_local_rot, rot)
+        np.matmul(rot, self._fk_anchor1_neg, out=self._fk_vec)
+        self._fk_vec += self._fk_anchor0
+        np.copyto(self._fk_local_vec, self._fk_vec) # (adding directly into the strided view would allocate a buffer)
+
+        # Compose transforms from the head to the extremities
+        # (ndarray.take is used instead of np.take, whose Python wrapper allocates memory, and 'clip' avoids buffering)
+        body, local = self._fk_body, self._fk_local
+        for joints, parents, gather, gather_local, children in self._fk_levels:
+            body.take(parents, axis=0, out=gather, mode='clip')
+            local.take(joints, axis=0, out=gather_local, mode='clip')
+            np.matmul(gather, gather_local, out=children)
+
+        body.take(self._fk_joint_parent, axis=0, out=self._fk_gather_joints, mode='clip')
+        np.matmul(self._fk_gather_joints, self._fk_anchor0_mat, out=self._fk_joints)
+
+        np.matmul(self._fk_mass_weights, self._fk_body_pos, out=self.rel_cart_CoM_position)
 
 
     def update_imu(self, time_local_ms):
@@ -385,15 +492,16 @@ class Robot():
             self.imu_weak_torso_position[:] = self.loc_torso_position
             self.imu_weak_torso_velocity[:] = self.loc_torso_velocity
             self.imu_weak_torso_acceleration[:] = self.loc_torso_acceleration
-            self.imu_weak_torso_next_position = self.loc_torso_position + self.loc_torso_velocity * Robot.STEPTIME + self.loc_torso_acceleration * (0.5 * Robot.SQ_STEPTIME)
-            self.imu_weak_torso_next_velocity = self.loc_torso_velocity + self.loc_torso_acceleration * Robot.STEPTIME
+            self._predict_imu_weak_torso_state(self.loc_torso_position, self.loc_torso_velocity, self.loc_torso_acceleration)
             self.imu_weak_CoM_position[:] = self.loc_CoM_position
             self.imu_weak_CoM_velocity[:] = self.loc_CoM_velocity
             self.imu_last_visual_update = time_local_ms
         else:
-            g = self.gyro / 50 # convert degrees per second to degrees per step
+            g = np.divide(self.gyro, 50, out=self._imu_gyro_step) # convert degrees per second to degrees per step
 
-            self.imu_torso_to_field_rotation.multiply( Matrix_3x3.from_rotation_deg(g), in_place=True, reverse_order=True)
+            Matrix_3x3.from_rotation_deg_into(g, self._imu_gyro_rotation)
+            Matrix_3x3.multiply_into(self._imu_gyro_rotation, self.imu_torso_to_field_rotation, self._imu_aux_rotation)
+            self.imu_torso_to_field_rotation.m[:] = self._imu_aux_rotation.m
 
             self.imu_torso_orientation = self.imu_torso_to_field_rotation.get_yaw_deg()
             self.imu_torso_pitch = self.imu_torso_to_field_rotation.get_pitch_deg()
@@ -405,22 +513,35 @@ class Robot():
             if time_local_ms < self.imu_last_visual_update + 200:
                 self.imu_weak_torso_position[:] = self.imu_weak_torso_next_position
                 if self.imu_weak_torso_position[2] < 0: self.imu_weak_torso_position[2] = 0 # limit z coordinate to positive values
-                self.imu_weak_torso_velocity[:] = self.imu_weak_torso_next_velocity * Robot.IMU_DECAY # stability tradeoff
+                np.multiply(self.imu_weak_torso_next_velocity, Robot.IMU_DECAY, out=self.imu_weak_torso_velocity) # stability tradeoff
             else:
                 self.imu_weak_torso_velocity *= 0.97 # without visual updates for 0.2s, the position is locked, and the velocity decays to zero
 
             # convert proper acceleration to coordinate acceleration and fix rounding bias
-            self.imu_weak_torso_acceleration = self.imu_torso_to_field_rotation.multiply(self.acc) + Robot.GRAVITY
-            self.imu_weak_torso_to_field_transform = Matrix_4x4.from_3x3_and_translation(self.imu_torso_to_field_rotation,self.imu_weak_torso_position)
-            self.imu_weak_head_to_field_transform = self.imu_weak_torso_to_field_transform.multiply(self.body_parts["torso"].transform.invert())
-            self.imu_weak_field_to_head_transform = self.imu_weak_head_to_field_transform.invert()
-            p = self.imu_weak_head_to_field_transform(self.rel_cart_CoM_position)
-            self.imu_weak_CoM_velocity = (p-self.imu_weak_CoM_position)/Robot.STEPTIME
-            self.imu_weak_CoM_position = p
-
-            # Next Position = x0 + v0*t + 0.5*a*t^2,   Next velocity = v0 + a*t
-            self.imu_weak_torso_next_position = self.imu_weak_torso_position + self.imu_weak_torso_velocity * Robot.STEPTIME + self.imu_weak_torso_acceleration * (0.5 * Robot.SQ_STEPTIME)
-            self.imu_weak_torso_next_velocity = self.imu_weak_torso_velocity + self.imu_weak_torso_acceleration * Robot.STEPTIME
+            Matrix_3x3.multiply_vec_into(self.imu_torso_to_field_rotation, self.acc, self.imu_weak_torso_acceleration)
+            self.imu_weak_torso_acceleration += Robot.GRAVITY
+            t = self.imu_weak_torso_to_field_transform
+            t.m[:3,:3] = self.imu_torso_to_field_rotation.m
+            t.m[:3,3] = self.imu_weak_torso_position
+            torso_to_head = Matrix_4x4.invert_rigid_into(self.body_parts["torso"].transform, self._aux_transform)
+            Matrix_4x4.multiply_into(t, torso_to_head, self.imu_weak_head_to_field_transform)
+            Matrix_4x4.invert_rigid_into(self.imu_weak_head_to_field_transform, self.imu_weak_field_to_head_transform)
+            p = Matrix_4x4.transform_point_into(self.imu_weak_head_to_field_transform, self.rel_cart_CoM_position, self._aux_vec)
+            np.subtract(p, self.imu_weak_CoM_position, out=self.imu_weak_CoM_velocity)
+            self.imu_weak_CoM_velocity /= Robot.STEPTIME
+            self.imu_weak_CoM_position[:] = p
+
+            self._predict_imu_weak_torso_state(self.imu_weak_torso_position, self.imu_weak_torso_velocity, self.imu_weak_torso_acceleration)
+
+    def _predict_imu_weak_torso_state(self, x0, v0, a):
+        ''' Next Position = x0 + v0*t + 0.5*a*t^2,   Next velocity = v0 + a*t   (written in place) '''
+        next_p, next_v = self.imu_weak_torso_next_position, self.imu_weak_torso_next_velocity
+        np.multiply(v0, Robot.STEPTIME, out=next_p)
+        next_p += x0
+        np.multiply(a, 0.5 * Robot.SQ_STEPTIME, out=self._aux_vec)
+        next_p += self._aux_vec
+        np.multiply(a, Robot.STEPTIME, out=next_v)
+        next_v += v0
 
 
 
@@ -526,10 +647,11 @@ class Robot():
     def get_command(self) -> bytes:
         '''
         Builds commands string from self.joints_target_speed
+        (see Command_Encoder to skip joints whose speed did not change)
         '''
-        j_speed = self.joints_target_speed * self.FIX_EFFECTOR_MASK #Fix symmetry issues 3/4 (effectors)
-        cmd = "".join(f"({self.joints_info[i].effector} {j_speed[i]:.5f})" for i in range(self.no_of_joints)).encode('utf-8')
+        cmd = self.command_encoder.encode(self.joints_target_speed)
 
-        self.joints_target_last_speed = self.joints_target_speed           #1. both point to the same array
-        self.joints_target_speed = np.zeros_like(self.joints_target_speed) #2. create new array for joints_target_speed
+        # swap buffers: joints_target_last_speed gets the sent speeds, joints_target_speed is reset (no allocation)
+        self.joints_target_last_speed, self.joints_target_speed = self.joints_target_speed, self.joints_target_last_speed
+        self.joints_target_speed.fill(0)
         return cmd
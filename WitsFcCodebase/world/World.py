@@ -1,11 +1,14 @@
 from collections import deque
+from cpp.a_star import a_star
 from cpp.ball_predictor import ball_predictor
 from cpp.localization import localization
 from logs.Logger import Logger
-from math import atan2, pi
+from logs.Profiler import Profiler
 from math_ops.Matrix_4x4 import Matrix_4x4
+from world.commons.Cost_Field import Cost_Field
 from world.commons.Draw import Draw
 from world.commons.Other_Robot import Other_Robot
+from world.commons.Other_Robots import Other_Robots
 from world.Robot import Robot
 import numpy as np
 
@@ -84,21 +87,29 @@ class World():
         self.ball_last_seen = 0                  # World.time_local_ms when ball was last seen (note: may be different from self.ball_abs_pos_last_update)
         self.ball_cheat_abs_pos = np.zeros(3)    # Absolute ball position provided by the server as cheat (m)
         self.ball_cheat_abs_vel = np.zeros(3)    # Absolute velocity vector based on the last 2 values of self.ball_cheat_abs_pos (m/s)
-        self.ball_2d_pred_pos = np.zeros((1,2))  # prediction of current and future 2D ball positions*
-        self.ball_2d_pred_vel = np.zeros((1,2))  # prediction of current and future 2D ball velocities*
-        self.ball_2d_pred_spd = np.zeros(1)      # prediction of current and future 2D ball linear speeds*
+        self.ball_predictor = ball_predictor.Predictor() # Keeps the ball prediction buffer (views below), advanced once per cycle
+        self.ball_predictor.set_stationary(0, 0)
+        self.ball_2d_pred_pos = self.ball_predictor.pos  # prediction of current and future 2D ball positions*
+        self.ball_2d_pred_vel = self.ball_predictor.vel  # prediction of current and future 2D ball velocities*
+        self.ball_2d_pred_spd = self.ball_predictor.spd  # prediction of current and future 2D ball linear speeds*
         # *at intervals of 0.02 s until ball comes to a stop or gets out of bounds (according to prediction)
+        #  (read-only views of the predictor's buffer, which is overwritten by the next prediction)
         self.lines = np.zeros((30,6))            # Position of visible lines, relative to head, start_pos+end_pos (spherical coordinates) (m, deg, deg, m, deg, deg)
         self.line_count = 0                      # Number of visible lines
         self.vision_last_update = 0                                   # World.time_local_ms when last vision update was received
         self.vision_is_up_to_date = False                             # True if the last server message contained vision information
-        self.teammates = [Other_Robot(i, True ) for i in range(1,6)] # List of teammates, ordered by unum
-        self.opponents = [Other_Robot(i, False) for i in range(1,6)] # List of opponents, ordered by unum
+        self.other_robots = Other_Robots(10)                                             # State of teammates (rows 0-4) and opponents (rows 5-9)
+        self.teammates = [Other_Robot(i, True,  self.other_robots, i-1) for i in range(1,6)] # List of teammates, ordered by unum
+        self.opponents = [Other_Robot(i, False, self.other_robots, i+4) for i in range(1,6)] # List of opponents, ordered by unum
         self.teammates[unum-1].is_self = True                         # This teammate is self
         self.draw = Draw(enable_draw, unum, host, 32769)              # Draw object for current player
         self.team_draw = Draw(enable_draw, 0, host, 32769)            # Draw object shared with teammates
         self.logger = logger
+        self.profiler = Profiler(logger.topic, World.STEPTIME_MS)    # Cycle-budget profiler (no-op unless enabled by Script option 'C')
         self.robot = Robot(unum, robot_type)
+        self.cost_field_planner = a_star.Planner() # planner of this agent's cost fields (keeps the obstacle map between fields)
+        self._ball_cost_field = None        # travel cost field from the ball of the current cycle (see get_ball_cost_field)
+        self._ball_cost_field_time = None
 
 
     def log(self, msg:str):
@@ -176,11 +187,34 @@ class World():
         '''
         b_sp = self.ball_2d_pred_spd
         index = len(b_sp) - max( 1, np.searchsorted(b_sp[::-1], max_speed, side='right') )
-        return self.ball_2d_pred_pos[index]
+        return self.ball_2d_pred_pos[index].copy() # (copy, the prediction buffer is reused)
+
+    def get_ball_cost_field(self, max_cost=np.inf, stop_positions=[]) -> Cost_Field:
+        '''
+        Get the travel cost field to the predicted 2D ball position when its speed is <= 0.5 m/s (see `get_predicted_ball_pos`)
+        Recently seen opponents are soft obstacles (with no hard radius, so that nearby players are not trapped)
+        The field is computed once per cycle and shared by all queries (it is computed again if it is not known up to `max_cost`)
+
+        Parameters
+        ----------
+        max_cost : float
+            minimum cost up to which the field must be known (see Cost_Field)
+        stop_positions : list
+            the field is only required until the cost of one of these 2D positions is known (see Cost_Field)
+        '''
+        f = self._ball_cost_field
+        if f is None or self._ball_cost_field_time != self.time_local_ms or (f.max_cost < max_cost and np.all(f.costs(stop_positions) == np.inf)):
+            o = self.other_robots
+            age = self.time_local_ms - o.state_last_update[5:]
+            rows = np.flatnonzero(o.state_ground_area_is_known[5:] & (o.state_last_update[5:] > 0) & (age <= 500)) + 5
+            obstacles = [(*o.state_ground_area_center[i], 0, 1.0, 1.0) for i in rows]
+            self._ball_cost_field = Cost_Field(self.cost_field_planner, self.get_predicted_ball_pos(0.5), obstacles, True, max_cost, stop_positions)
+            self._ball_cost_field_time = self.time_local_ms
+        return self._ball_cost_field
     
     def get_intersection_point_with_ball(self, player_speed):
         '''
-        Get 2D intersection point with moving ball, based on `self.ball_2d_pred_pos`
+        Get 2D intersection point with moving ball, based on `self.ball_2d_pred_pos` (the prediction is not copied, see `ball_predictor`)
 
         Parameters
         ----------
@@ -195,14 +229,40 @@ class World():
             distance between current robot position and intersection point
         '''
         
-        params = np.array([*self.robot.loc_head_position[:2], player_speed*0.02, *self.ball_2d_pred_pos.flat], np.float32)
-        pred_ret  = ball_predictor.get_intersection(params)
+        pos = self.robot.loc_head_position
+        pred_ret = self.ball_predictor.get_intersection(pos[0], pos[1], player_speed*0.02)
         return pred_ret[:2], pred_ret[2]
+
+    def get_intersections_with_ball(self, positions, player_speeds):
+        '''
+        Get 2D intersection points with moving ball for several players in one call (see `get_intersection_point_with_ball`)
+
+        Parameters
+        ----------
+        positions : array_like
+            (N,2) 2D positions of the players (NaN if unknown)
+        player_speeds : array_like
+            average speed at which each player will chase the ball, shape (N,) or scalar
+
+        Returns
+        -------
+        2D intersection points : ndarray
+            (N,2) 2D intersection point of each player (NaN if its position is unknown)
+        intersection distances : ndarray
+            (N,) distance between each player and its intersection point (NaN if its position is unknown)
+        '''
+        positions = np.asarray(positions, np.float32)[:,:2]
+        speeds = np.broadcast_to(np.asarray(player_speeds, np.float32) * 0.02, (len(positions),))
+        known = ~np.isnan(positions).any(axis=1)
+        pred_ret = self.ball_predictor.get_intersections(np.where(known[:,None], positions, 0), speeds)
+        pred_ret[~known] = np.nan
+        return pred_ret[:,:2], pred_ret[:,2]
     
     def update(self):
         r = self.robot
         PM = self.play_mode
         W = World
+        prof = self.profiler
 
         # reset variables
         r.loc_is_up_to_date = False                   
@@ -224,7 +284,9 @@ class World():
         elif PM is not None:
             raise ValueError(f'Unexpected play mode ID: {PM}')
 
+        t = prof.now()
         r.update_pose() # update forward kinematics
+        t = prof.add(Profiler.POSE, t)
 
         if self.ball_is_visible:
             # Compute ball position, relative to torso
@@ -239,9 +301,9 @@ class World():
             lf_contact = r.frp.get('lf', None)
             rf_contact = r.frp.get('rf', None)
             if lf_contact is not None:
-                feet_contact[0:3] = Matrix_4x4( r.body_parts["lfoot"].transform ).translate( lf_contact[0:3] , True).get_translation()
+                Matrix_4x4.transform_point_into( r.body_parts["lfoot"].transform, lf_contact[0:3], feet_contact[0:3] )
             if rf_contact is not None:
-                feet_contact[3:6] = Matrix_4x4( r.body_parts["rfoot"].transform ).translate( rf_contact[0:3] , True).get_translation()
+                Matrix_4x4.transform_point_into( r.body_parts["rfoot"].transform, rf_contact[0:3], feet_contact[3:6] )
 
             ball_pos = np.concatenate(( self.ball_rel_head_cart_pos, self.ball_cheat_abs_pos))
             
@@ -262,6 +324,7 @@ class World():
                 self.lines[0:self.line_count])  
 
             r.update_localization(loc, self.time_local_ms)
+            t = prof.add(Profiler.LOCALIZATION, t)
 
             # Update self in teammates list (only the most useful parameters, add as needed)
             me = self.teammates[r.unum-1]
@@ -314,118 +377,41 @@ class World():
                 self.is_ball_abs_pos_from_vision = True
 
             # Velocity decay for teammates and opponents (it is later neutralized if the velocity is updated)
-            for p in self.teammates:
-                p.state_filtered_velocity *= p.vel_decay
-            for p in self.opponents:
-                p.state_filtered_velocity *= p.vel_decay
+            others = self.other_robots
+            others.decay_velocity()
 
-            # Update teammates and opponents
+            # Update teammates and opponents (all at once)
             if r.loc_is_up_to_date:
-                for p in self.teammates:
-                    if not p.is_self:                     # if teammate is not self
-                        if p.is_visible:                  # if teammate is visible, execute full update
-                            self.update_other_robot(p)
-                        elif p.state_abs_pos is not None: # otherwise update its horizontal distance (assuming last known position)
-                            p.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - p.state_abs_pos[:2])
-
-                for p in self.opponents:
-                    if p.is_visible:                  # if opponent is visible, execute full update
-                        self.update_other_robot(p)
-                    elif p.state_abs_pos is not None: # otherwise update its horizontal distance (assuming last known position)
-                        p.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - p.state_abs_pos[:2])
+                visible = others.is_visible & others.parts_seen.any(axis=1)
+                visible[r.unum-1] = False # self
+                not_visible = ~visible
+                not_visible[r.unum-1] = False
+                others.update_cart_rel_pos()
+                # if visible, execute full update, otherwise update its horizontal distance (assuming last known position)
+                others.update_visible(visible, self.time_local_ms, r.loc_head_to_field_transform, r.loc_head_position)
+                others.update_horizontal_dist(not_visible, r.loc_head_position)
+
+            t = prof.add(Profiler.OTHER_ROBOTS, t)
+
+        # Keep own position in teammates list up to date (e.g. when changed by Radio between vision cycles)
+        if self.other_robots.state_abs_pos_dim[r.unum-1]:
+            self.other_robots.state_abs_pos[r.unum-1] = r.loc_head_position
 
         # Update prediction of ball position/velocity
+        t = prof.now()
+        bp = self.ball_predictor
         if self.play_mode_group != W.MG_OTHER: # not 'play on' nor 'game over', so ball must be stationary
-            self.ball_2d_pred_pos = self.ball_abs_pos[:2].copy().reshape(1, 2)
-            self.ball_2d_pred_vel = np.zeros((1,2))
-            self.ball_2d_pred_spd = np.zeros(1)
+            bp.set_stationary(self.ball_abs_pos[0], self.ball_abs_pos[1])
+            self.ball_2d_pred_pos, self.ball_2d_pred_vel, self.ball_2d_pred_spd = bp.pos, bp.vel, bp.spd
 
         elif self.ball_abs_pos_last_update == self.time_local_ms: # make new prediction for new ball position (from vision or radio)
+            vel = self.get_ball_abs_vel(6)
+            bp.predict(self.ball_abs_pos[0], self.ball_abs_pos[1], vel[0], vel[1])
+            self.ball_2d_pred_pos, self.ball_2d_pred_vel, self.ball_2d_pred_spd = bp.pos, bp.vel, bp.spd
 
-            params = np.array([*self.ball_abs_pos[:2], *np.copy(self.get_ball_abs_vel(6)[:2])], np.float32)
-            pred_ret  = ball_predictor.predict_rolling_ball(params)
-            sample_no = len(pred_ret) // 5 * 2
-            self.ball_2d_pred_pos = pred_ret[:sample_no].reshape(-1, 2)
-            self.ball_2d_pred_vel = pred_ret[sample_no:sample_no*2].reshape(-1, 2)
-            self.ball_2d_pred_spd = pred_ret[sample_no*2:]
+        elif bp.advance(): # otherwise, advance to next predicted step, if available 
+            self.ball_2d_pred_pos, self.ball_2d_pred_vel, self.ball_2d_pred_spd = bp.pos, bp.vel, bp.spd
 
-        elif len(self.ball_2d_pred_pos) > 1: # otherwise, advance to next predicted step, if available 
-            self.ball_2d_pred_pos = self.ball_2d_pred_pos[1:]
-            self.ball_2d_pred_vel = self.ball_2d_pred_vel[1:]
-            self.ball_2d_pred_spd = self.ball_2d_pred_spd[1:]
+        prof.add(Profiler.BALL_PREDICTION, t)
 
         r.update_imu(self.time_local_ms)      # update imu (must be executed after localization)
-
-
-    def update_other_robot(self,other_robot : Other_Robot):
-        ''' 
-        Update other robot state based on the relative position of visible body parts
-        (also updated by Radio, with the exception of state_orientation)
-        '''
-        o = other_robot
-        r = self.robot
-
-        # update body parts absolute positions
-        o.state_body_parts_abs_pos = o.body_parts_cart_rel_pos.copy()
-        for bp, pos in o.body_parts_cart_rel_pos.items():
-            # Using the IMU could be beneficial if we see other robots but can't self-locate
-            o.state_body_parts_abs_pos[bp] = r.loc_head_to_field_transform( pos, False )
-
-        # auxiliary variables 
-        bps_apos = o.state_body_parts_abs_pos                 # read-only shortcut
-        bps_2d_apos_list = [v[:2] for v in bps_apos.values()] # list of body parts' 2D absolute positions
-        avg_2d_pt = np.average(bps_2d_apos_list, axis=0)      # 2D avg pos of visible body parts
-        head_is_visible = 'head' in bps_apos
-
-        # evaluate robot's state (unchanged if head is not visible)
-        if head_is_visible:
-            o.state_fallen = bps_apos['head'][2] < 0.3
-
-        # compute velocity if head is visible
-        if o.state_abs_pos is not None:
-            time_diff = (self.time_local_ms - o.state_last_update) / 1000
-            if head_is_visible:
-                # if last position is 2D, we assume that the z coordinate did not change, so that v.z=0
-                old_p = o.state_abs_pos if len(o.state_abs_pos)==3 else np.append(o.state_abs_pos, bps_apos['head'][2])            
-                velocity = (bps_apos['head'] - old_p) / time_diff
-                decay = o.vel_decay # neutralize decay in all axes
-            else: # if head is not visible, we only update the x & y components of the velocity
-                velocity = np.append( (avg_2d_pt - o.state_abs_pos[:2]) / time_diff, 0)
-                decay = (o.vel_decay,o.vel_decay,1) # neutralize decay (except in the z-axis)
-            # apply filter
-            if np.linalg.norm(velocity - o.state_filtered_velocity) < 4: # otherwise assume it was beamed
-                o.state_filtered_velocity /= decay # neutralize decay
-                o.state_filtered_velocity += o.vel_filter * (velocity-o.state_filtered_velocity)
-
-        # compute robot's position (preferably based on head)  
-        if head_is_visible:  
-            o.state_abs_pos = bps_apos['head'] # 3D head position, if head is visible
-        else:   
-            o.state_abs_pos = avg_2d_pt # 2D avg pos of visible body parts
-
-        # compute robot's horizontal distance (head distance, or avg. distance of visible body parts)
-        o.state_horizontal_dist = np.linalg.norm(r.loc_head_position[:2] - o.state_abs_pos[:2])
-        
-        # compute orientation based on pair of lower arms or feet, or average of both
-        lr_vec = None
-        if 'llowerarm' in bps_apos and 'rlowerarm' in bps_apos:
-            lr_vec = bps_apos['rlowerarm'] - bps_apos['llowerarm']
-            
-        if 'lfoot' in bps_apos and 'rfoot' in bps_apos:
-            if lr_vec is None:
-                lr_vec = bps_apos['rfoot'] - bps_apos['lfoot']
-            else:
-                lr_vec = (lr_vec + (bps_apos['rfoot'] - bps_apos['lfoot'])) / 2
-        
-        if lr_vec is not None:
-            o.state_orientation = atan2(lr_vec[1],lr_vec[0]) * 180 / pi + 90
-
-        # compute projection of player area on ground (circle) 
-        if o.state_horizontal_dist < 4: # we don't need precision if the robot is farther than 4m 
-            max_dist = np.max(np.linalg.norm(bps_2d_apos_list - avg_2d_pt, axis=1))
-        else:
-            max_dist = 0.2
-        o.state_ground_area = (avg_2d_pt,max_dist)
-
-        # update timestamp
-        o.state_last_update = self.time_local_ms
\ No newline at end of file
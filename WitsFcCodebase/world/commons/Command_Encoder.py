@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class Command_Encoder():
+    '''
+    Encodes the joints' target speeds as effector commands, e.g. b"(he1 0.00000)(he2 -1.25000)..."
+
+    The byte templates are compiled once per robot type (same effectors) and all speeds are formatted in a single call.
+    If `skip_unchanged` is True, joints whose speed is the same as in the last command are omitted, since the server
+    keeps applying the last speed received by each hinge effector. In that case, `reset()` must be called whenever
+    an encoded command is not delivered to the server, so that the next command includes every joint.
+    '''
+    MAX_CACHED_TEMPLATES = 256                # maximum number of partial templates, per robot type
+    _compiled = dict()                        # key: effector names, value: (full template, per-joint templates, partial templates)
+
+    def __init__(self, effectors, fix_effector_mask, skip_unchanged=False) -> None:
+        '''
+        Parameters
+        ----------
+        effectors : list
+            effector name of each joint, e.g. ["he1","he2",...]
+        fix_effector_mask : ndarray
+            sign applied to each speed before encoding (fixes symmetry issues, see `Robot.FIX_EFFECTOR_MASK`)
+        skip_unchanged : bool
+            omit joints whose speed did not change since the last command
+        '''
+        key = tuple(effectors)
+        if key not in Command_Encoder._compiled:
+            joint_templates = [f"({e} %.5f)".encode('utf-8') for e in effectors]
+            Command_Encoder._compiled[key] = (b"".join(joint_templates), joint_templates, dict())
+        self._template, self._joint_templates, self._partial_templates = Command_Encoder._compiled[key]
+
+        self.mask = fix_effector_mask
+        self.skip_unchanged = skip_unchanged
+        self._speeds = np.zeros(len(effectors))          # signed speeds of the current command
+        self._last_speeds = np.full(len(effectors), np.nan) # signed speeds of the last command (NaN: unknown)
+        self._changed = np.zeros(len(effectors), bool)
+
+
+    def reset(self) -> None:
+        ''' Forget the last command (the next command will include every joint) '''
+        self._last_speeds.fill(np.nan)
+
+
+    def encode(self, joints_target_speed) -> bytes:
+        ''' Returns the effector commands for the given joints' target speeds (rad/s) '''
+        speeds = np.multiply(joints_target_speed, self.mask, out=self._speeds) #Fix symmetry issues 3/4 (effectors)
+
+        if not self.skip_unchanged:
+            return self._template % tuple(speeds.tolist())
+
+        changed = np.not_equal(speeds, self._last_speeds, out=self._changed)
+        self._last_speeds[:] = speeds
+        if changed.all():
+            return self._template % tuple(speeds.tolist())
+
+        key = changed.tobytes()
+        template = self._partial_templates.get(key)
+        if template is None:
+            if len(self._partial_templates) >= Command_Encoder.MAX_CACHED_TEMPLATES:
+                self._partial_templates.clear()
+            template = self._partial_templates[key] = b"".join(t for t,c in zip(self._joint_templates, changed) if c)
+        return template % tuple(speeds[changed].tolist())
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class Cost_Field():
+    '''
+    Obstacle-aware travel cost from every cell of the path planning grid (321x221, 0.1 m cells) to a seed point
+
+    The field is computed once with Dijkstra's algorithm (see a_star.Planner.cost_field), with the same costs as the
+    A* path planner, so the travel cost of any player (or point) to the seed is an O(1) lookup.
+    The planner (which keeps the obstacle map between fields) belongs to the caller, e.g. World, and the field is a copy
+    that is not changed by later fields of the same planner.
+    '''
+
+    def __init__(self, planner, seed, obstacles=[], allow_out_of_bounds=True, max_cost=np.inf, stop_positions=[]) -> None:
+        '''
+        Parameters
+        ----------
+        planner : a_star.Planner
+            planner of the caller (e.g. World), used to compute the field
+        seed : array_like
+            2D point (e.g. the ball), whose cost is zero
+        obstacles : list
+            list of obstacles, where each obstacle is a tuple of 5 floats (x, y, hard radius, soft radius, repulsive force)
+        allow_out_of_bounds : bool
+            allow paths to go out of bounds
+        max_cost : float
+            the field is only computed up to this cost (the cost of farther cells is infinite)
+            the computation time is roughly proportional to the area where the cost is below `max_cost`
+        stop_positions : list
+            2D positions, the field is only computed until the cost of one of them is known
+            (e.g. to find the closest player to the seed, only the area closer than that player is computed)
+        '''
+        self.seed = np.array(seed[:2], float)
+
+        # Field parameters: seed, allow_out_of_bounds, max_cost, stop positions, obstacles
+        params = np.array([*self.seed, int(allow_out_of_bounds), min(max_cost, 1e9), len(stop_positions),
+                           *[v for p in stop_positions for v in p[:2]], *[v for o in obstacles for v in o]], np.float32)
+
+        self.field = planner.cost_field(params) # (lines, columns), lines are aligned with x and columns with y
+        self.max_cost = min(max_cost, planner.field_limit) # the cost of every cell below max_cost is known
+
+    @staticmethod
+    def get_cell(pos):
+        ''' Grid cell (line, column) of 2D position `pos`, or arrays of cells if `pos` is an array of positions (N,2) '''
+        pos = np.asarray(pos)
+        line = (np.clip(10*pos[...,0]+160, 0, 320) + 0.5).astype(int)
+        col  = (np.clip(10*pos[...,1]+110, 0, 220) + 0.5).astype(int)
+        return line, col
+
+    def cost(self, pos) -> float:
+        '''
+        Travel cost (m) from 2D position `pos` to the seed
+        Roughly the path length, plus the cost of crossing soft obstacles (infinity if the seed is unreachable or the cost is not below `max_cost`)
+        '''
+        line = int(min(max(10*pos[0]+160, 0), 320) + 0.5)
+        col  = int(min(max(10*pos[1]+110, 0), 220) + 0.5)
+        return float(self.field[line, col])
+
+    def costs(self, positions):
+        ''' Travel cost (m) from each 2D position (N,2) to the seed (NaN positions have a NaN cost) '''
+        positions = np.asarray(positions, float).reshape(-1, 2)
+        known = ~np.isnan(positions).any(axis=-1)
+        line, col = Cost_Field.get_cell(np.where(known[...,None], positions, 0))
+        return np.where(known, self.field[line, col], np.nan)
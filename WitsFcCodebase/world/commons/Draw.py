@@ -1,10 +1,36 @@
 import socket
+import time
 from math_ops.Math_Ops import Math_Ops as M
 import numpy as np
 
 class Draw():
+    '''
+    RoboViz drawings
+
+    Drawings are not sent immediately. During the cycle, the commands of each drawing (identified by its id) are kept
+    until it is flushed, and flushed drawings are added to the frame of the current cycle. At the end of the cycle
+    (see Server_Comm.send), `send_frame` packs the whole frame (of all agents in this process) into as few datagrams
+    as possible, without splitting commands. A flushed drawing that is identical to its previous version is not sent
+    again (RoboViz keeps showing it), except once every REFRESH_INTERVAL seconds, when all drawings are sent again
+    (in case a datagram was lost or RoboViz was started after the agents).
+    '''
     _socket = None
 
+    MAX_DATAGRAM = 1472 # maximum UDP payload without IP fragmentation (Ethernet MTU - IP and UDP headers)
+    batched = True      # False: every command is sent immediately (previous behavior, used by benchmarks)
+    REFRESH_INTERVAL = 1 # time (s) between full refreshes, when unchanged drawings are also sent
+
+    _frame = []         # commands to be sent at the end of the cycle
+    _pending = dict()   # key: drawing id (with prefix), value: list of commands that were not flushed yet
+    _last = dict()      # key: drawing id (with prefix), value: commands of the last flushed version (None if unknown)
+    _partial = set()    # drawing ids whose back buffer in RoboViz has unflushed commands from previous cycles
+    _last_refresh = 0   # time of the last full refresh (see send_frame)
+
+    # Statistics (datagrams, payload bytes, flushed drawings that were not sent again because they were unchanged)
+    sent_datagrams = 0
+    sent_bytes = 0
+    skipped_drawings = 0
+
     def __init__(self, is_enabled:bool, unum:int, host:str, port:int) -> None:
         self.enabled = is_enabled  
         self._is_team_right = None
@@ -31,15 +57,80 @@ class Draw():
 
 
     @staticmethod
-    def _send(msg, id, flush):
-        ''' Private method to send message if RoboViz is accessible '''
+    def _send_datagram(msg):
+        ''' Private method to send a datagram if RoboViz is accessible '''
         try:
-            if flush:
-                Draw._socket.send(msg + id + b'\x00\x00\x00' + id + b'\x00')
-            else:
-                Draw._socket.send(msg + id + b'\x00')
+            Draw._socket.send(msg)
         except ConnectionRefusedError:
             pass
+        Draw.sent_datagrams += 1
+        Draw.sent_bytes += len(msg)
+
+
+    @staticmethod
+    def _send(msg, id, flush):
+        ''' Private method to add a drawing command to drawing `id`, and flush it if requested '''
+        if not Draw.batched:
+            Draw._send_datagram(msg + id + b'\x00\x00\x00' + id + b'\x00' if flush else msg + id + b'\x00')
+            return
+
+        cmds = Draw._pending.get(id)
+        if cmds is None:
+            cmds = Draw._pending[id] = []
+        cmds.append(msg + id + b'\x00')
+        if flush:
+            Draw._swap(id)
+
+
+    @staticmethod
+    def _swap(id):
+        ''' Private method to add the pending commands of drawing `id` to the frame, followed by a swap buffers command '''
+        if not Draw.batched:
+            Draw._send_datagram(b'\x00\x00' + id + b'\x00')
+            return
+
+        cmds = Draw._pending.pop(id, ())
+        content = b''.join(cmds)
+        if id in Draw._partial: # some commands were already sent, the whole content is unknown
+            Draw._partial.discard(id)
+            Draw._last[id] = None
+        elif Draw._last.get(id) == content: # RoboViz is already showing this drawing
+            Draw.skipped_drawings += 1
+            return
+        else:
+            Draw._last[id] = content
+        Draw._frame.extend(cmds)
+        Draw._frame.append(b'\x00\x00' + id + b'\x00')
+
+
+    @staticmethod
+    def send_frame():
+        '''
+        Send the frame of the current cycle (called once per cycle, see Server_Comm.send)
+        Commands of drawings that were not flushed are also sent (RoboViz keeps them in the back buffer until they are flushed)
+        '''
+        frame = Draw._frame
+        if Draw._pending:
+            for id, cmds in Draw._pending.items():
+                frame.extend(cmds)
+                Draw._partial.add(id)
+            Draw._pending.clear()
+
+        now = time.monotonic()
+        if now - Draw._last_refresh >= Draw.REFRESH_INTERVAL: # the next version of every drawing is sent, even if unchanged
+            Draw._last.clear()
+            Draw._last_refresh = now
+        if not frame: return
+
+        # Pack the commands in datagrams of up to MAX_DATAGRAM bytes (a longer command is sent alone)
+        start, size = 0, 0
+        for i, cmd in enumerate(frame):
+            if size + len(cmd) > Draw.MAX_DATAGRAM and size > 0:
+                Draw._send_datagram(b''.join(frame[start:i]))
+                start, size = i, 0
+            size += len(cmd)
+        Draw._send_datagram(b''.join(frame[start:]))
+        frame.clear()
 
         
     def circle(self, pos2d, radius, thickness, color:bytes, id:str, flush=True):
@@ -247,27 +338,43 @@ class Draw():
         ''' Flush specific drawing by ID '''
         if not self.enabled: return
 
-        Draw._send(b'\x00\x00', self._prefix + id.encode(), False)
+        Draw._swap(self._prefix + id.encode())
 
     def clear(self, id):
         ''' Clear specific drawing by ID '''
         if not self.enabled: return
 
-        Draw._send(b'\x00\x00', self._prefix + id.encode(), True) #swap buffer twice
+        key = self._prefix + id.encode()
+        if Draw.batched:
+            Draw._pending.pop(key, None)
+        Draw._swap(key) #swap buffer twice
+        Draw._swap(key)
 
 
     def clear_player(self):
         ''' Clear all drawings made by this player '''
         if not self.enabled: return
 
-        Draw._send(b'\x00\x00', self._prefix, True) #swap buffer twice
+        if Draw.batched: # all drawings of this player are cleared (their ids contain the prefix)
+            prefix = self._prefix
+            for state in (Draw._pending, Draw._last):
+                for key in [k for k in state if k.startswith(prefix)]:
+                    del state[key]
+            Draw._partial = {k for k in Draw._partial if not k.startswith(prefix)}
+            Draw._frame.append(b'\x00\x00' + prefix + b'\x00\x00\x00' + prefix + b'\x00') #swap buffer twice
+        else:
+            Draw._send_datagram(b'\x00\x00' + self._prefix + b'\x00\x00\x00' + self._prefix + b'\x00')
 
 
     @staticmethod
     def clear_all():
-        ''' Clear all drawings of all players '''
+        ''' Clear all drawings of all players (immediately, the current frame is discarded) '''
         if Draw._socket is not None:
-            Draw._send(b'\x00\x00\x00\x00\x00',b'',False) #swap buffer twice using no id
+            Draw._frame.clear()
+            Draw._pending.clear()
+            Draw._last.clear()
+            Draw._partial.clear()
+            Draw._send_datagram(b'\x00\x00\x00\x00\x00\x00') #swap buffer twice using no id
 
 
     class Color():
@@ -1,28 +1,153 @@
-import numpy as np
+from world.commons.Other_Robots import Other_Robots
 
 #Note: When other robot is seen, all previous body part positions are deleted
 # E.g. we see 5 body parts at 0 seconds -> body_parts_cart_rel_pos contains 5 elements
 #      we see 1 body part  at 1 seconds -> body_parts_cart_rel_pos contains 1 element
 
+#Note: The variables are stored in a row of `Other_Robots` (structure of arrays shared by all other robots)
+# Array attributes are views of that row, e.g. `state_filtered_velocity *= 2` changes the shared array,
+# but they are overwritten in place when the state is updated (copy them to keep old values)
+
 
 class Other_Robot():
-    def __init__(self, unum, is_teammate) -> None:
+    def __init__(self, unum, is_teammate, robots:Other_Robots=None, row=0) -> None:
         self.unum = unum                # convenient variable to indicate uniform number (same as other robot's index + 1)
         self.is_self = False            # convenient flag to indicate if this robot is self
         self.is_teammate = is_teammate  # convenient variable to indicate if this robot is from our team
-        self.is_visible = False # True if this robot was seen in the last message from the server (it doesn't mean we know its absolute location)
-        self.body_parts_cart_rel_pos = dict()  # cartesian relative position of the robot's visible body parts
-        self.body_parts_sph_rel_pos = dict()   # spherical relative position of the robot's visible body parts
-        self.vel_filter = 0.3                  # EMA filter coefficient applied to self.state_filtered_velocity
-        self.vel_decay  = 0.95                 # velocity decay at every vision cycle (neutralized if velocity is updated)
-
-
-        # State variables: these are computed when this robot is visible and when the original robot is able to self-locate
-        self.state_fallen = False              # true if the robot is lying down  (updated when head is visible)
-        self.state_last_update = 0             # World.time_local_ms when the state was last updated
-        self.state_horizontal_dist = 0         # horizontal head distance if head is visible, otherwise, average horizontal distance of visible body parts (the distance is updated by vision or radio when state_abs_pos gets a new value, but also when the other player is not visible, by assuming its last position)
-        self.state_abs_pos = None              # 3D head position if head is visible, otherwise, 2D average position of visible body parts, or, 2D radio head position
-        self.state_orientation = 0             # orientation based on pair of lower arms or feet, or average of both (WARNING: may be older than state_last_update)  
-        self.state_ground_area = None          # (pt_2d,radius) projection of player area on ground (circle), not precise if farther than 3m (for performance), useful for obstacle avoidance when it falls
-        self.state_body_parts_abs_pos = dict() # 3D absolute position of each body part
-        self.state_filtered_velocity = np.zeros(3) # 3D filtered velocity (m/s) (if the head is not visible, the 2D part is updated and v.z decays)
+        self.robots = Other_Robots(1) if robots is None else robots # structure of arrays where the variables are stored
+        self.row = row                                              # row of this robot in self.robots
+
+    # is_visible                 True if this robot was seen in the last message from the server (it doesn't mean we know its absolute location)
+    # body_parts_cart_rel_pos    cartesian relative position of the robot's visible body parts
+    # body_parts_sph_rel_pos     spherical relative position of the robot's visible body parts
+    # vel_filter                 EMA filter coefficient applied to self.state_filtered_velocity
+    # vel_decay                  velocity decay at every vision cycle (neutralized if velocity is updated)
+
+    @property
+    def is_visible(self) -> bool:
+        return bool(self.robots.is_visible[self.row])
+
+    @is_visible.setter
+    def is_visible(self, value:bool):
+        self.robots.is_visible[self.row] = value
+
+    @property
+    def body_parts_cart_rel_pos(self) -> dict:
+        o, i = self.robots, self.row
+        return {name:o.parts_cart_rel_pos[i,j] for j,name in enumerate(Other_Robots.BODY_PARTS) if o.parts_seen[i,j]}
+
+    @property
+    def body_parts_sph_rel_pos(self) -> dict:
+        o, i = self.robots, self.row
+        return {name:o.parts_sph_rel_pos[i,j] for j,name in enumerate(Other_Robots.BODY_PARTS) if o.parts_seen[i,j]}
+
+    @property
+    def vel_filter(self) -> float:
+        return float(self.robots.vel_filter[self.row])
+
+    @vel_filter.setter
+    def vel_filter(self, value:float):
+        self.robots.vel_filter[self.row] = value
+
+    @property
+    def vel_decay(self) -> float:
+        return float(self.robots.vel_decay[self.row])
+
+    @vel_decay.setter
+    def vel_decay(self, value:float):
+        self.robots.vel_decay[self.row] = value
+
+
+    # State variables: these are computed when this robot is visible and when the original robot is able to self-locate
+    # state_fallen               true if the robot is lying down  (updated when head is visible)
+    # state_last_update          World.time_local_ms when the state was last updated
+    # state_horizontal_dist      horizontal head distance if head is visible, otherwise, average horizontal distance of visible body parts (the distance is updated by vision or radio when state_abs_pos gets a new value, but also when the other player is not visible, by assuming its last position)
+    # state_abs_pos              3D head position if head is visible, otherwise, 2D average position of visible body parts, or, 2D radio head position
+    # state_orientation          orientation based on pair of lower arms or feet, or average of both (WARNING: may be older than state_last_update)
+    # state_ground_area          (pt_2d,radius) projection of player area on ground (circle), not precise if farther than 3m (for performance), useful for obstacle avoidance when it falls
+    # state_body_parts_abs_pos   3D absolute position of each body part
+    # state_filtered_velocity    3D filtered velocity (m/s) (if the head is not visible, the 2D part is updated and v.z decays)
+
+    @property
+    def state_fallen(self) -> bool:
+        return bool(self.robots.state_fallen[self.row])
+
+    @state_fallen.setter
+    def state_fallen(self, value:bool):
+        self.robots.state_fallen[self.row] = value
+
+    @property
+    def state_last_update(self) -> int:
+        return int(self.robots.state_last_update[self.row])
+
+    @state_last_update.setter
+    def state_last_update(self, value:int):
+        self.robots.state_last_update[self.row] = value
+
+    @property
+    def state_horizontal_dist(self) -> float:
+        return float(self.robots.state_horizontal_dist[self.row])
+
+    @state_horizontal_dist.setter
+    def state_horizontal_dist(self, value:float):
+        self.robots.state_horizontal_dist[self.row] = value
+
+    @property
+    def state_abs_pos(self):
+        dim = self.robots.state_abs_pos_dim[self.row]
+        return self.robots.state_abs_pos[self.row,:dim] if dim else None
+
+    @state_abs_pos.setter
+    def state_abs_pos(self, value):
+        o, i = self.robots, self.row
+        if value is None:
+            o.state_abs_pos_dim[i] = 0
+        else:
+            o.state_abs_pos_dim[i] = len(value)
+            o.state_abs_pos[i,:len(value)] = value
+
+    @property
+    def state_orientation(self) -> float:
+        return float(self.robots.state_orientation[self.row])
+
+    @state_orientation.setter
+    def state_orientation(self, value:float):
+        self.robots.state_orientation[self.row] = value
+
+    @property
+    def state_ground_area(self):
+        o, i = self.robots, self.row
+        return (o.state_ground_area_center[i], float(o.state_ground_area_radius[i])) if o.state_ground_area_is_known[i] else None
+
+    @state_ground_area.setter
+    def state_ground_area(self, value):
+        o, i = self.robots, self.row
+        o.state_ground_area_is_known[i] = value is not None
+        if value is not None:
+            o.state_ground_area_center[i] = value[0][:2]
+            o.state_ground_area_radius[i] = value[1]
+
+    @property
+    def state_body_parts_abs_pos(self) -> dict:
+        o, i = self.robots, self.row
+        dim = o.state_parts_dim[i]
+        return {name:o.state_parts_abs_pos[i,j,:dim] for j,name in enumerate(Other_Robots.BODY_PARTS) if o.state_parts_known[i,j]}
+
+    @state_body_parts_abs_pos.setter
+    def state_body_parts_abs_pos(self, value:dict):
+        ''' Set the absolute position of some body parts (2D or 3D, all with the same dimension) '''
+        o, i = self.robots, self.row
+        o.state_parts_known[i] = False
+        for name, pos in value.items():
+            j = Other_Robots.BODY_PART_INDEX[name]
+            o.state_parts_known[i,j] = True
+            o.state_parts_abs_pos[i,j,:len(pos)] = pos
+            o.state_parts_dim[i] = len(pos)
+
+    @property
+    def state_filtered_velocity(self):
+        return self.robots.state_filtered_velocity[self.row]
+
+    @state_filtered_velocity.setter
+    def state_filtered_velocity(self, value):
+        self.robots.state_filtered_velocity[self.row] = value
@@ -0,0 +1,237 @@
+from math import atan2, degrees, hypot
+from math_ops.Matrix_4x4 import Matrix_4x4
+import numpy as np
+
+
+class Other_Robots():
+    '''
+    State of all other robots (teammates and opponents) as a structure of arrays
+
+    Row `i` holds teammate `i+1` (i<5) or opponent `i-4` (i>=5). `World_Parser` fills the relative position of the
+    visible body parts, and `World.update` estimates the state of every visible robot at once (see `update_visible`).
+    Each `Other_Robot` exposes one row of these arrays through its attributes.
+    '''
+    BODY_PARTS = ("head", "llowerarm", "rlowerarm", "lfoot", "rfoot")  # body parts sent by the server
+    BODY_PART_INDEX = {name:i for i,name in enumerate(BODY_PARTS)}
+    HEAD, LLOWERARM, RLOWERARM, LFOOT, RFOOT = range(len(BODY_PARTS))
+    SCALAR_MAX_ROWS = 5 # up to this number of robots, `update_visible` updates one robot at a time (faster than batching)
+
+    def __init__(self, n=10) -> None:
+        p = len(Other_Robots.BODY_PARTS)
+        self.n = n
+
+        # Vision (filled by World_Parser)
+        self.is_visible = np.zeros(n, bool)          # True if the robot was seen in the last message from the server
+        self.parts_seen = np.zeros((n,p), bool)      # body parts seen the last time the robot was visible
+        self.parts_sph_rel_pos = np.zeros((n,p,3))   # spherical relative position of the body parts (m, deg, deg)
+        self.parts_cart_rel_pos = np.zeros((n,p,3))  # cartesian relative position of the body parts (m) (see `update_cart_rel_pos`)
+
+        # Filter parameters
+        self.vel_filter = np.full(n, 0.3)            # EMA filter coefficient applied to state_filtered_velocity
+        self.vel_decay  = np.full(n, 0.95)           # velocity decay at every vision cycle (neutralized if velocity is updated)
+
+        # State (see Other_Robot for a description of each variable)
+        self.state_fallen = np.zeros(n, bool)
+        self.state_last_update = np.zeros(n, np.int64)
+        self.state_horizontal_dist = np.zeros(n)
+        self.state_abs_pos = np.zeros((n,3))
+        self.state_abs_pos_dim = np.zeros(n, np.int64)       # 0: unknown (None), 2: 2D position, 3: 3D position
+        self.state_orientation = np.zeros(n)
+        self.state_ground_area_center = np.zeros((n,2))
+        self.state_ground_area_radius = np.zeros(n)
+        self.state_ground_area_is_known = np.zeros(n, bool)  # False while state_ground_area is None
+        self.state_parts_abs_pos = np.zeros((n,p,3))
+        self.state_parts_known = np.zeros((n,p), bool)       # body parts in state_body_parts_abs_pos
+        self.state_parts_dim = np.full(n, 3, np.int64)       # 2 if the body parts' position is 2D (e.g. from radio)
+        self.state_filtered_velocity = np.zeros((n,3))
+
+
+    def update_cart_rel_pos(self) -> None:
+        ''' Convert the spherical relative position of all body parts to cartesian coordinates '''
+        sph = self.parts_sph_rel_pos
+        angles = np.deg2rad(sph[...,1:]) # horizontal, vertical
+        cos, sin = np.cos(angles), np.sin(angles)
+        r_cos_v = sph[...,0] * cos[...,1]
+        out = self.parts_cart_rel_pos
+        np.multiply(r_cos_v, cos[...,0], out=out[...,0])
+        np.multiply(r_cos_v, sin[...,0], out=out[...,1])
+        np.multiply(sph[...,0], sin[...,1], out=out[...,2])
+
+
+    def decay_velocity(self) -> None:
+        ''' Apply velocity decay to all robots (it is later neutralized if the velocity is updated) '''
+        self.state_filtered_velocity *= self.vel_decay[:,None]
+
+
+    def update_visible(self, rows, time_local_ms:int, head_to_field:Matrix_4x4, head_pos) -> None:
+        '''
+        Update the state of other robots based on the relative position of their visible body parts
+        (also updated by Radio, with the exception of state_orientation)
+
+        Parameters
+        ----------
+        rows : ndarray
+            boolean mask of the robots to update (visible robots with at least one visible body part)
+        time_local_ms : int
+            current time (World.time_local_ms)
+        head_to_field : Matrix_4x4
+            transformation matrix from our head to the field
+        head_pos : ndarray
+            absolute position of our head
+        '''
+        indices = np.flatnonzero(rows)
+        if len(indices) == 0:
+            return
+
+        if len(indices) <= Other_Robots.SCALAR_MAX_ROWS:
+            for row in indices.tolist():
+                self._update_visible_row(row, time_local_ms, head_to_field, head_pos)
+            return
+
+        with np.errstate(divide='ignore', invalid='ignore'): # (robots that are not updated may produce invalid values)
+            self._update_visible(rows, time_local_ms, head_to_field, head_pos)
+
+
+    def _update_visible(self, rows, time_local_ms:int, head_to_field:Matrix_4x4, head_pos) -> None:
+        H, LA, RA, LF, RF = Other_Robots.HEAD, Other_Robots.LLOWERARM, Other_Robots.RLOWERARM, Other_Robots.LFOOT, Other_Robots.RFOOT
+        rows_2d = rows[:,None]
+        seen = self.parts_seen & rows_2d  # visible body parts of the robots to update (n,p)
+        head_visible = seen[:,H]
+
+        # update body parts absolute positions (all body parts of all robots are transformed at once)
+        # Using the IMU could be beneficial if we see other robots but can't self-locate
+        abs_pos = Matrix_4x4.transform_points_batch(head_to_field, self.parts_cart_rel_pos.reshape(-1,3)).reshape(self.parts_cart_rel_pos.shape)
+        np.copyto(self.state_parts_abs_pos, abs_pos, where=rows[:,None,None])
+        np.copyto(self.state_parts_known, seen, where=rows_2d)
+        self.state_parts_dim[rows] = 3
+        head_abs_pos = abs_pos[:,H]
+
+        # auxiliary variables
+        abs_2d = np.where(seen[...,None], abs_pos[...,:2], 0)         # 2D positions of visible body parts (zero otherwise)
+        avg_2d_pt = abs_2d.sum(axis=1) / seen.sum(axis=1)[:,None]     # 2D avg pos of visible body parts
+
+        # evaluate robot's state (unchanged if head is not visible)
+        np.copyto(self.state_fallen, head_abs_pos[:,2] < 0.3, where=head_visible)
+
+        # new position (3D head position if head is visible, otherwise, 2D avg pos of visible body parts)
+        # if the last position is 2D and the head is visible, we assume that the z coordinate did not change, so that v.z=0
+        # if the head is not visible, we only update the x & y components of the velocity
+        old_p = self.state_abs_pos.copy()
+        np.copyto(old_p[:,2], head_abs_pos[:,2], where=head_visible & (self.state_abs_pos_dim == 2))
+        new_p = old_p.copy()
+        new_p[:,:2] = np.where(head_visible[:,None], head_abs_pos[:,:2], avg_2d_pt)
+        np.copyto(new_p[:,2], head_abs_pos[:,2], where=head_visible)
+
+        # compute velocity and apply filter
+        vel = self.state_filtered_velocity
+        velocity = (new_p - old_p) / ((time_local_ms - self.state_last_update) / 1000)[:,None]
+        vel_diff = velocity - vel
+        apply = rows & (self.state_abs_pos_dim != 0) & (np.einsum('ij,ij->i', vel_diff, vel_diff) < 16) # otherwise assume it was beamed
+        decay = np.repeat(self.vel_decay[:,None], 3, axis=1)
+        decay[~head_visible,2] = 1    # neutralize decay in all axes (except in the z-axis if the head is not visible)
+        filtered = vel / decay        # neutralize decay
+        filtered += self.vel_filter[:,None] * (velocity - filtered)
+        np.copyto(vel, filtered, where=apply[:,None])
+
+        # update robot's position
+        np.copyto(self.state_abs_pos, new_p, where=rows_2d)
+        np.copyto(self.state_abs_pos_dim, np.where(head_visible, 3, 2), where=rows)
+
+        # compute robot's horizontal distance (head distance, or avg. distance of visible body parts)
+        dist = np.hypot(new_p[:,0] - head_pos[0], new_p[:,1] - head_pos[1])
+        np.copyto(self.state_horizontal_dist, dist, where=rows)
+
+        # compute orientation based on pair of lower arms or feet, or average of both
+        arms = seen[:,LA] & seen[:,RA]
+        feet = seen[:,LF] & seen[:,RF]
+        lr_vec = (abs_2d[:,RA] - abs_2d[:,LA]) * arms[:,None] + (abs_2d[:,RF] - abs_2d[:,LF]) * feet[:,None] # (sum is parallel to average)
+        np.copyto(self.state_orientation, np.degrees(np.arctan2(lr_vec[:,1], lr_vec[:,0])) + 90, where=arms|feet)
+
+        # compute projection of player area on ground (circle), we don't need precision if the robot is farther than 4m
+        rel_2d = abs_2d - avg_2d_pt[:,None]
+        max_dist = np.where(seen, np.hypot(rel_2d[...,0], rel_2d[...,1]), 0).max(axis=1)
+        np.copyto(self.state_ground_area_center, avg_2d_pt, where=rows_2d)
+        np.copyto(self.state_ground_area_radius, np.where(dist < 4, max_dist, 0.2), where=rows)
+        self.state_ground_area_is_known |= rows
+
+        # update timestamp
+        self.state_last_update[rows] = time_local_ms
+
+
+    def _update_visible_row(self, row:int, time_local_ms:int, head_to_field:Matrix_4x4, head_pos) -> None:
+        ''' Same as `_update_visible` for a single robot, with Python floats (numpy calls have a high fixed cost) '''
+        H, LA, RA, LF, RF = Other_Robots.HEAD, Other_Robots.LLOWERARM, Other_Robots.RLOWERARM, Other_Robots.LFOOT, Other_Robots.RFOOT
+        seen = self.parts_seen[row].tolist()
+
+        # update body parts absolute positions
+        abs_pos = Matrix_4x4.transform_points_batch(head_to_field, self.parts_cart_rel_pos[row], self.state_parts_abs_pos[row]).tolist()
+        self.state_parts_known[row] = self.parts_seen[row]
+        self.state_parts_dim[row] = 3
+
+        # auxiliary variables
+        visible_2d = [p[:2] for p, s in zip(abs_pos, seen) if s]  # 2D positions of visible body parts
+        n = len(visible_2d)
+        avg_x = sum(p[0] for p in visible_2d) / n                 # 2D avg pos of visible body parts
+        avg_y = sum(p[1] for p in visible_2d) / n
+        head_visible = seen[H]
+        head = abs_pos[H]
+
+        # evaluate robot's state (unchanged if head is not visible)
+        if head_visible:
+            self.state_fallen[row] = head[2] < 0.3
+
+        # new position (see `_update_visible`)
+        old_p = self.state_abs_pos[row].tolist()
+        dim = int(self.state_abs_pos_dim[row])
+        if head_visible and dim == 2:
+            old_p[2] = head[2]
+        new_p = head if head_visible else [avg_x, avg_y, old_p[2]]
+
+        # compute velocity and apply filter (not applied if no time has passed, the batched version produces inf/nan)
+        time_diff = (time_local_ms - int(self.state_last_update[row])) / 1000
+        if dim != 0 and time_diff != 0:
+            vel = self.state_filtered_velocity[row]
+            velocity = [(a - b) / time_diff for a, b in zip(new_p, old_p)]
+            vel_list = vel.tolist()
+            if sum((v - f) * (v - f) for v, f in zip(velocity, vel_list)) < 16: # otherwise assume it was beamed
+                decay = float(self.vel_decay[row])
+                k = float(self.vel_filter[row])
+                decays = (decay, decay, decay if head_visible else 1) # neutralize decay (except in the z-axis if the head is not visible)
+                for j in range(3):
+                    f = vel_list[j] / decays[j]
+                    vel[j] = f + k * (velocity[j] - f)
+
+        # update robot's position
+        self.state_abs_pos[row] = new_p
+        self.state_abs_pos_dim[row] = 3 if head_visible else 2
+
+        # compute robot's horizontal distance (head distance, or avg. distance of visible body parts)
+        dist = hypot(new_p[0] - head_pos[0], new_p[1] - head_pos[1])
+        self.state_horizontal_dist[row] = dist
+
+        # compute orientation based on pair of lower arms or feet, or average of both
+        arms = seen[LA] and seen[RA]
+        feet = seen[LF] and seen[RF]
+        if arms or feet:
+            lr_x = lr_y = 0.0
+            if arms:
+                lr_x += abs_pos[RA][0] - abs_pos[LA][0]
+                lr_y += abs_pos[RA][1] - abs_pos[LA][1]
+            if feet:
+                lr_x += abs_pos[RF][0] - abs_pos[LF][0]
+                lr_y += abs_pos[RF][1] - abs_pos[LF][1]
+            self.state_orientation[row] = degrees(atan2(lr_y, lr_x)) + 90
+
+        # compute projection of player area on ground (circle), we don't need precision if the robot is farther than 4m
+        self.state_ground_area_center[row] = avg_x, avg_y
+        self.state_ground_area_radius[row] = max(hypot(p[0] - avg_x, p[1] - avg_y) for p in visible_2d) if dist < 4 else 0.2
+        self.state_ground_area_is_known[row] = True
+
+        # update timestamp
+        self.state_last_update[row] = time_local_ms
+
+
+    def update_horizontal_dist(self, rows, head_pos) -> None:
+        ''' Update the horizontal distance of the given robots (boolean mask), assuming their last known position '''
+        dist = np.hypot(self.state_abs_pos[:,0] - head_pos[0], self.state_abs_pos[:,1] - head_pos[1])
+        np.copyto(self.state_horizontal_dist, dist, where=rows & (self.state_abs_pos_dim != 0))
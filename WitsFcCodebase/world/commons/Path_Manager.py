@@ -30,6 +30,11 @@ class Path_Manager():
         self.last_update = 0
         self.last_start_dist = None
 
+        # incremental A* planners, which keep the obstacle map and the learned heuristic between cycles
+        # (dribble paths cannot go out of bounds, so they get their own planner to avoid rebuilding the map at every switch)
+        self.planners = {True: a_star.Planner(), False: a_star.Planner()} # key: allow_out_of_bounds
+        self.batch_planner = a_star.Planner() # used by 'get_paths' (candidate queries would disturb the state of the main planners)
+
     def draw_options(self, enable_obstacles, enable_path, use_team_drawing_channel=False):
         '''
         Enable or disable drawings, and change drawing channel
@@ -562,12 +567,14 @@ class Path_Manager():
             optional_2d_target = (0,0)
 
         # flatten obstacles
-        obstacles = sum(obstacles, tuple())
+        obstacles = [v for o in obstacles for v in o]
         assert len(obstacles) % 5 == 0, "Each obstacle should be characterized by exactly 5 float values"
 
         # Path parameters: start, allow_out_of_bounds, go_to_goal, optional_target, timeout (us), obstacles
         params = np.array([*start, int(allow_out_of_bounds), go_to_goal, *optional_2d_target, timeout, *obstacles], np.float32)
-        path_ret  = a_star.compute(params)
+        t = self.world.profiler.now()
+        path_ret  = self.planners[bool(allow_out_of_bounds)].compute(params)
+        self.world.profiler.add(self.world.profiler.PATH_PLANNING, t)
         path = path_ret[:-2]
         path_status = path_ret[-2]
 
@@ -580,4 +587,87 @@ class Path_Manager():
                     d.line((path[j],path[j+1]),(path[j+2],path[j+3]), 1, c, "path_segments", False)
                 d.flush("path_segments")
 
-        return path, len(path)//2-1, path_status, path_ret[-1] # path, path_len (number of segments), path_status, path_cost (A* cost)
\ No newline at end of file
+        return path, len(path)//2-1, path_status, path_ret[-1] # path, path_len (number of segments), path_status, path_cost (A* cost)
+
+
+    def get_paths(self, starts, allow_out_of_bounds, obstacles=[], optional_2d_targets=None, timeout = 3000):
+        '''
+        Compute several paths with the same obstacles in a single call
+        The obstacle map is built once, and paths with the same start share the search (see Planner.compute_batch)
+        Useful to compare candidate targets (or teammates) by path cost instead of euclidean distance
+
+        Parameters
+        ----------
+        starts : array_like
+            2D start of each path (N,2), or a single 2D start shared by all paths
+        allow_out_of_bounds : bool
+            allow paths to go out of bounds, should be False when dribbling
+        obstacles : list
+            list of obstacles, where each obstacle is a tuple of 5 floats (x, y, hard radius, soft radius, repulsive force)
+        optional_2d_targets : list
+            2D target of each path, where None means the opponent's goal (see `get_path`)
+            if None, the target of every path is the opponent's goal (`starts` must be (N,2))
+        timeout : float
+            maximum execution time of each path (in microseconds)
+
+        Returns
+        -------
+        paths : list
+            list of (path, path_len, path_status, path_cost) for each start/target pair (see `get_path`)
+        '''
+
+        starts = np.asarray(starts, np.float32).reshape(-1,2)
+        n = len(starts) if optional_2d_targets is None else len(optional_2d_targets)
+        if optional_2d_targets is None:
+            optional_2d_targets = [None] * n
+        starts = np.broadcast_to(starts, (n,2))
+
+        # Query parameters: start, go_to_goal, optional_target
+        queries = [(s[0], s[1], int(t is None), *((0,0) if t is None else t[:2])) for s,t in zip(starts, optional_2d_targets)]
+        obstacles = [v for o in obstacles for v in o]
+        assert len(obstacles) % 5 == 0, "Each obstacle should be characterized by exactly 5 float values"
+
+        # Batch parameters: allow_out_of_bounds, timeout (us), number of queries, queries, obstacles
+        params = np.array([int(allow_out_of_bounds), timeout, n, *[v for q in queries for v in q], *obstacles], np.float32)
+        t = self.world.profiler.now()
+        batch_ret = self.batch_planner.compute_batch(params)
+        self.world.profiler.add(self.world.profiler.PATH_PLANNING, t)
+
+        # Split output: each query's output is preceded by its size
+        paths = []
+        i = 0
+        while i < len(batch_ret):
+            size = int(batch_ret[i])
+            path_ret = batch_ret[i+1:i+1+size]
+            path = path_ret[:-2]
+            paths.append((path, len(path)//2-1, path_ret[-2], path_ret[-1]))
+            i += size + 1
+        return paths
+
+    def get_path_costs(self, targets, priority_unums:list=[], is_aggressive=True, timeout = 1000):
+        '''
+        Path cost from our position to each target, with the obstacles of `get_path_to_target`
+        (the cost is infinite if the search timed out or if the target is unreachable)
+
+        Parameters
+        ----------
+        targets : list
+            list of 2D targets in absolute coordinates
+        priority_unums : list
+            list of teammates to avoid (since their role is more important)
+        is_aggressive : bool
+            if True, safety margins are reduced for opponents
+        timeout : float
+            maximum execution time of each path (in microseconds)
+
+        Returns
+        -------
+        costs : ndarray
+            A* cost of each path (roughly the path length in meters, plus the cost of crossing soft obstacles)
+        '''
+        obstacles = self.get_obstacles(include_teammates = True, include_opponents = True, include_play_mode_restrictions = True,
+                           mode = Path_Manager.MODE_AGGRESSIVE if is_aggressive else Path_Manager.MODE_CAUTIOUS, priority_unums = priority_unums)
+
+        paths = self.get_paths(self.world.robot.loc_head_position[:2], True, obstacles, targets, timeout)
+        return np.array([cost if status in (Path_Manager.STATUS_SUCCESS, Path_Manager.STATUS_DIRECT) else np.inf
+                         for _,_,status,cost in paths])